@@ -0,0 +1,453 @@
+// CPython расширение поверх socks5_parser.c: вызовы без ctypes.
+//
+// Данные принимаются через buffer protocol (bytes - без захвата буфера),
+// точки входа METH_FASTCALL. Функции *_into заполняют ctypes структуры
+// socks5_native по их буферу, parse_request возвращает компактный
+// неизменяемый ParsedRequest(cmd, atyp, host, port, consumed).
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <structmember.h>
+#include <netinet/in.h>
+#include <string.h>
+
+#include "socks5_parser.h"
+
+// ParsedRequest: числа хранятся без упаковки в int, объект не отслеживается GC
+// (host - строка, циклов нет). PyStructSequence на каждый вызов ищет размеры
+// в словаре типа и выделяет GC объект - это больше половины времени разбора.
+typedef struct {
+    PyObject_HEAD
+    PyObject* host;
+    uint16_t port;
+    uint16_t consumed;
+    uint8_t cmd;
+    uint8_t atyp;
+} ParsedRequestObject;
+
+static PyTypeObject* ParsedRequestType = NULL;
+
+static void parsed_request_dealloc(ParsedRequestObject* self)
+{
+    PyTypeObject* type = Py_TYPE(self);
+    Py_XDECREF(self->host);
+    PyObject_Free(self);
+    Py_DECREF(type);
+}
+
+static Py_ssize_t parsed_request_length(PyObject* self)
+{
+    (void)self;
+    return 5;
+}
+
+// Распаковка как у кортежа: cmd, atyp, host, port, consumed = result
+static PyObject* parsed_request_item(ParsedRequestObject* self, Py_ssize_t index)
+{
+    switch (index) {
+    case 0: return PyLong_FromLong(self->cmd);
+    case 1: return PyLong_FromLong(self->atyp);
+    case 2: return Py_NewRef(self->host);
+    case 3: return PyLong_FromLong(self->port);
+    case 4: return PyLong_FromLong(self->consumed);
+    }
+    PyErr_SetString(PyExc_IndexError, "ParsedRequest index out of range");
+    return NULL;
+}
+
+static PyObject* parsed_request_repr(ParsedRequestObject* self)
+{
+    return PyUnicode_FromFormat("ParsedRequest(cmd=%d, atyp=%d, host=%R, port=%d, consumed=%d)",
+                                self->cmd, self->atyp, self->host, self->port, self->consumed);
+}
+
+static PyMemberDef parsed_request_members[] = {
+    {"cmd", T_UBYTE, offsetof(ParsedRequestObject, cmd), READONLY, "SOCKS5 command"},
+    {"atyp", T_UBYTE, offsetof(ParsedRequestObject, atyp), READONLY, "address type"},
+    {"host", T_OBJECT, offsetof(ParsedRequestObject, host), READONLY,
+     "destination host: dotted IPv4, IPv6 or domain name"},
+    {"port", T_USHORT, offsetof(ParsedRequestObject, port), READONLY, "destination port"},
+    {"consumed", T_USHORT, offsetof(ParsedRequestObject, consumed), READONLY, "request length in bytes"},
+    {NULL, 0, 0, 0, NULL}
+};
+
+static PyType_Slot parsed_request_slots[] = {
+    {Py_tp_dealloc, parsed_request_dealloc},
+    {Py_tp_repr, parsed_request_repr},
+    {Py_tp_members, parsed_request_members},
+    {Py_sq_length, parsed_request_length},
+    {Py_sq_item, parsed_request_item},
+    {Py_tp_doc, "Parsed SOCKS5 request"},
+    {0, NULL}
+};
+
+static PyType_Spec parsed_request_spec = {
+    "_socks5_ext.ParsedRequest",
+    sizeof(ParsedRequestObject),
+    0,
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_DISALLOW_INSTANTIATION,
+    parsed_request_slots
+};
+
+// Входные данные: bytes напрямую, остальные объекты через buffer protocol.
+// view->obj == NULL - буфер не захватывался и освобождать его не нужно.
+static int get_input(PyObject* obj, Py_buffer* view, const uint8_t** data, size_t* len)
+{
+    if (PyBytes_CheckExact(obj)) {
+        view->obj = NULL;
+        *data = (const uint8_t*)PyBytes_AS_STRING(obj);
+        *len = (size_t)PyBytes_GET_SIZE(obj);
+        return 0;
+    }
+    if (PyObject_GetBuffer(obj, view, PyBUF_SIMPLE) < 0) return -1;
+    *data = (const uint8_t*)view->buf;
+    *len = (size_t)view->len;
+    return 0;
+}
+
+static void release_input(Py_buffer* view)
+{
+    if (view->obj) PyBuffer_Release(view);
+}
+
+// Записываемый буфер результата (ctypes структура, array.array) не меньше size байт
+static int get_output(PyObject* obj, Py_buffer* view, size_t size)
+{
+    if (PyObject_GetBuffer(obj, view, PyBUF_WRITABLE) < 0) return -1;
+    if ((size_t)view->len < size) {
+        PyBuffer_Release(view);
+        PyErr_Format(PyExc_ValueError, "output buffer too small: %zd < %zu", view->len, size);
+        return -1;
+    }
+    return 0;
+}
+
+static int check_nargs(const char* name, Py_ssize_t nargs, Py_ssize_t expected)
+{
+    if (nargs == expected) return 0;
+    PyErr_Format(PyExc_TypeError, "%s() takes exactly %zd arguments (%zd given)", name, expected, nargs);
+    return -1;
+}
+
+// parse_*_into(data, out) -> код ошибки парсера
+#define DEFINE_PARSE_INTO(name, type, func)                                      \
+    static PyObject* name(PyObject* module, PyObject* const* args, Py_ssize_t nargs) \
+    {                                                                            \
+        Py_buffer input, output;                                                 \
+        const uint8_t* data;                                                     \
+        size_t len;                                                              \
+        (void)module;                                                            \
+        if (check_nargs(#name, nargs, 2) < 0) return NULL;                       \
+        if (get_input(args[0], &input, &data, &len) < 0) return NULL;            \
+        if (get_output(args[1], &output, sizeof(type)) < 0) {                    \
+            release_input(&input);                                               \
+            return NULL;                                                         \
+        }                                                                        \
+        int result = func(data, len, (type*)output.buf);                         \
+        PyBuffer_Release(&output);                                               \
+        release_input(&input);                                                   \
+        return PyLong_FromLong(result);                                          \
+    }
+
+DEFINE_PARSE_INTO(parse_handshake_into, socks5_handshake_t, parse_socks5_handshake)
+DEFINE_PARSE_INTO(parse_request_into, socks5_request_t, parse_socks5_request)
+DEFINE_PARSE_INTO(parse_auth_into, socks5_auth_t, parse_socks5_auth)
+DEFINE_PARSE_INTO(parse_udp_header_into, socks5_udp_header_t, parse_socks5_udp_header)
+
+// *_needed(data) -> полная длина сообщения или код ошибки
+#define DEFINE_NEEDED(name, func)                                                \
+    static PyObject* name(PyObject* module, PyObject* const* args, Py_ssize_t nargs) \
+    {                                                                            \
+        Py_buffer input;                                                         \
+        const uint8_t* data;                                                     \
+        size_t len;                                                              \
+        (void)module;                                                            \
+        if (check_nargs(#name, nargs, 1) < 0) return NULL;                       \
+        if (get_input(args[0], &input, &data, &len) < 0) return NULL;            \
+        long result = func(data, len);                                           \
+        release_input(&input);                                                   \
+        return PyLong_FromLong(result);                                          \
+    }
+
+DEFINE_NEEDED(handshake_needed, socks5_handshake_needed)
+DEFINE_NEEDED(request_needed, socks5_request_needed)
+DEFINE_NEEDED(auth_needed, socks5_auth_needed)
+
+// ASCII строка без декодирования UTF-8
+static PyObject* ascii_string(const char* text, Py_ssize_t len)
+{
+    PyObject* string = PyUnicode_New(len, 127);
+    if (string) memcpy(PyUnicode_DATA(string), text, (size_t)len);
+    return string;
+}
+
+// IPv4 в точечной записи без snprintf
+static Py_ssize_t format_ipv4(const uint8_t* addr, char* out)
+{
+    char* p = out;
+    for (int i = 0; i < 4; i++) {
+        uint8_t octet = addr[i];
+        if (octet >= 100) *p++ = (char)('0' + octet / 100);
+        if (octet >= 10) *p++ = (char)('0' + octet / 10 % 10);
+        *p++ = (char)('0' + octet % 10);
+        if (i < 3) *p++ = '.';
+    }
+    return p - out;
+}
+
+// IPv6 как у inet_ntop из glibc (RFC 5952 плюс запись ::a.b.c.d и ::ffff:a.b.c.d),
+// но без sprintf: inet_ntop занимал больше половины времени разбора IPv6 запроса
+static Py_ssize_t format_ipv6(const uint8_t* addr, char* out)
+{
+    static const char hex[] = "0123456789abcdef";
+    uint16_t words[8];
+    int best_base = -1, best_len = 0, base = -1, len = 0;
+
+    for (int i = 0; i < 8; i++) {
+        words[i] = (uint16_t)(addr[2 * i] << 8 | addr[2 * i + 1]);
+        if (words[i] == 0) {
+            if (base < 0) base = i;
+            if (++len > best_len) {
+                best_base = base;
+                best_len = len;
+            }
+        } else {
+            base = -1;
+            len = 0;
+        }
+    }
+    // Одна нулевая группа не сокращается
+    if (best_len < 2) best_base = -1;
+
+    char* p = out;
+    for (int i = 0; i < 8; i++) {
+        if (i == best_base) {
+            *p++ = ':';
+            i += best_len - 1;
+            if (i == 7) *p++ = ':';
+            continue;
+        }
+        if (i > 0) *p++ = ':';
+        if (i == 6 && best_base == 0 && (best_len == 6 || (best_len == 5 && words[5] == 0xffff))) {
+            return p - out + format_ipv4(addr + 12, p);
+        }
+        uint16_t word = words[i];
+        int shift = 12;
+        while (shift > 0 && (word >> shift) == 0) shift -= 4;
+        for (; shift >= 0; shift -= 4) *p++ = hex[(word >> shift) & 0xF];
+    }
+    return p - out;
+}
+
+// parse_request(data) -> ParsedRequest или отрицательный код ошибки (int)
+static PyObject* parse_request(PyObject* module, PyObject* const* args, Py_ssize_t nargs)
+{
+    Py_buffer input;
+    const uint8_t* data;
+    size_t len;
+    socks5_request_t request;
+    (void)module;
+
+    if (check_nargs("parse_request", nargs, 1) < 0) return NULL;
+    if (get_input(args[0], &input, &data, &len) < 0) return NULL;
+    int result = parse_socks5_request(data, len, &request);
+    release_input(&input);
+    if (result != 0) return PyLong_FromLong(result);
+
+    PyObject* host;
+    uint16_t consumed;
+    if (request.atyp == 0x01) {
+        char text[16];
+        host = ascii_string(text, format_ipv4(request.dst_addr.ipv4.addr, text));
+        consumed = 10;
+    } else if (request.atyp == 0x04) {
+        char text[INET6_ADDRSTRLEN];
+        host = ascii_string(text, format_ipv6(request.dst_addr.ipv6.addr, text));
+        consumed = 22;
+    } else {
+        // Не-UTF-8 байты имени сохраняются как суррогаты и не приводят к исключению
+        host = PyUnicode_DecodeUTF8((const char*)request.dst_addr.domain.name, request.dst_addr.domain.len,
+                                    "surrogateescape");
+        consumed = (uint16_t)(7 + request.dst_addr.domain.len);
+    }
+    if (!host) return NULL;
+
+    ParsedRequestObject* parsed = PyObject_New(ParsedRequestObject, ParsedRequestType);
+    if (!parsed) {
+        Py_DECREF(host);
+        return NULL;
+    }
+    parsed->host = host;
+    parsed->port = request.dst_port;
+    parsed->consumed = consumed;
+    parsed->cmd = request.cmd;
+    parsed->atyp = request.atyp;
+    return (PyObject*)parsed;
+}
+
+// build_udp_header(out, atyp, addr, port) -> длина заголовка или код ошибки
+static PyObject* build_udp_header(PyObject* module, PyObject* const* args, Py_ssize_t nargs)
+{
+    Py_buffer output, addr_view;
+    const uint8_t* addr;
+    size_t addr_len;
+    (void)module;
+
+    if (check_nargs("build_udp_header", nargs, 4) < 0) return NULL;
+    long atyp = PyLong_AsLong(args[1]);
+    long port = PyLong_AsLong(args[3]);
+    if (PyErr_Occurred()) return NULL;
+    if (atyp < 0 || atyp > 0xFF || port < 0 || port > 0xFFFF) {
+        PyErr_SetString(PyExc_ValueError, "atyp or port out of range");
+        return NULL;
+    }
+    if (get_input(args[2], &addr_view, &addr, &addr_len) < 0) return NULL;
+    if (PyObject_GetBuffer(args[0], &output, PyBUF_WRITABLE) < 0) {
+        release_input(&addr_view);
+        return NULL;
+    }
+    long result = build_socks5_udp_header((uint8_t)atyp, addr, addr_len, (uint16_t)port,
+                                          (uint8_t*)output.buf, (size_t)output.len);
+    PyBuffer_Release(&output);
+    release_input(&addr_view);
+    return PyLong_FromLong(result);
+}
+
+// Массив пакетного парсинга: не меньше count элементов по itemsize байт
+static int get_array(PyObject* obj, Py_buffer* view, size_t count, size_t itemsize)
+{
+    return get_output(obj, view, count * itemsize);
+}
+
+// parse_handshakes_batch(data, offsets, count, status, nmethods) -> число разобранных
+static PyObject* parse_handshakes_batch(PyObject* module, PyObject* const* args, Py_ssize_t nargs)
+{
+    Py_buffer input, offsets, arrays[2];
+    const uint8_t* data;
+    size_t len;
+    int acquired = 0;
+    PyObject* result = NULL;
+    (void)module;
+
+    if (check_nargs("parse_handshakes_batch", nargs, 5) < 0) return NULL;
+    Py_ssize_t count = PyLong_AsSsize_t(args[2]);
+    if (count < 0) {
+        if (!PyErr_Occurred()) PyErr_SetString(PyExc_ValueError, "negative count");
+        return NULL;
+    }
+    if (get_input(args[0], &input, &data, &len) < 0) return NULL;
+    if (PyObject_GetBuffer(args[1], &offsets, PyBUF_SIMPLE) < 0) goto done_input;
+    if ((size_t)offsets.len < (size_t)(count + 1) * sizeof(uint32_t)) {
+        PyErr_SetString(PyExc_ValueError, "offsets array too small");
+        goto done_offsets;
+    }
+    if (get_array(args[3], &arrays[0], count, sizeof(int8_t)) < 0) goto done_offsets;
+    acquired = 1;
+    if (get_array(args[4], &arrays[1], count, sizeof(uint8_t)) < 0) goto done_arrays;
+    acquired = 2;
+
+    result = PyLong_FromLong(parse_socks5_handshake_batch(data, len, (const uint32_t*)offsets.buf, (size_t)count,
+                                                          (int8_t*)arrays[0].buf, (uint8_t*)arrays[1].buf));
+done_arrays:
+    for (int i = 0; i < acquired; i++) PyBuffer_Release(&arrays[i]);
+done_offsets:
+    PyBuffer_Release(&offsets);
+done_input:
+    release_input(&input);
+    return result;
+}
+
+// parse_requests_batch(data, offsets, count, status, cmd, atyp, port, addr_offset) -> число разобранных
+static PyObject* parse_requests_batch(PyObject* module, PyObject* const* args, Py_ssize_t nargs)
+{
+    static const size_t itemsizes[5] = {sizeof(int8_t), sizeof(uint8_t), sizeof(uint8_t),
+                                        sizeof(uint16_t), sizeof(uint32_t)};
+    Py_buffer input, offsets, arrays[5];
+    const uint8_t* data;
+    size_t len;
+    int acquired = 0;
+    PyObject* result = NULL;
+    (void)module;
+
+    if (check_nargs("parse_requests_batch", nargs, 8) < 0) return NULL;
+    Py_ssize_t count = PyLong_AsSsize_t(args[2]);
+    if (count < 0) {
+        if (!PyErr_Occurred()) PyErr_SetString(PyExc_ValueError, "negative count");
+        return NULL;
+    }
+    if (get_input(args[0], &input, &data, &len) < 0) return NULL;
+    if (PyObject_GetBuffer(args[1], &offsets, PyBUF_SIMPLE) < 0) goto done_input;
+    if ((size_t)offsets.len < (size_t)(count + 1) * sizeof(uint32_t)) {
+        PyErr_SetString(PyExc_ValueError, "offsets array too small");
+        goto done_offsets;
+    }
+    for (; acquired < 5; acquired++) {
+        if (get_array(args[3 + acquired], &arrays[acquired], count, itemsizes[acquired]) < 0) goto done_arrays;
+    }
+
+    result = PyLong_FromLong(parse_socks5_request_batch(
+        data, len, (const uint32_t*)offsets.buf, (size_t)count, (int8_t*)arrays[0].buf,
+        (uint8_t*)arrays[1].buf, (uint8_t*)arrays[2].buf, (uint16_t*)arrays[3].buf, (uint32_t*)arrays[4].buf));
+done_arrays:
+    for (int i = 0; i < acquired; i++) PyBuffer_Release(&arrays[i]);
+done_offsets:
+    PyBuffer_Release(&offsets);
+done_input:
+    release_input(&input);
+    return result;
+}
+
+static PyMethodDef methods[] = {
+    {"parse_handshake_into", (PyCFunction)(void (*)(void))parse_handshake_into, METH_FASTCALL,
+     "parse_handshake_into(data, handshake) -> error code"},
+    {"parse_request_into", (PyCFunction)(void (*)(void))parse_request_into, METH_FASTCALL,
+     "parse_request_into(data, request) -> error code"},
+    {"parse_auth_into", (PyCFunction)(void (*)(void))parse_auth_into, METH_FASTCALL,
+     "parse_auth_into(data, auth) -> error code"},
+    {"parse_udp_header_into", (PyCFunction)(void (*)(void))parse_udp_header_into, METH_FASTCALL,
+     "parse_udp_header_into(data, header) -> error code"},
+    {"handshake_needed", (PyCFunction)(void (*)(void))handshake_needed, METH_FASTCALL,
+     "handshake_needed(data) -> full message length or error code"},
+    {"request_needed", (PyCFunction)(void (*)(void))request_needed, METH_FASTCALL,
+     "request_needed(data) -> full message length or error code"},
+    {"auth_needed", (PyCFunction)(void (*)(void))auth_needed, METH_FASTCALL,
+     "auth_needed(data) -> full message length or error code"},
+    {"parse_request", (PyCFunction)(void (*)(void))parse_request, METH_FASTCALL,
+     "parse_request(data) -> ParsedRequest or error code"},
+    {"build_udp_header", (PyCFunction)(void (*)(void))build_udp_header, METH_FASTCALL,
+     "build_udp_header(out, atyp, addr, port) -> header length or error code"},
+    {"parse_handshakes_batch", (PyCFunction)(void (*)(void))parse_handshakes_batch, METH_FASTCALL,
+     "parse_handshakes_batch(data, offsets, count, status, nmethods) -> parsed count"},
+    {"parse_requests_batch", (PyCFunction)(void (*)(void))parse_requests_batch, METH_FASTCALL,
+     "parse_requests_batch(data, offsets, count, status, cmd, atyp, port, addr_offset) -> parsed count"},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef module_def = {
+    PyModuleDef_HEAD_INIT,
+    "_socks5_ext",
+    "SOCKS5 parser as a CPython extension",
+    -1,
+    methods,
+    NULL, NULL, NULL, NULL
+};
+
+PyMODINIT_FUNC PyInit__socks5_ext(void)
+{
+    PyObject* module = PyModule_Create(&module_def);
+    if (!module) return NULL;
+
+    if (!ParsedRequestType) {
+        ParsedRequestType = (PyTypeObject*)PyType_FromSpec(&parsed_request_spec);
+        if (!ParsedRequestType) {
+            Py_DECREF(module);
+            return NULL;
+        }
+    }
+    Py_INCREF(ParsedRequestType);
+    if (PyModule_AddObject(module, "ParsedRequest", (PyObject*)ParsedRequestType) < 0) {
+        Py_DECREF(ParsedRequestType);
+        Py_DECREF(module);
+        return NULL;
+    }
+    return module;
+}
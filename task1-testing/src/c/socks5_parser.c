@@ -17,41 +17,52 @@ int parse_socks5_handshake(const uint8_t* data, size_t len, socks5_handshake_t*
     return 0;
 }
 
-int parse_socks5_request(const uint8_t* data, size_t len, socks5_request_t* request) 
+int parse_socks5_auth(const uint8_t* data, size_t len, socks5_auth_t* auth)
 {
-    if (!data || !request) return -1;
-    if (len < 4) return -1;
-    
-    request->version = data[0];
-    request->cmd = data[1];
-    request->rsv = data[2];
-    request->atyp = data[3];
-    
-    size_t offset = 4;
-    
-    switch (request->atyp) {
+    if (!data || !auth || len < 2) return -1;
+
+    auth->version = data[0];
+    if (auth->version != 0x01) return -2;
+
+    auth->ulen = data[1];
+    if (auth->ulen == 0) return -3;
+    if (len < (size_t)(2 + auth->ulen + 1)) return -4;
+    memcpy(auth->uname, &data[2], auth->ulen);
+
+    auth->plen = data[2 + auth->ulen];
+    if (auth->plen == 0) return -5;
+    if (len < (size_t)(3 + auth->ulen + auth->plen)) return -6;
+    memcpy(auth->passwd, &data[3 + auth->ulen], auth->plen);
+    return 0;
+}
+
+// Разбирает ATYP-адрес и порт, начиная с data[offset]; *end - смещение после порта
+static int parse_address(const uint8_t* data, size_t len, size_t offset, uint8_t atyp,
+                         socks5_addr_t* addr, uint16_t* dst_port, size_t* end)
+{
+    switch (atyp) {
         case 0x01: // IPv4
             if (len < offset + 4 + 2) return -2;
-            memcpy(request->dst_addr.ipv4.addr, &data[offset], 4);
+            memcpy(addr->ipv4.addr, &data[offset], 4);
             offset += 4;
             break;
             
         case 0x03: // Domain name
             if (len < offset + 1) return -3;
-            request->dst_addr.domain.len = data[offset];
+            addr->domain.len = data[offset];
             offset += 1;
             
-            if (request->dst_addr.domain.len == 0 || request->dst_addr.domain.len > 254) 
+            if (addr->domain.len == 0 || addr->domain.len > 254) 
                 return -4;
-            if (len < offset + request->dst_addr.domain.len + 2) return -5;
+            if (len < offset + addr->domain.len + 2) return -5;
             
-            memcpy(request->dst_addr.domain.name, &data[offset], request->dst_addr.domain.len);
-            offset += request->dst_addr.domain.len;
+            memcpy(addr->domain.name, &data[offset], addr->domain.len);
+            offset += addr->domain.len;
             break;
             
         case 0x04: // IPv6
             if (len < offset + 16 + 2) return -6;
-            memcpy(request->dst_addr.ipv6.addr, &data[offset], 16);
+            memcpy(addr->ipv6.addr, &data[offset], 16);
             offset += 16;
             break;
             
@@ -63,7 +74,186 @@ int parse_socks5_request(const uint8_t* data, size_t len, socks5_request_t* requ
     if (len < offset + 2) return -8;
     uint16_t port;
     memcpy(&port, &data[offset], 2);
-    request->dst_port = ntohs(port);
+    *dst_port = ntohs(port);
+    *end = offset + 2;
+    
+    return 0;
+}
+
+int parse_socks5_request(const uint8_t* data, size_t len, socks5_request_t* request) 
+{
+    if (!data || !request) return -1;
+    if (len < 4) return -1;
     
+    request->version = data[0];
+    request->cmd = data[1];
+    request->rsv = data[2];
+    request->atyp = data[3];
+    
+    size_t end;
+    return parse_address(data, len, 4, request->atyp, &request->dst_addr, &request->dst_port, &end);
+}
+
+int parse_socks5_udp_header(const uint8_t* data, size_t len, socks5_udp_header_t* header)
+{
+    if (!data || !header) return -1;
+    if (len < 4) return -1;
+
+    header->rsv = (uint16_t)((data[0] << 8) | data[1]);
+    header->frag = data[2];
+    header->atyp = data[3];
+
+    size_t end;
+    int rc = parse_address(data, len, 4, header->atyp, &header->dst_addr, &header->dst_port, &end);
+    if (rc != 0) return rc;
+    header->header_len = (uint16_t)end;
     return 0;
 }
+
+long build_socks5_udp_header(uint8_t atyp, const uint8_t* addr, size_t addr_len, uint16_t port,
+                             uint8_t* out, size_t out_len)
+{
+    if (!addr || !out) return -1;
+
+    size_t addr_field;
+    switch (atyp) {
+        case 0x01: // IPv4
+            if (addr_len != 4) return -4;
+            addr_field = 4;
+            break;
+        case 0x03: // Domain name
+            if (addr_len == 0 || addr_len > 254) return -4;
+            addr_field = 1 + addr_len;
+            break;
+        case 0x04: // IPv6
+            if (addr_len != 16) return -4;
+            addr_field = 16;
+            break;
+        default:
+            return -7;
+    }
+
+    size_t total = 4 + addr_field + 2;
+    if (out_len < total) return -1;
+
+    out[0] = 0;
+    out[1] = 0;
+    out[2] = 0;
+    out[3] = atyp;
+    uint8_t* p = &out[4];
+    if (atyp == 0x03) *p++ = (uint8_t)addr_len;
+    memcpy(p, addr, addr_len);
+    p += addr_len;
+    p[0] = (uint8_t)(port >> 8);
+    p[1] = (uint8_t)(port & 0xFF);
+    return (long)total;
+}
+
+long socks5_handshake_needed(const uint8_t* data, size_t len)
+{
+    if (!data && len) return -1;
+    if (len < 2) return 2;
+    if (data[0] != 0x05) return -2;
+    if (data[1] == 0) return -3;
+    return 2 + (long)data[1];
+}
+
+long socks5_request_needed(const uint8_t* data, size_t len)
+{
+    if (!data && len) return -1;
+    if (len < 4) return 4;
+
+    switch (data[3]) {
+        case 0x01: // IPv4
+            return 4 + 4 + 2;
+        case 0x03: // Domain name
+            if (len < 5) return 5 + 2;
+            if (data[4] == 0 || data[4] > 254) return -4;
+            return 5 + (long)data[4] + 2;
+        case 0x04: // IPv6
+            return 4 + 16 + 2;
+        default:
+            return -7;
+    }
+}
+
+long socks5_auth_needed(const uint8_t* data, size_t len)
+{
+    if (!data && len) return -1;
+    if (len < 2) return 2;
+    if (data[0] != 0x01) return -2;
+    if (data[1] == 0) return -3;
+
+    size_t plen_offset = 2 + (size_t)data[1];
+    if (len <= plen_offset) return (long)plen_offset + 1;
+    if (data[plen_offset] == 0) return -5;
+    return (long)plen_offset + 1 + (long)data[plen_offset];
+}
+
+// Проверяет, что сообщение i лежит внутри буфера
+static int batch_bounds_ok(const uint32_t* offsets, size_t i, size_t len)
+{
+    return offsets[i] <= offsets[i + 1] && offsets[i + 1] <= len;
+}
+
+long parse_socks5_handshake_batch(const uint8_t* data, size_t len,
+                                  const uint32_t* offsets, size_t count,
+                                  int8_t* status, uint8_t* nmethods)
+{
+    if (!data || !offsets || !status || !nmethods) return -1;
+
+    socks5_handshake_t handshake;
+    long parsed = 0;
+
+    for (size_t i = 0; i < count; i++) {
+        nmethods[i] = 0;
+        if (!batch_bounds_ok(offsets, i, len)) {
+            status[i] = -1;
+            continue;
+        }
+
+        int rc = parse_socks5_handshake(&data[offsets[i]], offsets[i + 1] - offsets[i], &handshake);
+        status[i] = (int8_t)rc;
+        if (rc == 0) {
+            nmethods[i] = handshake.nmethods;
+            parsed++;
+        }
+    }
+
+    return parsed;
+}
+
+long parse_socks5_request_batch(const uint8_t* data, size_t len,
+                                const uint32_t* offsets, size_t count,
+                                int8_t* status, uint8_t* cmd, uint8_t* atyp,
+                                uint16_t* port, uint32_t* addr_offset)
+{
+    if (!data || !offsets || !status || !cmd || !atyp || !port || !addr_offset) return -1;
+
+    socks5_request_t request;
+    long parsed = 0;
+
+    for (size_t i = 0; i < count; i++) {
+        cmd[i] = 0;
+        atyp[i] = 0;
+        port[i] = 0;
+        addr_offset[i] = 0;
+        if (!batch_bounds_ok(offsets, i, len)) {
+            status[i] = -1;
+            continue;
+        }
+
+        int rc = parse_socks5_request(&data[offsets[i]], offsets[i + 1] - offsets[i], &request);
+        status[i] = (int8_t)rc;
+        if (rc != 0) continue;
+
+        cmd[i] = request.cmd;
+        atyp[i] = request.atyp;
+        port[i] = request.dst_port;
+        // Адрес начинается после заголовка, для домена - еще и после байта длины
+        addr_offset[i] = offsets[i] + 4 + (request.atyp == 0x03 ? 1 : 0);
+        parsed++;
+    }
+
+    return parsed;
+}
@@ -17,21 +17,76 @@ typedef struct {
     uint8_t name[255];
 } socks5_domain_t;
 
+// Username/password sub-negotiation (RFC 1929)
+typedef struct {
+    uint8_t version;
+    uint8_t ulen;
+    uint8_t uname[255];
+    uint8_t plen;
+    uint8_t passwd[255];
+} socks5_auth_t;
+
+typedef union {
+    struct { uint8_t addr[4]; } ipv4;
+    struct { uint8_t addr[16]; } ipv6;
+    socks5_domain_t domain;
+} socks5_addr_t;
+
 typedef struct {
     uint8_t version;
     uint8_t cmd;
     uint8_t rsv;
     uint8_t atyp;
-    union {
-        struct { uint8_t addr[4]; } ipv4;
-        struct { uint8_t addr[16]; } ipv6;
-        socks5_domain_t domain;
-    } dst_addr;
+    socks5_addr_t dst_addr;
     uint16_t dst_port;
 } socks5_request_t;
 
+// Заголовок UDP датаграммы (RFC 1928, раздел 7)
+typedef struct {
+    uint16_t rsv;
+    uint8_t frag;
+    uint8_t atyp;
+    socks5_addr_t dst_addr;
+    uint16_t dst_port;
+    uint16_t header_len;  // смещение данных датаграммы
+} socks5_udp_header_t;
+
 // Функции парсинга
 int parse_socks5_handshake(const uint8_t* data, size_t len, socks5_handshake_t* handshake);
 int parse_socks5_request(const uint8_t* data, size_t len, socks5_request_t* request);
 
+// Разбор запроса username/password: -1 - мало данных, -2 - версия не 0x01,
+// -3 - пустое имя, -4 - не хватает имени или PLEN, -5 - пустой пароль, -6 - не хватает пароля
+int parse_socks5_auth(const uint8_t* data, size_t len, socks5_auth_t* auth);
+
+// Разбор заголовка UDP датаграммы, коды ошибок адреса те же, что у parse_socks5_request.
+// FRAG не проверяется: датаграммы с FRAG != 0 отбрасывает вызывающий код.
+int parse_socks5_udp_header(const uint8_t* data, size_t len, socks5_udp_header_t* header);
+
+// Записывает заголовок UDP датаграммы в out. addr - 4 или 16 байт IP либо имя домена
+// длиной addr_len. Возвращает длину заголовка или отрицательный код ошибки:
+// -1 - неверные параметры или out слишком мал, -4 - неверная длина адреса, -7 - неизвестный atyp.
+long build_socks5_udp_header(uint8_t atyp, const uint8_t* addr, size_t addr_len, uint16_t port,
+                             uint8_t* out, size_t out_len);
+
+// Инкрементальный разбор: полная длина сообщения в начале data.
+// Если len меньше результата, сообщение не пришло целиком и нужно дочитать
+// (результат - len) байт; пока длина неизвестна, возвращается нижняя граница.
+// Отрицательное значение - код ошибки, сообщение невалидно независимо от остатка.
+long socks5_handshake_needed(const uint8_t* data, size_t len);
+long socks5_request_needed(const uint8_t* data, size_t len);
+long socks5_auth_needed(const uint8_t* data, size_t len);
+
+// Пакетный парсинг: сообщение i занимает data[offsets[i] .. offsets[i + 1]),
+// массив offsets содержит count + 1 элементов.
+// Результаты пишутся в массивы длины count, код ошибки - в status.
+// Возвращает количество успешно разобранных сообщений или -1 при неверных параметрах.
+long parse_socks5_handshake_batch(const uint8_t* data, size_t len,
+                                  const uint32_t* offsets, size_t count,
+                                  int8_t* status, uint8_t* nmethods);
+long parse_socks5_request_batch(const uint8_t* data, size_t len,
+                                const uint32_t* offsets, size_t count,
+                                int8_t* status, uint8_t* cmd, uint8_t* atyp,
+                                uint16_t* port, uint32_t* addr_offset);
+
 #endif
@@ -0,0 +1,292 @@
+import os
+import socket
+import threading
+
+# Как часто watch() проверяет изменение файла правил
+WATCH_INTERVAL = 1.0
+# Первые 12 байт IPv4-mapped IPv6 адреса ::ffff:0:0/96 (RFC 4291, 2.5.5.2)
+IPV4_MAPPED_PREFIX = bytes(10) + b'\xff\xff'
+
+
+class AccessDenied(Exception):
+    """Назначение запрещено правилами ACL"""
+
+
+class Rule:
+    """Правило ACL: allow - разрешает ли оно подключение, pattern - исходная запись
+    (None у правила по умолчанию, которое действует без совпадений)
+    """
+    __slots__ = ('allow', 'pattern')
+
+    def __init__(self, allow, pattern):
+        self.allow = allow
+        self.pattern = pattern
+
+    def __repr__(self):
+        return f"Rule({'allow' if self.allow else 'deny'} {self.pattern})"
+
+
+class _Node:
+    __slots__ = ('children', 'values')
+
+    def __init__(self):
+        self.children = {}  # байт адреса -> узел следующего уровня
+        self.values = {}    # байт адреса -> (длина префикса, Rule)
+
+
+class CidrTrie:
+    """Многобитовое префиксное дерево с шагом 8 бит для поиска самого длинного префикса.
+
+    Префикс длины L хранится на уровне ceil(L / 8) и раскрывается в 2^(8 * уровень - L)
+    значений последнего байта (controlled prefix expansion), более длинный префикс
+    перекрывает более короткий. Поиск - не больше 4 (IPv4) или 16 (IPv6) обращений
+    к dict независимо от числа правил.
+    """
+    __slots__ = ('root', 'default', 'size')
+
+    def __init__(self):
+        self.root = _Node()
+        self.default = None  # правило для префикса /0
+        self.size = 0
+
+    def insert(self, network: bytes, prefixlen, rule):
+        self.size += 1
+        if prefixlen == 0:
+            self.default = rule
+            return
+
+        level = (prefixlen + 7) // 8
+        node = self.root
+        for byte in network[:level - 1]:
+            child = node.children.get(byte)
+            if child is None:
+                child = node.children[byte] = _Node()
+            node = child
+
+        first = network[level - 1]
+        span = 1 << (level * 8 - prefixlen)
+        first &= ~(span - 1) & 0xFF
+        for byte in range(first, first + span):
+            existing = node.values.get(byte)
+            if existing is None or existing[0] <= prefixlen:
+                node.values[byte] = (prefixlen, rule)
+
+    def lookup(self, address: bytes):
+        """Правило самого длинного префикса, содержащего адрес, или None"""
+        node = self.root
+        best = self.default
+        for byte in address:
+            entry = node.values.get(byte)
+            if entry is not None:
+                best = entry[1]
+            node = node.children.get(byte)
+            if node is None:
+                break
+        return best
+
+
+class _DomainNode:
+    __slots__ = ('children', 'rule')
+
+    def __init__(self):
+        self.children = {}  # метка -> узел
+        self.rule = None
+
+
+class DomainTrie:
+    """Суффиксное дерево доменов по меткам в обратном порядке (com -> example -> www).
+
+    Правило для example.com действует на сам домен и все поддомены, побеждает
+    самое длинное совпадение. Поиск - по одному обращению к dict на метку имени.
+    """
+    __slots__ = ('root', 'size')
+
+    def __init__(self):
+        self.root = _DomainNode()
+        self.size = 0
+
+    def insert(self, domain, rule):
+        self.size += 1
+        node = self.root
+        for label in reversed(domain.split('.')):
+            child = node.children.get(label)
+            if child is None:
+                child = node.children[label] = _DomainNode()
+            node = child
+        # Для одинаковых записей запрет сильнее разрешения
+        if node.rule is None or not rule.allow:
+            node.rule = rule
+
+    def lookup(self, host):
+        node = self.root
+        best = None
+        for label in reversed(host.lower().rstrip('.').split('.')):
+            node = node.children.get(label)
+            if node is None:
+                break
+            if node.rule is not None:
+                best = node.rule
+        return best
+
+
+class RuleSet:
+    """Скомпилированные правила. Не изменяется после сборки, поэтому читается без блокировок"""
+    __slots__ = ('ipv4', 'ipv6', 'domains', 'default')
+
+    def __init__(self, rules=(), default=True):
+        self.ipv4 = CidrTrie()
+        self.ipv6 = CidrTrie()
+        self.domains = DomainTrie()
+        self.default = Rule(default, None)
+
+        networks = []
+        for allow, pattern in rules:
+            target = parse_pattern(pattern)
+            rule = Rule(allow, pattern)
+            if isinstance(target, str):
+                self.domains.insert(target, rule)
+            else:
+                networks.append((target[1], not allow, target[0], rule))
+
+        # Для одинаковых префиксов запрет вставляется последним и перекрывает разрешение
+        networks.sort(key=lambda item: item[:2])
+        for prefixlen, _, packed, rule in networks:
+            trie = self.ipv4 if len(packed) == 4 else self.ipv6
+            trie.insert(packed, prefixlen, rule)
+
+    def match(self, host) -> Rule:
+        """Правило для адреса назначения: IP-адрес в любом виде или доменное имя"""
+        try:
+            return self.ipv4.lookup(socket.inet_pton(socket.AF_INET, host)) or self.default
+        except (OSError, UnicodeError):
+            pass
+        try:
+            # Зона link-local адреса (fe80::1%eth0) на правила не влияет
+            packed = socket.inet_pton(socket.AF_INET6, host.partition('%')[0])
+        except (OSError, UnicodeError):
+            return self.domains.lookup(host) or self.default
+        if packed[:12] == IPV4_MAPPED_PREFIX:
+            # ::ffff:a.b.c.d подключается к IPv4 адресу a.b.c.d и проверяется его правилами
+            rule = self.ipv4.lookup(packed[12:])
+            if rule is not None:
+                return rule
+        return self.ipv6.lookup(packed) or self.default
+
+    def stats(self):
+        return {
+            'ipv4_rules': self.ipv4.size,
+            'ipv6_rules': self.ipv6.size,
+            'domain_rules': self.domains.size,
+        }
+
+
+def parse_pattern(pattern):
+    """(адрес в сетевом виде, длина префикса) для IP-адреса или CIDR, иначе нормализованное имя домена.
+
+    Биты адреса за префиксом не обнуляются - CidrTrie.insert их не читает.
+    """
+    address, slash, prefix = pattern.partition('/')
+    for family, bits in ((socket.AF_INET, 32), (socket.AF_INET6, 128)):
+        try:
+            packed = socket.inet_pton(family, address)
+        except OSError:
+            continue
+        if not slash:
+            return packed, bits
+        if prefix.isdigit() and int(prefix) <= bits:
+            return packed, int(prefix)
+        break
+    if slash:
+        raise ValueError(f"Invalid ACL network: {pattern!r}")
+
+    domain = pattern.lower().rstrip('.')
+    if domain.startswith('*.'):
+        domain = domain[2:]
+    domain = domain.lstrip('.')
+    if not domain or any(not label for label in domain.split('.')):
+        raise ValueError(f"Invalid ACL pattern: {pattern!r}")
+    return domain
+
+
+def parse_rules(lines):
+    """Строки 'allow|deny шаблон', # - комментарий. Возвращает список (allow, шаблон)"""
+    rules = []
+    for number, line in enumerate(lines, 1):
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        parts = line.split()
+        if len(parts) != 2 or parts[0] not in ('allow', 'deny'):
+            raise ValueError(f"Invalid ACL rule at line {number}: {line!r}")
+        parse_pattern(parts[1])
+        rules.append((parts[0] == 'allow', parts[1]))
+    return rules
+
+
+class AccessControl:
+    """Контроль адресов назначения CONNECT и UDP ASSOCIATE.
+
+    Правила компилируются в RuleSet: CIDR IPv4/IPv6 в префиксные деревья, домены
+    в суффиксное дерево, поэтому стоимость проверки не зависит от числа правил.
+    Побеждает самое специфичное правило, при равенстве - запрет; без совпадений
+    действует default. load() собирает новый RuleSet и подменяет ссылку одним
+    присваиванием - проверки в других потоках видят либо старые, либо новые правила.
+    """
+
+    def __init__(self, rules=(), default=True, path=None):
+        self.default = default
+        self.path = path
+        self.mtime = None
+        self.reloads = 0
+        self.stopped = threading.Event()
+        if path is not None:
+            self.reload()
+        else:
+            self.ruleset = RuleSet(rules, default)
+
+    def load(self, rules):
+        self.ruleset = RuleSet(rules, self.default)
+        self.reloads += 1
+
+    def reload(self):
+        """Перечитывает файл правил; при ошибке в файле остаются прежние правила"""
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path) as f:
+            rules = parse_rules(f)
+        self.load(rules)
+        self.mtime = mtime
+
+    def watch(self, interval=WATCH_INTERVAL):
+        """Фоновая перезагрузка файла правил при изменении mtime"""
+        thread = threading.Thread(target=self.watch_loop, args=(interval,), name='socks5-acl')
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def watch_loop(self, interval):
+        while not self.stopped.wait(interval):
+            try:
+                if os.stat(self.path).st_mtime != self.mtime:
+                    self.reload()
+            except (OSError, ValueError):
+                # Файл заменяется или содержит ошибку - работаем с прежними правилами
+                pass
+
+    def stop(self):
+        self.stopped.set()
+
+    def match(self, host) -> Rule:
+        return self.ruleset.match(host)
+
+    def allows(self, host) -> bool:
+        return self.ruleset.match(host).allow
+
+    def filter(self, addresses):
+        """Оставляет разрешенные (family, sockaddr) из результата разрешения имени"""
+        ruleset = self.ruleset
+        return [(family, sockaddr) for family, sockaddr in addresses if ruleset.match(sockaddr[0]).allow]
+
+    def stats(self):
+        stats = self.ruleset.stats()
+        stats['reloads'] = self.reloads
+        return stats
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""Проверка username/password (RFC 1929) для SOCKS5 прокси.
+
+Хранилища учетных записей (файл, SQLite) проверяют пароль по PBKDF2 хешу -
+это намеренно дорого. CredentialCache запоминает успешные проверки, поэтому
+повторные подключения того же аккаунта не обращаются к хранилищу.
+"""
+import abc
+import argparse
+import getpass
+import hashlib
+import hmac
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+HASH_SCHEME = 'pbkdf2_sha256'
+HASH_ITERATIONS = 100000
+
+CACHE_SIZE = 10000
+CACHE_TTL = 300.0
+
+
+def hash_password(password: bytes, iterations=HASH_ITERATIONS, salt=None) -> str:
+    """Строка хеша для хранилища: pbkdf2_sha256$итерации$соль$хеш"""
+    salt = salt or os.urandom(16)
+    digest = hashlib.pbkdf2_hmac('sha256', password, salt, iterations)
+    return f'{HASH_SCHEME}${iterations}${salt.hex()}${digest.hex()}'
+
+
+def check_password(password: bytes, encoded: str) -> bool:
+    """Сравнивает пароль с хешем из hash_password за постоянное время"""
+    try:
+        scheme, iterations, salt, expected = encoded.split('$')
+        if scheme != HASH_SCHEME:
+            return False
+        digest = hashlib.pbkdf2_hmac('sha256', password, bytes.fromhex(salt), int(iterations))
+    except ValueError:
+        return False
+    return hmac.compare_digest(digest.hex(), expected)
+
+
+class CredentialStore(abc.ABC):
+    """Хранилище учетных записей: verify(username, password) -> bool.
+
+    Подклассы реализуют password_hash(username) - хеш пароля или None.
+    """
+
+    @abc.abstractmethod
+    def password_hash(self, username: bytes):
+        """Хеш пароля аккаунта или None, если аккаунта нет"""
+
+    def verify(self, username: bytes, password: bytes) -> bool:
+        encoded = self.password_hash(username)
+        if encoded is None:
+            # Хеш все равно считается, чтобы время ответа не выдавало существование аккаунта
+            hashlib.pbkdf2_hmac('sha256', password, b'\0' * 16, HASH_ITERATIONS)
+            return False
+        return check_password(password, encoded)
+
+
+class FileCredentialStore(CredentialStore):
+    """Файл со строками username:хеш (hash_password), # - комментарий.
+
+    Файл перечитывается при изменении mtime.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.users = {}
+        self.reload()
+
+    def reload(self):
+        mtime = os.stat(self.path).st_mtime
+        users = {}
+        with open(self.path, 'rb') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith(b'#'):
+                    continue
+                username, _, encoded = line.rpartition(b':')
+                if username:
+                    users[username] = encoded.decode('ascii')
+        with self.lock:
+            self.users = users
+            self.mtime = mtime
+
+    def password_hash(self, username: bytes):
+        try:
+            if os.stat(self.path).st_mtime != self.mtime:
+                self.reload()
+        except OSError:
+            # Файл временно недоступен (замена при деплое) - работаем с прочитанным
+            pass
+        with self.lock:
+            return self.users.get(username)
+
+
+class SqliteCredentialStore(CredentialStore):
+    """Учетные записи в SQLite: таблица users(username BLOB PRIMARY KEY, password_hash TEXT)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS users (username BLOB PRIMARY KEY, password_hash TEXT NOT NULL)')
+            self.connection.commit()
+
+    def add_user(self, username: bytes, password: bytes):
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO users VALUES (?, ?)',
+                                    (username, hash_password(password)))
+            self.connection.commit()
+
+    def password_hash(self, username: bytes):
+        with self.lock:
+            row = self.connection.execute('SELECT password_hash FROM users WHERE username = ?',
+                                          (username,)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class CredentialCache:
+    """Кеш успешных проверок перед хранилищем учетных записей.
+
+    Ключ - HMAC-SHA256 пары username/password с солью процесса, сами пароли
+    в памяти не хранятся. Неуспешные проверки не кешируются. Смена пароля
+    в хранилище вступает в силу для закешированного аккаунта не позже ttl.
+    """
+
+    def __init__(self, store, max_entries=CACHE_SIZE, ttl=CACHE_TTL, clock=time.monotonic):
+        self.store = store
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.salt = os.urandom(32)
+        self.entries = OrderedDict()  # ключ -> время истечения, порядок LRU
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+
+    def key(self, username: bytes, password: bytes) -> bytes:
+        # Длина имени в начале: пары ('ab', 'c') и ('a', 'bc') дают разные ключи
+        message = bytes((len(username),)) + username + password
+        return hmac.new(self.salt, message, hashlib.sha256).digest()
+
+    def verify(self, username: bytes, password: bytes) -> bool:
+        key = self.key(username, password)
+        now = self.clock()
+        with self.lock:
+            expires_at = self.entries.get(key)
+            if expires_at is not None:
+                if expires_at > now:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return True
+                del self.entries[key]
+            self.misses += 1
+
+        # Проверка в хранилище - без блокировки, она медленная
+        if not self.store.verify(username, password):
+            with self.lock:
+                self.failures += 1
+            return False
+
+        with self.lock:
+            self.entries[key] = now + self.ttl
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return True
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'failures': self.failures,
+            }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage SOCKS5 proxy credentials")
+    parser.add_argument('username')
+    parser.add_argument('--db', default=None, help="добавить пользователя в SQLite базу")
+    args = parser.parse_args(argv)
+
+    password = getpass.getpass('Password: ').encode()
+    username = args.username.encode()
+    if args.db:
+        store = SqliteCredentialStore(args.db)
+        store.add_user(username, password)
+        store.close()
+    else:
+        # Строка для файла --auth-file
+        print(f'{args.username}:{hash_password(password)}')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
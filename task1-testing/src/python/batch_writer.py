@@ -0,0 +1,87 @@
+import queue
+import threading
+
+# Сколько элементов фоновый поток записывает одним вызовом write
+WRITE_BATCH = 256
+
+_STOP = object()
+
+
+def join_lines(lines, end):
+    return ''.join(lines)
+
+
+class BatchWriter:
+    """Запись в поток вывода из фонового потока пакетами.
+
+    submit() не блокирует вызывающий поток: элемент кладется в ограниченную очередь,
+    при заполненной очереди отбрасывается и учитывается в dropped. Фоновый поток
+    забирает накопившиеся элементы, форматирует их функцией format и пишет одним
+    вызовом write. join(lines, end) собирает текст пакета; end=True - последний
+    пакет при close(), чтобы формат мог дописать завершение (например, скобку JSON массива).
+    """
+
+    def __init__(self, stream, format, queue_size=10000, name='socks5-writer', join=join_lines):
+        self.stream = stream
+        self.format = format
+        self.join = join
+        self.queue = queue.Queue(queue_size)
+
+        self.lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+
+        self.thread = threading.Thread(target=self.run, name=name)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+                return False
+        return True
+
+    def run(self):
+        while True:
+            items = [self.queue.get()]
+            # Забираем накопившиеся элементы, чтобы писать их одним вызовом
+            while len(items) < WRITE_BATCH:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = _STOP in items
+            lines = [self.format(*item) for item in items if item is not _STOP]
+            if lines or stop:
+                self.write(lines, stop)
+            if stop:
+                return
+
+    def write(self, lines, end):
+        text = self.join(lines, end)
+        try:
+            if text:
+                self.stream.write(text)
+                self.stream.flush()
+        except (OSError, ValueError):
+            # Поток вывода закрыт или диск заполнен: запись не должна ронять прокси
+            pass
+        with self.lock:
+            self.written += len(lines)
+
+    def close(self):
+        """Дописывает очередь и останавливает фоновый поток"""
+        self.queue.put(_STOP)
+        self.thread.join()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'written': self.written,
+                'dropped': self.dropped,
+                'queue_depth': self.queue.qsize(),
+            }
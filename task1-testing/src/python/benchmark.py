@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""Сквозные бенчмарки прокси на loopback без внешней сети.
+
+Прокси запускается отдельным процессом (main.py), клиенты работают
+против локальных EchoServer/SinkServer. Результаты пишутся в JSON
+и сравниваются с сохраненным baseline.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from local_servers import EchoServer, SinkServer
+
+DEFAULT_CONCURRENCY = (1, 8, 32)
+# Допустимое ухудшение относительно baseline (доля)
+DEFAULT_THRESHOLD = 0.2
+
+MAIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+# Результаты эталонного прогона с параметрами по умолчанию, хранятся рядом с набором
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+
+def find_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def percentile(samples, q):
+    """Перцентиль q (0-100) по методу ближайшего ранга"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    # round убирает ошибку представления float (99.9 / 100 * 1000 = 999.0000000000001)
+    rank = math.ceil(round(q * len(ordered) / 100, 9))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def process_rss(pid):
+    """RSS процесса в байтах по /proc или None, если недоступно"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Connection closed by proxy")
+        data += chunk
+    return bytes(data)
+
+
+def socks5_connect(proxy_address, target, timeout=10):
+    """Открывает туннель через прокси к target=(ipv4, port)"""
+    sock = socket.create_connection(proxy_address, timeout=timeout)
+    try:
+        sock.sendall(b'\x05\x01\x00')
+        if recv_exactly(sock, 2) != b'\x05\x00':
+            raise ConnectionError("Handshake rejected")
+        sock.sendall(b'\x05\x01\x00\x01' + socket.inet_aton(target[0]) + target[1].to_bytes(2, 'big'))
+        reply = recv_exactly(sock, 10)
+        if reply[1] != 0x00:
+            raise ConnectionError(f"CONNECT failed with reply {reply[1]:#04x}")
+        return sock
+    except BaseException:
+        sock.close()
+        raise
+
+
+class ProxyProcess:
+    """Прокси в отдельном процессе, чтобы клиенты не делили с ним GIL и RSS"""
+
+    def __init__(self, proxy_args=()):
+        self.port = find_free_port()
+        self.address = ('127.0.0.1', self.port)
+        self.process = subprocess.Popen(
+            [sys.executable, MAIN_PATH, '--host', '127.0.0.1', '--port', str(self.port), *proxy_args],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def wait_ready(self, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(self.address, timeout=1).close()
+                return
+            except OSError:
+                if self.process.poll() is not None:
+                    raise RuntimeError("Proxy process exited on startup")
+                time.sleep(0.05)
+        raise RuntimeError("Proxy did not start listening")
+
+    def rss(self):
+        return process_rss(self.process.pid)
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def __enter__(self):
+        self.wait_ready()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def run_parallel(concurrency, worker):
+    """Запускает worker(i) в concurrency потоках, возвращает время выполнения"""
+    errors = []
+
+    def run(i):
+        try:
+            worker(i)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+    return elapsed
+
+
+class BenchmarkSuite:
+    """Набор сквозных измерений для одного запуска прокси.
+
+    - connect: подключений в секунду и задержка от начала handshake до первого
+      байта ответа echo-сервера (p50/p99/p999) на каждом уровне параллельности
+    - throughput: MB/s одного туннеля и суммарно для concurrency туннелей
+    - memory: прирост RSS процесса прокси на один открытый простаивающий туннель
+    """
+
+    def __init__(self, proxy_args=(), concurrency=DEFAULT_CONCURRENCY, connections=400,
+                 payload_bytes=32 * 1024 * 1024, idle_tunnels=200):
+        self.proxy_args = list(proxy_args)
+        self.concurrency = tuple(concurrency)
+        self.connections = connections
+        self.payload_bytes = payload_bytes
+        self.idle_tunnels = idle_tunnels
+
+    def run(self):
+        results = {'connect': {}, 'throughput': {'aggregate_mb_s': {}}, 'memory': {}}
+        with ProxyProcess(self.proxy_args) as proxy, EchoServer() as echo, SinkServer() as sink:
+            for level in self.concurrency:
+                results['connect'][str(level)] = self.bench_connect(proxy, echo, level)
+            results['throughput']['single_mb_s'] = self.bench_throughput(proxy, sink, 1)
+            for level in self.concurrency:
+                if level > 1:
+                    results['throughput']['aggregate_mb_s'][str(level)] = self.bench_throughput(proxy, sink, level)
+            results['memory'] = self.bench_memory(proxy, echo)
+
+        return {
+            'meta': {
+                'timestamp': time.time(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'proxy_args': self.proxy_args,
+            },
+            'results': results,
+        }
+
+    def bench_connect(self, proxy, echo, concurrency):
+        per_worker = max(1, self.connections // concurrency)
+        latencies = [[] for _ in range(concurrency)]
+
+        def worker(i):
+            samples = latencies[i]
+            for _ in range(per_worker):
+                start = time.perf_counter()
+                with socks5_connect(proxy.address, echo.address) as sock:
+                    sock.sendall(b'x')
+                    recv_exactly(sock, 1)
+                    samples.append(time.perf_counter() - start)
+
+        elapsed = run_parallel(concurrency, worker)
+        samples = [sample for worker_samples in latencies for sample in worker_samples]
+        return {
+            'connections_per_sec': len(samples) / elapsed,
+            'latency_p50_ms': percentile(samples, 50) * 1000,
+            'latency_p99_ms': percentile(samples, 99) * 1000,
+            'latency_p999_ms': percentile(samples, 99.9) * 1000,
+        }
+
+    def bench_throughput(self, proxy, sink, concurrency):
+        per_tunnel = self.payload_bytes // concurrency
+        chunk = memoryview(bytes(1 << 20))
+        target = sink.received + per_tunnel * concurrency
+        sockets = [socks5_connect(proxy.address, sink.address) for _ in range(concurrency)]
+
+        def worker(i):
+            sent = 0
+            while sent < per_tunnel:
+                size = min(len(chunk), per_tunnel - sent)
+                sockets[i].sendall(chunk[:size])
+                sent += size
+
+        try:
+            start = time.perf_counter()
+            run_parallel(concurrency, worker)
+            if not sink.wait_for_bytes(target, timeout=120):
+                raise RuntimeError("Sink did not receive all data")
+            elapsed = time.perf_counter() - start
+        finally:
+            for sock in sockets:
+                sock.close()
+        return per_tunnel * concurrency / elapsed / 1e6
+
+    def bench_memory(self, proxy, echo):
+        before = proxy.rss()
+        sockets = []
+        try:
+            for _ in range(self.idle_tunnels):
+                sockets.append(socks5_connect(proxy.address, echo.address))
+            # Даем прокси дойти до цикла пересылки во всех туннелях
+            time.sleep(0.5)
+            after = proxy.rss()
+        finally:
+            for sock in sockets:
+                sock.close()
+
+        if before is None or after is None:
+            return {'rss_per_tunnel_kb': None}
+        return {'rss_per_tunnel_kb': max(0, after - before) / len(sockets) / 1024}
+
+
+def flatten(results, prefix=''):
+    """{'connect': {'8': {'x': 1}}} -> {'connect.8.x': 1}"""
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def lower_is_better(metric):
+    leaf = metric.rsplit('.', 1)[-1]
+    return leaf.startswith('latency_') or leaf.startswith('rss_')
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Список ухудшений больше threshold: (метрика, baseline, текущее значение, изменение)"""
+    current = flatten(results['results'])
+    reference = flatten(baseline['results'])
+    regressions = []
+    for metric, base in sorted(reference.items()):
+        value = current.get(metric)
+        if value is None or not base:
+            continue
+        change = (value - base) / base
+        worse = change > threshold if lower_is_better(metric) else change < -threshold
+        if worse:
+            regressions.append((metric, base, value, change))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end SOCKS5 proxy benchmarks")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=BASELINE_PATH,
+                        help="JSON с результатами прошлого запуска для проверки регрессий "
+                             "(по умолчанию benchmark_baseline.json рядом с benchmark.py; '' - без проверки)")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="записать результаты в файл --baseline")
+    parser.add_argument('--concurrency', type=lambda v: [int(x) for x in v.split(',')],
+                        default=list(DEFAULT_CONCURRENCY))
+    parser.add_argument('--connections', type=int, default=400)
+    parser.add_argument('--payload-mb', type=int, default=32)
+    parser.add_argument('--idle-tunnels', type=int, default=200)
+    parser.add_argument('--proxy-args', default='',
+                        help="аргументы main.py, например '--relay-mode shared'")
+    args = parser.parse_args(argv)
+    if args.save_baseline and not args.baseline:
+        parser.error("--save-baseline requires a --baseline path")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    suite = BenchmarkSuite(args.proxy_args.split(), args.concurrency, args.connections,
+                           args.payload_mb * 1024 * 1024, args.idle_tunnels)
+    results = suite.run()
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    for metric, value in flatten(results['results']).items():
+        print(f"{metric}: {value:.3f}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        return 0
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for metric, base, value, change in regressions:
+            print(f"REGRESSION {metric}: {base:.3f} -> {value:.3f} ({change:+.1%})")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
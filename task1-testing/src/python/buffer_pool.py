@@ -0,0 +1,100 @@
+import threading
+
+MIN_CHUNK = 4 * 1024
+MAX_CHUNK = 256 * 1024
+
+
+class BufferPool:
+    """Общий пул bytearray буферов, разбитых на классы размеров (степени двойки).
+
+    Туннель берет буфер только на время одного recv_into/sendall и сразу
+    возвращает его, поэтому простаивающие туннели не держат память.
+    """
+
+    def __init__(self, min_size=MIN_CHUNK, max_size=MAX_CHUNK, max_free_per_class=64):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_free_per_class = max_free_per_class
+        self.lock = threading.Lock()
+        self.free = {}
+        size = min_size
+        while size <= max_size:
+            self.free[size] = []
+            size *= 2
+
+        self.hits = 0
+        self.misses = 0
+        self.allocated_bytes = 0  # всего выделено буферами пула (свободные + выданные)
+        self.free_bytes = 0
+
+    def size_class(self, size):
+        """Округляет размер вверх до класса пула"""
+        size_class = self.min_size
+        while size_class < size and size_class < self.max_size:
+            size_class *= 2
+        return size_class
+
+    def acquire(self, size=MIN_CHUNK) -> bytearray:
+        size_class = self.size_class(size)
+        with self.lock:
+            free = self.free[size_class]
+            if free:
+                self.hits += 1
+                self.free_bytes -= size_class
+                return free.pop()
+            self.misses += 1
+            self.allocated_bytes += size_class
+        return bytearray(size_class)
+
+    def release(self, buffer: bytearray):
+        size_class = len(buffer)
+        with self.lock:
+            free = self.free.get(size_class)
+            if free is None or len(free) >= self.max_free_per_class:
+                # Лишний буфер отдается сборщику мусора
+                self.allocated_bytes -= size_class
+                return
+            free.append(buffer)
+            self.free_bytes += size_class
+
+    def stats(self):
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'allocated_bytes': self.allocated_bytes,
+                'free_bytes': self.free_bytes,
+                'in_use_bytes': self.allocated_bytes - self.free_bytes,
+            }
+
+
+class ChunkSizer:
+    """Адаптивный размер чтения для одного направления туннеля.
+
+    Полностью заполненный буфер означает поток данных - размер удваивается.
+    Несколько подряд коротких чтений (интерактивный трафик) - размер уменьшается вдвое.
+    """
+    __slots__ = ('size', 'min_size', 'max_size', 'short_reads')
+
+    SHORT_READS_TO_SHRINK = 4
+
+    def __init__(self, min_size=MIN_CHUNK, max_size=MAX_CHUNK):
+        self.size = min_size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.short_reads = 0
+
+    def update(self, received):
+        if received >= self.size:
+            self.short_reads = 0
+            if self.size < self.max_size:
+                self.size *= 2
+        elif received * 4 <= self.size:
+            self.short_reads += 1
+            if self.short_reads >= self.SHORT_READS_TO_SHRINK and self.size > self.min_size:
+                self.size //= 2
+                self.short_reads = 0
+        else:
+            self.short_reads = 0
@@ -0,0 +1,138 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+from batch_writer import BatchWriter
+
+# Ограничения по умолчанию (событий в секунду) для событий, которые порождает каждый клиент
+DEFAULT_RATE_LIMITS = {
+    'accepted': 100.0,
+    'handshake_failed': 20.0,
+    'client_error': 50.0,
+    'connect_timeout': 50.0,
+    'connect_failed': 50.0,
+}
+
+
+class _RateLimit:
+    """Token bucket: rate событий в секунду, всплеск до burst"""
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def allow(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class EventLogger:
+    """Структурированный лог событий без блокировки рабочих потоков.
+
+    log() только проверяет выборку и ограничение частоты и кладет событие
+    в ограниченную очередь. Форматирование в JSON и запись в поток вывода
+    выполняет фоновый поток. Если очередь заполнена, событие отбрасывается
+    и учитывается в счетчике dropped.
+    """
+
+    def __init__(self, stream=None, queue_size=10000, sample_rates=None, rate_limits=None,
+                 clock=time.monotonic):
+        self.stream = stream or sys.stdout
+        # event -> доля событий, которые попадают в лог (0.0 - 1.0)
+        self.sample_rates = dict(sample_rates or {})
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        now = clock()
+        rate_limits = DEFAULT_RATE_LIMITS if rate_limits is None else rate_limits
+        self.rate_limits = {event: _RateLimit(rate, max(rate, 1.0), now) for event, rate in rate_limits.items()}
+
+        self.sampled_out = 0
+        self.rate_limited = 0
+
+        self.writer = BatchWriter(self.stream, self.format, queue_size, name='socks5-log')
+
+    def log(self, event, level='info', **fields):
+        sample_rate = self.sample_rates.get(event)
+        if sample_rate is not None and random.random() >= sample_rate:
+            with self.lock:
+                self.sampled_out += 1
+            return
+
+        limit = self.rate_limits.get(event)
+        if limit is not None:
+            with self.lock:
+                if not limit.allow(self.clock()):
+                    self.rate_limited += 1
+                    return
+
+        self.writer.submit((time.time(), level, event, fields))
+
+    def info(self, event, **fields):
+        self.log(event, 'info', **fields)
+
+    def warning(self, event, **fields):
+        self.log(event, 'warning', **fields)
+
+    def error(self, event, **fields):
+        self.log(event, 'error', **fields)
+
+    @staticmethod
+    def format(timestamp, level, event, fields):
+        record = {'ts': round(timestamp, 6), 'level': level, 'event': event}
+        record.update(fields)
+        return json.dumps(record, default=str) + '\n'
+
+    def close(self):
+        """Дописывает очередь и останавливает фоновый поток"""
+        self.writer.close()
+
+    def stats(self):
+        writer = self.writer.stats()
+        with self.lock:
+            return {
+                'written': writer['written'],
+                'sampled_out': self.sampled_out,
+                'rate_limited': self.rate_limited,
+                'dropped': writer['dropped'],
+                'queue_depth': writer['queue_depth'],
+            }
+
+
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def get_logger() -> EventLogger:
+    """Общий логгер процесса, создается при первом обращении"""
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                _logger = EventLogger()
+    return _logger
+
+
+def set_logger(logger: EventLogger) -> None:
+    global _logger
+    _logger = logger
+
+
+def _reset_after_fork():
+    # Фоновый поток не переживает fork: дочерний процесс создает свой логгер
+    global _logger
+    _logger = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
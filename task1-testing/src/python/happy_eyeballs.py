@@ -0,0 +1,97 @@
+import errno
+import selectors
+import socket
+import time
+
+# Задержка перед следующей попыткой по RFC 8305 (Connection Attempt Delay)
+ATTEMPT_DELAY = 0.25
+ATTEMPT_TIMEOUT = 5.0
+
+
+def interleave_families(addresses):
+    """Чередует семейства адресов, начиная с семейства первого адреса (RFC 8305, 4)"""
+    if not addresses:
+        return []
+
+    first_family = addresses[0][0]
+    primary = [address for address in addresses if address[0] == first_family]
+    secondary = [address for address in addresses if address[0] != first_family]
+
+    ordered = []
+    for i in range(max(len(primary), len(secondary))):
+        if i < len(primary):
+            ordered.append(primary[i])
+        if i < len(secondary):
+            ordered.append(secondary[i])
+    return ordered
+
+
+def connect_happy_eyeballs(addresses, attempt_delay=ATTEMPT_DELAY, attempt_timeout=ATTEMPT_TIMEOUT):
+    """Параллельное подключение к списку (family, sockaddr) со сдвигом по времени.
+
+    Следующая попытка стартует через attempt_delay или сразу после неудачи предыдущей.
+    Первый подключившийся сокет возвращается в блокирующем режиме, остальные закрываются.
+    Если все попытки неудачны, бросается ошибка последней из них.
+    """
+    pending = list(interleave_families(addresses))
+    if not pending:
+        raise OSError("No addresses to connect to")
+
+    selector = selectors.DefaultSelector()
+    attempts = {}  # сокет -> время истечения попытки
+    last_error = None
+    next_start = time.monotonic()
+
+    try:
+        while pending or attempts:
+            now = time.monotonic()
+
+            if pending and (now >= next_start or not attempts):
+                family, sockaddr = pending.pop(0)
+                sock = socket.socket(family, socket.SOCK_STREAM)
+                sock.setblocking(False)
+                code = sock.connect_ex(sockaddr)
+                if code in (0, errno.EINPROGRESS):
+                    selector.register(sock, selectors.EVENT_WRITE)
+                    attempts[sock] = now + attempt_timeout
+                else:
+                    sock.close()
+                    last_error = OSError(code, f"Connect to {sockaddr[0]} failed: {errno.errorcode.get(code, code)}")
+                next_start = now + attempt_delay
+                continue
+
+            # Ждем до старта следующей попытки или до истечения ближайшей
+            wake_at = min(attempts.values())
+            if pending:
+                wake_at = min(wake_at, next_start)
+
+            for key, _ in selector.select(max(wake_at - now, 0)):
+                sock = key.fileobj
+                selector.unregister(sock)
+                del attempts[sock]
+
+                code = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if code == 0:
+                    sock.setblocking(True)
+                    return sock
+
+                sock.close()
+                last_error = OSError(code, f"Connect failed: {errno.errorcode.get(code, code)}")
+                # После неудачи следующий адрес пробуется без задержки
+                next_start = time.monotonic()
+
+            now = time.monotonic()
+            for sock, deadline in list(attempts.items()):
+                if deadline <= now:
+                    selector.unregister(sock)
+                    del attempts[sock]
+                    sock.close()
+                    last_error = socket.timeout("Connection attempt timed out")
+                    next_start = now
+
+        raise last_error
+    finally:
+        # Проигравшие попытки отменяются
+        for sock in attempts:
+            sock.close()
+        selector.close()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""Генератор нагрузки для SOCKS5 прокси.
+
+Открывает тысячи одновременных сессий через прокси к локальному echo-серверу
+(по умолчанию поднимается внутри процесса, сеть не нужна), с типами адреса
+IPv4, домен и IPv6. Режимы:
+
+- closed-loop: concurrency сессий, новая начинается после завершения предыдущей
+- open-loop: новые сессии стартуют с частотой rate независимо от ответов прокси
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import socket
+import sys
+import time
+from collections import Counter
+
+from benchmark import percentile
+from local_servers import EchoServer
+from socks5_messages import encode_auth, encode_handshake, encode_request, describe_reply
+
+ATYP_IPV4 = 'ipv4'
+ATYP_DOMAIN = 'domain'
+ATYP_IPV6 = 'ipv6'
+ATYPS = (ATYP_IPV4, ATYP_DOMAIN, ATYP_IPV6)
+
+MODE_CLOSED = 'closed'
+MODE_OPEN = 'open'
+
+
+class SessionError(Exception):
+    """Сессия завершилась ошибкой; kind попадает в таблицу ошибок отчета"""
+
+    def __init__(self, kind):
+        super().__init__(kind)
+        self.kind = kind
+
+
+class LoadStats:
+    def __init__(self):
+        self.connect_latencies = []     # от TCP connect до ответа на CONNECT
+        self.first_byte_latencies = []  # от отправки данных до первого байта echo
+        self.session_latencies = []
+        self.completed = 0
+        self.errors = Counter()
+        self.bytes_echoed = 0
+
+    def report(self, elapsed):
+        def distribution(samples):
+            if not samples:
+                return None
+            return {name: percentile(samples, q) * 1000 for name, q in
+                    (('p50_ms', 50), ('p90_ms', 90), ('p99_ms', 99), ('p999_ms', 99.9), ('max_ms', 100))}
+
+        return {
+            'elapsed_sec': elapsed,
+            'completed': self.completed,
+            'failed': sum(self.errors.values()),
+            'sessions_per_sec': self.completed / elapsed if elapsed else 0.0,
+            'echo_mb_s': self.bytes_echoed / elapsed / 1e6 if elapsed else 0.0,
+            'connect_latency': distribution(self.connect_latencies),
+            'first_byte_latency': distribution(self.first_byte_latencies),
+            'session_latency': distribution(self.session_latencies),
+            'errors': dict(self.errors),
+        }
+
+
+class LoadGenerator:
+    def __init__(self, proxy, targets, payload_size=64, tunnel_duration=0.0, timeout=10.0, credentials=None):
+        self.proxy = proxy
+        # (username, password) в bytes - сессии проходят аутентификацию RFC 1929
+        self.credentials = credentials
+        # Цели по кругу: (host, port) для каждого ATYP
+        self.targets = itertools.cycle(targets)
+        self.payload = b'x' * payload_size
+        self.tunnel_duration = tunnel_duration
+        self.timeout = timeout
+        self.stats = LoadStats()
+        self.inflight = 0
+
+    async def session(self):
+        host, port = next(self.targets)
+        stats = self.stats
+        self.inflight += 1
+        start = time.perf_counter()
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(*self.proxy), self.timeout)
+            if self.credentials:
+                writer.write(encode_handshake((0x02,)) + encode_auth(*self.credentials) + encode_request(host, port))
+            else:
+                writer.write(encode_handshake() + encode_request(host, port))
+            await writer.drain()
+
+            method = await asyncio.wait_for(reader.readexactly(2), self.timeout)
+            if method != (b'\x05\x02' if self.credentials else b'\x05\x00'):
+                raise SessionError('Handshake rejected')
+            if self.credentials and await asyncio.wait_for(reader.readexactly(2), self.timeout) != b'\x01\x00':
+                raise SessionError('Authentication failed')
+            reply = await asyncio.wait_for(reader.readexactly(4), self.timeout)
+            if reply[1] != 0x00:
+                raise SessionError(describe_reply(reply[1]))
+            bound = {0x01: 4, 0x04: 16}.get(reply[3], 0)
+            await reader.readexactly(bound + 2)
+            stats.connect_latencies.append(time.perf_counter() - start)
+
+            deadline = start + self.tunnel_duration
+            while True:
+                sent_at = time.perf_counter()
+                writer.write(self.payload)
+                await writer.drain()
+                await asyncio.wait_for(reader.readexactly(len(self.payload)), self.timeout)
+                stats.first_byte_latencies.append(time.perf_counter() - sent_at)
+                stats.bytes_echoed += len(self.payload)
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                # Туннель держится открытым, данные отправляются раз в секунду
+                await asyncio.sleep(min(remaining, 1.0))
+
+            stats.session_latencies.append(time.perf_counter() - start)
+            stats.completed += 1
+        except SessionError as e:
+            stats.errors[e.kind] += 1
+        except asyncio.TimeoutError:
+            stats.errors['Timeout'] += 1
+        except asyncio.IncompleteReadError:
+            stats.errors['Connection closed'] += 1
+        except OSError as e:
+            stats.errors[type(e).__name__] += 1
+        finally:
+            self.inflight -= 1
+            if writer is not None:
+                writer.close()
+
+    async def run_closed(self, concurrency, duration, sessions=None):
+        """concurrency сессий одновременно, пока не истечет duration или не наберется sessions"""
+        deadline = time.perf_counter() + duration
+        started = itertools.count()
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                if sessions is not None and next(started) >= sessions:
+                    return
+                await self.session()
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    async def run_open(self, rate, duration, max_inflight):
+        """Новые сессии с частотой rate, без ожидания ответов (open-loop)"""
+        tasks = set()
+        interval = 1.0 / rate
+        start = time.perf_counter()
+        for i in itertools.count():
+            scheduled = start + i * interval
+            if scheduled - start >= duration:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.inflight >= max_inflight:
+                # Прокси не успевает: сессия не запускается, но учитывается
+                self.stats.errors['Client overload'] += 1
+                continue
+            task = asyncio.ensure_future(self.session())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    def run(self, mode=MODE_CLOSED, concurrency=100, rate=100.0, duration=10.0,
+            sessions=None, max_inflight=10000):
+        async def main():
+            start = time.perf_counter()
+            if mode == MODE_OPEN:
+                await self.run_open(rate, duration, max_inflight)
+            else:
+                await self.run_closed(concurrency, duration, sessions)
+            return time.perf_counter() - start
+
+        elapsed = asyncio.run(main())
+        return self.stats.report(elapsed)
+
+
+def literal_family(host):
+    """AF_INET/AF_INET6 для IP литерала, None для доменного имени"""
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, host)
+        except OSError:
+            continue
+        return family
+    return None
+
+
+def target_for(atyp, host, port):
+    """Адрес внешней цели в форме, которая дает запрос с нужным ATYP.
+
+    Для ipv4/ipv6 доменное имя разрешается в литерал своего семейства;
+    для domain нужно имя - IP литерал в доменной форме не отправить.
+    """
+    family = literal_family(host)
+    if atyp == ATYP_DOMAIN:
+        if family is not None:
+            raise SystemExit(f"--atyp domain needs a host name in --target, got {host}")
+        return host, port
+
+    wanted = socket.AF_INET if atyp == ATYP_IPV4 else socket.AF_INET6
+    if family == wanted:
+        return host, port
+    if family is not None:
+        raise SystemExit(f"--target {host} is not an {atyp} address")
+    try:
+        infos = socket.getaddrinfo(host, port, wanted, socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise SystemExit(f"Cannot resolve {host} to an {atyp} address: {e}")
+    return infos[0][4][0], port
+
+
+def parse_address(value):
+    host, _, port = value.rpartition(':')
+    return host.strip('[]'), int(port)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="SOCKS5 load generator")
+    parser.add_argument('--proxy', type=parse_address, default=('127.0.0.1', 1080),
+                        help="адрес прокси host:port")
+    parser.add_argument('--target', type=parse_address, default=None,
+                        help="внешний echo-сервер host:port (по умолчанию встроенный)")
+    parser.add_argument('--atyp', default=None,
+                        help="типы адреса через запятую: ipv4,domain,ipv6 (по умолчанию все; "
+                             "с --target - тип, который задает сам адрес цели)")
+    parser.add_argument('--mode', choices=[MODE_CLOSED, MODE_OPEN], default=MODE_CLOSED)
+    parser.add_argument('--concurrency', type=int, default=100, help="сессий одновременно (closed-loop)")
+    parser.add_argument('--rate', type=float, default=100.0, help="новых сессий в секунду (open-loop)")
+    parser.add_argument('--max-inflight', type=int, default=10000)
+    parser.add_argument('--duration', type=float, default=10.0, help="длительность теста, секунды")
+    parser.add_argument('--sessions', type=int, default=None, help="ограничение числа сессий (closed-loop)")
+    parser.add_argument('--payload-size', type=int, default=64)
+    parser.add_argument('--tunnel-duration', type=float, default=0.0,
+                        help="сколько секунд держать туннель открытым")
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--username', default=None, help="аутентификация username/password")
+    parser.add_argument('--password', default='')
+    parser.add_argument('--json', action='store_true', help="вывести отчет в JSON")
+    return parser.parse_args(argv)
+
+
+def print_report(report):
+    print(f"Sessions: {report['completed']} completed, {report['failed']} failed "
+          f"in {report['elapsed_sec']:.2f}s ({report['sessions_per_sec']:.1f}/s)")
+    for name in ('connect_latency', 'first_byte_latency', 'session_latency'):
+        values = report[name]
+        if values:
+            print(f"{name}: " + ', '.join(f"{key[:-3]}={value:.2f}ms" for key, value in values.items()))
+    for error, count in sorted(report['errors'].items(), key=lambda item: -item[1]):
+        print(f"  {error}: {count}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.atyp is None:
+        if args.target:
+            family = literal_family(args.target[0])
+            args.atyp = {socket.AF_INET: ATYP_IPV4, socket.AF_INET6: ATYP_IPV6}.get(family, ATYP_DOMAIN)
+        else:
+            args.atyp = ','.join(ATYPS)
+    atyps = [atyp.strip() for atyp in args.atyp.split(',') if atyp.strip()]
+    for atyp in atyps:
+        if atyp not in ATYPS:
+            raise SystemExit(f"Unknown address type: {atyp}")
+
+    servers = []
+    if args.target:
+        # Одна цель на каждый ATYP: один и тот же сервер как IPv4, домен и IPv6
+        targets = [target_for(atyp, *args.target) for atyp in atyps]
+    else:
+        echo4 = EchoServer(backlog=4096).start()
+        servers.append(echo4)
+        targets = []
+        for atyp in atyps:
+            if atyp == ATYP_IPV4:
+                targets.append(('127.0.0.1', echo4.address[1]))
+            elif atyp == ATYP_DOMAIN:
+                targets.append(('localhost', echo4.address[1]))
+            else:
+                echo6 = EchoServer('::1', backlog=4096).start()
+                servers.append(echo6)
+                targets.append(('::1', echo6.address[1]))
+
+    try:
+        credentials = (args.username.encode(), args.password.encode()) if args.username else None
+        generator = LoadGenerator(args.proxy, targets, args.payload_size, args.tunnel_duration, args.timeout,
+                                  credentials)
+        report = generator.run(args.mode, args.concurrency, args.rate, args.duration,
+                               args.sessions, args.max_inflight)
+    finally:
+        for server in servers:
+            server.stop()
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
+    return 0 if report['completed'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
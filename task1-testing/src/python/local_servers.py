@@ -0,0 +1,134 @@
+import abc
+import socket
+import threading
+
+
+class LocalServer(abc.ABC):
+    """Простой TCP сервер на loopback для тестов и бенчмарков без сети.
+
+    Каждое соединение обслуживается отдельным потоком методом handle.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, backlog=1024):
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        self.server_socket = socket.socket(family, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind((host, port))
+        self.server_socket.listen(backlog)
+        self.address = self.server_socket.getsockname()
+        self.connections = 0
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        try:
+            self.server_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.server_socket.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.server_socket.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self.serve_connection, args=(conn,), daemon=True).start()
+
+    def serve_connection(self, conn):
+        try:
+            self.handle(conn)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    @abc.abstractmethod
+    def handle(self, conn):
+        """Обслуживает одно соединение; сокет закрывается после возврата"""
+
+
+class EchoServer(LocalServer):
+    """Возвращает клиенту все полученные данные"""
+
+    def handle(self, conn):
+        buffer = bytearray(65536)
+        view = memoryview(buffer)
+        while True:
+            size = conn.recv_into(buffer)
+            if not size:
+                return
+            conn.sendall(view[:size])
+
+
+class SinkServer(LocalServer):
+    """Принимает и отбрасывает данные, считая байты"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.received = 0
+        self.lock = threading.Lock()
+        self.progress = threading.Condition(self.lock)
+
+    def handle(self, conn):
+        buffer = bytearray(1 << 20)
+        while True:
+            size = conn.recv_into(buffer)
+            if not size:
+                return
+            with self.lock:
+                self.received += size
+                self.progress.notify_all()
+
+    def wait_for_bytes(self, total, timeout=None):
+        """Ждет, пока сервер получит не меньше total байт"""
+        with self.lock:
+            return self.progress.wait_for(lambda: self.received >= total, timeout)
+
+
+class UdpEchoServer:
+    """UDP сервер на loopback, возвращающий каждую датаграмму отправителю"""
+
+    def __init__(self, host='127.0.0.1', port=0):
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        self.sock = socket.socket(family, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.address = self.sock.getsockname()
+        self.received = 0
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def serve(self):
+        buffer = bytearray(65535)
+        view = memoryview(buffer)
+        while True:
+            try:
+                size, source = self.sock.recvfrom_into(buffer)
+                self.received += 1
+                self.sock.sendto(view[:size], source)
+            except OSError:
+                return
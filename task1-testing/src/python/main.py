@@ -1,6 +1,250 @@
 #!/usr/bin/env python3
+import argparse
+import atexit
 from socks5_proxy import Socks5Proxy
+from worker_pool import OVERLOAD_POLICIES
+from socks5_native import BACKENDS, set_backend
+from relay import RELAY_MODES
+from resolver import CachingResolver
+from prefork import PreforkSupervisor, parse_cpu_list
+from metrics import ProxyMetrics, MetricsServer, SnapshotWriter
+from event_log import EventLogger, DEFAULT_RATE_LIMITS
+from shaping import BandwidthShaper, parse_bandwidth
+from acl import AccessControl
+from upstream import UpstreamPool, POLICIES, HEALTH_INTERVAL, parse_upstream
+from auth import CredentialCache, FileCredentialStore, SqliteCredentialStore, CACHE_SIZE, CACHE_TTL
+from tracing import Tracer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="SOCKS5 proxy server")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=1080)
+    parser.add_argument('--mode', choices=['threads', 'asyncio'], default='threads',
+                        help="threads - поток на подключение, asyncio - один event loop")
+    parser.add_argument('--max-workers', type=int, default=None,
+                        help="размер пула потоков (по умолчанию поток на подключение)")
+    parser.add_argument('--queue-size', type=int, default=256)
+    parser.add_argument('--backlog', type=int, default=128)
+    parser.add_argument('--overload-policy', choices=OVERLOAD_POLICIES, default='queue')
+    parser.add_argument('--relay-mode', choices=RELAY_MODES, default='thread',
+                        help="thread - поток на туннель, shared - общий цикл selectors, "
+                             "splice - поток на туннель с os.splice")
+    parser.add_argument('--relay-threads', type=int, default=1)
+    parser.add_argument('--dns-cache', action='store_true',
+                        help="кешировать разрешение доменных имен")
+    parser.add_argument('--dns-ttl', type=float, default=60.0)
+    parser.add_argument('--dns-negative-ttl', type=float, default=5.0)
+    parser.add_argument('--happy-eyeballs', action='store_true',
+                        help="параллельное подключение к IPv4/IPv6 адресам домена")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="количество процессов на одном порту (SO_REUSEPORT)")
+    parser.add_argument('--cpu-affinity', type=parse_cpu_list, default=None,
+                        help="CPU для привязки рабочих процессов, например 0-3,8")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="порт HTTP /metrics в формате Prometheus (рабочий процесс i слушает порт + i)")
+    parser.add_argument('--metrics-host', default='127.0.0.1')
+    parser.add_argument('--metrics-file', default=None,
+                        help="файл для периодической записи метрик (рабочий процесс i пишет в файл.i)")
+    parser.add_argument('--metrics-interval', type=float, default=10.0)
+    parser.add_argument('--log-sample', action='append', default=[], metavar='EVENT=RATE',
+                        help="доля записываемых событий, например accepted=0.01")
+    parser.add_argument('--log-rate-limit', action='append', default=[], metavar='EVENT=PER_SEC',
+                        help="ограничение частоты события в секунду")
+    parser.add_argument('--log-queue-size', type=int, default=10000)
+    parser.add_argument('--handshake-timeout', type=float, default=None,
+                        help="секунд на handshake и request, затем соединение закрывается")
+    parser.add_argument('--connect-timeout', type=float, default=5.0,
+                        help="таймаут подключения к целевому серверу")
+    parser.add_argument('--idle-timeout', type=float, default=None,
+                        help="закрывать туннели без данных дольше указанного числа секунд")
+    parser.add_argument('--udp-idle-timeout', type=float, default=None,
+                        help="закрывать UDP ассоциации без датаграмм дольше указанного числа секунд")
+    parser.add_argument('--auth-file', default=None,
+                        help="файл username:хеш (python auth.py USER) - требовать username/password")
+    parser.add_argument('--auth-db', default=None,
+                        help="SQLite база учетных записей (python auth.py USER --db PATH)")
+    parser.add_argument('--auth-cache-size', type=int, default=CACHE_SIZE)
+    parser.add_argument('--auth-cache-ttl', type=float, default=CACHE_TTL,
+                        help="сколько секунд успешная проверка не требует обращения к хранилищу")
+    parser.add_argument('--acl', default=None,
+                        help="файл правил 'allow|deny CIDR или домен', перечитывается при изменении")
+    parser.add_argument('--acl-default', choices=['allow', 'deny'], default='allow',
+                        help="решение для назначений без подходящего правила")
+    parser.add_argument('--upstream', action='append', type=parse_upstream, default=[],
+                        metavar='[USER:PASSWORD@]HOST:PORT',
+                        help="подключаться через вышестоящий SOCKS5 сервер (можно указать несколько раз)")
+    parser.add_argument('--upstream-policy', choices=POLICIES, default=POLICIES[0],
+                        help="выбор upstream: наименьшее число соединений или EWMA задержки")
+    parser.add_argument('--upstream-health-interval', type=float, default=HEALTH_INTERVAL,
+                        help="период активной проверки upstream, секунд")
+    parser.add_argument('--limit-client', type=parse_bandwidth, default=None, metavar='BYTES_PER_SEC',
+                        help="полоса на IP клиента, например 512K или 10M")
+    parser.add_argument('--limit-destination', type=parse_bandwidth, default=None, metavar='BYTES_PER_SEC',
+                        help="полоса на адрес назначения host:port")
+    parser.add_argument('--limit-total', type=parse_bandwidth, default=None, metavar='BYTES_PER_SEC',
+                        help="общая полоса всех туннелей")
+    parser.add_argument('--limit-burst', type=float, default=None, metavar='SECONDS',
+                        help="запас ведра токенов в секундах трафика")
+    parser.add_argument('--trace-file', default=None,
+                        help="файл трассировки соединений в формате Chrome trace event "
+                             "(рабочий процесс i пишет в файл.i)")
+    parser.add_argument('--trace-sample', type=float, default=0.01,
+                        help="доля трассируемых соединений (0.0 - 1.0)")
+    parser.add_argument('--trace-queue-size', type=int, default=10000)
+    parser.add_argument('--parser-backend', choices=BACKENDS, default=None,
+                        help="реализация парсера (по умолчанию SOCKS5_PARSER_BACKEND или auto)")
+    args = parser.parse_args()
+    check_mode(parser, args)
+    return args
+
+
+# Возможности, которых нет в режиме asyncio: (атрибут args, опция командной строки)
+ASYNCIO_UNSUPPORTED = (
+    ('max_workers', '--max-workers'),
+    ('overload_policy', '--overload-policy'),
+    ('relay_mode', '--relay-mode'),
+    ('dns_cache', '--dns-cache'),
+    ('happy_eyeballs', '--happy-eyeballs'),
+    ('metrics_port', '--metrics-port'),
+    ('metrics_file', '--metrics-file'),
+    ('handshake_timeout', '--handshake-timeout'),
+    ('idle_timeout', '--idle-timeout'),
+    ('udp_idle_timeout', '--udp-idle-timeout'),
+    ('auth_file', '--auth-file'),
+    ('auth_db', '--auth-db'),
+    ('acl', '--acl'),
+    ('upstream', '--upstream'),
+    ('limit_client', '--limit-client'),
+    ('limit_destination', '--limit-destination'),
+    ('limit_total', '--limit-total'),
+    ('trace_file', '--trace-file'),
+)
+
+
+def check_mode(parser, args):
+    """Отказ запускаться с опциями, которые выбранный режим не поддерживает.
+
+    Молча проигнорированные --acl или --auth-file в режиме asyncio дали бы открытый прокси.
+    """
+    if args.mode != 'asyncio':
+        return
+    unsupported = [option for dest, option in ASYNCIO_UNSUPPORTED
+                   if getattr(args, dest) != parser.get_default(dest)]
+    if unsupported:
+        parser.error(f"--mode asyncio does not support {', '.join(unsupported)}")
+
+
+def parse_event_rates(values):
+    rates = {}
+    for value in values:
+        event, _, rate = value.partition('=')
+        rates[event] = float(rate)
+    return rates
+
+
+def build_logger(args):
+    rate_limits = dict(DEFAULT_RATE_LIMITS)
+    rate_limits.update(parse_event_rates(args.log_rate_limit))
+    return EventLogger(queue_size=args.log_queue_size,
+                       sample_rates=parse_event_rates(args.log_sample),
+                       rate_limits=rate_limits)
+
+
+def start_metrics(args, index=None):
+    """Поднимает экспорт метрик; в многопроцессном режиме у каждого процесса свой порт и файл"""
+    metrics = ProxyMetrics()
+    if args.metrics_port is not None:
+        port = args.metrics_port + (index or 0)
+        MetricsServer(metrics.registry, args.metrics_host, port).start()
+    if args.metrics_file:
+        path = args.metrics_file if index is None else f'{args.metrics_file}.{index}'
+        SnapshotWriter(metrics.registry, path, args.metrics_interval).start()
+    return metrics
+
+
+def build_tracer(args, index=None):
+    """Трассировка соединений или None; в многопроцессном режиме у каждого процесса свой файл"""
+    if not args.trace_file:
+        return None
+    path = args.trace_file if index is None else f'{args.trace_file}.{index}'
+    tracer = Tracer(path, sample_rate=args.trace_sample, queue_size=args.trace_queue_size)
+    if index is None:
+        # Дописать очередь и закрыть JSON массив при штатном завершении;
+        # рабочие процессы prefork закрывают трассировку сами (см. run_worker)
+        atexit.register(tracer.close)
+    return tracer
+
+
+def run_worker(args, supervisor, index):
+    """Рабочий процесс prefork: свой прокси, метрики и файл трассировки"""
+    tracer = build_tracer(args, index)
+    if tracer is not None:
+        # Рабочий процесс выходит через os._exit, atexit в нем не вызывается
+        supervisor.at_exit(tracer.close)
+    build_proxy(args, reuse_port=True, metrics=start_metrics(args, index), tracer=tracer).start()
+
+
+def build_proxy(args, reuse_port=False, metrics=None, tracer=None):
+    if args.mode == 'asyncio':
+        from socks5_asyncio import AsyncSocks5Proxy
+        return AsyncSocks5Proxy(args.host, args.port, backlog=args.backlog, connect_timeout=args.connect_timeout,
+                                reuse_port=reuse_port, logger=build_logger(args))
+
+    resolver = None
+    if args.dns_cache:
+        resolver = CachingResolver(positive_ttl=args.dns_ttl, negative_ttl=args.dns_negative_ttl)
+
+    authenticator = None
+    if args.auth_file or args.auth_db:
+        store = FileCredentialStore(args.auth_file) if args.auth_file else SqliteCredentialStore(args.auth_db)
+        authenticator = CredentialCache(store, args.auth_cache_size, args.auth_cache_ttl)
+
+    acl = None
+    if args.acl:
+        acl = AccessControl(default=args.acl_default == 'allow', path=args.acl).watch()
+
+    upstreams = None
+    if args.upstream:
+        upstreams = UpstreamPool(args.upstream, args.upstream_policy, connect_timeout=args.connect_timeout,
+                                 health_interval=args.upstream_health_interval).start()
+
+    shaper = None
+    if args.limit_client or args.limit_destination or args.limit_total:
+        shaper = BandwidthShaper(args.limit_client, args.limit_destination, args.limit_total, args.limit_burst)
+
+    return Socks5Proxy(args.host, args.port,
+                       max_workers=args.max_workers,
+                       queue_size=args.queue_size,
+                       backlog=args.backlog,
+                       overload_policy=args.overload_policy,
+                       relay_mode=args.relay_mode,
+                       relay_threads=args.relay_threads,
+                       resolver=resolver,
+                       happy_eyeballs=args.happy_eyeballs,
+                       reuse_port=reuse_port,
+                       metrics=metrics,
+                       logger=build_logger(args),
+                       handshake_timeout=args.handshake_timeout,
+                       connect_timeout=args.connect_timeout,
+                       idle_timeout=args.idle_timeout,
+                       shaper=shaper,
+                       udp_idle_timeout=args.udp_idle_timeout,
+                       authenticator=authenticator,
+                       acl=acl,
+                       upstreams=upstreams,
+                       tracer=tracer)
+
 
 if __name__ == "__main__":
-    proxy = Socks5Proxy()
-    proxy.start()
\ No newline at end of file
+    args = parse_args()
+    if args.parser_backend:
+        set_backend(args.parser_backend)
+
+    if args.workers > 1 or args.cpu_affinity:
+        # Прокси создается в каждом рабочем процессе после fork
+        supervisor = PreforkSupervisor(lambda index: run_worker(args, supervisor, index),
+                                       args.workers, cpus=args.cpu_affinity)
+        supervisor.run()
+    else:
+        build_proxy(args, metrics=start_metrics(args), tracer=build_tracer(args)).start()
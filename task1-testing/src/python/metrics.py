@@ -0,0 +1,273 @@
+import bisect
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Границы гистограмм задержек (секунды)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Границы гистограммы времени жизни туннеля (секунды)
+LIFETIME_BUCKETS = (0.01, 0.1, 1.0, 10.0, 60.0, 300.0, 1800.0, 3600.0)
+
+
+def _format_labels(labelnames, values, extra=''):
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    """Монотонный счетчик, опционально с метками (значения меток передаются кортежем)"""
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, amount=1, labels=()):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def value(self, labels=()):
+        return self.values.get(labels, 0)
+
+    def samples(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        for labels, value in items:
+            yield self.name + _format_labels(self.labelnames, labels), value
+
+    def snapshot(self):
+        with self.lock:
+            if not self.labelnames:
+                return self.values.get((), 0)
+            return {','.join(str(v) for v in labels): value for labels, value in self.values.items()}
+
+
+class Gauge:
+    """Текущее значение, которое может расти и уменьшаться"""
+    kind = 'gauge'
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.labelnames = ()
+        self.lock = threading.Lock()
+        self.current = 0
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.current += amount
+
+    def dec(self, amount=1):
+        with self.lock:
+            self.current -= amount
+
+    def set(self, value):
+        self.current = value
+
+    def value(self):
+        return self.current
+
+    def samples(self):
+        yield self.name, self.current
+
+    def snapshot(self):
+        return self.current
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин.
+
+    observe - один bisect и обновление двух полей под блокировкой,
+    кумулятивные значения считаются только при экспорте.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = ()
+        self.bounds = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.counts = [0] * (len(self.bounds) + 1)  # последняя корзина - +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def samples(self):
+        with self.lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+
+        cumulative = 0
+        for bound, bucket in zip(self.bounds + (math.inf,), counts):
+            cumulative += bucket
+            yield self.name + '_bucket' + _format_labels((), (), f'le="{_format_value(float(bound))}"'), cumulative
+        yield self.name + '_sum', total
+        yield self.name + '_count', count
+
+    def snapshot(self):
+        with self.lock:
+            return {'count': self.count, 'sum': self.sum,
+                    'buckets': dict(zip([str(b) for b in self.bounds] + ['+Inf'], self.counts))}
+
+
+class MetricsRegistry:
+    """Набор метрик с экспортом в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def register(self, metric):
+        with self.lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help):
+        return self.register(Gauge(name, help))
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, buckets))
+
+    def render(self):
+        """Текстовый формат Prometheus (version 0.0.4)"""
+        lines = []
+        with self.lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for sample, value in metric.samples():
+                lines.append(f'{sample} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+
+class ProxyMetrics:
+    """Метрики прокси: где тратится время подключения и сколько данных прошло"""
+
+    def __init__(self, registry=None):
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.accepted = r.counter('socks5_accepted_connections_total', 'Accepted client connections')
+        self.parse_failures = r.counter('socks5_parse_failures_total', 'Parser errors by stage and code',
+                                        ('stage', 'code'))
+        self.auth_results = r.counter('socks5_auth_total', 'Username/password checks by result', ('result',))
+        self.acl_denied = r.counter('socks5_acl_denied_total', 'Destinations denied by access control rules')
+        self.replies = r.counter('socks5_replies_total', 'SOCKS5 reply codes sent to clients', ('code',))
+        self.bytes_in = r.counter('socks5_bytes_in_total', 'Bytes received from clients')
+        self.bytes_out = r.counter('socks5_bytes_out_total', 'Bytes sent to clients')
+        self.udp_datagrams = r.counter('socks5_udp_datagrams_total', 'Relayed UDP datagrams by direction',
+                                       ('direction',))
+        self.udp_dropped = r.counter('socks5_udp_dropped_total', 'UDP datagrams dropped by the relay')
+        self.throttled = r.counter('socks5_throttled_reads_total', 'Reads postponed by bandwidth limits')
+        self.reclaimed = r.counter('socks5_reclaimed_connections_total',
+                                   'Connections closed by handshake or idle timeout', ('reason',))
+
+        self.handshake_time = r.histogram('socks5_handshake_seconds', 'Time from handler start to method reply')
+        self.request_parse_time = r.histogram('socks5_request_parse_seconds', 'Request parse time')
+        self.connect_time = r.histogram('socks5_upstream_connect_seconds', 'Upstream connect time')
+        self.tunnel_lifetime = r.histogram('socks5_tunnel_lifetime_seconds', 'Tunnel lifetime',
+                                           LIFETIME_BUCKETS)
+
+        self.active_tunnels = r.gauge('socks5_active_tunnels', 'Currently open tunnels')
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        if self.path not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Опросы Prometheus не пишутся в stdout
+        pass
+
+
+class MetricsServer:
+    """HTTP эндпоинт /metrics в фоновом потоке"""
+
+    def __init__(self, registry, host='127.0.0.1', port=9108):
+        handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.address = self.httpd.server_address
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='socks5-metrics')
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class SnapshotWriter:
+    """Периодически записывает метрики в файл (атомарно, через переименование)"""
+
+    def __init__(self, registry, path, interval=10.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='socks5-metrics-snapshot')
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.write()
+        self.write()
+
+    def write(self):
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.registry.render())
+        os.replace(tmp_path, self.path)
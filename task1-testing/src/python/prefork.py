@@ -0,0 +1,148 @@
+import os
+import signal
+import sys
+import time
+import traceback
+
+from event_log import get_logger
+
+# Сигналы, которые супервизор передает рабочим процессам
+FORWARDED_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+# Рабочий процесс, упавший быстрее этого времени, перезапускается с задержкой
+MIN_UPTIME = 1.0
+
+
+def parse_cpu_list(value):
+    """Разбирает список CPU вида '0-3,8,10-11'"""
+    cpus = []
+    for part in value.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-', 1)
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def pin_to_cpu(cpu):
+    """Привязывает текущий процесс к одному CPU, если платформа это умеет"""
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {cpu})
+
+
+class PreforkSupervisor:
+    """Запускает N рабочих процессов, каждый со своим слушающим сокетом SO_REUSEPORT.
+
+    Рабочий процесс - это worker_main(index), вызванная после fork. Все состояние
+    (пулы потоков, циклы пересылки) создается уже в дочернем процессе.
+    Упавшие процессы перезапускаются, SIGTERM/SIGINT передаются всем рабочим.
+    Рабочий процесс завершается через os._exit, поэтому atexit в нем не работает:
+    то, что нужно дописать при остановке (например, файл трассировки),
+    регистрируется из worker_main через at_exit().
+    """
+
+    def __init__(self, worker_main, workers, cpus=None, restart_delay=0.5):
+        if workers < 1:
+            raise ValueError("At least one worker process is required")
+        self.worker_main = worker_main
+        self.workers = workers
+        self.cpus = list(cpus) if cpus else []
+        self.restart_delay = restart_delay
+
+        self.children = {}  # pid -> (индекс рабочего, время запуска)
+        self.restarts = 0
+        self.stopping = False
+        # Завершающие действия рабочего процесса; после fork у каждого процесса свой список
+        self.exit_callbacks = []
+
+    def cpu_for(self, index):
+        if not self.cpus:
+            return None
+        return self.cpus[index % len(self.cpus)]
+
+    def at_exit(self, callback):
+        """Регистрирует действие при завершении текущего рабочего процесса"""
+        self.exit_callbacks.append(callback)
+
+    @staticmethod
+    def stop_worker(signum, frame):
+        # Сигнал остановки раскручивает стек worker_main до finally в spawn
+        raise SystemExit(0)
+
+    def spawn(self, index):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = (index, time.monotonic())
+            return pid
+
+        # Дочерний процесс: обработчики супервизора не наследуются
+        self.exit_callbacks = []
+        for signum in FORWARDED_SIGNALS:
+            signal.signal(signum, self.stop_worker)
+        code = 0
+        try:
+            cpu = self.cpu_for(index)
+            if cpu is not None:
+                pin_to_cpu(cpu)
+            self.worker_main(index)
+        except KeyboardInterrupt:
+            pass
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 0
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            # Повторный сигнал не должен прерывать завершающие действия
+            for signum in FORWARDED_SIGNALS:
+                signal.signal(signum, signal.SIG_IGN)
+            for callback in reversed(self.exit_callbacks):
+                try:
+                    callback()
+                except BaseException:
+                    traceback.print_exc()
+                    code = 1
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    def forward_signal(self, signum, frame):
+        """Останавливает супервизор и передает сигнал рабочим процессам"""
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        previous = {signum: signal.signal(signum, self.forward_signal) for signum in FORWARDED_SIGNALS}
+        try:
+            for index in range(self.workers):
+                self.spawn(index)
+
+            while self.children:
+                try:
+                    pid, status = os.wait()
+                except ChildProcessError:
+                    break
+
+                index, started_at = self.children.pop(pid)
+                if self.stopping:
+                    continue
+
+                get_logger().warning('worker_exited', worker=index, pid=pid,
+                                     status=os.waitstatus_to_exitcode(status))
+                if time.monotonic() - started_at < MIN_UPTIME:
+                    # Защита от цикла мгновенных падений
+                    time.sleep(self.restart_delay)
+                if not self.stopping:
+                    self.restarts += 1
+                    self.spawn(index)
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
@@ -0,0 +1,295 @@
+import heapq
+import itertools
+import queue
+import selectors
+import socket
+import threading
+import time
+
+RELAY_THREAD = 'thread'  # отдельный поток на туннель (tunnel_data)
+RELAY_SHARED = 'shared'  # все туннели в общем цикле selectors
+RELAY_SPLICE = 'splice'  # поток на туннель, данные через os.splice без копирования
+RELAY_MODES = (RELAY_THREAD, RELAY_SHARED, RELAY_SPLICE)
+
+
+class _Endpoint:
+    """Одна сторона туннеля: сокет и данные, ожидающие отправки в него"""
+    __slots__ = ('sock', 'peer', 'tunnel', 'out', 'eof', 'write_closed', 'events', 'resume_at')
+
+    def __init__(self, sock, tunnel):
+        self.sock = sock
+        self.tunnel = tunnel
+        self.peer = None
+        self.out = bytearray()
+        self.eof = False            # от сокета получен EOF
+        self.write_closed = False   # в сокет отправлен FIN
+        self.events = 0
+        self.resume_at = 0.0        # чтение отложено ограничением полосы до этого момента
+
+
+class _Tunnel:
+    __slots__ = ('client', 'remote', 'closed', 'started', 'idle_timer', 'limit', 'trace', 'awaiting_first_byte')
+
+    def __init__(self, client_socket, remote_socket, idle_timer=None, limit=None, trace=None):
+        self.client = _Endpoint(client_socket, self)
+        self.remote = _Endpoint(remote_socket, self)
+        self.client.peer = self.remote
+        self.remote.peer = self.client
+        self.closed = False
+        self.started = time.perf_counter()
+        self.idle_timer = idle_timer
+        self.limit = limit
+        # tracing.Trace соединения, попавшего в выборку, или None
+        self.trace = trace
+        self.awaiting_first_byte = trace is not None
+
+
+class RelayEngine:
+    """Общий цикл пересылки данных для всех установленных туннелей.
+
+    Оба сокета каждого туннеля регистрируются в одном selector (epoll на Linux),
+    данные пересылаются из одного потока без периодических пробуждений.
+    Пока данные не ушли в медленную сторону, чтение из быстрой приостанавливается.
+    Так же работает ограничение полосы: сокет без токенов снимается с чтения,
+    а цикл просыпается по таймауту select к моменту, когда токены накопятся.
+    """
+
+    def __init__(self, chunk_size=65536, name='socks5-relay', metrics=None, timers=None):
+        self.chunk_size = chunk_size
+        # metrics.ProxyMetrics прокси или None
+        self.metrics = metrics
+        # timer_wheel.TimerWheel, в котором учитываются таймеры простоя туннелей
+        self.timers = timers
+        # Один буфер на цикл: данные читаются через recv_into без выделения bytes
+        self.buffer = bytearray(chunk_size)
+        self.view = memoryview(self.buffer)
+        self.selector = selectors.DefaultSelector()
+        self.incoming = queue.SimpleQueue()
+        # Куча (resume_at, seq, endpoint) сокетов, чтение которых отложено
+        self.throttled = []
+        self.sequence = itertools.count()
+        self.active_tunnels = 0
+        self.running = False
+
+        # Пробуждение цикла при добавлении туннеля из другого потока
+        self.wakeup_reader, self.wakeup_writer = socket.socketpair()
+        self.wakeup_reader.setblocking(False)
+        self.wakeup_writer.setblocking(False)
+        self.selector.register(self.wakeup_reader, selectors.EVENT_READ, None)
+
+        self.thread = threading.Thread(target=self.run, name=name)
+        self.thread.daemon = True
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wakeup()
+        self.thread.join()
+
+    def wakeup(self):
+        try:
+            self.wakeup_writer.send(b'\0')
+        except (BlockingIOError, OSError):
+            # Буфер уже содержит байт пробуждения
+            pass
+
+    def add_tunnel(self, client_socket, remote_socket, idle_timer=None, limit=None, trace=None):
+        """Передает установленное соединение в цикл пересылки (из любого потока).
+
+        idle_timer - таймер простоя из self.timers: активность отмечается при пересылке,
+        таймер отменяется при закрытии туннеля. limit - shaping.TunnelLimit или None.
+        trace получает спаны first_byte, teardown и tunnel.
+        """
+        self.incoming.put((client_socket, remote_socket, idle_timer, limit, trace))
+        self.wakeup()
+
+    def run(self):
+        while self.running:
+            timeout = None
+            if self.throttled:
+                timeout = max(self.throttled[0][0] - time.monotonic(), 0)
+            events = self.selector.select(timeout)
+            if self.throttled:
+                self.resume_throttled()
+
+            for key, mask in events:
+                endpoint = key.data
+                if endpoint is None:
+                    self.accept_tunnels()
+                    continue
+                if endpoint.tunnel.closed:
+                    continue
+
+                try:
+                    if mask & selectors.EVENT_WRITE:
+                        self.flush(endpoint)
+                    if mask & selectors.EVENT_READ and not endpoint.tunnel.closed:
+                        self.forward(endpoint)
+                except (ConnectionError, OSError):
+                    self.close_tunnel(endpoint.tunnel)
+
+        self.shutdown()
+
+    def accept_tunnels(self):
+        try:
+            while self.wakeup_reader.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        while True:
+            try:
+                client_socket, remote_socket, idle_timer, limit, trace = self.incoming.get_nowait()
+            except queue.Empty:
+                return
+
+            client_socket.setblocking(False)
+            remote_socket.setblocking(False)
+            tunnel = _Tunnel(client_socket, remote_socket, idle_timer, limit, trace)
+            self.active_tunnels += 1
+            if self.metrics:
+                self.metrics.active_tunnels.inc()
+            self.update(tunnel.client)
+            self.update(tunnel.remote)
+
+    def forward(self, endpoint):
+        """Читает из endpoint и пересылает в противоположный сокет"""
+        limit = endpoint.tunnel.limit
+        allowed = self.chunk_size
+        if limit is not None:
+            allowed = limit.allowance(allowed)
+            if not allowed:
+                self.throttle(endpoint, limit.delay())
+                return
+
+        try:
+            size = endpoint.sock.recv_into(self.buffer, allowed)
+        except BlockingIOError:
+            return
+        if limit is not None:
+            limit.consume(size)
+
+        peer = endpoint.peer
+        if not size:
+            endpoint.eof = True
+        else:
+            if self.metrics:
+                (self.metrics.bytes_in if endpoint is endpoint.tunnel.client else self.metrics.bytes_out).inc(size)
+            if endpoint.tunnel.idle_timer is not None:
+                self.timers.touch(endpoint.tunnel.idle_timer)
+            if endpoint.tunnel.awaiting_first_byte and endpoint is endpoint.tunnel.remote:
+                # Первый ответ сервера после установки туннеля
+                endpoint.tunnel.trace.span('first_byte', endpoint.tunnel.started, bytes=size)
+                endpoint.tunnel.awaiting_first_byte = False
+            data = self.view[:size]
+            sent = 0
+            try:
+                sent = peer.sock.send(data)
+            except BlockingIOError:
+                pass
+            if sent < size:
+                # Копируется только то, что не ушло сразу
+                peer.out += data[sent:]
+
+        self.finish_direction(peer)
+        self.update(endpoint)
+        self.update(peer)
+        self.check_done(endpoint.tunnel)
+
+    def throttle(self, endpoint, delay):
+        """Снимает сокет с чтения до накопления токенов"""
+        endpoint.resume_at = time.monotonic() + delay
+        heapq.heappush(self.throttled, (endpoint.resume_at, next(self.sequence), endpoint))
+        if self.metrics:
+            self.metrics.throttled.inc()
+        self.update(endpoint)
+
+    def resume_throttled(self):
+        """Возвращает на чтение сокеты, для которых наступило время resume_at"""
+        now = time.monotonic()
+        while self.throttled and self.throttled[0][0] <= now:
+            _, _, endpoint = heapq.heappop(self.throttled)
+            endpoint.resume_at = 0.0
+            self.update(endpoint)
+
+    def flush(self, endpoint):
+        """Дописывает отложенные данные после частичной отправки"""
+        if endpoint.out:
+            try:
+                sent = endpoint.sock.send(endpoint.out)
+            except BlockingIOError:
+                sent = 0
+            del endpoint.out[:sent]
+
+        self.finish_direction(endpoint)
+        self.update(endpoint)
+        self.update(endpoint.peer)
+        self.check_done(endpoint.tunnel)
+
+    def finish_direction(self, endpoint):
+        """Передает FIN в endpoint, когда противоположная сторона закрыла запись"""
+        if endpoint.peer.eof and not endpoint.out and not endpoint.write_closed:
+            endpoint.write_closed = True
+            endpoint.sock.shutdown(socket.SHUT_WR)
+
+    def update(self, endpoint):
+        """Пересчитывает интересующие события сокета"""
+        if endpoint.tunnel.closed:
+            return
+
+        events = 0
+        # Не читаем, пока противоположная сторона не приняла предыдущие данные
+        if not endpoint.eof and not endpoint.peer.out and not endpoint.resume_at:
+            events |= selectors.EVENT_READ
+        if endpoint.out:
+            events |= selectors.EVENT_WRITE
+
+        if events == endpoint.events:
+            return
+        if endpoint.events == 0:
+            self.selector.register(endpoint.sock, events, endpoint)
+        elif events == 0:
+            self.selector.unregister(endpoint.sock)
+        else:
+            self.selector.modify(endpoint.sock, events, endpoint)
+        endpoint.events = events
+
+    def check_done(self, tunnel):
+        if tunnel.client.write_closed and tunnel.remote.write_closed:
+            self.close_tunnel(tunnel)
+
+    def close_tunnel(self, tunnel):
+        if tunnel.closed:
+            return
+        tunnel.closed = True
+        if tunnel.idle_timer is not None:
+            self.timers.cancel(tunnel.idle_timer)
+        self.active_tunnels -= 1
+        if self.metrics:
+            self.metrics.active_tunnels.dec()
+            self.metrics.tunnel_lifetime.observe(time.perf_counter() - tunnel.started)
+
+        teardown_started = time.perf_counter()
+        for endpoint in (tunnel.client, tunnel.remote):
+            if endpoint.events:
+                self.selector.unregister(endpoint.sock)
+                endpoint.events = 0
+            try:
+                endpoint.sock.close()
+            except OSError:
+                pass
+        if tunnel.trace is not None:
+            tunnel.trace.span('teardown', teardown_started)
+            tunnel.trace.span('tunnel', tunnel.started)
+
+    def shutdown(self):
+        """Закрывает все туннели при остановке цикла"""
+        tunnels = {key.data.tunnel for key in self.selector.get_map().values() if key.data}
+        for tunnel in tunnels:
+            self.close_tunnel(tunnel)
+        self.selector.close()
+        self.wakeup_reader.close()
+        self.wakeup_writer.close()
@@ -0,0 +1,181 @@
+import queue
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+
+def system_resolve(host):
+    """Адреса хоста через getaddrinfo: список (family, sockaddr) без порта"""
+    infos = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+    addresses = []
+    for family, _, _, _, sockaddr in infos:
+        address = (family, sockaddr)
+        if address not in addresses:
+            addresses.append(address)
+    return addresses
+
+
+def with_port(addresses, port):
+    """Подставляет порт в закешированные адреса"""
+    return [(family, (sockaddr[0], port) + tuple(sockaddr[2:])) for family, sockaddr in addresses]
+
+
+class _Entry:
+    __slots__ = ('addresses', 'error', 'expires_at', 'ttl', 'hits', 'refreshing')
+
+    def __init__(self, addresses, error, ttl, now):
+        self.addresses = addresses
+        self.error = error
+        self.ttl = ttl
+        self.expires_at = now + ttl
+        self.hits = 0
+        self.refreshing = False
+
+
+class _Lookup:
+    """Выполняющийся запрос, которого ждут остальные потоки с тем же именем"""
+    __slots__ = ('done', 'addresses', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.addresses = None
+        self.error = None
+
+
+class CachingResolver:
+    """Кеш DNS перед connect для доменных CONNECT запросов.
+
+    - LRU с ограничением по количеству имен
+    - отдельные TTL для успешных и неуспешных ответов
+    - одновременные запросы одного имени объединяются в один вызов resolve_func
+    - популярные записи обновляются в фоне до истечения TTL
+    """
+
+    def __init__(self, resolve_func=system_resolve, max_entries=4096, positive_ttl=60.0,
+                 negative_ttl=5.0, refresh_ahead=0.2, refresh_min_hits=3, clock=time.monotonic):
+        self.resolve_func = resolve_func
+        self.max_entries = max_entries
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.refresh_ahead = refresh_ahead
+        self.refresh_min_hits = refresh_min_hits
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.inflight = {}
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.evictions = 0
+
+        self.refresh_queue = queue.SimpleQueue()
+        self.refresh_thread = None
+
+    def resolve(self, host, port):
+        """Возвращает список (family, sockaddr) с портом или бросает socket.gaierror"""
+        return with_port(self.lookup(host), port)
+
+    def lookup(self, host):
+        now = self.clock()
+        with self.lock:
+            entry = self.cache.get(host)
+            if entry is not None and entry.expires_at > now:
+                self.cache.move_to_end(host)
+                entry.hits += 1
+                if entry.error is not None:
+                    self.negative_hits += 1
+                    raise socket.gaierror(*entry.error.args)
+                self.hits += 1
+                self.maybe_refresh(host, entry, now)
+                return entry.addresses
+
+            lookup = self.inflight.get(host)
+            if lookup is not None:
+                self.coalesced += 1
+                owner = False
+            else:
+                lookup = self.inflight[host] = _Lookup()
+                self.misses += 1
+                owner = True
+
+        if owner:
+            self.run_lookup(host, lookup)
+        else:
+            lookup.done.wait()
+
+        if lookup.error is not None:
+            raise socket.gaierror(*lookup.error.args)
+        return lookup.addresses
+
+    def run_lookup(self, host, lookup):
+        try:
+            lookup.addresses = self.resolve_func(host)
+        except Exception as e:
+            lookup.error = e if isinstance(e, socket.gaierror) else socket.gaierror(str(e))
+
+        with self.lock:
+            self.store(host, lookup.addresses, lookup.error)
+            del self.inflight[host]
+        lookup.done.set()
+
+    def store(self, host, addresses, error):
+        """Сохраняет результат в кеш (вызывается под self.lock)"""
+        ttl = self.negative_ttl if error is not None else self.positive_ttl
+        self.cache[host] = _Entry(addresses, error, ttl, self.clock())
+        self.cache.move_to_end(host)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+            self.evictions += 1
+
+    def maybe_refresh(self, host, entry, now):
+        """Ставит популярную запись на фоновое обновление незадолго до истечения"""
+        if entry.refreshing or entry.hits < self.refresh_min_hits:
+            return
+        if entry.expires_at - now > entry.ttl * self.refresh_ahead:
+            return
+
+        entry.refreshing = True
+        if self.refresh_thread is None:
+            self.refresh_thread = threading.Thread(target=self.refresh_loop, name='socks5-resolver')
+            self.refresh_thread.daemon = True
+            self.refresh_thread.start()
+        self.refresh_queue.put(host)
+
+    def refresh_loop(self):
+        while True:
+            self.refresh(self.refresh_queue.get())
+
+    def refresh(self, host):
+        """Обновляет запись; при ошибке старые адреса остаются до истечения TTL"""
+        try:
+            addresses = self.resolve_func(host)
+        except Exception:
+            with self.lock:
+                entry = self.cache.get(host)
+                if entry is not None:
+                    entry.refreshing = False
+            return
+
+        with self.lock:
+            self.refreshes += 1
+            if host in self.cache:
+                self.store(host, addresses, None)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.negative_hits + self.misses + self.coalesced
+            return {
+                'entries': len(self.cache),
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'refreshes': self.refreshes,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,139 @@
+import threading
+import time
+import weakref
+
+# Запас токенов по умолчанию: сколько секунд трафика может пройти без ограничения
+BURST_SECONDS = 0.25
+# Меньше этого туннель не читает: частые крошечные recv тратят CPU впустую
+MIN_READ = 4096
+
+
+class TokenBucket:
+    """Ведро токенов: rate байт в секунду, не больше burst накопленных байт.
+
+    Ведро может уйти в минус, если несколько потоков одновременно прочитали
+    по разрешенному остатку - тогда следующая задержка будет длиннее.
+    """
+    __slots__ = ('rate', 'burst', 'tokens', 'updated', 'lock', '__weakref__')
+
+    def __init__(self, rate, burst=None, now=None):
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive: {rate}")
+        self.rate = float(rate)
+        self.burst = float(burst) if burst else max(self.rate * BURST_SECONDS, MIN_READ)
+        self.tokens = self.burst
+        self.updated = time.monotonic() if now is None else now
+        self.lock = threading.Lock()
+
+    def refill(self, now):
+        """Начисляет токены за прошедшее время (вызывается под self.lock)"""
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def available(self, now) -> float:
+        with self.lock:
+            self.refill(now)
+            return self.tokens
+
+    def consume(self, amount):
+        """Списывает прочитанное; начисление уже сделано в available() перед чтением"""
+        with self.lock:
+            self.tokens -= amount
+
+    def delay(self, amount, now) -> float:
+        """Через сколько секунд в ведре будет amount токенов"""
+        with self.lock:
+            self.refill(now)
+            return max(amount - self.tokens, 0.0) / self.rate
+
+
+class TunnelLimit:
+    """Ограничения одного туннеля: ведра клиента, назначения и общее.
+
+    Учитываются байты в обоих направлениях. allowance() говорит, сколько
+    можно прочитать сейчас; 0 - чтение откладывается на delay() секунд.
+    """
+    __slots__ = ('buckets', 'clock', 'min_read')
+
+    def __init__(self, buckets, clock=time.monotonic):
+        self.buckets = buckets
+        self.clock = clock
+        # Ведро с burst меньше MIN_READ иначе никогда не разрешило бы чтение
+        self.min_read = min([MIN_READ] + [int(bucket.burst) for bucket in buckets])
+
+    def allowance(self, size) -> int:
+        now = self.clock()
+        allowed = size
+        for bucket in self.buckets:
+            allowed = min(allowed, bucket.available(now))
+        if allowed < min(self.min_read, size):
+            return 0
+        return int(allowed)
+
+    def consume(self, size):
+        for bucket in self.buckets:
+            bucket.consume(size)
+
+    def delay(self) -> float:
+        now = self.clock()
+        return max(bucket.delay(self.min_read, now) for bucket in self.buckets)
+
+
+class BandwidthShaper:
+    """Ограничение полосы в байтах в секунду по IP клиента, по адресу назначения и общее.
+
+    Туннели одного клиента (или к одному назначению) делят одно ведро. Ведра
+    хранятся по слабым ссылкам и исчезают, когда закрыт последний туннель.
+    """
+
+    def __init__(self, per_client=None, per_destination=None, total=None, burst_seconds=None,
+                 clock=time.monotonic):
+        self.per_client = per_client
+        self.per_destination = per_destination
+        # Запас ведер в секундах трафика, None - BURST_SECONDS
+        self.burst_seconds = burst_seconds
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.clients = weakref.WeakValueDictionary()
+        self.destinations = weakref.WeakValueDictionary()
+        self.total = TokenBucket(total, self.burst_bytes(total), clock()) if total else None
+
+    def burst_bytes(self, rate):
+        return rate * self.burst_seconds if self.burst_seconds else None
+
+    def bucket(self, table, key, rate):
+        """Ведро по ключу, общее для всех открытых туннелей (вызывается под self.lock)"""
+        bucket = table.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate, self.burst_bytes(rate), self.clock())
+            table[key] = bucket
+        return bucket
+
+    def open(self, client, destination):
+        """Ограничения для нового туннеля или None, если лимиты не заданы"""
+        buckets = []
+        with self.lock:
+            if self.per_client:
+                buckets.append(self.bucket(self.clients, client, self.per_client))
+            if self.per_destination:
+                buckets.append(self.bucket(self.destinations, destination, self.per_destination))
+        if self.total:
+            buckets.append(self.total)
+        return TunnelLimit(buckets, self.clock) if buckets else None
+
+    def stats(self):
+        with self.lock:
+            return {
+                'clients': len(self.clients),
+                'destinations': len(self.destinations),
+            }
+
+
+def parse_bandwidth(value) -> float:
+    """'512K', '10M', '1G' или число - байт в секунду"""
+    multipliers = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    value = value.strip().upper()
+    if value and value[-1] in multipliers:
+        return float(value[:-1]) * multipliers[value[-1]]
+    return float(value)
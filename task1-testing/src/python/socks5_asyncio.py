@@ -0,0 +1,171 @@
+import asyncio
+from socks5_native import parse_handshake_fast, parse_request_view, RequestView
+from event_log import get_logger
+
+# Ответы сервера, общие для всех соединений
+REPLY_SUCCESS = b'\x05\x00\x00\x01\x00\x00\x00\x00\x00\x00'
+REPLY_GENERAL_FAILURE = b'\x05\x01\x00\x01\x00\x00\x00\x00\x00\x00'
+REPLY_HOST_UNREACHABLE = b'\x05\x04\x00\x01\x00\x00\x00\x00\x00\x00'
+REPLY_COMMAND_NOT_SUPPORTED = b'\x05\x07\x00\x01\x00\x00\x00\x00\x00\x00'
+REPLY_ATYP_NOT_SUPPORTED = b'\x05\x08\x00\x01\x00\x00\x00\x00\x00\x00'
+
+# Размер тела адреса (без порта) для фиксированных типов адресов
+_ADDR_SIZES = {0x01: 4, 0x04: 16}
+
+
+class AsyncSocks5Proxy:
+    """SOCKS5 прокси на одном event loop asyncio.
+
+    В отличие от Socks5Proxy не создает поток на каждое подключение:
+    handle_client, handle_connect и tunnel_data выполняются как корутины,
+    поэтому тысячи простаивающих туннелей занимают только память буферов.
+    """
+
+    def __init__(self, host='localhost', port=1080, backlog=1024,
+                 connect_timeout=5, chunk_size=65536, reuse_port=False, logger=None):
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.reuse_port = reuse_port
+        self.logger = logger or get_logger()
+        self.connect_timeout = connect_timeout
+        self.chunk_size = chunk_size
+        self.active_tunnels = 0
+        self.server = None
+
+    def start(self):
+        """Запускает прокси в собственном event loop (блокирующий вызов)"""
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        """Корутина прослушивания порта для запуска в существующем event loop"""
+        self.server = await asyncio.start_server(
+            self.handle_client, self.host, self.port,
+            backlog=self.backlog, reuse_address=True,
+            reuse_port=self.reuse_port or None
+        )
+        self.logger.info('listening', host=self.host, port=self.port, mode='asyncio')
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def read_handshake(self, reader):
+        """Читает handshake целиком: VER, NMETHODS и список методов"""
+        header = await reader.readexactly(2)
+        methods = await reader.readexactly(header[1])
+        return header + methods
+
+    async def read_request(self, reader):
+        """Читает CONNECT запрос целиком в зависимости от типа адреса"""
+        header = await reader.readexactly(4)
+        atyp = header[3]
+
+        if atyp == 0x03:  # Domain
+            length = await reader.readexactly(1)
+            tail = await reader.readexactly(length[0] + 2)
+            return header + length + tail
+
+        if atyp in _ADDR_SIZES:
+            return header + await reader.readexactly(_ADDR_SIZES[atyp] + 2)
+
+        # Неизвестный тип адреса - отдаем парсеру то, что есть, он вернет ошибку
+        return header
+
+    async def handle_client(self, reader, writer):
+        try:
+            handshake_data = await self.read_handshake(reader)
+            success, handshake = parse_handshake_fast(handshake_data)
+
+            if not success:
+                writer.write(b'\x05\xFF')  # No acceptable methods
+                await writer.drain()
+                return
+
+            # NO AUTHENTICATION
+            writer.write(b'\x05\x00')
+            await writer.drain()
+
+            request_data = await self.read_request(reader)
+            request = parse_request_view(request_data)
+
+            if type(request) is int or request.cmd != 0x01:
+                writer.write(REPLY_COMMAND_NOT_SUPPORTED)
+                await writer.drain()
+                return
+
+            await self.handle_connect(reader, writer, request)
+
+        except asyncio.IncompleteReadError:
+            # Клиент закрыл соединение посреди handshake
+            pass
+        except Exception as e:
+            self.logger.warning('client_error', error=str(e))
+            try:
+                writer.write(REPLY_GENERAL_FAILURE)
+                await writer.drain()
+            except Exception:
+                pass
+        finally:
+            writer.close()
+
+    async def handle_connect(self, reader, writer, request: RequestView):
+        host = None
+        port = None
+
+        try:
+            if request.atyp not in (0x01, 0x03, 0x04):
+                writer.write(REPLY_ATYP_NOT_SUPPORTED)
+                await writer.drain()
+                return
+
+            host = request.host
+            port = request.port
+
+            remote_reader, remote_writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port), timeout=self.connect_timeout
+            )
+        except asyncio.TimeoutError:
+            self.logger.warning('connect_timeout', host=host, port=port)
+            writer.write(REPLY_HOST_UNREACHABLE)
+            await writer.drain()
+            return
+        except Exception as e:
+            self.logger.warning('connect_failed', host=host, port=port, error=str(e))
+            writer.write(REPLY_HOST_UNREACHABLE)
+            await writer.drain()
+            return
+
+        writer.write(REPLY_SUCCESS)
+        await writer.drain()
+
+        await self.tunnel_data(reader, writer, remote_reader, remote_writer)
+
+    async def tunnel_data(self, client_reader, client_writer, remote_reader, remote_writer):
+        """Туннелирование данных между клиентом и удаленным сервером"""
+        self.active_tunnels += 1
+        try:
+            await asyncio.gather(
+                self.pipe(client_reader, remote_writer),
+                self.pipe(remote_reader, client_writer),
+            )
+        finally:
+            self.active_tunnels -= 1
+            remote_writer.close()
+
+    async def pipe(self, reader, writer):
+        """Копирует данные в одном направлении до EOF"""
+        try:
+            while True:
+                data = await reader.read(self.chunk_size)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            # Полузакрытие: сообщаем другой стороне об EOF
+            try:
+                if writer.can_write_eof():
+                    writer.write_eof()
+            except (ConnectionError, OSError):
+                pass
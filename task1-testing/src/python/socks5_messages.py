@@ -0,0 +1,42 @@
+import socket
+
+# Коды ответа SOCKS5 (RFC 1928, 6)
+ERROR_CODES = {
+    0x01: 'General failure',
+    0x02: 'Connection not allowed',
+    0x03: 'Network unreachable',
+    0x04: 'Host unreachable',
+    0x05: 'Connection refused',
+    0x06: 'TTL expired',
+    0x07: 'Command not supported',
+    0x08: 'Address type not supported'
+}
+
+
+def encode_handshake(methods=(0x00,)) -> bytes:
+    """Приветствие клиента: версия, количество методов, методы"""
+    return bytes((0x05, len(methods))) + bytes(methods)
+
+
+def encode_auth(username: bytes, password: bytes) -> bytes:
+    """Запрос username/password (RFC 1929)"""
+    return bytes((0x01, len(username))) + username + bytes((len(password),)) + password
+
+
+def encode_request(host, port, cmd=0x01) -> bytes:
+    """Запрос с ATYP по виду адреса: IPv4, IPv6 или доменное имя"""
+    for family, atyp in ((socket.AF_INET, 0x01), (socket.AF_INET6, 0x04)):
+        try:
+            address = socket.inet_pton(family, host)
+        except OSError:
+            continue
+        return bytes((0x05, cmd, 0x00, atyp)) + address + port.to_bytes(2, 'big')
+
+    name = host.encode('idna')
+    if not 0 < len(name) < 255:
+        raise ValueError(f"Invalid domain name length: {host}")
+    return bytes((0x05, cmd, 0x00, 0x03, len(name))) + name + port.to_bytes(2, 'big')
+
+
+def describe_reply(code) -> str:
+    return ERROR_CODES.get(code, f'Unknown error {code}')
@@ -1,12 +1,46 @@
 import ctypes
+import importlib.machinery
+import importlib.util
+import ipaddress
 import os
+import socket
+import sys
+import sysconfig
+import threading
+from array import array
+from collections import namedtuple
 from ctypes import c_uint8, c_uint16, c_size_t, c_int, c_bool, Structure, POINTER, cast, Union
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Iterable
 
-# Загружаем C библиотеку
+import socks5_pure
+
+# Доступные реализации парсера
+BACKEND_AUTO = 'auto'
+BACKEND_NATIVE = 'native'
+BACKEND_PYTHON = 'python'
+BACKEND_EXT = 'ext'
+BACKENDS = (BACKEND_AUTO, BACKEND_EXT, BACKEND_NATIVE, BACKEND_PYTHON)
+
+# Где искать C библиотеку: явный путь из окружения, рядом с модулем (make build), в src/c
 current_dir = os.path.dirname(os.path.abspath(__file__))
-lib_path = os.path.join(current_dir, '..', 'c', 'libsocks5_parser.so')
-socks5_lib = ctypes.CDLL(lib_path)
+LIBRARY_PATHS = [
+    os.environ.get('SOCKS5_PARSER_LIB'),
+    os.path.join(current_dir, 'libsocks5_parser.so'),
+    os.path.join(current_dir, '..', 'c', 'libsocks5_parser.so'),
+]
+
+# CPython расширение (make в src/c) ищется там же; имя зависит от версии интерпретатора
+EXTENSION_NAME = '_socks5_ext'
+EXTENSION_FILE = EXTENSION_NAME + sysconfig.get_config_var('EXT_SUFFIX')
+EXTENSION_PATHS = [
+    os.environ.get('SOCKS5_PARSER_EXT'),
+    os.path.join(current_dir, EXTENSION_FILE),
+    os.path.join(current_dir, '..', 'c', EXTENSION_FILE),
+]
+
+# Компактный результат parse_request_compact для backend без расширения,
+# поля совпадают с _socks5_ext.ParsedRequest
+ParsedRequest = namedtuple('ParsedRequest', 'cmd atyp host port consumed')
 
 # Определяем структуры для Python
 class Socks5Handshake(Structure):
@@ -45,40 +79,637 @@ class Socks5Request(Structure):
         ("dst_port", c_uint16)
     ]
 
-# Определяем сигнатуры функций
-socks5_lib.parse_socks5_handshake.argtypes = [
-    ctypes.POINTER(c_uint8),  # data
-    c_size_t,                 # len
-    ctypes.POINTER(Socks5Handshake)  # handshake
-]
-socks5_lib.parse_socks5_handshake.restype = c_int
+class Socks5Auth(Structure):
+    """Запрос username/password (RFC 1929)"""
+    _fields_ = [
+        ("version", c_uint8),
+        ("ulen", c_uint8),
+        ("uname", c_uint8 * 255),
+        ("plen", c_uint8),
+        ("passwd", c_uint8 * 255)
+    ]
 
-socks5_lib.parse_socks5_request.argtypes = [
-    ctypes.POINTER(c_uint8),  # data
-    c_size_t,                 # len  
-    ctypes.POINTER(Socks5Request)  # request
-]
-socks5_lib.parse_socks5_request.restype = c_int
+    @property
+    def username(self) -> bytes:
+        return bytes(self.uname[:self.ulen])
+
+    @property
+    def password(self) -> bytes:
+        return bytes(self.passwd[:self.plen])
+
+class Socks5UdpHeader(Structure):
+    """Заголовок UDP датаграммы: RSV, FRAG, адрес назначения; данные начинаются с header_len"""
+    _fields_ = [
+        ("rsv", c_uint16),
+        ("frag", c_uint8),
+        ("atyp", c_uint8),
+        ("dst_addr", Socks5Request.AddrUnion),
+        ("dst_port", c_uint16),
+        ("header_len", c_uint16)
+    ]
+
+# Самый длинный заголовок UDP: RSV, FRAG, ATYP, длина и 254 байта домена, порт
+UDP_HEADER_MAX = 4 + 1 + 254 + 2
+
+def decode_domain(name: bytes) -> str:
+    """Имя домена из запроса (TCP и UDP) в str.
+
+    Байты не из UTF-8 не теряются, а разрешение такого имени завершится UnicodeError
+    или ошибкой getaddrinfo, как для любого несуществующего имени.
+    """
+    return name.decode('utf-8', 'surrogateescape')
+
+class RequestView:
+    """Разобранный запрос: команда, тип адреса, сырые байты адреса и порт.
+
+    Занимает несколько десятков байт вместо ~280 байт структуры Socks5Request
+    и не держит ее до конца туннеля. Строка host и объект ipaddress собираются
+    при первом обращении и кешируются.
+    """
+    __slots__ = ('cmd', 'atyp', 'addr', 'port', '_host', '_ip')
+
+    def __init__(self, cmd: int, atyp: int, addr: bytes, port: int):
+        self.cmd = cmd
+        self.atyp = atyp
+        self.addr = addr  # 4/16 байт IP или имя домена без байта длины
+        self.port = port
+        self._host = None
+        self._ip = None
+
+    @classmethod
+    def from_message(cls, data) -> 'RequestView':
+        """Представление уже проверенного парсером запроса в начале data"""
+        atyp = data[3]
+        if atyp == 0x03:
+            start = 5
+            end = start + data[4]
+        else:
+            start = 4
+            end = start + (16 if atyp == 0x04 else 4)
+        return cls(data[1], atyp, bytes(data[start:end]), data[end] << 8 | data[end + 1])
+
+    @classmethod
+    def from_struct(cls, request: 'Socks5Request') -> 'RequestView':
+        """Копия адреса и порта из структуры Socks5Request"""
+        if request.atyp == 0x01:
+            addr = bytes(request.dst_addr.ipv4)
+        elif request.atyp == 0x04:
+            addr = bytes(request.dst_addr.ipv6)
+        elif request.atyp == 0x03:
+            addr = bytes(request.dst_addr.domain.name)[:request.dst_addr.domain.len]
+        else:
+            addr = b''
+        return cls(request.cmd, request.atyp, addr, request.dst_port)
+
+    @property
+    def host(self) -> str:
+        """IPv4/IPv6 адрес в текстовой записи или имя домена"""
+        host = self._host
+        if host is None:
+            if self.atyp == 0x03:
+                host = decode_domain(self.addr)
+            else:
+                host = socket.inet_ntop(socket.AF_INET6 if self.atyp == 0x04 else socket.AF_INET, self.addr)
+            self._host = host
+        return host
+
+    @property
+    def ip(self):
+        """IPv4Address/IPv6Address адреса назначения, None для домена"""
+        ip = self._ip
+        if ip is None and self.atyp != 0x03:
+            ip = self._ip = (ipaddress.IPv6Address if self.atyp == 0x04 else ipaddress.IPv4Address)(self.addr)
+        return ip
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.host, self.port
+
+    def __repr__(self):
+        return f"RequestView(cmd={self.cmd}, atyp={self.atyp}, host={self.host!r}, port={self.port})"
+
+# Ответы с нулевым BND.ADDR собираются один раз на каждый код
+_ZERO_REPLIES = tuple(bytes((0x05, code, 0x00, 0x01, 0, 0, 0, 0, 0, 0)) for code in range(256))
+
+def pack_reply(code: int, bind: Optional[Tuple[str, int]] = None) -> bytes:
+    """SOCKS5 reply; bind - (host, port) для BND.ADDR/BND.PORT, по умолчанию нулевой адрес"""
+    if bind is None:
+        return _ZERO_REPLIES[code]
+    host, port = bind[0], bind[1]
+    if ':' in host:
+        address = b'\x04' + socket.inet_pton(socket.AF_INET6, host)
+    else:
+        address = b'\x01' + socket.inet_aton(host)
+    return bytes((0x05, code, 0x00)) + address + port.to_bytes(2, 'big')
+
+def load_library(path: Optional[str] = None) -> ctypes.CDLL:
+    """Загружает C библиотеку и объявляет сигнатуры функций.
+
+    Без path перебирает LIBRARY_PATHS. Бросает OSError, если библиотека не найдена.
+    """
+    candidates = [path] if path else [p for p in LIBRARY_PATHS if p]
+    errors = []
+    for candidate in candidates:
+        try:
+            socks5_lib = ctypes.CDLL(candidate)
+            break
+        except OSError as e:
+            errors.append(f"{candidate}: {e}")
+    else:
+        raise OSError("libsocks5_parser.so not found: " + "; ".join(errors))
+    
+    # Определяем сигнатуры функций.
+    # Данные передаются как c_void_p: bytes и ctypes-массивы поверх буфера
+    # принимаются без копирования и без распаковки в Python int.
+    socks5_lib.parse_socks5_handshake.argtypes = [
+        ctypes.c_void_p,          # data
+        c_size_t,                 # len
+        ctypes.POINTER(Socks5Handshake)  # handshake
+    ]
+    socks5_lib.parse_socks5_handshake.restype = c_int
+
+    socks5_lib.parse_socks5_request.argtypes = [
+        ctypes.c_void_p,          # data
+        c_size_t,                 # len  
+        ctypes.POINTER(Socks5Request)  # request
+    ]
+    socks5_lib.parse_socks5_request.restype = c_int
+
+    socks5_lib.parse_socks5_handshake_batch.argtypes = [
+        ctypes.c_void_p,          # data
+        c_size_t,                 # len
+        ctypes.c_void_p,          # offsets (uint32_t[count + 1])
+        c_size_t,                 # count
+        ctypes.c_void_p,          # status (int8_t[count])
+        ctypes.c_void_p,          # nmethods (uint8_t[count])
+    ]
+    socks5_lib.parse_socks5_handshake_batch.restype = ctypes.c_long
+
+    socks5_lib.parse_socks5_request_batch.argtypes = [
+        ctypes.c_void_p,          # data
+        c_size_t,                 # len
+        ctypes.c_void_p,          # offsets (uint32_t[count + 1])
+        c_size_t,                 # count
+        ctypes.c_void_p,          # status (int8_t[count])
+        ctypes.c_void_p,          # cmd (uint8_t[count])
+        ctypes.c_void_p,          # atyp (uint8_t[count])
+        ctypes.c_void_p,          # port (uint16_t[count])
+        ctypes.c_void_p,          # addr_offset (uint32_t[count])
+    ]
+    socks5_lib.parse_socks5_request_batch.restype = ctypes.c_long
+
+    socks5_lib.parse_socks5_auth.argtypes = [
+        ctypes.c_void_p,          # data
+        c_size_t,                 # len
+        ctypes.POINTER(Socks5Auth)  # auth
+    ]
+    socks5_lib.parse_socks5_auth.restype = c_int
+
+    socks5_lib.parse_socks5_udp_header.argtypes = [
+        ctypes.c_void_p,          # data
+        c_size_t,                 # len
+        ctypes.POINTER(Socks5UdpHeader)  # header
+    ]
+    socks5_lib.parse_socks5_udp_header.restype = c_int
+
+    socks5_lib.build_socks5_udp_header.argtypes = [
+        c_uint8,                  # atyp
+        ctypes.c_void_p,          # addr
+        c_size_t,                 # addr_len
+        c_uint16,                 # port
+        ctypes.c_void_p,          # out
+        c_size_t,                 # out_len
+    ]
+    socks5_lib.build_socks5_udp_header.restype = ctypes.c_long
+
+    for name in ('socks5_handshake_needed', 'socks5_request_needed', 'socks5_auth_needed'):
+        func = getattr(socks5_lib, name)
+        func.argtypes = [ctypes.c_void_p, c_size_t]
+        func.restype = ctypes.c_long
+    
+    return socks5_lib
+
+def load_extension(path: Optional[str] = None):
+    """Загружает модуль _socks5_ext из собранного файла расширения.
+
+    Без path перебирает EXTENSION_PATHS. Бросает OSError, если расширение не найдено
+    или собрано под другой интерпретатор.
+    """
+    module = sys.modules.get(EXTENSION_NAME)
+    if module is not None and path is None:
+        return module
+
+    candidates = [path] if path else [p for p in EXTENSION_PATHS if p]
+    errors = []
+    for candidate in candidates:
+        if not os.path.exists(candidate):
+            errors.append(f"{candidate}: not found")
+            continue
+        try:
+            loader = importlib.machinery.ExtensionFileLoader(EXTENSION_NAME, candidate)
+            spec = importlib.util.spec_from_file_location(EXTENSION_NAME, candidate, loader=loader)
+            module = importlib.util.module_from_spec(spec)
+            loader.exec_module(module)
+        except ImportError as e:
+            errors.append(f"{candidate}: {e}")
+            continue
+        sys.modules[EXTENSION_NAME] = module
+        return module
+    raise OSError(EXTENSION_FILE + " not found: " + "; ".join(errors))
+
+class ParserBackend:
+    """Набор функций парсинга одной реализации.
+
+    parse_handshake(data, handshake) и parse_request(data, request) заполняют
+    структуру и возвращают код ошибки, parse_*_batch(data, offsets, batch)
+    заполняют массивы пакета и возвращают количество разобранных сообщений.
+    handshake_needed(data) и request_needed(data) возвращают полную длину
+    сообщения в начале data (нижнюю границу, пока она неизвестна) или код ошибки.
+    parse_auth(data, auth) и auth_needed(data) - то же для запроса username/password.
+    parse_udp_header(data, header) разбирает заголовок UDP датаграммы,
+    build_udp_header(out, atyp, addr, port) пишет заголовок в out и возвращает его длину.
+    parse_request_compact(data) возвращает ParsedRequest или отрицательный код ошибки.
+    """
+    def __init__(self, name, parse_handshake, parse_request, parse_handshakes_batch, parse_requests_batch,
+                 handshake_needed, request_needed, parse_auth, auth_needed,
+                 parse_udp_header, build_udp_header, parse_request_compact=None):
+        self.name = name
+        self.parse_handshake = parse_handshake
+        self.parse_request = parse_request
+        self.parse_handshakes_batch = parse_handshakes_batch
+        self.parse_requests_batch = parse_requests_batch
+        self.handshake_needed = handshake_needed
+        self.request_needed = request_needed
+        self.parse_auth = parse_auth
+        self.auth_needed = auth_needed
+        self.parse_udp_header = parse_udp_header
+        self.build_udp_header = build_udp_header
+        self.parse_request_compact = parse_request_compact or _compact_parser(parse_request)
+
+def _compact_parser(parse_request):
+    """parse_request_compact поверх parse_request со структурой текущего потока"""
+    def parse_request_compact(data):
+        request = _thread_structs()[1]
+        result = parse_request(data, request)
+        if result != 0:
+            return result
+        if request.atyp == 0x01:
+            host = socket.inet_ntop(socket.AF_INET, bytes(request.dst_addr.ipv4))
+            consumed = 10
+        elif request.atyp == 0x04:
+            host = socket.inet_ntop(socket.AF_INET6, bytes(request.dst_addr.ipv6))
+            consumed = 22
+        else:
+            domain = request.dst_addr.domain
+            host = decode_domain(bytes(domain.name[:domain.len]))
+            consumed = 7 + domain.len
+        return ParsedRequest(request.cmd, request.atyp, host, request.dst_port, consumed)
+    return parse_request_compact
+
+def ext_backend(path: Optional[str] = None) -> ParserBackend:
+    """Backend на CPython расширении: без ctypes, буфер данных берется напрямую"""
+    ext = load_extension(path)
+    ext_handshakes_batch = ext.parse_handshakes_batch
+    ext_requests_batch = ext.parse_requests_batch
+
+    def parse_handshakes_batch(data, offsets, batch):
+        return ext_handshakes_batch(data, offsets, batch.count, batch.status, batch.nmethods)
+
+    def parse_requests_batch(data, offsets, batch):
+        return ext_requests_batch(data, offsets, batch.count, batch.status, batch.cmd,
+                                  batch.atyp, batch.port, batch.addr_offset)
+
+    return ParserBackend(BACKEND_EXT, ext.parse_handshake_into, ext.parse_request_into,
+                         parse_handshakes_batch, parse_requests_batch,
+                         ext.handshake_needed, ext.request_needed,
+                         ext.parse_auth_into, ext.auth_needed,
+                         ext.parse_udp_header_into, ext.build_udp_header,
+                         ext.parse_request)
+
+def native_backend(path: Optional[str] = None) -> ParserBackend:
+    socks5_lib = load_library(path)
+    c_handshake = socks5_lib.parse_socks5_handshake
+    c_request = socks5_lib.parse_socks5_request
+    c_handshake_batch = socks5_lib.parse_socks5_handshake_batch
+    c_request_batch = socks5_lib.parse_socks5_request_batch
+    c_handshake_needed = socks5_lib.socks5_handshake_needed
+    c_request_needed = socks5_lib.socks5_request_needed
+    c_auth = socks5_lib.parse_socks5_auth
+    c_auth_needed = socks5_lib.socks5_auth_needed
+    c_udp_header = socks5_lib.parse_socks5_udp_header
+    c_build_udp_header = socks5_lib.build_socks5_udp_header
+    
+    def parse_handshake(data, handshake):
+        if type(data) is bytes:
+            return c_handshake(data, len(data), handshake)
+        buf, length = _buffer_arg(data)
+        return c_handshake(buf, length, handshake)
+    
+    def parse_request(data, request):
+        if type(data) is bytes:
+            return c_request(data, len(data), request)
+        buf, length = _buffer_arg(data)
+        return c_request(buf, length, request)
+    
+    def parse_handshakes_batch(data, offsets, batch):
+        buf, length = _buffer_arg(data)
+        return c_handshake_batch(
+            buf, length, _array_arg(offsets), batch.count,
+            _array_arg(batch.status), _array_arg(batch.nmethods)
+        )
+    
+    def parse_requests_batch(data, offsets, batch):
+        buf, length = _buffer_arg(data)
+        return c_request_batch(
+            buf, length, _array_arg(offsets), batch.count,
+            _array_arg(batch.status), _array_arg(batch.cmd), _array_arg(batch.atyp),
+            _array_arg(batch.port), _array_arg(batch.addr_offset)
+        )
+    
+    def handshake_needed(data):
+        buf, length = _buffer_arg(data)
+        return c_handshake_needed(buf, length)
+
+    def request_needed(data):
+        buf, length = _buffer_arg(data)
+        return c_request_needed(buf, length)
+    
+    def parse_auth(data, auth):
+        buf, length = _buffer_arg(data)
+        return c_auth(buf, length, auth)
+
+    def auth_needed(data):
+        buf, length = _buffer_arg(data)
+        return c_auth_needed(buf, length)
+
+    def parse_udp_header(data, header):
+        buf, length = _buffer_arg(data)
+        return c_udp_header(buf, length, header)
+
+    def build_udp_header(out, atyp, addr, port):
+        buf, length = _buffer_arg(out)
+        return c_build_udp_header(atyp, addr, len(addr), port, buf, length)
+    
+    return ParserBackend(BACKEND_NATIVE, parse_handshake, parse_request,
+                         parse_handshakes_batch, parse_requests_batch,
+                         handshake_needed, request_needed,
+                         parse_auth, auth_needed,
+                         parse_udp_header, build_udp_header)
+
+def python_backend() -> ParserBackend:
+    return ParserBackend(BACKEND_PYTHON,
+                         socks5_pure.parse_socks5_handshake,
+                         socks5_pure.parse_socks5_request,
+                         socks5_pure.parse_socks5_handshake_batch,
+                         socks5_pure.parse_socks5_request_batch,
+                         socks5_pure.socks5_handshake_needed,
+                         socks5_pure.socks5_request_needed,
+                         socks5_pure.parse_socks5_auth,
+                         socks5_pure.socks5_auth_needed,
+                         socks5_pure.parse_socks5_udp_header,
+                         socks5_pure.build_socks5_udp_header)
+
+# Backend выбирается при первом вызове парсера, а не при импорте модуля
+_backend_name = os.environ.get('SOCKS5_PARSER_BACKEND', BACKEND_AUTO)
+_backend = None
+_backend_lock = threading.Lock()
+
+def set_backend(name: str) -> None:
+    """Задает реализацию парсера: 'ext', 'native', 'python' или 'auto'.
+
+    Сама реализация загружается при следующем вызове парсера.
+    """
+    global _backend_name, _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown parser backend: {name}")
+    with _backend_lock:
+        _backend_name = name
+        _backend = None
+
+def get_backend() -> ParserBackend:
+    """Возвращает активную реализацию, загружая ее при необходимости"""
+    global _backend
+    backend = _backend
+    if backend is not None:
+        return backend
+    
+    with _backend_lock:
+        if _backend is None:
+            if _backend_name == BACKEND_PYTHON:
+                _backend = python_backend()
+            elif _backend_name == BACKEND_NATIVE:
+                _backend = native_backend()
+            elif _backend_name == BACKEND_EXT:
+                _backend = ext_backend()
+            else:
+                # Самая быстрая из доступных: расширение, затем ctypes, затем чистый Python
+                for loader in (ext_backend, native_backend):
+                    try:
+                        _backend = loader()
+                        break
+                    except OSError:
+                        pass
+                else:
+                    _backend = python_backend()
+        return _backend
+
+# Переиспользуемые структуры результата, по одной на поток
+_thread_local = threading.local()
+
+def _buffer_arg(data) -> Tuple[object, int]:
+    """Возвращает аргумент для C функции и длину данных без копирования буфера"""
+    if type(data) is bytes:
+        return data, len(data)
+    
+    view = memoryview(data)
+    if not view.readonly:
+        # bytearray, записываемый memoryview и т.п. - ctypes-массив поверх того же буфера
+        return (c_uint8 * view.nbytes).from_buffer(view), view.nbytes
+    
+    if isinstance(view.obj, bytes) and view.nbytes == len(view.obj):
+        return view.obj, view.nbytes
+    
+    # Срез read-only буфера: единственный случай, когда нужна копия
+    return view.tobytes(), view.nbytes
+
+def _thread_structs() -> Tuple[Socks5Handshake, Socks5Request]:
+    try:
+        return _thread_local.structs
+    except AttributeError:
+        structs = _thread_local.structs = (Socks5Handshake(), Socks5Request())
+        return structs
+
+def parse_handshake_into(data, handshake: Socks5Handshake) -> int:
+    """Заполняет переданную структуру handshake, возвращает код ошибки парсера"""
+    return (_backend or get_backend()).parse_handshake(data, handshake)
+
+def parse_request_into(data, request: Socks5Request) -> int:
+    """Заполняет переданную структуру request, возвращает код ошибки парсера"""
+    return (_backend or get_backend()).parse_request(data, request)
+
+def handshake_needed(data) -> int:
+    """Полная длина handshake в начале data или отрицательный код ошибки"""
+    return (_backend or get_backend()).handshake_needed(data)
+
+def request_needed(data) -> int:
+    """Полная длина request в начале data или отрицательный код ошибки"""
+    return (_backend or get_backend()).request_needed(data)
+
+def parse_auth_into(data, auth: Socks5Auth) -> int:
+    """Заполняет запрос username/password, возвращает код ошибки парсера"""
+    return (_backend or get_backend()).parse_auth(data, auth)
+
+def parse_auth(data) -> Tuple[bool, Optional[Socks5Auth]]:
+    """Парсит запрос username/password (RFC 1929) используя выбранный backend"""
+    auth = Socks5Auth()
+    result = parse_auth_into(data, auth)
+    return result == 0, auth if result == 0 else None
+
+def auth_needed(data) -> int:
+    """Полная длина запроса username/password в начале data или отрицательный код ошибки"""
+    return (_backend or get_backend()).auth_needed(data)
+
+def parse_udp_header_into(data, header: Socks5UdpHeader) -> int:
+    """Заполняет заголовок UDP датаграммы, возвращает код ошибки парсера"""
+    return (_backend or get_backend()).parse_udp_header(data, header)
+
+def parse_udp_header(data) -> Tuple[bool, Optional[Socks5UdpHeader]]:
+    """Парсит заголовок UDP датаграммы используя выбранный backend"""
+    header = Socks5UdpHeader()
+    result = parse_udp_header_into(data, header)
+    return result == 0, header if result == 0 else None
+
+def build_udp_header(atyp: int, addr: bytes, port: int) -> bytes:
+    """Заголовок UDP датаграммы для адреса: 4/16 байт IP или имя домена"""
+    out = bytearray(UDP_HEADER_MAX)
+    length = (_backend or get_backend()).build_udp_header(out, atyp, addr, port)
+    if length < 0:
+        raise ValueError(f"Cannot build UDP header: error {length}")
+    return bytes(out[:length])
 
 def parse_handshake(data: bytes) -> Tuple[bool, Optional[Socks5Handshake]]:
-    """Парсит SOCKS5 handshake используя C библиотеку"""
+    """Парсит SOCKS5 handshake используя выбранный backend"""
     handshake = Socks5Handshake()
-    data_array = (c_uint8 * len(data))(*data)
-    
-    result = socks5_lib.parse_socks5_handshake(data_array, len(data), handshake)
+    result = parse_handshake_into(data, handshake)
     return result == 0, handshake if result == 0 else None    
 
 def parse_request(data: bytes) -> Tuple[bool, Optional[Socks5Request]]:
-    """Парсит SOCKS5 request используя C библиотеку"""
+    """Парсит SOCKS5 request используя выбранный backend"""
     request = Socks5Request()
-    data_array = (c_uint8 * len(data))(*data)
-    
-    result = socks5_lib.parse_socks5_request(data_array, len(data), request)
-    
-    # Добавим отладочный вывод
+    result = parse_request_into(data, request)
+    return result == 0, request if result == 0 else None
+
+def parse_request_compact(data):
+    """Запрос как неизменяемый ParsedRequest(cmd, atyp, host, port, consumed).
+
+    При ошибке возвращает отрицательный код парсера (int), а не бросает исключение:
+    вызывающий код различает ошибки так же, как в parse_*_into. host - строка
+    IPv4/IPv6 адреса или имени домена, consumed - длина запроса в байтах.
+    """
+    return (_backend or get_backend()).parse_request_compact(data)
+
+def parse_request_view(data):
+    """Запрос как RequestView или отрицательный код ошибки парсера.
+
+    Парсер только проверяет сообщение (в структуру текущего потока),
+    адрес и порт берутся из самих данных без обхода полей ctypes.
+    """
+    result = (_backend or get_backend()).parse_request(data, _thread_structs()[1])
     if result != 0:
-        print(f"Parse request failed with error code: {result}")
-        print(f"Data length: {len(data)}")
-        print(f"Data: {data.hex()}")
-    
+        return result
+    return RequestView.from_message(data)
+
+def parse_handshake_status(data) -> Tuple[int, Optional[Socks5Handshake]]:
+    """Как parse_handshake_fast, но вместо флага успеха возвращает код ошибки парсера"""
+    handshake = _thread_structs()[0]
+    result = (_backend or get_backend()).parse_handshake(data, handshake)
+    return result, handshake if result == 0 else None
+
+def parse_handshake_fast(data) -> Tuple[bool, Optional[Socks5Handshake]]:
+    """Как parse_handshake, но результат пишется в структуру текущего потока.
+
+    Структура перезаписывается следующим вызовом в этом же потоке,
+    поэтому ее нельзя сохранять между вызовами.
+    """
+    handshake = _thread_structs()[0]
+    result = (_backend or get_backend()).parse_handshake(data, handshake)
+    return result == 0, handshake if result == 0 else None
+
+def parse_request_fast(data) -> Tuple[bool, Optional[Socks5Request]]:
+    """Как parse_request, но результат пишется в структуру текущего потока.
+
+    Структура перезаписывается следующим вызовом в этом же потоке,
+    поэтому ее нельзя сохранять между вызовами.
+    """
+    request = _thread_structs()[1]
+    result = (_backend or get_backend()).parse_request(data, request)
     return result == 0, request if result == 0 else None
+
+
+# Коды типов array.array, совпадающие по размеру с типами C библиотеки
+_UINT32 = 'I' if array('I').itemsize == 4 else 'L'
+
+class HandshakeBatch:
+    """Результаты пакетного парсинга handshake в виде массивов array.array.
+
+    Массивы поддерживают buffer protocol: их можно обернуть в memoryview
+    или numpy.frombuffer без копирования.
+    """
+    def __init__(self, count: int):
+        self.count = count
+        self.parsed = 0
+        self.status = array('b', bytes(count))
+        self.nmethods = array('B', bytes(count))
+
+class RequestBatch:
+    """Результаты пакетного парсинга запросов в виде массивов array.array.
+
+    addr_offset - смещение адреса назначения в исходном буфере
+    (для доменов - первый байт имени, длина лежит в предыдущем байте).
+    """
+    def __init__(self, count: int):
+        self.count = count
+        self.parsed = 0
+        self.status = array('b', bytes(count))
+        self.cmd = array('B', bytes(count))
+        self.atyp = array('B', bytes(count))
+        self.port = array('H', bytes(2 * count))
+        self.addr_offset = array(_UINT32, bytes(4 * count))
+
+def _array_arg(arr: array):
+    return (c_uint8 * (len(arr) * arr.itemsize)).from_buffer(arr) if len(arr) else None
+
+def _offsets_arg(offsets) -> array:
+    if isinstance(offsets, array) and offsets.typecode == _UINT32:
+        return offsets
+    return array(_UINT32, offsets)
+
+def pack_messages(messages: Iterable[bytes]) -> Tuple[bytes, array]:
+    """Склеивает сообщения в один буфер и строит для него массив смещений"""
+    messages = list(messages)
+    offsets = array(_UINT32, [0])
+    position = 0
+    for message in messages:
+        position += len(message)
+        offsets.append(position)
+    return b''.join(messages), offsets
+
+def parse_handshakes_batch(data, offsets) -> HandshakeBatch:
+    """Парсит несколько handshake из одного буфера за один вызов парсера"""
+    offsets = _offsets_arg(offsets)
+    batch = HandshakeBatch(max(len(offsets) - 1, 0))
+    if batch.count == 0:
+        return batch
+    
+    batch.parsed = (_backend or get_backend()).parse_handshakes_batch(data, offsets, batch)
+    return batch
+
+def parse_requests_batch(data, offsets) -> RequestBatch:
+    """Парсит несколько запросов из одного буфера за один вызов парсера"""
+    offsets = _offsets_arg(offsets)
+    batch = RequestBatch(max(len(offsets) - 1, 0))
+    if batch.count == 0:
+        return batch
+    
+    batch.parsed = (_backend or get_backend()).parse_requests_batch(data, offsets, batch)
+    return batch
@@ -1,71 +1,334 @@
 import socket
 import threading
 import select
-from socks5_native import parse_handshake, parse_request, Socks5Handshake, Socks5Request
+import time
+from socks5_native import (parse_handshake, parse_handshake_fast, parse_request, pack_reply, Socks5Handshake,
+                           Socks5Request, RequestView)
+from socks5_session import (Socks5Session, STATE_HANDSHAKE, STATE_AUTH, STATE_REQUEST, STATE_ERROR,
+                            METHOD_NO_AUTH, METHOD_USERNAME_PASSWORD)
+from worker_pool import WorkerPool, OVERLOAD_QUEUE, OVERLOAD_REJECT, OVERLOAD_PAUSE, OVERLOAD_POLICIES
+from relay import RelayEngine, RELAY_THREAD, RELAY_SHARED, RELAY_SPLICE, RELAY_MODES
+from splice_relay import SpliceTunnel, splice_supported
+from buffer_pool import BufferPool, ChunkSizer
+from resolver import system_resolve, with_port
+from happy_eyeballs import connect_happy_eyeballs, ATTEMPT_TIMEOUT
+from metrics import ProxyMetrics
+from event_log import get_logger
+from timer_wheel import TimerWheel
+from udp_relay import UdpRelay
+from acl import AccessDenied
+from upstream import UpstreamError
 
 class Socks5Proxy:
-    def __init__(self, host='localhost', port=1080):
+    def __init__(self, host='localhost', port=1080, max_workers=None, queue_size=256,
+                 backlog=128, overload_policy=OVERLOAD_QUEUE, relay_mode=RELAY_THREAD,
+                 relay_threads=1, buffer_pool=None, resolver=None, happy_eyeballs=False,
+                 reuse_port=False, metrics=None, logger=None, handshake_timeout=None,
+                 connect_timeout=5, idle_timeout=None, timer_wheel=None, shaper=None,
+                 udp_idle_timeout=None, authenticator=None, acl=None, upstreams=None, tracer=None):
+        if overload_policy not in OVERLOAD_POLICIES:
+            raise ValueError(f"Unknown overload policy: {overload_policy}")
+        if relay_mode not in RELAY_MODES:
+            raise ValueError(f"Unknown relay mode: {relay_mode}")
+
         self.host = host
         self.port = port
+        self.backlog = backlog
+        self.reuse_port = reuse_port
+        self.overload_policy = overload_policy
+
+        # max_workers=None - поток на каждое подключение (поведение по умолчанию)
+        self.pool = WorkerPool(self.handle_client, max_workers, queue_size) if max_workers else None
+
+        # Кеш DNS для доменных запросов (resolver.CachingResolver), None - getaddrinfo в connect
+        self.resolver = resolver
+        # Параллельное подключение ко всем адресам домена (IPv4/IPv6) по RFC 8305
+        self.happy_eyeballs = happy_eyeballs
+
+        # Проверка username/password (auth.CredentialCache или любое хранилище с verify).
+        # С ним клиент обязан пройти аутентификацию RFC 1929, без него - только NO AUTHENTICATION
+        self.authenticator = authenticator
+        self.methods = (METHOD_USERNAME_PASSWORD,) if authenticator else (METHOD_NO_AUTH,)
+
+        # Счетчики и гистограммы по этапам обработки (metrics.ProxyMetrics)
+        self.metrics = metrics or ProxyMetrics()
+        # Структурированный лог с фоновой записью (event_log.EventLogger)
+        self.logger = logger or get_logger()
+        # Выборочная трассировка этапов соединения (tracing.Tracer), None - выключена.
+        # Trace соединения, попавшего в выборку при accept, лежит в traces по клиентскому сокету
+        self.tracer = tracer
+        self.traces = {}
+
+        # Таймауты в секундах, None - без ограничения. connect_timeout - таймаут сокета
+        # при подключении к серверу, handshake и простой отслеживаются колесом таймеров
+        self.handshake_timeout = handshake_timeout
+        self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout
+        self.timers = timer_wheel
+        if self.timers is None and (handshake_timeout or idle_timeout or udp_idle_timeout):
+            self.timers = TimerWheel().start()
+        self.reclaimed = {'handshake': 0, 'idle': 0, 'udp_idle': 0}
+
+        # Цикл UDP ASSOCIATE создается при первой ассоциации
+        self.udp_idle_timeout = udp_idle_timeout
+        self.udp_relay = None
+        self.udp_lock = threading.Lock()
+
+        # Правила допустимых назначений (acl.AccessControl), None - без ограничений
+        self.acl = acl
+        # Цепочка через вышестоящие SOCKS5 серверы (upstream.UpstreamPool), None - прямое подключение
+        self.upstreams = upstreams
+
+        # Ограничение полосы по клиенту, назначению и общее (shaping.BandwidthShaper)
+        self.shaper = shaper
+
+        # Буферы для recv_into в tunnel_data, общие для всех туннелей
+        self.buffer_pool = buffer_pool or BufferPool()
+
+        # В режиме shared туннели обслуживаются фиксированным набором потоков пересылки
+        self.relay_mode = relay_mode
+        self.relays = []
+        if relay_mode == RELAY_SHARED:
+            for i in range(relay_threads):
+                relay = RelayEngine(name=f"socks5-relay-{i}", metrics=self.metrics,
+                                    timers=self.timers)
+                relay.start()
+                self.relays.append(relay)
+
+        self.accepted = 0
+        self.rejected = 0
     
-    def start(self):
+    def listen(self):
+        """Создает слушающий сокет; с reuse_port несколько процессов делят один порт"""
         server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            # Ядро распределяет новые соединения между всеми сокетами на порту
+            server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         server_socket.bind((self.host, self.port))
-        server_socket.listen(5)
-        print(f"SOCKS5 proxy listening on {self.host}:{self.port}")
+        server_socket.listen(self.backlog)
+        return server_socket
+
+    def start(self):
+        server_socket = self.listen()
+        self.logger.info('listening', host=self.host, port=self.port)
         
         while True:
+            # В режиме pause не принимаем соединения, пока в пуле нет места
+            slot_acquired = False
+            if self.pool and self.overload_policy == OVERLOAD_PAUSE:
+                slot_acquired = self.pool.try_acquire()
+
+            accept_started = time.perf_counter() if self.tracer is not None else None
             client_socket, addr = server_socket.accept()
-            print(f"New connection from {addr}")
+            if accept_started is not None:
+                accepted_at = time.perf_counter()
+            self.accepted += 1
+            self.metrics.accepted.inc()
+            self.logger.info('accepted', client=addr[0], client_port=addr[1])
+            if self.tracer is not None:
+                trace = self.tracer.sample(accepted_at)
+                if trace is not None:
+                    trace.name(f'{addr[0]}:{addr[1]}')
+                    # Сам вызов accept(), включая ожидание подключения
+                    trace.span('accept', accept_started, accepted_at)
+                    self.traces[client_socket] = trace
+            self.dispatch(client_socket, slot_acquired)
+
+    def dispatch(self, client_socket, slot_acquired=False):
+        """Передает соединение на обработку согласно политике перегрузки"""
+        if self.pool is None:
             threading.Thread(target=self.handle_client, args=(client_socket,)).start()
+            return
+
+        if not slot_acquired:
+            blocking = self.overload_policy != OVERLOAD_REJECT
+            if not self.pool.try_acquire(blocking=blocking):
+                self.reject(client_socket)
+                return
+
+        self.pool.submit(client_socket)
+
+    def reject(self, client_socket):
+        """Отклоняет соединение при перегрузке.
+
+        Клиент еще на этапе приветствия и ждет выбор метода, а не reply на запрос,
+        поэтому отвечаем "нет подходящих методов" (0x05 0xFF).
+        """
+        self.rejected += 1
+        self.traces.pop(client_socket, None)
+        try:
+            client_socket.send(b'\x05\xFF')  # No acceptable methods
+        except OSError:
+            pass
+        finally:
+            client_socket.close()
+
+    def stats(self):
+        """Счетчики для подбора размеров пула"""
+        stats = {
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'queue_depth': 0,
+            'busy_workers': 0,
+            'active_tunnels': sum(relay.active_tunnels for relay in self.relays),
+        }
+        if not self.relays:
+            # Циклы пересылки shared читают в свой буфер, пулом пользуется только tunnel_data
+            stats['buffer_pool'] = self.buffer_pool.stats()
+        stats['log'] = self.logger.stats()
+        if self.timers:
+            stats['reclaimed'] = dict(self.reclaimed)
+            stats['timers'] = self.timers.stats()
+        if self.resolver:
+            stats['resolver'] = self.resolver.stats()
+        if self.shaper:
+            stats['shaping'] = self.shaper.stats()
+        if self.udp_relay:
+            stats['udp'] = self.udp_relay.stats()
+        if self.acl:
+            stats['acl'] = self.acl.stats()
+        if self.upstreams:
+            stats['upstreams'] = self.upstreams.stats()
+        if hasattr(self.authenticator, 'stats'):
+            stats['auth'] = self.authenticator.stats()
+        if self.tracer is not None:
+            stats['trace'] = self.tracer.stats()
+        if self.pool:
+            stats.update(self.pool.stats())
+        return stats
             
+    def send_reply(self, client_socket, code, bind=None):
+        """Отправляет SOCKS5 reply; bind - (host, port) для BND.ADDR/BND.PORT, по умолчанию нулевой адрес"""
+        self.metrics.replies.inc(labels=(code,))
+        client_socket.send(pack_reply(code, bind))
+
+    def expire(self, reason, *sockets):
+        """Колбэк колеса таймеров: обрывает зависшее или простаивающее соединение.
+
+        shutdown будит поток, заблокированный в recv/select на этих сокетах,
+        и он закрывает соединение сам.
+        """
+        self.reclaimed[reason] += 1
+        self.metrics.reclaimed.inc(labels=(reason,))
+        self.logger.info('connection_reclaimed', reason=reason)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def schedule_idle(self, client_socket, remote_socket):
+        """Таймер простоя туннеля или None, если таймаут не задан"""
+        if not self.idle_timeout:
+            return None
+        return self.timers.schedule(self.idle_timeout, self.expire, 'idle', client_socket, remote_socket,
+                                    idle=True)
+
+    def trace_for(self, client_socket):
+        """Trace соединения, если оно попало в выборку, иначе None"""
+        if self.tracer is None:
+            return None
+        return self.traces.get(client_socket)
+
     def handle_client(self, client_socket):
+        metrics = self.metrics
+        trace = self.trace_for(client_socket)
+        if trace is not None:
+            # От возврата accept() до начала обработки: ожидание в очереди пула
+            trace.span('queue_wait', trace.started)
+        timer = None
+        if self.handshake_timeout:
+            # Клиент должен успеть прислать handshake и request до таймаута
+            timer = self.timers.schedule(self.handshake_timeout, self.expire, 'handshake', client_socket)
         try:
-            # Получаем handshake
-            handshake_data = client_socket.recv(1024)
-            if not handshake_data:
-                client_socket.close()
-                return
-            
-            success, handshake = parse_handshake(handshake_data)
+            session = Socks5Session(self.methods)
+            started = time.perf_counter()
+            # Получаем handshake, возможно по частям
+            while session.state == STATE_HANDSHAKE:
+                data = client_socket.recv(1024)
+                if not data:
+                    client_socket.close()
+                    return
+                session.feed(data)
         
-            if not success:
+            if session.failed_state == STATE_HANDSHAKE:
+                if trace is not None:
+                    trace.span('parse_handshake', started, error=session.error)
+                metrics.parse_failures.inc(labels=('handshake', session.error))
+                self.logger.info('handshake_failed', code=session.error)
                 # Отправляем ошибку перед закрытием
                 client_socket.send(b'\x05\xFF')  # No acceptable methods
                 client_socket.close()
                 return
         
-            # Отправляем response (NO AUTHENTICATION)
-            client_socket.send(b'\x05\x00')
+            # Отправляем выбранный метод аутентификации
+            client_socket.send(bytes((0x05, session.method)))
+            request_started = time.perf_counter()
+            metrics.handshake_time.observe(request_started - started)
+            if trace is not None:
+                trace.span('parse_handshake', started, request_started, method=session.method)
+
+            if session.method == METHOD_USERNAME_PASSWORD:
+                while session.state == STATE_AUTH:
+                    data = client_socket.recv(1024)
+                    if not data:
+                        client_socket.close()
+                        return
+                    session.feed(data)
+                authenticated = self.authenticate(client_socket, session)
+                if trace is not None:
+                    auth_started, request_started = request_started, time.perf_counter()
+                    trace.span('auth', auth_started, request_started, success=authenticated)
+                if not authenticated:
+                    client_socket.close()
+                    return
         
-            # Получаем request
-            request_data = client_socket.recv(1024)
-            if not request_data:
+            # Request мог прийти в том же сегменте, что и handshake - тогда recv не нужен
+            parse_time = 0.0
+            while session.state == STATE_REQUEST:
+                data = client_socket.recv(1024)
+                if not data:
+                    client_socket.close()
+                    return
+                started = time.perf_counter()
+                session.feed(data)
+                parse_time += time.perf_counter() - started
+            metrics.request_parse_time.observe(parse_time)
+            if trace is not None:
+                # Спан включает ожидание данных клиента, чистое время разбора - в parse_us
+                trace.span('parse_request', request_started, parse_us=round(parse_time * 1e6, 3),
+                           error=session.error)
+
+            if timer is not None and not self.timers.cancel(timer):
+                # Таймер уже сработал и оборвал соединение
                 client_socket.close()
                 return
-            
-            success, request = parse_request(request_data)
         
-            if not success:
+            if session.state == STATE_ERROR:
+                metrics.parse_failures.inc(labels=('request', session.error))
                 # Отправляем ошибку для невалидного запроса
-                client_socket.send(b'\x05\x07\x00\x01\x00\x00\x00\x00\x00\x00')  # Command not supported
+                self.send_reply(client_socket, 0x07)  # Command not supported
                 client_socket.close()
                 return
         
             # Обрабатываем CONNECT запрос
+            request = session.request
             if request.cmd == 0x01:  # CONNECT
-                self.handle_connect(client_socket, request)
+                # Данные, отправленные клиентом вслед за request, уходят на сервер
+                self.handle_connect(client_socket, request, session.take_payload())
+            elif request.cmd == 0x03:  # UDP ASSOCIATE
+                self.handle_udp_associate(client_socket, request)
             else:
                 # Unsupported command
-                client_socket.send(b'\x05\x07\x00\x01\x00\x00\x00\x00\x00\x00')
+                self.send_reply(client_socket, 0x07)
                 client_socket.close()
             
         except Exception as e:
-            print(f"Error handling client: {e}")
+            self.logger.warning('client_error', error=str(e))
             try:
                 # Пытаемся отправить ошибку перед закрытием
-                client_socket.send(b'\x05\x01\x00\x01\x00\x00\x00\x00\x00\x00')  # General failure
+                self.send_reply(client_socket, 0x01)  # General failure
             except:
                 pass
             finally:
@@ -73,73 +336,307 @@ class Socks5Proxy:
                     client_socket.close()
                 except:
                     pass
+        finally:
+            if timer is not None:
+                self.timers.cancel(timer)
+            if trace is not None:
+                self.traces.pop(client_socket, None)
                 
-    def handle_connect(self, client_socket, request: Socks5Request):
+    def authenticate(self, client_socket, session) -> bool:
+        """Проверяет username/password сессии и отправляет статус (RFC 1929)"""
+        if session.failed_state == STATE_AUTH:
+            self.metrics.parse_failures.inc(labels=('auth', session.error))
+            client_socket.send(b'\x01\x01')
+            return False
+
+        username = session.auth.username
+        ok = self.authenticator.verify(username, session.auth.password)
+        self.metrics.auth_results.inc(labels=('success' if ok else 'failure',))
+        if not ok:
+            self.logger.warning('auth_failed', username=username.decode('utf-8', 'replace'))
+        client_socket.send(b'\x01\x00' if ok else b'\x01\x01')
+        return ok
+
+    def handle_connect(self, client_socket, request: RequestView, initial_data=b''):
         # Инициализируем переменные заранее
         host = None
         port = None
+        trace = self.trace_for(client_socket)
     
         try:
-            if request.atyp == 0x01:  # IPv4
-                host = '.'.join(str(b) for b in request.dst_addr.ipv4)
-            elif request.atyp == 0x03:  # Domain
-                domain_bytes = bytes(request.dst_addr.domain.name)[:request.dst_addr.domain.len]
-                host = domain_bytes.decode('utf-8')
-            elif request.atyp == 0x04:  # IPv6
-                # Конвертируем IPv6 в строку
-                host = ':'.join(f'{b:02x}' for b in request.dst_addr.ipv6)
-            else:
+            if isinstance(request, Socks5Request):
+                request = RequestView.from_struct(request)
+            if request.atyp not in (0x01, 0x03, 0x04):
                 # Unsupported address type
-                client_socket.send(b'\x05\x08\x00\x01\x00\x00\x00\x00\x00\x00')
+                self.send_reply(client_socket, 0x08)
                 client_socket.close()
                 return
         
-            port = request.dst_port
+            host = request.host
+            port = request.port
+
+            check_addresses = False
+            if self.acl is not None:
+                rule = self.acl.match(host)
+                if not rule.allow:
+                    raise AccessDenied(rule.pattern)
+                # Домен без своего правила: адреса после разрешения проверяются по CIDR правилам
+                check_addresses = request.atyp == 0x03 and rule.pattern is None
         
             # Устанавливаем соединение с целевым сервером
-            remote_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            remote_socket.settimeout(5)
-            remote_socket.connect((host, port))
-        
-            # Отправляем успешный response
-            client_socket.send(b'\x05\x00\x00\x01\x00\x00\x00\x00\x00\x00')
-        
-            # Начинаем туннелирование
-            self.tunnel_data(client_socket, remote_socket)
+            started = time.perf_counter()
+            try:
+                remote_socket = self.open_remote(request.atyp, host, port, check_addresses, trace)
+            except Exception as e:
+                if trace is not None:
+                    trace.span('connect', started, host=host, port=port, error=str(e) or type(e).__name__)
+                raise
+            connected = time.perf_counter()
+            self.metrics.connect_time.observe(connected - started)
+            if trace is not None:
+                trace.span('connect', started, connected, host=host, port=port)
         
+        except AccessDenied as e:
+            self.metrics.acl_denied.inc()
+            self.logger.info('connect_denied', host=host, port=port, rule=e.args[0])
+            self.send_reply(client_socket, 0x02)  # Connection not allowed by ruleset
+            client_socket.close()
+            return
+        except UpstreamError as e:
+            # Назначение недоступно с upstream - клиент получает его код ответа
+            self.logger.info('upstream_refused', host=host, port=port, code=e.code)
+            self.send_reply(client_socket, e.code)
+            client_socket.close()
+            return
         except socket.timeout:
-            error_msg = f"Connection to {host}:{port} timed out" if host and port else "Connection timed out"
-            print(error_msg)
-            client_socket.send(b'\x05\x04\x00\x01\x00\x00\x00\x00\x00\x00')
+            self.logger.warning('connect_timeout', host=host, port=port)
+            self.send_reply(client_socket, 0x04)
             client_socket.close()
+            return
         except Exception as e:
-            error_msg = f"Failed to connect to {host}:{port}: {e}" if host and port else f"Failed to connect: {e}"
-            print(error_msg)
-            client_socket.send(b'\x05\x04\x00\x01\x00\x00\x00\x00\x00\x00')
+            self.logger.warning('connect_failed', host=host, port=port, error=str(e))
+            self.send_reply(client_socket, 0x04)
+            client_socket.close()
+            return
+
+        try:
+            # Отправляем успешный response
+            self.send_reply(client_socket, 0x00)
+            if initial_data:
+                remote_socket.sendall(initial_data)
+        except OSError as e:
+            # Успешный reply уже мог уйти клиенту - второй reply в том же соединении не отправляем
+            self.logger.warning('client_error', host=host, port=port, error=str(e))
+            remote_socket.close()
             client_socket.close()
+            return
+
+        # Начинаем туннелирование
+        self.start_tunnel(client_socket, remote_socket, self.open_limit(client_socket, host, port))
     
-    def tunnel_data(self, client_socket, remote_socket):
-        """Туннелирование данных между клиентом и удаленным сервером"""
+    def get_udp_relay(self):
+        with self.udp_lock:
+            if self.udp_relay is None:
+                self.udp_relay = UdpRelay(resolver=self.resolver, timers=self.timers,
+                                          metrics=self.metrics, acl=self.acl).start()
+            return self.udp_relay
+
+    def handle_udp_associate(self, client_socket, request: RequestView):
+        """UDP ASSOCIATE: ассоциация живет, пока клиент держит управляющее TCP соединение"""
+        client_ip = client_socket.getpeername()[0]
+        # DST.ADDR/DST.PORT запроса - адрес, с которого клиент будет слать датаграммы;
+        # порт 0 означает, что клиент его еще не знает
+        client_port = request.port
+        idle_timer = None
+        if self.udp_idle_timeout:
+            # Датаграммы отмечают активность, без них ассоциация закрывается вместе с TCP соединением
+            idle_timer = self.timers.schedule(self.udp_idle_timeout, self.expire, 'udp_idle', client_socket,
+                                              idle=True)
+        relay = self.get_udp_relay()
+        association = relay.open(client_socket.getsockname()[0], client_ip, client_port, idle_timer)
+        try:
+            self.send_reply(client_socket, 0x00, association.address)
+            self.logger.info('udp_associate', client=client_ip, port=association.address[1])
+            # Данные по TCP после UDP ASSOCIATE не ожидаются - ждем закрытия соединения
+            client_socket.settimeout(None)
+            while client_socket.recv(1024):
+                pass
+        except OSError:
+            pass
+        finally:
+            if idle_timer is not None:
+                self.timers.cancel(idle_timer)
+            relay.close(association)
+            client_socket.close()
+
+    def open_remote(self, atyp, host, port, check_addresses=False, trace=None):
+        """Подключается к целевому серверу, домены разрешаются через кеш resolver.
+
+        Без resolver домен разрешается getaddrinfo для всех семейств адресов, чтобы
+        хосты только с IPv6 были доступны и без happy_eyeballs.
+
+        check_addresses - адреса домена отфильтровываются правилами ACL до подключения.
+        С upstreams имя передается вышестоящему серверу и разрешается им; если адреса
+        нужно проверить, имя разрешается здесь и upstream получает разрешенный IP-адрес,
+        иначе цепочка позволяла бы обойти CIDR правила.
+        trace получает спан dns, если имя разрешается здесь, а не внутри connect.
+        """
+        if self.upstreams is not None and not check_addresses:
+            return self.upstreams.connect(host, port)
+        if atyp == 0x03:
+            if trace is not None:
+                resolve_started = time.perf_counter()
+            addresses = self.resolver.resolve(host, port) if self.resolver else with_port(system_resolve(host), port)
+            if trace is not None:
+                trace.span('dns', resolve_started, host=host, addresses=len(addresses))
+            if check_addresses:
+                addresses = self.acl.filter(addresses)
+                if not addresses:
+                    raise AccessDenied(None)
+            if self.upstreams is not None:
+                return self.upstreams.connect(addresses[0][1][0], port)
+            if self.happy_eyeballs:
+                return connect_happy_eyeballs(addresses, attempt_timeout=self.connect_timeout or ATTEMPT_TIMEOUT)
+            return self.connect_addresses(addresses)
+
+        family = socket.AF_INET6 if atyp == 0x04 else socket.AF_INET
+        return self.connect_addresses([(family, (host, port))])
+
+    def connect_addresses(self, addresses):
+        """Пробует адреса по очереди, возвращает первый подключенный сокет"""
+        last_error = OSError("No addresses to connect to")
+        for family, sockaddr in addresses:
+            remote_socket = socket.socket(family, socket.SOCK_STREAM)
+            remote_socket.settimeout(self.connect_timeout)
+            try:
+                remote_socket.connect(sockaddr)
+                return remote_socket
+            except OSError as e:
+                remote_socket.close()
+                last_error = e
+        raise last_error
+
+    def open_limit(self, client_socket, host, port):
+        """Ограничения полосы для туннеля клиента к host:port или None"""
+        if self.shaper is None:
+            return None
+        peer = client_socket.getpeername()
+        client = peer[0] if isinstance(peer, tuple) else peer
+        return self.shaper.open(client, (host, port))
+
+    def start_tunnel(self, client_socket, remote_socket, limit=None):
+        """Передает установленное соединение выбранному способу пересылки"""
+        if self.relays:
+            # Распределяем туннели по потокам пересылки по дескриптору клиента
+            relay = self.relays[client_socket.fileno() % len(self.relays)]
+            relay.add_tunnel(client_socket, remote_socket, self.schedule_idle(client_socket, remote_socket), limit,
+                             self.trace_for(client_socket))
+            return
+
+        # В режимах thread/splice туннель живет в потоке обработчика
+        metrics = self.metrics
+        metrics.active_tunnels.inc()
+        started = time.perf_counter()
+        idle_timer = self.schedule_idle(client_socket, remote_socket)
+        try:
+            # splice переносит данные без чтения в user space - с ограничением полосы
+            # туннель обслуживает tunnel_data
+            if self.relay_mode == RELAY_SPLICE and limit is None and splice_supported():
+                on_activity = (lambda: self.timers.touch(idle_timer)) if idle_timer else None
+                tunnel = SpliceTunnel(client_socket, remote_socket, on_activity=on_activity)
+                tunnel.run()
+                metrics.bytes_in.inc(tunnel.bytes_from_client)
+                metrics.bytes_out.inc(tunnel.bytes_relayed - tunnel.bytes_from_client)
+                trace = self.trace_for(client_socket)
+                if trace is not None:
+                    if tunnel.first_reply_at is not None:
+                        trace.span('first_byte', started, tunnel.first_reply_at)
+                    trace.span('tunnel', started)
+            else:
+                # Без поддержки splice в ядре - обычное копирование через user space
+                self.tunnel_data(client_socket, remote_socket, idle_timer, limit)
+        finally:
+            if idle_timer is not None:
+                self.timers.cancel(idle_timer)
+            metrics.active_tunnels.dec()
+            metrics.tunnel_lifetime.observe(time.perf_counter() - started)
+
+    def tunnel_data(self, client_socket, remote_socket, idle_timer=None, limit=None):
+        """Туннелирование данных между клиентом и удаленным сервером.
+
+        С limit (shaping.TunnelLimit) сокет без токенов не передается в select
+        на чтение, пока токены не накопятся - поток ждет в select, а не в sleep.
+        """
+        # Таймауты не нужны: поток ждет данные в select
+        client_socket.settimeout(None)
+        remote_socket.settimeout(None)
+
+        trace = self.trace_for(client_socket)
+        tunnel_started = time.perf_counter() if trace is not None else None
+        awaiting_first_byte = trace is not None
+
+        peers = {client_socket: remote_socket, remote_socket: client_socket}
+        # Размер чтения не растет больше самого крупного буфера пула
+        max_chunk = self.buffer_pool.max_size
+        sizers = {client_socket: ChunkSizer(max_size=max_chunk), remote_socket: ChunkSizer(max_size=max_chunk)}
         sockets = [client_socket, remote_socket]
+        bytes_in, bytes_out = self.metrics.bytes_in, self.metrics.bytes_out
+        resume_at = {client_socket: 0.0, remote_socket: 0.0}
         
-        while True:
+        while sockets:
             try:
-                read_sockets, _, error_sockets = select.select(sockets, [], sockets, 1)
+                readable, timeout = sockets, None
+                if limit is not None:
+                    now = time.monotonic()
+                    readable = [sock for sock in sockets if resume_at[sock] <= now]
+                    waiting = [resume_at[sock] for sock in sockets if resume_at[sock] > now]
+                    if waiting:
+                        timeout = min(waiting) - now
+                read_sockets, _, error_sockets = select.select(readable, [], sockets, timeout)
                 
                 if error_sockets:
                     break
                     
                 for sock in read_sockets:
-                    data = sock.recv(4096)
-                    if not data:
-                        break
-                    
-                    if sock is client_socket:
-                        remote_socket.send(data)
+                    sizer = sizers[sock]
+                    allowed = sizer.size
+                    if limit is not None:
+                        allowed = limit.allowance(allowed)
+                        if not allowed:
+                            resume_at[sock] = time.monotonic() + limit.delay()
+                            self.metrics.throttled.inc()
+                            continue
+                    buffer = self.buffer_pool.acquire(sizer.size)
+                    try:
+                        size = sock.recv_into(buffer, min(allowed, len(buffer)))
+                        if limit is not None:
+                            limit.consume(size)
+                        if size:
+                            # sendall дописывает остаток при частичной отправке
+                            peers[sock].sendall(memoryview(buffer)[:size])
+                            (bytes_in if sock is client_socket else bytes_out).inc(size)
+                            if idle_timer is not None:
+                                self.timers.touch(idle_timer)
+                            if awaiting_first_byte and sock is remote_socket:
+                                # Первый ответ сервера после установки туннеля
+                                trace.span('first_byte', tunnel_started, bytes=size)
+                                awaiting_first_byte = False
+                    finally:
+                        self.buffer_pool.release(buffer)
+
+                    if not size:
+                        # EOF: передаем FIN другой стороне и дочитываем встречное направление
+                        sockets.remove(sock)
+                        peers[sock].shutdown(socket.SHUT_WR)
                     else:
-                        client_socket.send(data)
-            except:
+                        sizer.update(size)
+            except OSError:
                 break
         
+        if trace is not None:
+            teardown_started = time.perf_counter()
         client_socket.close()
         remote_socket.close()
+        if trace is not None:
+            trace.span('teardown', teardown_started)
+            trace.span('tunnel', tunnel_started)
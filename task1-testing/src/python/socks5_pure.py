@@ -0,0 +1,283 @@
+"""Реализация парсеров SOCKS5 на чистом Python.
+
+Повторяет поведение socks5_parser.c: заполняет те же ctypes-структуры
+и возвращает те же коды ошибок, поэтому используется как запасной
+backend, когда libsocks5_parser.so не собрана.
+"""
+from struct import Struct
+
+_PORT = Struct('!H')
+
+
+def _as_bytes_view(data):
+    """bytes/bytearray индексируются напрямую, остальные буферы - через memoryview"""
+    if type(data) is bytes or type(data) is bytearray:
+        return data
+    return memoryview(data).cast('B')
+
+
+def parse_socks5_handshake(data, handshake) -> int:
+    data = _as_bytes_view(data)
+    length = len(data)
+    if length < 3:
+        return -1
+
+    handshake.version = data[0]
+    if handshake.version != 0x05:
+        return -2
+
+    nmethods = handshake.nmethods = data[1]
+    if nmethods == 0:
+        return -3
+    if length < 2 + nmethods:
+        return -4
+
+    handshake.methods[:nmethods] = data[2:2 + nmethods]
+    return 0
+
+
+def parse_socks5_auth(data, auth) -> int:
+    data = _as_bytes_view(data)
+    length = len(data)
+    if length < 2:
+        return -1
+
+    auth.version = data[0]
+    if auth.version != 0x01:
+        return -2
+
+    ulen = auth.ulen = data[1]
+    if ulen == 0:
+        return -3
+    if length < 2 + ulen + 1:
+        return -4
+    auth.uname[:ulen] = data[2:2 + ulen]
+
+    plen = auth.plen = data[2 + ulen]
+    if plen == 0:
+        return -5
+    if length < 3 + ulen + plen:
+        return -6
+    auth.passwd[:plen] = data[3 + ulen:3 + ulen + plen]
+    return 0
+
+
+def _parse_address(data, length, atyp, message) -> int:
+    """Разбирает ATYP-адрес и порт с data[4]; возвращает смещение после порта или код ошибки"""
+    if atyp == 0x01:  # IPv4
+        if length < 10:
+            return -2
+        message.dst_addr.ipv4[:] = data[4:8]
+        offset = 8
+    elif atyp == 0x03:  # Domain name
+        if length < 5:
+            return -3
+        domain_len = data[4]
+        message.dst_addr.domain.len = domain_len
+        if domain_len == 0 or domain_len > 254:
+            return -4
+        if length < 5 + domain_len + 2:
+            return -5
+        message.dst_addr.domain.name[:domain_len] = data[5:5 + domain_len]
+        offset = 5 + domain_len
+    elif atyp == 0x04:  # IPv6
+        if length < 22:
+            return -6
+        message.dst_addr.ipv6[:] = data[4:20]
+        offset = 20
+    else:
+        return -7
+
+    message.dst_port = _PORT.unpack_from(data, offset)[0]
+    return offset + 2
+
+
+def parse_socks5_request(data, request) -> int:
+    data = _as_bytes_view(data)
+    length = len(data)
+    if length < 4:
+        return -1
+
+    request.version = data[0]
+    request.cmd = data[1]
+    request.rsv = data[2]
+    atyp = request.atyp = data[3]
+
+    end = _parse_address(data, length, atyp, request)
+    return end if end < 0 else 0
+
+
+def parse_socks5_udp_header(data, header) -> int:
+    data = _as_bytes_view(data)
+    length = len(data)
+    if length < 4:
+        return -1
+
+    header.rsv = data[0] << 8 | data[1]
+    header.frag = data[2]
+    atyp = header.atyp = data[3]
+
+    end = _parse_address(data, length, atyp, header)
+    if end < 0:
+        return end
+    header.header_len = end
+    return 0
+
+
+def build_socks5_udp_header(out, atyp, addr, port) -> int:
+    if atyp == 0x01:
+        if len(addr) != 4:
+            return -4
+        address = addr
+    elif atyp == 0x03:
+        if not 0 < len(addr) <= 254:
+            return -4
+        address = bytes((len(addr),)) + addr
+    elif atyp == 0x04:
+        if len(addr) != 16:
+            return -4
+        address = addr
+    else:
+        return -7
+
+    header = bytes((0, 0, 0, atyp)) + address + _PORT.pack(port)
+    if len(out) < len(header):
+        return -1
+    out[:len(header)] = header
+    return len(header)
+
+
+def socks5_handshake_needed(data) -> int:
+    data = _as_bytes_view(data)
+    if len(data) < 2:
+        return 2
+    if data[0] != 0x05:
+        return -2
+    if data[1] == 0:
+        return -3
+    return 2 + data[1]
+
+
+def socks5_request_needed(data) -> int:
+    data = _as_bytes_view(data)
+    length = len(data)
+    if length < 4:
+        return 4
+
+    atyp = data[3]
+    if atyp == 0x01:
+        return 10
+    if atyp == 0x03:
+        if length < 5:
+            return 7
+        domain_len = data[4]
+        if domain_len == 0 or domain_len > 254:
+            return -4
+        return 7 + domain_len
+    if atyp == 0x04:
+        return 22
+    return -7
+
+
+def socks5_auth_needed(data) -> int:
+    data = _as_bytes_view(data)
+    length = len(data)
+    if length < 2:
+        return 2
+    if data[0] != 0x01:
+        return -2
+    if data[1] == 0:
+        return -3
+
+    plen_offset = 2 + data[1]
+    if length <= plen_offset:
+        return plen_offset + 1
+    if data[plen_offset] == 0:
+        return -5
+    return plen_offset + 1 + data[plen_offset]
+
+
+def _request_fields(data, start, end):
+    """Разбор одного запроса для пакетного режима без заполнения структуры"""
+    length = end - start
+    if length < 4:
+        return -1, 0, 0, 0, 0
+
+    cmd = data[start + 1]
+    atyp = data[start + 3]
+
+    if atyp == 0x01:
+        if length < 10:
+            return -2, 0, 0, 0, 0
+        addr_offset = start + 4
+        port_offset = start + 8
+    elif atyp == 0x03:
+        if length < 5:
+            return -3, 0, 0, 0, 0
+        domain_len = data[start + 4]
+        if domain_len == 0 or domain_len > 254:
+            return -4, 0, 0, 0, 0
+        if length < 7 + domain_len:
+            return -5, 0, 0, 0, 0
+        addr_offset = start + 5
+        port_offset = addr_offset + domain_len
+    elif atyp == 0x04:
+        if length < 22:
+            return -6, 0, 0, 0, 0
+        addr_offset = start + 4
+        port_offset = start + 20
+    else:
+        return -7, 0, 0, 0, 0
+
+    return 0, cmd, atyp, _PORT.unpack_from(data, port_offset)[0], addr_offset
+
+
+def parse_socks5_handshake_batch(data, offsets, batch) -> int:
+    data = _as_bytes_view(data)
+    length = len(data)
+    parsed = 0
+
+    for i in range(batch.count):
+        start, end = offsets[i], offsets[i + 1]
+        if start > end or end > length:
+            batch.status[i] = -1
+            continue
+
+        if end - start < 3:
+            status = -1
+        elif data[start] != 0x05:
+            status = -2
+        elif data[start + 1] == 0:
+            status = -3
+        elif end - start < 2 + data[start + 1]:
+            status = -4
+        else:
+            status = 0
+            batch.nmethods[i] = data[start + 1]
+            parsed += 1
+        batch.status[i] = status
+
+    return parsed
+
+
+def parse_socks5_request_batch(data, offsets, batch) -> int:
+    data = _as_bytes_view(data)
+    length = len(data)
+    parsed = 0
+
+    for i in range(batch.count):
+        start, end = offsets[i], offsets[i + 1]
+        if start > end or end > length:
+            batch.status[i] = -1
+            continue
+
+        status, cmd, atyp, port, addr_offset = _request_fields(data, start, end)
+        batch.status[i] = status
+        if status == 0:
+            batch.cmd[i] = cmd
+            batch.atyp[i] = atyp
+            batch.port[i] = port
+            batch.addr_offset[i] = addr_offset
+            parsed += 1
+
+    return parsed
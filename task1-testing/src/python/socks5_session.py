@@ -0,0 +1,118 @@
+from socks5_native import (handshake_needed, auth_needed, request_needed, parse_handshake_into,
+                           parse_auth_into, parse_request_view, Socks5Handshake, Socks5Auth)
+
+# Состояния сессии
+STATE_HANDSHAKE = 'handshake'
+STATE_AUTH = 'auth'
+STATE_REQUEST = 'request'
+STATE_DONE = 'done'
+STATE_ERROR = 'error'
+
+# Методы аутентификации
+METHOD_NO_AUTH = 0x00
+METHOD_USERNAME_PASSWORD = 0x02
+METHOD_NO_ACCEPTABLE = 0xFF
+
+# Код ошибки: клиент не предложил ни одного метода, поддерживаемого сервером
+ERROR_NO_ACCEPTABLE_METHODS = -10
+
+
+class Socks5Session:
+    """Инкрементальный разбор начала SOCKS5 сессии: handshake, затем request.
+
+    Данные подаются через feed() кусками произвольного размера: сообщение может
+    прийти по частям, а клиент может отправить handshake, request и первые байты
+    полезной нагрузки одним сегментом, не дожидаясь ответов сервера.
+    Байты после request остаются в payload и должны уйти на целевой сервер.
+
+    methods - методы сервера в порядке предпочтения. После handshake в method
+    выбранный метод; для USERNAME/PASSWORD перед request разбирается auth.
+    После request в request - RequestView с адресом и портом назначения.
+    """
+
+    def __init__(self, methods=(METHOD_NO_AUTH,)):
+        self.state = STATE_HANDSHAKE
+        self.buffer = bytearray()
+        self.methods = methods
+        self.method = None
+        self.handshake = Socks5Handshake()
+        self.auth = Socks5Auth()
+        self.request = None
+        self.error = 0
+        self.failed_state = None  # этап, на котором произошла ошибка
+        self.needed = 0  # сколько байт не хватает до конца текущего сообщения
+
+    def feed(self, data) -> str:
+        """Добавляет данные и разбирает все полные сообщения. Возвращает новое состояние"""
+        self.buffer += data
+        while self.state in (STATE_HANDSHAKE, STATE_AUTH, STATE_REQUEST):
+            if self.state == STATE_HANDSHAKE:
+                needed = handshake_needed(self.buffer)
+            elif self.state == STATE_AUTH:
+                needed = auth_needed(self.buffer)
+            else:
+                needed = request_needed(self.buffer)
+
+            if needed < 0:
+                return self.fail(needed)
+            if len(self.buffer) < needed:
+                self.needed = needed - len(self.buffer)
+                break
+
+            message = memoryview(self.buffer)[:needed]
+            try:
+                if self.state == STATE_HANDSHAKE:
+                    code = parse_handshake_into(message, self.handshake)
+                    next_state = STATE_REQUEST
+                    if not code:
+                        self.method = self.select_method()
+                        if self.method is None:
+                            code = ERROR_NO_ACCEPTABLE_METHODS
+                        elif self.method == METHOD_USERNAME_PASSWORD:
+                            next_state = STATE_AUTH
+                elif self.state == STATE_AUTH:
+                    code = parse_auth_into(message, self.auth)
+                    next_state = STATE_REQUEST
+                else:
+                    request = parse_request_view(message)
+                    if type(request) is int:
+                        code = request
+                    else:
+                        code = 0
+                        self.request = request
+                    next_state = STATE_DONE
+            finally:
+                # Буфер нельзя укорачивать, пока на него есть memoryview
+                message.release()
+
+            if code:
+                return self.fail(code)
+            del self.buffer[:needed]
+            self.needed = 0
+            self.state = next_state
+        return self.state
+
+    def select_method(self):
+        """Первый метод сервера, предложенный клиентом, или None"""
+        offered = bytes(self.handshake.methods[:self.handshake.nmethods])
+        for method in self.methods:
+            if method in offered:
+                return method
+        return None
+
+    def fail(self, code):
+        self.failed_state = self.state
+        self.state = STATE_ERROR
+        self.error = code
+        self.needed = 0
+        return self.state
+
+    @property
+    def handshake_done(self) -> bool:
+        return self.state in (STATE_AUTH, STATE_REQUEST, STATE_DONE)
+
+    def take_payload(self) -> bytes:
+        """Забирает данные клиента, пришедшие после request"""
+        payload = bytes(self.buffer)
+        self.buffer.clear()
+        return payload
@@ -0,0 +1,183 @@
+import errno
+import fcntl
+import os
+import select
+import socket
+import time
+
+# Сколько байт за один вызов splice переносится через pipe
+SPLICE_CHUNK = 1 << 20
+
+# Ошибки, означающие, что ядро не умеет splice для данной пары дескрипторов
+_UNSUPPORTED_ERRNOS = (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP)
+
+_supported = None
+
+
+def splice_supported() -> bool:
+    """Проверяет во время выполнения, что os.splice работает для сокетов"""
+    global _supported
+    if _supported is not None:
+        return _supported
+
+    if not hasattr(os, 'splice'):
+        _supported = False
+        return _supported
+
+    left, right = socket.socketpair()
+    pipe_r, pipe_w = os.pipe()
+    try:
+        left.sendall(b'x')
+        moved = os.splice(right.fileno(), pipe_w, 1, flags=os.SPLICE_F_NONBLOCK)
+        moved = moved and os.splice(pipe_r, left.fileno(), 1, flags=os.SPLICE_F_NONBLOCK)
+        _supported = moved == 1
+    except OSError:
+        _supported = False
+    finally:
+        os.close(pipe_r)
+        os.close(pipe_w)
+        left.close()
+        right.close()
+    return _supported
+
+
+class _Direction:
+    """Направление пересылки src -> dst через собственный pipe"""
+
+    def __init__(self, src, dst):
+        self.src = src
+        self.dst = dst
+        self.src_fd = src.fileno()
+        self.dst_fd = dst.fileno()
+        self.pipe_r, self.pipe_w = os.pipe()
+        self.use_splice = True
+        self.done = False
+        # Байты текущей порции, еще лежащие в pipe
+        self.pending = 0
+
+    def resize_pipe(self, size):
+        """Увеличивает pipe, чтобы за один splice переносилось больше 64 KiB"""
+        try:
+            fcntl.fcntl(self.pipe_w, fcntl.F_SETPIPE_SZ, size)
+        except (AttributeError, OSError):
+            # Размер ограничен /proc/sys/fs/pipe-max-size, работаем с тем, что есть
+            pass
+
+    def close(self):
+        os.close(self.pipe_r)
+        os.close(self.pipe_w)
+
+
+class SpliceTunnel:
+    """Пересылка данных между сокетами через os.splice без копирования в user space.
+
+    Данные идут сокет -> pipe -> сокет внутри ядра. Если ядро отказывает в splice
+    для конкретного сокета, это направление переключается на recv_into/sendall.
+    """
+
+    def __init__(self, client_socket, remote_socket, chunk_size=SPLICE_CHUNK, on_activity=None):
+        self.client_socket = client_socket
+        self.remote_socket = remote_socket
+        self.chunk_size = chunk_size
+        self.bytes_relayed = 0
+        self.bytes_from_client = 0
+        self.fallback_buffer = None
+        # Вызывается после каждой перенесенной порции (таймаут простоя)
+        self.on_activity = on_activity
+        # time.perf_counter первой порции от сервера (спан first_byte трассировки)
+        self.first_reply_at = None
+
+    def run(self):
+        # Запись в dst блокирующая: splice из pipe ждет, пока dst примет данные
+        self.client_socket.settimeout(None)
+        self.remote_socket.settimeout(None)
+
+        directions = {
+            self.client_socket: _Direction(self.client_socket, self.remote_socket),
+            self.remote_socket: _Direction(self.remote_socket, self.client_socket),
+        }
+        for direction in directions.values():
+            direction.resize_pipe(self.chunk_size)
+
+        try:
+            while True:
+                active = [sock for sock, direction in directions.items() if not direction.done]
+                if not active:
+                    break
+
+                readable, _, errored = select.select(active, [], active)
+                if errored:
+                    break
+                for sock in readable:
+                    self.pump(directions[sock])
+        except OSError:
+            pass
+        finally:
+            for direction in directions.values():
+                direction.close()
+            self.client_socket.close()
+            self.remote_socket.close()
+
+    def pump(self, direction):
+        """Переносит одну порцию данных; EOF передается дальше как FIN"""
+        if direction.use_splice:
+            try:
+                moved = self.splice_chunk(direction)
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED_ERRNOS:
+                    raise
+                direction.use_splice = False
+                if direction.pending:
+                    # Часть порции уже в pipe: без дописывания поток потерял бы эти байты
+                    moved = self.drain_pipe(direction)
+                else:
+                    moved = self.copy_chunk(direction)
+        else:
+            moved = self.copy_chunk(direction)
+
+        if moved < 0:
+            # Ложное срабатывание select: данных пока нет
+            return
+        if moved == 0:
+            direction.done = True
+            direction.dst.shutdown(socket.SHUT_WR)
+        else:
+            self.bytes_relayed += moved
+            if self.on_activity:
+                self.on_activity()
+            if direction.src is self.client_socket:
+                self.bytes_from_client += moved
+            elif self.first_reply_at is None:
+                self.first_reply_at = time.perf_counter()
+
+    def splice_chunk(self, direction):
+        try:
+            moved = os.splice(direction.src_fd, direction.pipe_w, self.chunk_size,
+                              flags=os.SPLICE_F_MOVE | os.SPLICE_F_NONBLOCK)
+        except BlockingIOError:
+            return -1
+
+        direction.pending = moved
+        while direction.pending:
+            direction.pending -= os.splice(direction.pipe_r, direction.dst_fd, direction.pending,
+                                           flags=os.SPLICE_F_MOVE)
+        return moved
+
+    def drain_pipe(self, direction):
+        """Дописывает в dst остаток порции из pipe через user space"""
+        drained = 0
+        while direction.pending:
+            data = os.read(direction.pipe_r, direction.pending)
+            direction.dst.sendall(data)
+            direction.pending -= len(data)
+            drained += len(data)
+        return drained
+
+    def copy_chunk(self, direction):
+        """Запасной путь через пользовательский буфер"""
+        if self.fallback_buffer is None:
+            self.fallback_buffer = bytearray(65536)
+        size = direction.src.recv_into(self.fallback_buffer)
+        if size:
+            direction.dst.sendall(memoryview(self.fallback_buffer)[:size])
+        return size
@@ -1,6 +1,7 @@
 import socket
 import time
 from socks5_native import parse_request, Socks5Request
+from socks5_messages import ERROR_CODES, encode_handshake, encode_request
 
 def test_socks5_proxy_debug():
     # Подключаемся к прокси
@@ -10,7 +11,7 @@ def test_socks5_proxy_debug():
     print("Connected to proxy")
     
     # Отправляем handshake
-    handshake = b'\x05\x01\x00'  # VER=5, NMETHODS=1, METHOD=0
+    handshake = encode_handshake()  # VER=5, NMETHODS=1, METHOD=0
     proxy_socket.send(handshake)
     
     # Получаем ответ
@@ -21,8 +22,7 @@ def test_socks5_proxy_debug():
         print("Handshake successful!")
         
         # Отправляем CONNECT запрос к httpbin.org:80
-        host = b'httpbin.org'
-        request_data = b'\x05\x01\x00\x03' + bytes([len(host)]) + host + b'\x00\x50'
+        request_data = encode_request('httpbin.org', 80)
         print(f"Sending request: {request_data.hex()}")
         
         # Декодируем и проверим запрос локально
@@ -54,17 +54,7 @@ def test_socks5_proxy_debug():
             print("HTTP response:")
             print(response.decode())
         else:
-            error_codes = {
-                0x01: 'General failure',
-                0x02: 'Connection not allowed',
-                0x03: 'Network unreachable', 
-                0x04: 'Host unreachable',
-                0x05: 'Connection refused',
-                0x06: 'TTL expired',
-                0x07: 'Command not supported',
-                0x08: 'Address type not supported'
-            }
-            error_msg = error_codes.get(response_code, f'Unknown error {response_code}')
+            error_msg = ERROR_CODES.get(response_code, f'Unknown error {response_code}')
             print(f"Connection failed: {error_msg}")
     else:
         print("Handshake failed")
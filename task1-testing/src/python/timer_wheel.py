@@ -0,0 +1,153 @@
+import math
+import threading
+import time
+
+# Шаг колеса: точность срабатывания таймаутов
+TICK = 0.1
+SLOTS = 512
+
+
+class Timer:
+    """Таймер в колесе. Для таймаута простоя activity обновляется через touch()"""
+    __slots__ = ('callback', 'args', 'interval', 'deadline', 'last_active', 'rounds', 'slot',
+                 'state', 'idle')
+
+    PENDING = 0
+    CANCELLED = 1
+    FIRED = 2
+
+    def __init__(self, callback, args, interval, deadline, idle):
+        self.callback = callback
+        self.args = args
+        self.interval = interval
+        self.deadline = deadline
+        self.last_active = deadline - interval
+        self.idle = idle
+        self.rounds = 0
+        self.slot = None
+        self.state = Timer.PENDING
+
+    def touch(self, now):
+        """Отмечает активность: без блокировок, колесо проверит ее при срабатывании"""
+        self.last_active = now
+
+
+class TimerWheel:
+    """Хешированное колесо таймеров (Varghese & Lauck).
+
+    Таймер попадает в слот (deadline / tick) % slots с числом полных оборотов.
+    schedule/cancel - O(1), за один шаг обрабатывается только текущий слот,
+    поэтому стоимость не зависит от общего числа отслеживаемых соединений.
+    Колбэки вызываются из потока колеса и должны быть быстрыми.
+    """
+
+    def __init__(self, tick=TICK, slots=SLOTS, clock=time.monotonic):
+        self.tick = tick
+        self.clock = clock
+        self.slots = [set() for _ in range(slots)]
+        self.lock = threading.Lock()
+        self.current_tick = int(clock() / tick)
+        self.pending = 0
+
+        self.scheduled = 0
+        self.expired = 0
+        self.cancelled = 0
+
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='socks5-timers')
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.tick):
+            self.advance()
+
+    def schedule(self, delay, callback, *args, idle=False) -> Timer:
+        """Вызывает callback(*args) через delay секунд.
+
+        idle=True - таймаут простоя: срок отсчитывается от последнего touch().
+        """
+        now = self.clock()
+        timer = Timer(callback, args, delay, now + delay, idle)
+        with self.lock:
+            self.insert(timer)
+            self.pending += 1
+            self.scheduled += 1
+        return timer
+
+    def insert(self, timer):
+        """Кладет таймер в слот его срока (вызывается под self.lock)"""
+        # Слоты текущего и прошлых шагов уже обработаны - ближайший шаг следующий
+        expires_tick = max(math.ceil(timer.deadline / self.tick), self.current_tick + 1)
+        ticks = expires_tick - self.current_tick
+        timer.rounds = (ticks - 1) // len(self.slots)
+        timer.slot = self.slots[expires_tick % len(self.slots)]
+        timer.slot.add(timer)
+
+    def touch(self, timer):
+        """Отмечает активность по часам колеса"""
+        timer.last_active = self.clock()
+
+    def cancel(self, timer) -> bool:
+        """Отменяет таймер. False - таймер уже сработал (колбэк вызван или будет вызван)"""
+        with self.lock:
+            if timer.state != Timer.PENDING:
+                return timer.state == Timer.CANCELLED
+            timer.state = Timer.CANCELLED
+            timer.slot.discard(timer)
+            timer.slot = None
+            self.pending -= 1
+            self.cancelled += 1
+        return True
+
+    def advance(self):
+        """Обрабатывает слоты всех шагов до текущего момента, вызывает истекшие колбэки"""
+        now = self.clock()
+        target_tick = int(now / self.tick)
+        fired = []
+
+        with self.lock:
+            while self.current_tick < target_tick:
+                self.current_tick += 1
+                slot = self.slots[self.current_tick % len(self.slots)]
+                for timer in list(slot):
+                    if timer.rounds:
+                        timer.rounds -= 1
+                        continue
+                    slot.discard(timer)
+                    if timer.idle and timer.last_active + timer.interval > now:
+                        # Была активность: срок переносится от нее
+                        timer.deadline = timer.last_active + timer.interval
+                        self.insert(timer)
+                        continue
+                    timer.state = Timer.FIRED
+                    timer.slot = None
+                    self.pending -= 1
+                    self.expired += 1
+                    fired.append(timer)
+
+        for timer in fired:
+            try:
+                timer.callback(*timer.args)
+            except Exception:
+                # Ошибка одного колбэка не должна останавливать колесо
+                pass
+        return len(fired)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'pending': self.pending,
+                'scheduled': self.scheduled,
+                'expired': self.expired,
+                'cancelled': self.cancelled,
+            }
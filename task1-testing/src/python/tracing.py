@@ -0,0 +1,104 @@
+import itertools
+import json
+import os
+import random
+import threading
+import time
+
+from batch_writer import BatchWriter
+
+
+class Trace:
+    """Спаны одного соединения. Все спаны соединения попадают на одну дорожку (tid)"""
+    __slots__ = ('tracer', 'tid', 'started')
+
+    def __init__(self, tracer, tid, started):
+        self.tracer = tracer
+        self.tid = tid
+        # Момент, когда accept() вернул соединение: начало спана queue_wait
+        self.started = started
+
+    def span(self, name, start, end=None, **args):
+        """Записывает спан от start до end (time.perf_counter, по умолчанию - сейчас)"""
+        if end is None:
+            end = time.perf_counter()
+        self.tracer.submit((self.tid, name, start, end, args))
+
+    def name(self, title):
+        """Подпись дорожки соединения в просмотрщике"""
+        self.tracer.submit((self.tid, None, 0.0, 0.0, {'name': title}))
+
+
+class Tracer:
+    """Выборочная трассировка соединений в формате Chrome trace event (JSON array).
+
+    sample() на подключение решает, трассируется ли оно; без выборки возвращается
+    None, и точки трассировки в прокси сводятся к проверке `trace is not None`.
+    Спаны кладутся в ограниченную очередь, JSON формирует и пишет фоновый поток;
+    при заполненной очереди спан отбрасывается и учитывается в dropped.
+    Файл открывается в chrome://tracing и ui.perfetto.dev; закрывающая скобка
+    пишется в close(), но оба просмотрщика читают и файл без нее.
+    """
+
+    def __init__(self, path=None, stream=None, sample_rate=1.0, queue_size=10000, rng=random.random):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"Sample rate must be between 0 and 1: {sample_rate}")
+        self.path = path
+        self.stream = stream if stream is not None else open(path, 'w')
+        self.sample_rate = sample_rate
+        self.rng = rng
+        self.pid = os.getpid()
+        self.ids = itertools.count(1)
+
+        self.lock = threading.Lock()
+        self.sampled = 0
+        self.first = True
+
+        self.writer = BatchWriter(self.stream, self.format, queue_size, name='socks5-trace', join=self.join)
+
+    def sample(self, started=None):
+        """Trace для нового соединения или None, если оно не попало в выборку.
+
+        started - момент получения соединения (time.perf_counter), по умолчанию - сейчас.
+        """
+        if self.sample_rate < 1.0 and self.rng() >= self.sample_rate:
+            return None
+        with self.lock:
+            self.sampled += 1
+        return Trace(self, next(self.ids), time.perf_counter() if started is None else started)
+
+    def submit(self, event):
+        self.writer.submit(event)
+
+    def join(self, records, end):
+        # Записи JSON массива разделяются запятыми, закрывающая скобка - в последнем пакете
+        chunks = []
+        for record in records:
+            chunks.append(('[\n' if self.first else ',\n') + record)
+            self.first = False
+        if end:
+            chunks.append('[]\n' if self.first else '\n]\n')
+        return ''.join(chunks)
+
+    def format(self, tid, name, start, end, args):
+        if name is None:
+            # Метаданные: подпись дорожки соединения
+            record = {'ph': 'M', 'name': 'thread_name', 'pid': self.pid, 'tid': tid, 'args': args}
+        else:
+            # Полный спан: ts и dur в микросекундах
+            record = {'ph': 'X', 'name': name, 'cat': 'socks5', 'pid': self.pid, 'tid': tid,
+                      'ts': round(start * 1e6, 3), 'dur': round((end - start) * 1e6, 3)}
+            if args:
+                record['args'] = args
+        return json.dumps(record, default=str)
+
+    def close(self):
+        """Дописывает очередь, закрывает JSON массив и останавливает фоновый поток"""
+        self.writer.close()
+        if self.path is not None:
+            self.stream.close()
+
+    def stats(self):
+        with self.lock:
+            sampled = self.sampled
+        return dict(self.writer.stats(), sampled=sampled)
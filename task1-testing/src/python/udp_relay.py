@@ -0,0 +1,455 @@
+import queue
+import selectors
+import socket
+import threading
+import time
+
+from acl import AccessDenied
+from socks5_native import (Socks5UdpHeader, UDP_HEADER_MAX, parse_udp_header_into, build_udp_header,
+                           decode_domain)
+
+# Максимальный размер данных UDP датаграммы
+UDP_BUFFER = 65535
+# Сколько датаграмм читается из сокета за одно пробуждение цикла
+BATCH_SIZE = 64
+# Запись NAT без датаграмм дольше этого времени удаляется
+NAT_TIMEOUT = 60.0
+# Ограничение числа назначений одной ассоциации
+MAX_NAT_ENTRIES = 1024
+# Как часто проверяются устаревшие записи NAT
+SWEEP_INTERVAL = 1.0
+# Потоки разрешения доменов: getaddrinfo не выполняется в цикле пересылки
+LOOKUP_THREADS = 2
+# Сколько датаграмм к одному домену ждут окончания его разрешения
+MAX_PENDING = 16
+
+_SIDE_CLIENT = 0
+_SIDE_REMOTE = 1
+
+
+def address_header(sockaddr) -> bytes:
+    """Заголовок UDP ответа клиенту от sockaddr удаленного узла"""
+    host, port = sockaddr[0], sockaddr[1]
+    if ':' in host:
+        return build_udp_header(0x04, socket.inet_pton(socket.AF_INET6, host), port)
+    return build_udp_header(0x01, socket.inet_aton(host), port)
+
+
+class _NatEntry:
+    """Назначение ассоциации: куда пересылать и каким заголовком помечать ответы"""
+    __slots__ = ('family', 'sockaddr', 'reply_header', 'last_used')
+
+    def __init__(self, family, sockaddr, now):
+        self.family = family
+        self.sockaddr = sockaddr
+        self.reply_header = address_header(sockaddr)
+        self.last_used = now
+
+
+class UdpAssociation:
+    """UDP ASSOCIATE одного клиента.
+
+    client_sock принимает датаграммы клиента (его адрес сообщается в BND.ADDR/BND.PORT),
+    remote_socks - по сокету на семейство адресов для обмена с назначениями.
+    NAT таблица пропускает к клиенту только ответы тех узлов, которым он писал.
+    """
+    __slots__ = ('client_ip', 'client_port', 'client_addr', 'client_sock', 'remote_socks',
+                 'routes', 'nat', 'pending', 'idle_timer', 'closed')
+
+    def __init__(self, bind_host, client_ip, client_port=0, idle_timer=None):
+        family = socket.AF_INET6 if ':' in bind_host else socket.AF_INET
+        self.client_sock = socket.socket(family, socket.SOCK_DGRAM)
+        self.client_sock.bind((bind_host, 0))
+        self.client_sock.setblocking(False)
+        self.client_ip = client_ip
+        # Порт клиента из запроса UDP ASSOCIATE, 0 - любой порт с IP клиента
+        self.client_port = client_port
+        self.client_addr = None
+        self.remote_socks = {}
+        # Сырые ATYP/адрес/порт из заголовка -> запись NAT, без разбора адреса на каждой датаграмме
+        self.routes = {}
+        # (host, port) удаленного узла -> запись NAT
+        self.nat = {}
+        # Назначения-домены, которые сейчас разрешаются -> данные ожидающих датаграмм
+        self.pending = {}
+        self.idle_timer = idle_timer
+        self.closed = False
+
+    @property
+    def address(self):
+        """Адрес UDP сокета для ответа на UDP ASSOCIATE"""
+        return self.client_sock.getsockname()
+
+    def accepts(self, source) -> bool:
+        """Датаграмма пришла от клиента этой ассоциации"""
+        if self.client_addr is not None:
+            return source == self.client_addr
+        if source[0] != self.client_ip or (self.client_port and source[1] != self.client_port):
+            return False
+        # Первая датаграмма фиксирует адрес клиента
+        self.client_addr = source
+        return True
+
+    def close(self):
+        self.closed = True
+        for sock in [self.client_sock, *self.remote_socks.values()]:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+
+class UdpRelay:
+    """Цикл пересылки UDP датаграмм всех ассоциаций в одном потоке.
+
+    За одно пробуждение из готового сокета читается до batch_size датаграмм.
+    Домены разрешаются в отдельных потоках: датаграммы к домену ждут результата
+    в ассоциации, а остальные ассоциации тем временем обслуживаются без задержки.
+    Датаграмма читается в один общий буфер: от клиента - с начала буфера,
+    заголовок разбирается C парсером и данные уходят срезом memoryview;
+    от удаленного узла - после запаса под заголовок, который дописывается
+    перед данными, так что ответ отправляется без копирования данных.
+    """
+
+    def __init__(self, name='socks5-udp', batch_size=BATCH_SIZE, nat_timeout=NAT_TIMEOUT,
+                 resolver=None, timers=None, metrics=None, acl=None):
+        self.batch_size = batch_size
+        self.nat_timeout = nat_timeout
+        # resolver.CachingResolver для доменов в заголовках, None - getaddrinfo
+        self.resolver = resolver
+        # timer_wheel.TimerWheel: датаграммы отмечают активность таймера простоя ассоциации
+        self.timers = timers
+        self.metrics = metrics
+        # acl.AccessControl: датаграммы к запрещенным назначениям отбрасываются
+        self.acl = acl
+
+        self.buffer = bytearray(UDP_HEADER_MAX + UDP_BUFFER)
+        self.view = memoryview(self.buffer)
+        self.payload = self.view[UDP_HEADER_MAX:]
+        self.header = Socks5UdpHeader()
+
+        self.selector = selectors.DefaultSelector()
+        self.commands = queue.SimpleQueue()
+        # Запросы разрешения доменов и их результаты для цикла пересылки
+        self.lookups = queue.SimpleQueue()
+        self.resolved = queue.SimpleQueue()
+        self.associations = set()
+        self.running = False
+        self.next_sweep = 0.0
+
+        self.datagrams_in = 0
+        self.datagrams_out = 0
+        self.dropped = 0
+
+        # Пробуждение цикла при добавлении и удалении ассоциаций из других потоков
+        self.wakeup_reader, self.wakeup_writer = socket.socketpair()
+        self.wakeup_reader.setblocking(False)
+        self.wakeup_writer.setblocking(False)
+        self.selector.register(self.wakeup_reader, selectors.EVENT_READ, None)
+
+        self.thread = threading.Thread(target=self.run, name=name)
+        self.thread.daemon = True
+        self.lookup_threads = [threading.Thread(target=self.lookup_loop, name=f'{name}-dns-{i}', daemon=True)
+                               for i in range(LOOKUP_THREADS)]
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+        for thread in self.lookup_threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.wakeup()
+        self.thread.join()
+        for _ in self.lookup_threads:
+            self.lookups.put(None)
+
+    def wakeup(self):
+        try:
+            self.wakeup_writer.send(b'\0')
+        except (BlockingIOError, OSError):
+            # Буфер уже содержит байт пробуждения
+            pass
+
+    def open(self, bind_host, client_ip, client_port=0, idle_timer=None) -> UdpAssociation:
+        """Создает ассоциацию (из любого потока); адрес сокета доступен сразу"""
+        association = UdpAssociation(bind_host, client_ip, client_port, idle_timer)
+        self.commands.put((True, association))
+        self.wakeup()
+        return association
+
+    def close(self, association):
+        """Закрывает ассоциацию после закрытия управляющего TCP соединения"""
+        self.commands.put((False, association))
+        self.wakeup()
+
+    def run(self):
+        while self.running:
+            for key, _ in self.selector.select(SWEEP_INTERVAL):
+                if key.data is None:
+                    self.apply_commands()
+                    continue
+
+                association, side = key.data
+                if association.closed:
+                    continue
+                if side == _SIDE_CLIENT:
+                    self.from_client(association)
+                else:
+                    self.from_remote(association, key.fileobj)
+
+            now = time.monotonic()
+            if now >= self.next_sweep:
+                self.sweep(now)
+                self.next_sweep = now + SWEEP_INTERVAL
+
+        for association in list(self.associations):
+            self.remove(association)
+        self.selector.close()
+        self.wakeup_reader.close()
+        self.wakeup_writer.close()
+
+    def apply_commands(self):
+        try:
+            while self.wakeup_reader.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        while True:
+            try:
+                association, key, destination = self.resolved.get_nowait()
+            except queue.Empty:
+                break
+            self.deliver_pending(association, key, destination)
+
+        while True:
+            try:
+                add, association = self.commands.get_nowait()
+            except queue.Empty:
+                return
+            if add:
+                self.associations.add(association)
+                self.selector.register(association.client_sock, selectors.EVENT_READ,
+                                       (association, _SIDE_CLIENT))
+            elif association in self.associations:
+                self.remove(association)
+
+    def remove(self, association):
+        self.associations.discard(association)
+        for sock in [association.client_sock, *association.remote_socks.values()]:
+            self.selector.unregister(sock)
+        association.close()
+
+    def remote_socket(self, association, family):
+        sock = association.remote_socks.get(family)
+        if sock is None:
+            sock = socket.socket(family, socket.SOCK_DGRAM)
+            sock.setblocking(False)
+            association.remote_socks[family] = sock
+            self.selector.register(sock, selectors.EVENT_READ, (association, _SIDE_REMOTE))
+        return sock
+
+    def resolve_address(self, header):
+        """(family, sockaddr) назначения с IP адресом, AccessDenied - назначение запрещено ACL"""
+        if header.atyp == 0x01:
+            family, host = socket.AF_INET, socket.inet_ntop(socket.AF_INET, bytes(header.dst_addr.ipv4))
+        else:
+            family, host = socket.AF_INET6, socket.inet_ntop(socket.AF_INET6, bytes(header.dst_addr.ipv6))
+        if self.acl is not None and not self.acl.allows(host):
+            raise AccessDenied(host)
+        return family, (host, header.dst_port)
+
+    def resolve_domain(self, host, port, rule):
+        """(family, sockaddr) для домена; вызывается в потоке разрешения, а не в цикле пересылки"""
+        if self.resolver is not None:
+            addresses = self.resolver.resolve(host, port)
+        else:
+            addresses = [(family, sockaddr) for family, _, _, _, sockaddr in
+                         socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM)]
+        if rule is not None and rule.pattern is None:
+            # Для домена нет своего правила - адреса проверяются по CIDR правилам
+            addresses = self.acl.filter(addresses)
+            if not addresses:
+                raise AccessDenied(host)
+        return addresses[0]
+
+    def lookup_loop(self):
+        while True:
+            item = self.lookups.get()
+            if item is None:
+                return
+            association, key, host, port, rule = item
+            try:
+                destination = self.resolve_domain(host, port, rule)
+            except (OSError, UnicodeError, IndexError, AccessDenied):
+                destination = None
+            self.resolved.put((association, key, destination))
+            self.wakeup()
+
+    def add_route(self, association, key, family, sockaddr, now):
+        entry = association.nat.get(sockaddr[:2])
+        if entry is None:
+            entry = _NatEntry(family, sockaddr, now)
+            association.nat[sockaddr[:2]] = entry
+        association.routes[key] = entry
+        return entry
+
+    def route(self, association, key, now):
+        """Новая запись NAT для назначения с IP адресом, None - назначение недоступно"""
+        if len(association.routes) >= MAX_NAT_ENTRIES:
+            return None
+        try:
+            family, sockaddr = self.resolve_address(self.header)
+        except (OSError, AccessDenied):
+            return None
+        return self.add_route(association, key, family, sockaddr, now)
+
+    def defer(self, association, key, data) -> bool:
+        """Ставит датаграмму к домену в ожидание разрешения; False - датаграмма отброшена"""
+        pending = association.pending.get(key)
+        if pending is not None:
+            if len(pending) >= MAX_PENDING:
+                return False
+            pending.append(bytes(data))
+            return True
+        if len(association.routes) + len(association.pending) >= MAX_NAT_ENTRIES:
+            return False
+
+        header = self.header
+        host = decode_domain(bytes(header.dst_addr.domain.name[:header.dst_addr.domain.len]))
+        try:
+            rule = self.acl.match(host) if self.acl is not None else None
+        except UnicodeError:
+            # Имя не из UTF-8 не разрешится - отбрасываем датаграмму, а не цикл пересылки
+            return False
+        if rule is not None and not rule.allow:
+            return False
+        association.pending[key] = [bytes(data)]
+        self.lookups.put((association, key, host, header.dst_port, rule))
+        return True
+
+    def deliver_pending(self, association, key, destination):
+        """Результат разрешения домена: отправка накопленных датаграмм"""
+        pending = association.pending.pop(key, ())
+        if association.closed or not pending:
+            return
+        sent = 0
+        if destination is not None:
+            entry = self.add_route(association, key, destination[0], destination[1], time.monotonic())
+            sock = self.remote_socket(association, entry.family)
+            for data in pending:
+                try:
+                    sock.sendto(data, entry.sockaddr)
+                    sent += 1
+                except OSError:
+                    pass
+        self.account(association, len(pending), sent, 'in')
+
+    def from_client(self, association):
+        """Пакет датаграмм клиента: разбор заголовка и пересылка данных назначению"""
+        sock = association.client_sock
+        header = self.header
+        view = self.view
+        now = time.monotonic()
+        received = sent = 0
+
+        for _ in range(self.batch_size):
+            try:
+                size, source = sock.recvfrom_into(self.buffer, UDP_BUFFER)
+            except BlockingIOError:
+                break
+            except OSError:
+                continue
+            received += 1
+            if not association.accepts(source):
+                continue
+            datagram = view[:size]
+            # Фрагментация не поддерживается: такие датаграммы отбрасываются (RFC 1928, 7)
+            if parse_udp_header_into(datagram, header) or header.frag:
+                continue
+
+            key = bytes(view[3:header.header_len])
+            entry = association.routes.get(key)
+            if entry is None:
+                if header.atyp == 0x03:
+                    # Домен разрешается в фоне, датаграмма учитывается при отправке
+                    if self.defer(association, key, view[header.header_len:size]):
+                        received -= 1
+                    continue
+                entry = self.route(association, key, now)
+                if entry is None:
+                    continue
+            entry.last_used = now
+            try:
+                self.remote_socket(association, entry.family).sendto(view[header.header_len:size],
+                                                                     entry.sockaddr)
+                sent += 1
+            except OSError:
+                pass
+
+        self.account(association, received, sent, 'in')
+
+    def from_remote(self, association, sock):
+        """Пакет ответов: заголовок из записи NAT дописывается перед данными"""
+        now = time.monotonic()
+        received = sent = 0
+
+        for _ in range(self.batch_size):
+            try:
+                size, source = sock.recvfrom_into(self.payload, UDP_BUFFER)
+            except BlockingIOError:
+                break
+            except OSError:
+                continue
+            received += 1
+            entry = association.nat.get(source[:2])
+            if entry is None or association.client_addr is None:
+                # Узел, которому клиент не писал, или клиент еще не прислал ни одной датаграммы
+                continue
+            entry.last_used = now
+            start = UDP_HEADER_MAX - len(entry.reply_header)
+            self.buffer[start:UDP_HEADER_MAX] = entry.reply_header
+            try:
+                association.client_sock.sendto(self.view[start:UDP_HEADER_MAX + size], association.client_addr)
+                sent += 1
+            except OSError:
+                pass
+
+        self.account(association, received, sent, 'out')
+
+    def account(self, association, received, sent, direction):
+        if not received:
+            return
+        self.datagrams_in += received
+        self.datagrams_out += sent
+        self.dropped += received - sent
+        if sent and association.idle_timer is not None:
+            self.timers.touch(association.idle_timer)
+        if self.metrics:
+            self.metrics.udp_datagrams.inc(sent, labels=(direction,))
+            if received > sent:
+                self.metrics.udp_dropped.inc(received - sent)
+
+    def sweep(self, now):
+        """Удаляет записи NAT, через которые давно не проходили датаграммы"""
+        deadline = now - self.nat_timeout
+        for association in self.associations:
+            expired = [key for key, entry in association.nat.items() if entry.last_used < deadline]
+            if not expired:
+                continue
+            for key in expired:
+                del association.nat[key]
+            association.routes = {key: entry for key, entry in association.routes.items()
+                                  if entry.last_used >= deadline}
+
+    def stats(self):
+        return {
+            'associations': len(self.associations),
+            'nat_entries': sum(len(association.nat) for association in list(self.associations)),
+            'datagrams_in': self.datagrams_in,
+            'datagrams_out': self.datagrams_out,
+            'dropped': self.dropped,
+        }
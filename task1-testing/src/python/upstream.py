@@ -0,0 +1,335 @@
+import math
+import socket
+import threading
+import time
+
+from socks5_messages import encode_auth, encode_handshake, encode_request
+from socks5_native import request_needed
+
+POLICY_LEAST_CONNECTIONS = 'least_connections'
+POLICY_EWMA = 'ewma'
+POLICIES = (POLICY_LEAST_CONNECTIONS, POLICY_EWMA)
+
+# Постоянная времени затухания EWMA задержки, секунд
+EWMA_DECAY = 10.0
+HEALTH_INTERVAL = 2.0
+HEALTH_TIMEOUT = 2.0
+# Столько ошибок подряд - и upstream исключается на EJECT_TIME секунд
+EJECT_FAILURES = 3
+EJECT_TIME = 30.0
+# Upstream с EWMA больше медианы в OUTLIER_FACTOR раз исключается как медленный,
+# если отставание больше OUTLIER_MIN_EXCESS - иначе на loopback исключал бы шум замеров
+OUTLIER_FACTOR = 3.0
+OUTLIER_MIN_EXCESS = 0.05
+# Доля upstream, которые можно исключить одновременно
+MAX_EJECTED = 0.5
+# Сколько разных upstream пробуется для одного подключения
+MAX_ATTEMPTS = 3
+
+
+class UpstreamError(Exception):
+    """Upstream ответил на CONNECT кодом ошибки - его нужно передать клиенту"""
+
+    def __init__(self, code):
+        super().__init__(f"Upstream replied {code:#04x}")
+        self.code = code
+
+
+class Upstream:
+    """Вышестоящий SOCKS5 сервер и его состояние для балансировки"""
+    __slots__ = ('host', 'port', 'credentials', 'active', 'ewma', 'updated', 'healthy',
+                 'consecutive_failures', 'ejected_until', 'requests', 'failures', 'ejections')
+
+    def __init__(self, host, port, credentials=None):
+        self.host = host
+        self.port = port
+        # (username, password) в bytes для upstream с аутентификацией RFC 1929
+        self.credentials = credentials
+        self.active = 0
+        self.ewma = 0.0  # задержка установки соединения, секунд; 0 - замеров еще не было
+        self.updated = None
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+
+    @property
+    def address(self):
+        return self.host, self.port
+
+    def observe(self, latency, now, decay=EWMA_DECAY):
+        """Учитывает замер задержки.
+
+        Рост задержки принимается сразу (peak EWMA), снижение - с затуханием по времени,
+        поэтому медленный upstream теряет трафик с первого же медленного ответа.
+        """
+        if self.updated is None or latency >= self.ewma:
+            self.ewma = latency
+        else:
+            weight = math.exp(-(now - self.updated) / decay)
+            self.ewma = self.ewma * weight + latency * (1 - weight)
+        self.updated = now
+
+    def stats(self, now):
+        return {
+            'address': f'{self.host}:{self.port}',
+            'active': self.active,
+            'ewma_ms': round(self.ewma * 1000, 3),
+            'healthy': self.healthy,
+            'ejected': self.ejected_until > now,
+            'requests': self.requests,
+            'failures': self.failures,
+            'ejections': self.ejections,
+        }
+
+
+class UpstreamSocket(socket.socket):
+    """Соединение через upstream: закрытие освобождает место в счетчике активных соединений.
+
+    Все способы пересылки закрывают удаленный сокет через close(), поэтому
+    пулу не нужно знать, когда и каким потоком закончился туннель.
+    """
+    __slots__ = ('pool', 'upstream')
+
+    def close(self):
+        upstream, self.upstream = getattr(self, 'upstream', None), None
+        if upstream is not None:
+            self.pool.release(upstream)
+        super().close()
+
+
+def recv_exactly(sock, size) -> bytes:
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Upstream closed connection")
+        data += chunk
+    return data
+
+
+def parse_upstream(value) -> Upstream:
+    """'host:port' или 'user:password@host:port'"""
+    credentials = None
+    if '@' in value:
+        userinfo, _, value = value.rpartition('@')
+        username, _, password = userinfo.partition(':')
+        credentials = (username.encode(), password.encode())
+    host, _, port = value.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f"Invalid upstream address: {value!r}")
+    return Upstream(host.strip('[]'), int(port), credentials)
+
+
+class UpstreamPool:
+    """Цепочка через вышестоящие SOCKS5 серверы с балансировкой и проверкой здоровья.
+
+    connect() выбирает upstream, отправляет ему handshake, аутентификацию и CONNECT
+    одним сегментом (кодировщики socks5_messages) и возвращает сокет с установленным туннелем.
+    Выбор - по наименьшему числу активных соединений или по EWMA задержки, умноженной
+    на число активных соединений. Ошибки подключения подряд и задержка намного выше
+    медианы исключают upstream на eject_time; активные проверки в фоне возвращают
+    upstream в работу и обновляют задержку без клиентского трафика.
+    """
+
+    def __init__(self, upstreams, policy=POLICY_LEAST_CONNECTIONS, connect_timeout=5,
+                 health_interval=HEALTH_INTERVAL, health_timeout=HEALTH_TIMEOUT, eject_failures=EJECT_FAILURES,
+                 eject_time=EJECT_TIME, outlier_factor=OUTLIER_FACTOR, decay=EWMA_DECAY, clock=time.monotonic):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown upstream policy: {policy}")
+        if not upstreams:
+            raise ValueError("Upstream pool is empty")
+        self.upstreams = list(upstreams)
+        self.policy = policy
+        self.connect_timeout = connect_timeout
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.eject_failures = eject_failures
+        self.eject_time = eject_time
+        self.outlier_factor = outlier_factor
+        self.decay = decay
+        self.clock = clock
+        self.lock = threading.Lock()
+        # Сдвиг начала перебора: при равной стоимости upstream выбираются по кругу
+        self.rotation = 0
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Запускает фоновые проверки здоровья"""
+        self.thread = threading.Thread(target=self.run, name='socks5-upstreams')
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.health_interval):
+            self.check_all()
+
+    def available(self, now, exclude=()):
+        """Upstream, которые можно выбрать (вызывается под self.lock)"""
+        candidates = [upstream for upstream in self.upstreams
+                      if upstream.healthy and upstream.ejected_until <= now and upstream not in exclude]
+        if candidates:
+            return candidates
+        # Все исключены: лучше попробовать любой, чем отказать всем клиентам
+        return [upstream for upstream in self.upstreams if upstream not in exclude]
+
+    def cost(self, upstream):
+        if self.policy == POLICY_EWMA:
+            return upstream.ewma * (upstream.active + 1)
+        return upstream.active
+
+    def acquire(self, exclude=()):
+        """Выбирает upstream и учитывает новое соединение на нем, None - выбирать не из чего"""
+        with self.lock:
+            candidates = self.available(self.clock(), exclude)
+            if not candidates:
+                return None
+            self.rotation += 1
+            start = self.rotation % len(candidates)
+            candidates = candidates[start:] + candidates[:start]
+            upstream = min(candidates, key=self.cost)
+            upstream.active += 1
+            upstream.requests += 1
+            return upstream
+
+    def release(self, upstream):
+        with self.lock:
+            upstream.active -= 1
+
+    def record_success(self, upstream, latency):
+        with self.lock:
+            upstream.consecutive_failures = 0
+            upstream.observe(latency, self.clock(), self.decay)
+
+    def record_failure(self, upstream):
+        with self.lock:
+            upstream.failures += 1
+            upstream.consecutive_failures += 1
+            if upstream.consecutive_failures >= self.eject_failures:
+                self.eject(upstream, self.clock())
+
+    def eject(self, upstream, now):
+        """Исключает upstream, если не превышена доля исключенных (вызывается под self.lock)"""
+        if upstream.ejected_until > now:
+            return
+        ejected = sum(1 for other in self.upstreams if other.ejected_until > now)
+        if ejected + 1 > max(1, int(len(self.upstreams) * MAX_EJECTED)):
+            return
+        upstream.ejected_until = now + self.eject_time
+        upstream.consecutive_failures = 0
+        upstream.ejections += 1
+
+    def connect(self, host, port):
+        """Сокет с туннелем к host:port через один из upstream.
+
+        Ошибка подключения к upstream - попытка через следующий; код ошибки CONNECT
+        от самого upstream (назначение недоступно) передается как UpstreamError.
+        """
+        request = encode_request(host, port)
+        tried = []
+        last_error = OSError("No upstream available")
+        for _ in range(min(MAX_ATTEMPTS, len(self.upstreams))):
+            upstream = self.acquire(tried)
+            if upstream is None:
+                break
+            tried.append(upstream)
+            try:
+                return self.open(upstream, request)
+            except UpstreamError:
+                raise
+            except OSError as e:
+                last_error = e
+        raise last_error
+
+    def open(self, upstream, request):
+        """Handshake, аутентификация и CONNECT через upstream, уже учтенный в acquire()"""
+        family = socket.AF_INET6 if ':' in upstream.host else socket.AF_INET
+        sock = UpstreamSocket(family, socket.SOCK_STREAM)
+        sock.pool, sock.upstream = self, upstream
+        started = time.perf_counter()
+        try:
+            sock.settimeout(self.connect_timeout)
+            sock.connect(upstream.address)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.handshake(sock, upstream, request)
+
+            reply = recv_exactly(sock, 5)
+            needed = request_needed(reply)
+            if reply[0] != 0x05 or needed < 0:
+                raise ConnectionError("Invalid reply from upstream")
+            recv_exactly(sock, needed - len(reply))
+        except OSError:
+            self.record_failure(upstream)
+            sock.close()
+            raise
+
+        # Upstream ответил - он исправен, даже если само назначение недоступно
+        self.record_success(upstream, time.perf_counter() - started)
+        if reply[1] != 0x00:
+            sock.close()
+            raise UpstreamError(reply[1])
+        return sock
+
+    def handshake(self, sock, upstream, request=b''):
+        """Отправляет приветствие (и запрос, не дожидаясь ответов) и проверяет выбранный метод"""
+        if upstream.credentials:
+            sock.sendall(encode_handshake((0x02,)) + encode_auth(*upstream.credentials) + request)
+            if recv_exactly(sock, 2) != b'\x05\x02' or recv_exactly(sock, 2) != b'\x01\x00':
+                raise ConnectionError("Upstream authentication failed")
+        else:
+            sock.sendall(encode_handshake() + request)
+            if recv_exactly(sock, 2) != b'\x05\x00':
+                raise ConnectionError("Upstream rejected handshake")
+
+    def check(self, upstream) -> bool:
+        """Активная проверка: подключение и handshake без запроса"""
+        started = time.perf_counter()
+        try:
+            with socket.create_connection(upstream.address, timeout=self.health_timeout) as sock:
+                self.handshake(sock, upstream)
+        except OSError:
+            with self.lock:
+                upstream.healthy = False
+                upstream.failures += 1
+            return False
+        latency = time.perf_counter() - started
+        with self.lock:
+            upstream.healthy = True
+            upstream.observe(latency, self.clock(), self.decay)
+        return True
+
+    def check_all(self):
+        for upstream in self.upstreams:
+            self.check(upstream)
+        self.eject_outliers()
+
+    def eject_outliers(self):
+        """Исключает upstream с задержкой намного выше медианы остальных"""
+        with self.lock:
+            now = self.clock()
+            measured = sorted(upstream.ewma for upstream in self.upstreams
+                              if upstream.updated is not None and upstream.ejected_until <= now)
+            if len(measured) < 2:
+                return
+            median = measured[(len(measured) - 1) // 2]
+            for upstream in self.upstreams:
+                if (upstream.updated is not None and upstream.ewma > median * self.outlier_factor
+                        and upstream.ewma - median > OUTLIER_MIN_EXCESS):
+                    self.eject(upstream, now)
+
+    def stats(self):
+        with self.lock:
+            now = self.clock()
+            return {
+                'policy': self.policy,
+                'upstreams': [upstream.stats(now) for upstream in self.upstreams],
+            }
@@ -0,0 +1,91 @@
+import queue
+import threading
+
+# Политики поведения при перегрузке пула
+OVERLOAD_QUEUE = 'queue'    # соединение ждет свободного места в очереди
+OVERLOAD_REJECT = 'reject'  # соединение отклоняется с ошибкой SOCKS5
+OVERLOAD_PAUSE = 'pause'    # accept() не вызывается, пока нет места
+OVERLOAD_POLICIES = (OVERLOAD_QUEUE, OVERLOAD_REJECT, OVERLOAD_PAUSE)
+
+
+class WorkerPool:
+    """Фиксированный пул потоков с ограниченной очередью ожидания.
+
+    Емкость пула (max_workers + queue_size) ограничена семафором:
+    место занимается до постановки задачи в очередь и освобождается,
+    когда обработчик завершил работу.
+    """
+
+    def __init__(self, handler, max_workers=64, queue_size=256):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if queue_size < 0:
+            raise ValueError("queue_size must not be negative")
+
+        self.handler = handler
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.queue = queue.SimpleQueue()
+        self.slots = threading.BoundedSemaphore(max_workers + queue_size)
+
+        self.lock = threading.Lock()
+        self.busy = 0
+        self.completed = 0
+
+        self.workers = []
+        for i in range(max_workers):
+            worker = threading.Thread(target=self.worker_loop, name=f"socks5-worker-{i}")
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+    def try_acquire(self, blocking=True, timeout=None):
+        """Занимает место в пуле. Возвращает False, если места нет"""
+        if not blocking:
+            return self.slots.acquire(blocking=False)
+        return self.slots.acquire(timeout=timeout)
+
+    def submit(self, item):
+        """Ставит задачу в очередь. Место должно быть занято через try_acquire"""
+        self.queue.put(item)
+
+    def worker_loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+
+            with self.lock:
+                self.busy += 1
+            try:
+                self.handler(item)
+            except Exception:
+                # Ошибки обработчик должен разбирать сам, поток пула не должен падать
+                pass
+            finally:
+                with self.lock:
+                    self.busy -= 1
+                    self.completed += 1
+                self.slots.release()
+
+    @property
+    def queue_depth(self):
+        """Количество задач, ожидающих свободного потока"""
+        return self.queue.qsize()
+
+    def stats(self):
+        return {
+            'max_workers': self.max_workers,
+            'queue_size': self.queue_size,
+            'busy_workers': self.busy,
+            'queue_depth': self.queue_depth,
+            'completed': self.completed,
+        }
+
+    def shutdown(self, wait=True):
+        """Останавливает потоки после обработки уже поставленных задач"""
+        for _ in self.workers:
+            self.queue.put(None)
+        if wait:
+            for worker in self.workers:
+                worker.join()
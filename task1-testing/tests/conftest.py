@@ -9,6 +9,11 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'python'
 
 from socks5_proxy import Socks5Proxy
 
+# Общие вспомогательные функции тестов (tests/helpers.py)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from helpers import start_proxy
+
 @pytest.fixture(scope="session")
 def compiled_library():
     """Фикстура для проверки скомпилированной C библиотеки"""
@@ -36,3 +41,19 @@ def sample_ipv4_request():
 def sample_domain_request():
     """Образец доменного запроса"""
     return b'\x05\x01\x00\x03\x0bexample.com\x00\x50'
+
+@pytest.fixture
+def proxy_factory():
+    """Запускает прокси в фоновом потоке: proxy_factory(cls=Socks5Proxy, **kwargs) -> (proxy, port)"""
+    def start(cls=Socks5Proxy, **kwargs):
+        proxy = start_proxy(cls, **kwargs)
+        return proxy, proxy.port
+    return start
+
+@pytest.fixture
+def started_proxy(request, proxy_factory):
+    """Прокси с параметрами конструктора из косвенной параметризации, возвращает (proxy, port):
+
+    @pytest.mark.parametrize('started_proxy', [{'relay_mode': 'shared'}], indirect=True)
+    """
+    return proxy_factory(**getattr(request, 'param', {}))
@@ -0,0 +1,55 @@
+import socket
+import threading
+import time
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'python'))
+
+from socks5_proxy import Socks5Proxy
+
+
+def find_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(condition, timeout=3, interval=0.01):
+    """Ждет выполнения условия; возвращает его значение после таймаута"""
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(interval)
+    return condition()
+
+
+def can_connect(port, host='127.0.0.1'):
+    try:
+        socket.create_connection((host, port), timeout=1).close()
+        return True
+    except OSError:
+        return False
+
+
+def recv_exactly(sock, size):
+    """Читает ровно size байт или меньше, если соединение закрылось раньше"""
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def start_proxy(cls=Socks5Proxy, **kwargs):
+    """Запускает прокси на свободном порту в фоновом потоке и ждет, пока он начнет принимать подключения.
+
+    Проверочное подключение учитывается прокси как обычное (accepted, трассировка).
+    """
+    proxy = cls('127.0.0.1', find_free_port(), **kwargs)
+    threading.Thread(target=proxy.start, daemon=True).start()
+    assert wait_for(lambda: can_connect(proxy.port))
+    return proxy
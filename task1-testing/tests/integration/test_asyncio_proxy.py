@@ -0,0 +1,158 @@
+import pytest
+import socket
+import subprocess
+import threading
+import time
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+# Общие вспомогательные функции тестов (tests/helpers.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import find_free_port, start_proxy
+from socks5_asyncio import AsyncSocks5Proxy
+
+MAIN = os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python', 'main.py')
+
+
+class TestAsyncSocks5ProxyIntegration:
+    """Интеграционные тесты asyncio-версии прокси"""
+
+    @pytest.fixture
+    def proxy_server(self):
+        """Запуск asyncio прокси в фоновом потоке"""
+        proxy = start_proxy(AsyncSocks5Proxy)
+        yield proxy, '127.0.0.1', proxy.port
+
+    @pytest.fixture
+    def echo_server(self):
+        """Простой эхо-сервер для проверки туннеля"""
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(('127.0.0.1', 0))
+        server.listen(64)
+
+        def serve():
+            while True:
+                try:
+                    conn, _ = server.accept()
+                except OSError:
+                    return
+                threading.Thread(target=echo, args=(conn,), daemon=True).start()
+
+        def echo(conn):
+            with conn:
+                while True:
+                    data = conn.recv(4096)
+                    if not data:
+                        return
+                    conn.sendall(data)
+
+        threading.Thread(target=serve, daemon=True).start()
+        yield server.getsockname()
+        server.close()
+
+    def open_tunnel(self, proxy_host, proxy_port, target):
+        sock = socket.create_connection((proxy_host, proxy_port), timeout=5)
+        sock.sendall(b'\x05\x01\x00')
+        assert sock.recv(2) == b'\x05\x00'
+
+        ip, port = target
+        sock.sendall(b'\x05\x01\x00\x01' + socket.inet_aton(ip) + port.to_bytes(2, 'big'))
+        response = sock.recv(10)
+        assert response[:2] == b'\x05\x00'
+        return sock
+
+    def test_handshake(self, proxy_server):
+        """Проверка handshake"""
+        _, host, port = proxy_server
+
+        with socket.create_connection((host, port), timeout=5) as sock:
+            sock.sendall(b'\x05\x01\x00')
+            assert sock.recv(2) == b'\x05\x00'
+
+    def test_invalid_handshake(self, proxy_server):
+        """Неверная версия протокола отклоняется"""
+        _, host, port = proxy_server
+
+        with socket.create_connection((host, port), timeout=5) as sock:
+            sock.sendall(b'\x04\x01\x00')
+            assert sock.recv(2) == b'\x05\xff'
+
+    def test_handshake_split_across_segments(self, proxy_server):
+        """Handshake, пришедший по частям, собирается целиком"""
+        _, host, port = proxy_server
+
+        with socket.create_connection((host, port), timeout=5) as sock:
+            sock.sendall(b'\x05')
+            time.sleep(0.05)
+            sock.sendall(b'\x02\x00\x01')
+            assert sock.recv(2) == b'\x05\x00'
+
+    def test_unsupported_command(self, proxy_server):
+        """BIND отклоняется с кодом 0x07"""
+        _, host, port = proxy_server
+
+        with socket.create_connection((host, port), timeout=5) as sock:
+            sock.sendall(b'\x05\x01\x00')
+            assert sock.recv(2) == b'\x05\x00'
+            sock.sendall(b'\x05\x02\x00\x01\x7f\x00\x00\x01\x00\x50')
+            assert sock.recv(10)[1] == 0x07
+
+    def test_connect_refused(self, proxy_server):
+        """Недоступный адрес дает код 0x04"""
+        _, host, port = proxy_server
+        closed_port = find_free_port()
+
+        with socket.create_connection((host, port), timeout=5) as sock:
+            sock.sendall(b'\x05\x01\x00')
+            assert sock.recv(2) == b'\x05\x00'
+            sock.sendall(b'\x05\x01\x00\x01\x7f\x00\x00\x01' + closed_port.to_bytes(2, 'big'))
+            assert sock.recv(10)[1] == 0x04
+
+    def test_tunnel_echo(self, proxy_server, echo_server):
+        """Данные проходят через туннель в обе стороны"""
+        _, host, port = proxy_server
+
+        with self.open_tunnel(host, port, echo_server) as sock:
+            sock.sendall(b'hello through asyncio')
+            assert sock.recv(1024) == b'hello through asyncio'
+
+    def test_many_idle_tunnels(self, proxy_server, echo_server):
+        """Много одновременно открытых туннелей в одном event loop"""
+        proxy, host, port = proxy_server
+        tunnels = [self.open_tunnel(host, port, echo_server) for _ in range(50)]
+
+        try:
+            # Счетчик обновляется в event loop сразу после ответа клиенту
+            deadline = time.time() + 2
+            while proxy.active_tunnels < 50 and time.time() < deadline:
+                time.sleep(0.01)
+            assert proxy.active_tunnels == 50
+
+            # Все туннели продолжают работать
+            for i, sock in enumerate(tunnels):
+                sock.sendall(str(i).encode())
+                assert sock.recv(16) == str(i).encode()
+        finally:
+            for sock in tunnels:
+                sock.close()
+
+
+class TestAsyncioModeOptions:
+    """main.py не запускает asyncio режим с опциями, которые он бы проигнорировал"""
+
+    @pytest.mark.parametrize('options', [
+        ['--acl', 'rules.txt'],
+        ['--auth-file', 'users.txt'],
+        ['--upstream', '127.0.0.1:1081'],
+        ['--dns-cache'],
+        ['--limit-total', '1M'],
+        ['--trace-file', 'trace.json'],
+    ])
+    def test_unsupported_option_rejected(self, options):
+        result = subprocess.run([sys.executable, MAIN, '--mode', 'asyncio', '--port', str(find_free_port())]
+                                + options, capture_output=True, text=True, timeout=10)
+        assert result.returncode == 2
+        assert f'--mode asyncio does not support {options[0]}' in result.stderr
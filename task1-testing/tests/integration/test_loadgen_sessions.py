@@ -0,0 +1,99 @@
+import pytest
+import json
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+# Общие вспомогательные функции тестов (tests/helpers.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import find_free_port, start_proxy
+from loadgen import LoadGenerator, MODE_OPEN, main, target_for
+from local_servers import EchoServer
+
+
+@pytest.fixture(scope='module')
+def proxy_address():
+    return ('127.0.0.1', start_proxy().port)
+
+
+class TestLoadGenerator:
+    """Нагрузка через прокси к локальным echo-серверам"""
+
+    def test_closed_loop_all_address_types(self, proxy_address):
+        with EchoServer() as echo4, EchoServer('::1') as echo6:
+            targets = [('127.0.0.1', echo4.address[1]), ('localhost', echo4.address[1]),
+                       ('::1', echo6.address[1])]
+            generator = LoadGenerator(proxy_address, targets, payload_size=128)
+            report = generator.run(concurrency=30, duration=10, sessions=90)
+
+        assert report['completed'] == 90
+        assert report['errors'] == {}
+        assert report['connect_latency']['p50_ms'] <= report['connect_latency']['p99_ms']
+        assert echo4.connections == 60
+        assert echo6.connections == 30
+
+    def test_open_loop(self, proxy_address):
+        with EchoServer() as echo:
+            generator = LoadGenerator(proxy_address, [('127.0.0.1', echo.address[1])])
+            report = generator.run(mode=MODE_OPEN, rate=200, duration=0.5)
+
+        assert report['completed'] == 100
+        assert report['failed'] == 0
+
+    def test_tunnel_duration(self, proxy_address):
+        with EchoServer() as echo:
+            generator = LoadGenerator(proxy_address, [('127.0.0.1', echo.address[1])], tunnel_duration=0.3)
+            report = generator.run(concurrency=5, duration=10, sessions=5)
+
+        assert report['completed'] == 5
+        assert report['session_latency']['p50_ms'] >= 300
+
+    def test_reply_errors_reported_by_name(self, proxy_address):
+        closed_port = find_free_port()
+        generator = LoadGenerator(proxy_address, [('127.0.0.1', closed_port)])
+        report = generator.run(concurrency=2, duration=10, sessions=4)
+
+        assert report['completed'] == 0
+        assert report['errors'] == {'Host unreachable': 4}
+
+    def test_cli_json(self, proxy_address, capsys):
+        code = main(['--proxy', f'{proxy_address[0]}:{proxy_address[1]}', '--atyp', 'ipv4,domain',
+                     '--concurrency', '4', '--sessions', '20', '--json'])
+        report = json.loads(capsys.readouterr().out)
+
+        assert code == 0
+        assert report['completed'] == 20
+
+    def test_cli_external_target_all_address_types(self, proxy_address, capsys):
+        """С --target каждый ATYP из --atyp получает свою форму адреса цели"""
+        with EchoServer() as echo:
+            code = main(['--proxy', f'{proxy_address[0]}:{proxy_address[1]}',
+                         '--target', f'localhost:{echo.address[1]}', '--atyp', 'ipv4,domain',
+                         '--concurrency', '4', '--sessions', '20', '--json'])
+        report = json.loads(capsys.readouterr().out)
+
+        assert code == 0
+        assert report['completed'] == 20
+
+
+class TestTargetForAtyp:
+    """Адрес внешней цели для каждого ATYP"""
+
+    def test_literal_matching_atyp(self):
+        assert target_for('ipv4', '127.0.0.1', 7) == ('127.0.0.1', 7)
+        assert target_for('ipv6', '::1', 7) == ('::1', 7)
+
+    def test_name_resolved_to_literal(self):
+        assert target_for('ipv4', 'localhost', 7) == ('127.0.0.1', 7)
+        assert target_for('domain', 'localhost', 7) == ('localhost', 7)
+
+    @pytest.mark.parametrize('atyp, host', [('domain', '127.0.0.1'), ('ipv6', '127.0.0.1'), ('ipv4', '::1')])
+    def test_mismatch_rejected(self, atyp, host):
+        with pytest.raises(SystemExit):
+            target_for(atyp, host, 7)
+
+    def test_cli_mismatch_rejected(self):
+        with pytest.raises(SystemExit):
+            main(['--target', '127.0.0.1:7', '--atyp', 'ipv4,domain'])
@@ -0,0 +1,155 @@
+import pytest
+import json
+import signal
+import socket
+import struct
+import subprocess
+import textwrap
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+# Общие вспомогательные функции тестов (tests/helpers.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import find_free_port, can_connect, wait_for
+from local_servers import EchoServer
+from prefork import parse_cpu_list
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python')
+
+
+def socks5_echo(port, target, payload):
+    with socket.create_connection(('127.0.0.1', port), timeout=5) as client:
+        client.sendall(b'\x05\x01\x00')
+        assert client.recv(2) == b'\x05\x00'
+        client.sendall(b'\x05\x01\x00\x01' + socket.inet_aton(target[0]) + struct.pack('!H', target[1]))
+        assert client.recv(10)[:2] == b'\x05\x00'
+        client.sendall(payload)
+        received = b''
+        while len(received) < len(payload):
+            received += client.recv(4096)
+        return received
+
+
+class TestParseCpuList:
+    """Разбор --cpu-affinity"""
+
+    def test_ranges_and_single(self):
+        assert parse_cpu_list('0-3,8,10-11') == [0, 1, 2, 3, 8, 10, 11]
+
+    def test_single(self):
+        assert parse_cpu_list('0') == [0]
+
+
+class TestPreforkSupervisor:
+    """Перезапуск рабочих процессов и передача сигналов"""
+
+    SCRIPT = textwrap.dedent('''
+        import os, sys, time
+        sys.path.insert(0, sys.argv[1])
+        from prefork import PreforkSupervisor
+
+        def worker_main(index):
+            pid = str(os.getpid())
+            supervisor.at_exit(lambda: open(os.path.join(sys.argv[3], pid), 'w').close())
+            with open(os.path.join(sys.argv[2], pid), 'w') as f:
+                f.write(str(index))
+            while True:
+                time.sleep(1)
+
+        supervisor = PreforkSupervisor(worker_main, 2, restart_delay=0.1)
+        supervisor.run()
+    ''')
+
+    @pytest.fixture
+    def supervisor(self, tmp_path):
+        started, exited = tmp_path / 'started', tmp_path / 'exited'
+        started.mkdir()
+        exited.mkdir()
+        process = subprocess.Popen([sys.executable, '-c', self.SCRIPT, SRC_DIR, str(started), str(exited)])
+        process.exited = exited
+        yield process, started
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+    @staticmethod
+    def alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        # Зомби-процесс еще существует, но уже не работает
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().split(')')[-1].split()[0] != 'Z'
+
+    def worker_pids(self, directory):
+        return {int(name) for name in os.listdir(directory)}
+
+    def test_crashed_worker_restarted(self, supervisor):
+        process, directory = supervisor
+        assert wait_for(lambda: len(self.worker_pids(directory)) == 2, timeout=5, interval=0.05)
+
+        victim = min(self.worker_pids(directory))
+        os.kill(victim, signal.SIGKILL)
+
+        assert wait_for(lambda: len(self.worker_pids(directory)) == 3, timeout=5, interval=0.05)
+        assert process.poll() is None
+
+    def test_sigterm_stops_all_workers(self, supervisor):
+        process, directory = supervisor
+        assert wait_for(lambda: len(self.worker_pids(directory)) == 2, timeout=5, interval=0.05)
+        pids = self.worker_pids(directory)
+
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=5) == 0
+        assert wait_for(lambda: not any(self.alive(pid) for pid in pids), timeout=5, interval=0.05)
+        # После остановки новые процессы не запускаются
+        assert self.worker_pids(directory) == pids
+        # Завершающие действия at_exit выполнены в каждом рабочем процессе
+        assert self.worker_pids(process.exited) == pids
+
+
+class TestReusePortProxy:
+    """Несколько процессов прокси на одном порту"""
+
+    def test_workers_share_port(self):
+        port = find_free_port()
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(SRC_DIR, 'main.py'), '--host', '127.0.0.1',
+             '--port', str(port), '--workers', '2'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            with EchoServer() as echo:
+                assert wait_for(lambda: can_connect(port), timeout=5)
+                for i in range(10):
+                    payload = f'message {i}'.encode()
+                    assert socks5_echo(port, echo.address, payload) == payload
+        finally:
+            process.send_signal(signal.SIGTERM)
+            assert process.wait(timeout=5) == 0
+
+    def test_workers_close_trace_files(self, tmp_path):
+        port = find_free_port()
+        trace_file = tmp_path / 'trace.json'
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(SRC_DIR, 'main.py'), '--host', '127.0.0.1',
+             '--port', str(port), '--workers', '2', '--trace-file', str(trace_file),
+             '--trace-sample', '1'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            with EchoServer() as echo:
+                assert wait_for(lambda: can_connect(port), timeout=5)
+                for i in range(10):
+                    assert socks5_echo(port, echo.address, b'ping') == b'ping'
+        finally:
+            process.send_signal(signal.SIGTERM)
+            assert process.wait(timeout=5) == 0
+
+        # Каждый процесс дописал свой файл и закрыл JSON массив
+        events = []
+        for index in range(2):
+            events += json.loads((tmp_path / f'trace.json.{index}').read_text())
+        assert sum(event['name'] == 'connect' for event in events) == 10
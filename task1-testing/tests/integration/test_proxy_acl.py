@@ -0,0 +1,86 @@
+import pytest
+import socket
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+# Общие вспомогательные функции тестов (tests/helpers.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import recv_exactly, wait_for
+from acl import AccessControl
+from local_servers import EchoServer, UdpEchoServer
+from socks5_messages import encode_handshake, encode_request
+from socks5_native import build_udp_header
+
+
+def connect_reply(port, host, target_port):
+    """Код ответа прокси на CONNECT к host:target_port"""
+    with socket.create_connection(('127.0.0.1', port), timeout=5) as client:
+        client.sendall(encode_handshake() + encode_request(host, target_port))
+        reply = recv_exactly(client, 12)
+        assert reply[:2] == b'\x05\x00'
+        return reply[3]
+
+
+class TestProxyAcl:
+    """Ответ 0x02 (Connection not allowed by ruleset) на запрещенные назначения"""
+
+    def test_denied_ip(self, proxy_factory):
+        proxy, port = proxy_factory(acl=AccessControl([(False, '127.0.0.0/8')]))
+        with EchoServer() as echo:
+            assert connect_reply(port, *echo.address) == 0x02
+        assert wait_for(lambda: proxy.metrics.acl_denied.value() == 1)
+
+    def test_denied_ipv6(self, proxy_factory):
+        """ATYP 0x04 проверяется правилами IPv6"""
+        proxy, port = proxy_factory(acl=AccessControl([(False, '::1/128')]))
+        assert connect_reply(port, '::1', 9) == 0x02
+
+    def test_ipv4_mapped_address_denied(self, proxy_factory):
+        """::ffff:127.0.0.1 в ATYP 0x04 не обходит запрет 127.0.0.0/8"""
+        proxy, port = proxy_factory(acl=AccessControl([(False, '127.0.0.0/8')]))
+        with EchoServer() as echo:
+            assert connect_reply(port, '::ffff:' + echo.address[0], echo.address[1]) == 0x02
+            assert connect_reply(port, '::ffff:7f00:1', echo.address[1]) == 0x02
+
+    def test_allowed_by_more_specific_rule(self, proxy_factory):
+        proxy, port = proxy_factory(acl=AccessControl([(False, '127.0.0.0/8'), (True, '127.0.0.1/32')]))
+        with EchoServer() as echo:
+            assert connect_reply(port, *echo.address) == 0x00
+
+    def test_denied_domain(self, proxy_factory):
+        proxy, port = proxy_factory(acl=AccessControl([(False, 'localhost')]))
+        with EchoServer() as echo:
+            assert connect_reply(port, 'localhost', echo.address[1]) == 0x02
+
+    def test_domain_without_rule_checks_resolved_addresses(self, proxy_factory):
+        """Домен, указывающий на запрещенную сеть, не обходит CIDR правило"""
+        proxy, port = proxy_factory(acl=AccessControl([(False, '127.0.0.0/8'), (False, '::1')]))
+        with EchoServer() as echo:
+            assert connect_reply(port, 'localhost', echo.address[1]) == 0x02
+
+    def test_domain_rule_overrides_cidr(self, proxy_factory):
+        proxy, port = proxy_factory(acl=AccessControl([(False, '127.0.0.0/8'), (True, 'localhost')]))
+        with EchoServer() as echo:
+            assert connect_reply(port, 'localhost', echo.address[1]) == 0x00
+
+    def test_udp_to_denied_destination_dropped(self, proxy_factory):
+        proxy, port = proxy_factory(acl=AccessControl([(False, '127.0.0.0/8')]))
+        with UdpEchoServer() as echo, socket.create_connection(('127.0.0.1', port), timeout=5) as control:
+            control.sendall(encode_handshake() + b'\x05\x03\x00\x01\x00\x00\x00\x00\x00\x00')
+            reply = recv_exactly(control, 12)
+            relay = (socket.inet_ntoa(reply[6:10]), int.from_bytes(reply[10:12], 'big'))
+
+            client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            client.bind(('127.0.0.1', 0))
+            client.settimeout(0.3)
+            header = build_udp_header(0x01, socket.inet_aton(echo.address[0]), echo.address[1])
+            client.sendto(header + b'ping', relay)
+            mapped = socket.inet_pton(socket.AF_INET6, '::ffff:' + echo.address[0])
+            client.sendto(build_udp_header(0x04, mapped, echo.address[1]) + b'ping', relay)
+            with pytest.raises(socket.timeout):
+                client.recvfrom(65535)
+            client.close()
+            assert wait_for(lambda: proxy.udp_relay.stats()['dropped'] == 2)
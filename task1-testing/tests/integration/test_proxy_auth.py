@@ -0,0 +1,76 @@
+import pytest
+import socket
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+# Общие вспомогательные функции тестов (tests/helpers.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import recv_exactly, wait_for
+from auth import CredentialCache, FileCredentialStore, hash_password
+from local_servers import EchoServer
+from socks5_messages import encode_auth, encode_handshake, encode_request
+
+
+@pytest.fixture
+def authenticator(tmp_path):
+    """Кэш учетных записей из файла с пользователем alice"""
+    path = tmp_path / 'users'
+    path.write_text('alice:' + hash_password(b'secret', iterations=1000) + '\n')
+    return CredentialCache(FileCredentialStore(str(path)))
+
+
+class TestProxyAuth:
+    """Аутентификация username/password (RFC 1929) через прокси"""
+
+    def test_success_and_tunnel(self, proxy_factory, authenticator):
+        proxy, port = proxy_factory(authenticator=authenticator)
+        with EchoServer() as echo, socket.create_connection(('127.0.0.1', port), timeout=5) as client:
+            client.sendall(encode_handshake((0x02,)))
+            assert recv_exactly(client, 2) == b'\x05\x02'
+            client.sendall(encode_auth(b'alice', b'secret'))
+            assert recv_exactly(client, 2) == b'\x01\x00'
+
+            client.sendall(encode_request(*echo.address))
+            assert recv_exactly(client, 10)[:2] == b'\x05\x00'
+            client.sendall(b'ping')
+            assert recv_exactly(client, 4) == b'ping'
+
+    def test_pipelined(self, proxy_factory, authenticator):
+        """Клиент отправляет приветствие, учетные данные и запрос, не дожидаясь ответов"""
+        proxy, port = proxy_factory(authenticator=authenticator)
+        with EchoServer() as echo, socket.create_connection(('127.0.0.1', port), timeout=5) as client:
+            client.sendall(encode_handshake((0x00, 0x02)) + encode_auth(b'alice', b'secret') +
+                           encode_request(*echo.address) + b'hello')
+            data = recv_exactly(client, 2 + 2 + 10 + 5)
+            assert data[:4] == b'\x05\x02\x01\x00'
+            assert data[4:6] == b'\x05\x00'
+            assert data[14:] == b'hello'
+
+    def test_wrong_password(self, proxy_factory, authenticator):
+        proxy, port = proxy_factory(authenticator=authenticator)
+        with socket.create_connection(('127.0.0.1', port), timeout=5) as client:
+            client.sendall(encode_handshake((0x02,)) + encode_auth(b'alice', b'wrong'))
+            assert recv_exactly(client, 4) == b'\x05\x02\x01\x01'
+            assert client.recv(1) == b''
+        assert wait_for(lambda: proxy.metrics.auth_results.value(('failure',)) == 1)
+
+    def test_no_acceptable_methods(self, proxy_factory, authenticator):
+        proxy, port = proxy_factory(authenticator=authenticator)
+        with socket.create_connection(('127.0.0.1', port), timeout=5) as client:
+            client.sendall(encode_handshake())
+            assert recv_exactly(client, 2) == b'\x05\xff'
+            assert client.recv(1) == b''
+
+    def test_repeat_connections_hit_cache(self, proxy_factory, authenticator):
+        proxy, port = proxy_factory(authenticator=authenticator)
+        for _ in range(3):
+            with socket.create_connection(('127.0.0.1', port), timeout=5) as client:
+                client.sendall(encode_handshake((0x02,)) + encode_auth(b'alice', b'secret'))
+                assert recv_exactly(client, 4) == b'\x05\x02\x01\x00'
+
+        stats = proxy.authenticator.stats()
+        assert (stats['misses'], stats['hits']) == (1, 2)
+        assert proxy.metrics.auth_results.value(('success',)) == 3
@@ -0,0 +1,108 @@
+import pytest
+import json
+import socket
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+# Общие вспомогательные функции тестов (tests/helpers.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import find_free_port, recv_exactly, wait_for
+from local_servers import EchoServer
+from relay import RELAY_THREAD, RELAY_SHARED, RELAY_SPLICE
+from resolver import CachingResolver
+from socks5_messages import encode_handshake, encode_request
+from tracing import Tracer
+
+
+def tunnel(proxy, host, port, payload=b'ping'):
+    with socket.create_connection(('127.0.0.1', proxy.port), timeout=5) as client:
+        client.sendall(encode_handshake() + encode_request(host, port) + payload)
+        data = recv_exactly(client, 2 + 10 + len(payload))
+    assert data[:4] == b'\x05\x00\x05\x00'
+    assert data[12:] == payload
+
+
+def tracks(path):
+    """Спаны по дорожкам соединений: tid -> [имена в порядке начала]"""
+    result = {}
+    for event in sorted(json.loads(path.read_text()), key=lambda event: event.get('ts', 0)):
+        if event['ph'] == 'X':
+            result.setdefault(event['tid'], []).append(event)
+    return result
+
+
+class TestProxyTracing:
+    """Трассировка жизненного цикла соединения через прокси"""
+
+    def test_connection_lifecycle(self, tmp_path, proxy_factory):
+        path = tmp_path / 'trace.json'
+        tracer = Tracer(str(path))
+        proxy, _ = proxy_factory(tracer=tracer, resolver=CachingResolver())
+        with EchoServer() as echo:
+            tunnel(proxy, 'localhost', echo.address[1])
+            assert wait_for(lambda: not proxy.traces)
+        tracer.close()
+
+        spans = next(events for events in tracks(path).values()
+                     if any(event['name'] == 'connect' for event in events))
+        names = [event['name'] for event in spans]
+        assert names[:6] == ['accept', 'queue_wait', 'parse_handshake', 'parse_request', 'connect', 'dns']
+        assert set(names[6:]) == {'tunnel', 'first_byte', 'teardown'}
+
+        by_name = {event['name']: event for event in spans}
+        # dns вложен в connect, first_byte и teardown - в tunnel
+        connect, dns = by_name['connect'], by_name['dns']
+        assert connect['ts'] <= dns['ts'] and dns['ts'] + dns['dur'] <= connect['ts'] + connect['dur'] + 1
+        assert by_name['connect']['args'] == {'host': 'localhost', 'port': echo.address[1]}
+        assert by_name['first_byte']['args'] == {'bytes': 4}
+        assert by_name['parse_request']['args']['error'] == 0
+        # accept покрывает сам вызов, ожидание в пуле - отдельный спан сразу после него
+        accept, queue_wait = by_name['accept'], by_name['queue_wait']
+        assert abs(accept['ts'] + accept['dur'] - queue_wait['ts']) < 1
+
+    @pytest.mark.parametrize('relay_mode', [RELAY_THREAD, RELAY_SHARED, RELAY_SPLICE])
+    def test_tunnel_spans_in_every_relay_mode(self, tmp_path, relay_mode, proxy_factory):
+        path = tmp_path / 'trace.json'
+        tracer = Tracer(str(path))
+        proxy, _ = proxy_factory(tracer=tracer, relay_mode=relay_mode)
+        with EchoServer() as echo:
+            tunnel(proxy, *echo.address)
+            # В режимах shared и splice туннель закрывается уже после ответа клиенту
+            assert wait_for(lambda: proxy.metrics.active_tunnels.value() == 0)
+        tracer.close()
+
+        spans = next(events for events in tracks(path).values()
+                     if any(event['name'] == 'connect' for event in events))
+        by_name = {event['name']: event for event in spans}
+        assert {'tunnel', 'first_byte'} <= set(by_name)
+        tunnel_span, first_byte = by_name['tunnel'], by_name['first_byte']
+        assert tunnel_span['ts'] <= first_byte['ts']
+        assert first_byte['ts'] + first_byte['dur'] <= tunnel_span['ts'] + tunnel_span['dur'] + 1
+
+    def test_failed_connect_recorded(self, tmp_path, proxy_factory):
+        path = tmp_path / 'trace.json'
+        tracer = Tracer(str(path))
+        proxy, _ = proxy_factory(tracer=tracer)
+        with socket.create_connection(('127.0.0.1', proxy.port), timeout=5) as client:
+            client.sendall(encode_handshake() + encode_request('127.0.0.1', find_free_port()))
+            assert recv_exactly(client, 12)[3] == 0x04
+        assert wait_for(lambda: not proxy.traces)
+        tracer.close()
+
+        connects = [event for events in tracks(path).values() for event in events if event['name'] == 'connect']
+        assert len(connects) == 1
+        assert 'error' in connects[0]['args']
+
+    def test_sampling_off_writes_nothing(self, tmp_path, proxy_factory):
+        path = tmp_path / 'trace.json'
+        tracer = Tracer(str(path), sample_rate=0.0)
+        proxy, _ = proxy_factory(tracer=tracer)
+        with EchoServer() as echo:
+            tunnel(proxy, *echo.address)
+        tracer.close()
+
+        assert json.loads(path.read_text()) == []
+        assert proxy.traces == {}
@@ -0,0 +1,127 @@
+import pytest
+import socket
+import threading
+import time
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from local_servers import SinkServer
+from relay import RELAY_THREAD, RELAY_SHARED
+from shaping import BandwidthShaper
+from socks5_proxy import Socks5Proxy
+
+RATE = 512 * 1024
+PAYLOAD = 768 * 1024
+# Допуск на планирование потоков и запас ведра
+TOLERANCE = 0.25
+
+
+def open_tunnel(proxy, sink, client_address='10.0.0.1'):
+    """Туннель через start_tunnel прокси: клиентский конец socketpair -> SinkServer"""
+    client, proxy_client = socket.socketpair()
+    remote = socket.create_connection(sink.address)
+    limit = proxy.shaper.open(client_address, sink.address)
+    threading.Thread(target=proxy.start_tunnel, args=(proxy_client, remote, limit), daemon=True).start()
+    return client
+
+
+def send_all(clients, size):
+    """Отправляет size байт в каждый туннель параллельно"""
+    def send(client):
+        client.sendall(bytes(size))
+
+    threads = [threading.Thread(target=send, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def expected_time(rate, total, burst):
+    return (total - burst) / rate
+
+
+@pytest.fixture(params=[RELAY_THREAD, RELAY_SHARED])
+def relay_mode(request):
+    return request.param
+
+
+def make_proxy(relay_mode, **limits):
+    return Socks5Proxy(relay_mode=relay_mode, shaper=BandwidthShaper(**limits))
+
+
+class TestShapingRates:
+    """Ограничения полосы на локальном sink-сервере"""
+
+    def test_per_client_rate(self, relay_mode):
+        """Два туннеля одного клиента вместе не превышают лимит клиента"""
+        proxy = make_proxy(relay_mode, per_client=RATE)
+        with SinkServer() as sink:
+            clients = [open_tunnel(proxy, sink), open_tunnel(proxy, sink)]
+            start = time.perf_counter()
+            threads = send_all(clients, PAYLOAD // 2)
+            assert sink.wait_for_bytes(PAYLOAD, timeout=10)
+            elapsed = time.perf_counter() - start
+
+            expected = expected_time(RATE, PAYLOAD, RATE * 0.25)
+            assert expected * (1 - TOLERANCE) <= elapsed <= expected * (1 + TOLERANCE)
+            assert proxy.metrics.throttled.value() > 0
+            for thread in threads:
+                thread.join()
+            for client in clients:
+                client.close()
+        for relay in proxy.relays:
+            relay.stop()
+
+    def test_clients_limited_separately(self):
+        """Разные клиенты получают лимит каждый"""
+        proxy = make_proxy(RELAY_SHARED, per_client=RATE)
+        with SinkServer() as sink:
+            clients = [open_tunnel(proxy, sink, '10.0.0.1'), open_tunnel(proxy, sink, '10.0.0.2')]
+            start = time.perf_counter()
+            threads = send_all(clients, PAYLOAD)
+            assert sink.wait_for_bytes(2 * PAYLOAD, timeout=10)
+            elapsed = time.perf_counter() - start
+
+            expected = expected_time(2 * RATE, 2 * PAYLOAD, 2 * RATE * 0.25)
+            assert expected * (1 - TOLERANCE) <= elapsed <= expected * (1 + TOLERANCE)
+            for thread in threads:
+                thread.join()
+            for client in clients:
+                client.close()
+        proxy.relays[0].stop()
+
+    def test_global_rate(self):
+        """Общий лимит делится между всеми клиентами"""
+        proxy = make_proxy(RELAY_THREAD, total=RATE)
+        with SinkServer() as sink:
+            clients = [open_tunnel(proxy, sink, f'10.0.0.{i}') for i in range(3)]
+            start = time.perf_counter()
+            threads = send_all(clients, PAYLOAD // 3)
+            assert sink.wait_for_bytes(PAYLOAD, timeout=10)
+            elapsed = time.perf_counter() - start
+
+            expected = expected_time(RATE, PAYLOAD, RATE * 0.25)
+            assert expected * (1 - TOLERANCE) <= elapsed <= expected * (1 + TOLERANCE)
+            for thread in threads:
+                thread.join()
+            for client in clients:
+                client.close()
+
+    def test_throttled_tunnel_idle_cpu(self):
+        """Ожидающий токенов туннель не расходует CPU"""
+        proxy = make_proxy(RELAY_SHARED, per_client=64 * 1024, burst_seconds=0.1)
+        with SinkServer() as sink:
+            client = open_tunnel(proxy, sink)
+            threads = send_all([client], 128 * 1024)
+            time.sleep(0.2)
+            cpu_before = time.process_time()
+            time.sleep(1.0)
+            cpu_used = time.process_time() - cpu_before
+            assert cpu_used < 0.2
+            client.close()
+            for thread in threads:
+                thread.join()
+        proxy.relays[0].stop()
@@ -0,0 +1,221 @@
+import pytest
+import socket
+import threading
+import time
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+# Общие вспомогательные функции тестов (tests/helpers.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import wait_for
+from local_servers import UdpEchoServer
+from resolver import CachingResolver
+from socks5_native import build_udp_header, parse_udp_header
+from udp_relay import UdpRelay
+
+
+def associate(port, client_port=0):
+    """UDP ASSOCIATE: возвращает управляющее TCP соединение и адрес UDP relay"""
+    control = socket.create_connection(('127.0.0.1', port), timeout=5)
+    control.sendall(b'\x05\x01\x00')
+    assert control.recv(2) == b'\x05\x00'
+    control.sendall(b'\x05\x03\x00\x01\x00\x00\x00\x00' + client_port.to_bytes(2, 'big'))
+    reply = control.recv(10)
+    assert reply[:4] == b'\x05\x00\x00\x01'
+    relay_address = (socket.inet_ntoa(reply[4:8]), int.from_bytes(reply[8:10], 'big'))
+    return control, relay_address
+
+
+def udp_client(family=socket.AF_INET):
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.settimeout(2)
+    return sock
+
+
+class TestUdpAssociate:
+    """UDP ASSOCIATE через прокси к локальному UDP echo-серверу"""
+
+    def test_ipv4_roundtrip(self, started_proxy):
+        proxy, port = started_proxy
+        with UdpEchoServer() as echo:
+            control, relay = associate(port)
+            client = udp_client()
+            header = build_udp_header(0x01, socket.inet_aton(echo.address[0]), echo.address[1])
+
+            for i in range(5):
+                client.sendto(header + b'ping %d' % i, relay)
+                data, source = client.recvfrom(65535)
+                assert source == relay
+                ok, reply = parse_udp_header(data)
+                assert ok
+                assert (reply.atyp, reply.dst_port) == (0x01, echo.address[1])
+                assert data[reply.header_len:] == b'ping %d' % i
+
+            stats = proxy.stats()['udp']
+            assert stats['associations'] == 1
+            assert stats['nat_entries'] == 1
+            assert proxy.metrics.udp_datagrams.value(('in',)) == 5
+            control.close()
+            client.close()
+
+    def test_domain_destination(self, started_proxy):
+        """Домен разрешается, ответ помечается IP адресом источника"""
+        proxy, port = started_proxy
+        with UdpEchoServer() as echo:
+            control, relay = associate(port)
+            client = udp_client()
+            client.sendto(build_udp_header(0x03, b'localhost', echo.address[1]) + b'dns', relay)
+            data, _ = client.recvfrom(65535)
+            ok, reply = parse_udp_header(data)
+            assert ok and reply.atyp in (0x01, 0x04)
+            assert data[reply.header_len:] == b'dns'
+            control.close()
+            client.close()
+
+    def test_ipv6_destination(self, started_proxy):
+        try:
+            echo = UdpEchoServer('::1').start()
+        except OSError:
+            pytest.skip("IPv6 loopback is not available")
+        proxy, port = started_proxy
+        try:
+            control, relay = associate(port)
+            client = udp_client()
+            client.sendto(build_udp_header(0x04, socket.inet_pton(socket.AF_INET6, '::1'), echo.address[1])
+                          + b'quic', relay)
+            data, _ = client.recvfrom(65535)
+            ok, reply = parse_udp_header(data)
+            assert ok and reply.atyp == 0x04
+            assert data[reply.header_len:] == b'quic'
+            control.close()
+            client.close()
+        finally:
+            echo.stop()
+
+    def test_foreign_and_fragmented_datagrams_dropped(self, started_proxy):
+        """Датаграммы не от клиента и фрагменты не пересылаются"""
+        proxy, port = started_proxy
+        with UdpEchoServer() as echo:
+            client = udp_client()
+            control, relay = associate(port, client.getsockname()[1])
+            header = build_udp_header(0x01, socket.inet_aton(echo.address[0]), echo.address[1])
+
+            stranger = udp_client()
+            stranger.sendto(header + b'foreign', relay)
+            client.sendto(b'\x00\x00\x01' + header[3:] + b'fragment', relay)
+            client.sendto(header + b'valid', relay)
+
+            data, _ = client.recvfrom(65535)
+            assert data.endswith(b'valid')
+            assert echo.received == 1
+            assert proxy.stats()['udp']['dropped'] >= 2
+            control.close()
+            client.close()
+            stranger.close()
+
+    def test_association_closed_with_tcp(self, started_proxy):
+        proxy, port = started_proxy
+        control, relay = associate(port)
+        assert wait_for(lambda: proxy.stats()['udp']['associations'] == 1)
+        control.close()
+        assert wait_for(lambda: proxy.stats()['udp']['associations'] == 0)
+
+    @pytest.mark.parametrize('started_proxy', [{'udp_idle_timeout': 0.3}], indirect=True)
+    def test_udp_idle_timeout(self, started_proxy):
+        """Ассоциация без датаграмм закрывается вместе с управляющим соединением"""
+        proxy, port = started_proxy
+        control, relay = associate(port)
+        assert control.recv(16) == b''
+        assert wait_for(lambda: proxy.stats()['udp']['associations'] == 0)
+        assert proxy.reclaimed['udp_idle'] == 1
+        control.close()
+
+
+class TestUdpNat:
+    """Таблица NAT ассоциации"""
+
+    def test_nat_entries_expire(self):
+        relay = UdpRelay(nat_timeout=0.5).start()
+        try:
+            with UdpEchoServer() as echo:
+                client = udp_client()
+                association = relay.open('127.0.0.1', '127.0.0.1')
+                header = build_udp_header(0x01, socket.inet_aton(echo.address[0]), echo.address[1])
+                client.sendto(header + b'x', association.address)
+                client.recvfrom(65535)
+                assert relay.stats()['nat_entries'] == 1
+
+                # Записи старше nat_timeout удаляются при очередной проверке
+                relay.sweep(time.monotonic() + 1)
+                assert relay.stats()['nat_entries'] == 0
+
+                # Ответ узла без записи NAT клиенту не передается
+                remote = next(iter(association.remote_socks.values()))
+                echo.sock.sendto(b'late', remote.getsockname())
+                client.settimeout(0.3)
+                with pytest.raises(socket.timeout):
+                    client.recvfrom(65535)
+                client.close()
+        finally:
+            relay.stop()
+
+
+class TestUdpDomainLookup:
+    """Разрешение доменов вне цикла пересылки"""
+
+    def test_slow_lookup_does_not_stall_relay(self):
+        """Пока домен разрешается, датаграммы других ассоциаций проходят, ожидающие доставляются после"""
+        release = threading.Event()
+
+        def slow_resolve(host):
+            release.wait(5)
+            return [(socket.AF_INET, ('127.0.0.1', 0))]
+
+        relay = UdpRelay(resolver=CachingResolver(slow_resolve)).start()
+        try:
+            with UdpEchoServer() as echo:
+                slow_client, fast_client = udp_client(), udp_client()
+                slow = relay.open('127.0.0.1', '127.0.0.1', slow_client.getsockname()[1])
+                fast = relay.open('127.0.0.1', '127.0.0.1', fast_client.getsockname()[1])
+
+                domain_header = build_udp_header(0x03, b'slow.test', echo.address[1])
+                slow_client.sendto(domain_header + b'first', slow.address)
+                slow_client.sendto(domain_header + b'second', slow.address)
+
+                fast_client.sendto(build_udp_header(0x01, socket.inet_aton(echo.address[0]), echo.address[1])
+                                   + b'fast', fast.address)
+                data, _ = fast_client.recvfrom(65535)
+                assert data.endswith(b'fast')
+
+                release.set()
+                payloads = []
+                for _ in range(2):
+                    data, _ = slow_client.recvfrom(65535)
+                    payloads.append(data[parse_udp_header(data)[1].header_len:])
+                assert payloads == [b'first', b'second']
+                assert relay.stats()['dropped'] == 0
+                slow_client.close()
+                fast_client.close()
+        finally:
+            relay.stop()
+
+    def test_undecodable_name_dropped(self):
+        """Имя не из UTF-8 отбрасывает датаграмму, ассоциация продолжает работать"""
+        relay = UdpRelay().start()
+        try:
+            with UdpEchoServer() as echo:
+                client = udp_client()
+                association = relay.open('127.0.0.1', '127.0.0.1')
+                client.sendto(build_udp_header(0x03, b'\xff\xfe.test', echo.address[1]) + b'bad', association.address)
+                client.sendto(build_udp_header(0x01, socket.inet_aton(echo.address[0]), echo.address[1]) + b'ok',
+                              association.address)
+                data, _ = client.recvfrom(65535)
+                assert data.endswith(b'ok')
+                assert wait_for(lambda: relay.stats()['dropped'] == 1)
+                client.close()
+        finally:
+            relay.stop()
@@ -0,0 +1,155 @@
+import pytest
+import socket
+import time
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+# Общие вспомогательные функции тестов (tests/helpers.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import find_free_port, recv_exactly, wait_for
+from acl import AccessControl
+from auth import CredentialCache, FileCredentialStore, hash_password
+from local_servers import EchoServer
+from socks5_messages import encode_handshake, encode_request
+from socks5_proxy import Socks5Proxy
+from upstream import Upstream, UpstreamPool, UpstreamError, POLICY_EWMA
+
+
+class SlowProxy(Socks5Proxy):
+    """Upstream, который отвечает с задержкой"""
+    delay = 0.2
+
+    def handle_client(self, client_socket):
+        time.sleep(self.delay)
+        super().handle_client(client_socket)
+
+
+def roundtrip(pool, address, payload=b'ping'):
+    sock = pool.connect(*address)
+    try:
+        sock.sendall(payload)
+        return recv_exactly(sock, len(payload))
+    finally:
+        sock.close()
+
+
+class TestUpstreamChain:
+    """Подключение через локальные Socks5Proxy в роли upstream"""
+
+    def test_connect_and_release(self, proxy_factory):
+        pool = UpstreamPool([Upstream('127.0.0.1', proxy_factory()[1]) for _ in range(2)])
+        with EchoServer() as echo:
+            for _ in range(4):
+                assert roundtrip(pool, echo.address) == b'ping'
+        stats = pool.stats()['upstreams']
+        assert [upstream['requests'] for upstream in stats] == [2, 2]
+        assert all(upstream['active'] == 0 for upstream in stats)
+
+    def test_failover_and_ejection(self, proxy_factory):
+        dead = Upstream('127.0.0.1', find_free_port())
+        _, port = proxy_factory()
+        pool = UpstreamPool([dead, Upstream('127.0.0.1', port)], eject_failures=2)
+        with EchoServer() as echo:
+            for _ in range(4):
+                assert roundtrip(pool, echo.address) == b'ping'
+        assert dead.failures == 2
+        assert dead.ejections == 1
+
+    def test_upstream_reply_code(self, proxy_factory):
+        """Отказ upstream в доступе к назначению не считается неисправностью upstream"""
+        _, port = proxy_factory(acl=AccessControl([(False, '127.0.0.0/8')]))
+        upstream = Upstream('127.0.0.1', port)
+        pool = UpstreamPool([upstream])
+        with EchoServer() as echo:
+            with pytest.raises(UpstreamError) as error:
+                pool.connect(*echo.address)
+        assert error.value.code == 0x02
+        assert (upstream.failures, upstream.active) == (0, 0)
+
+    def test_upstream_with_auth(self, tmp_path, proxy_factory):
+        path = tmp_path / 'users'
+        path.write_text('alice:' + hash_password(b'secret', iterations=1000) + '\n')
+        _, port = proxy_factory(authenticator=CredentialCache(FileCredentialStore(str(path))))
+        upstream = Upstream('127.0.0.1', port, credentials=(b'alice', b'secret'))
+        pool = UpstreamPool([upstream])
+        with EchoServer() as echo:
+            assert roundtrip(pool, echo.address) == b'ping'
+
+    def test_traffic_moves_away_from_slow_upstream(self, proxy_factory):
+        slow = Upstream('127.0.0.1', proxy_factory(SlowProxy)[1])
+        fast = Upstream('127.0.0.1', proxy_factory()[1])
+        pool = UpstreamPool([slow, fast], policy=POLICY_EWMA)
+        with EchoServer() as echo:
+            started = time.time()
+            for _ in range(30):
+                assert roundtrip(pool, echo.address) == b'ping'
+            elapsed = time.time() - started
+        # Один медленный ответ - и EWMA уводит трафик на быстрый upstream
+        assert slow.requests <= 2
+        assert elapsed < 2
+
+    def test_health_check_ejects_slow_upstream(self, proxy_factory):
+        slow = Upstream('127.0.0.1', proxy_factory(SlowProxy)[1])
+        healthy = [Upstream('127.0.0.1', proxy_factory()[1]) for _ in range(2)]
+        pool = UpstreamPool([slow] + healthy, health_interval=0.05).start()
+        try:
+            assert wait_for(lambda: slow.ejections == 1)
+            assert pool.acquire() is not slow
+        finally:
+            pool.stop()
+
+    def test_health_check_marks_dead_upstream(self, proxy_factory):
+        dead = Upstream('127.0.0.1', find_free_port())
+        pool = UpstreamPool([dead, Upstream('127.0.0.1', proxy_factory()[1])])
+        pool.check_all()
+        assert dead.healthy is False
+        assert pool.stats()['upstreams'][0]['healthy'] is False
+
+
+class TestProxyWithUpstreams:
+    """Клиент -> прокси -> upstream -> назначение"""
+
+    def test_chained_tunnel(self, proxy_factory):
+        pool = UpstreamPool([Upstream('127.0.0.1', proxy_factory()[1]) for _ in range(2)])
+        _, port = proxy_factory(upstreams=pool)
+        with EchoServer() as echo, socket.create_connection(('127.0.0.1', port), timeout=5) as client:
+            client.sendall(encode_handshake() + encode_request(*echo.address) + b'hello')
+            data = recv_exactly(client, 2 + 10 + 5)
+            assert data[:4] == b'\x05\x00\x05\x00'
+            assert data[12:] == b'hello'
+        assert wait_for(lambda: all(upstream['active'] == 0 for upstream in pool.stats()['upstreams']))
+
+    def test_upstream_code_passed_to_client(self, proxy_factory):
+        _, upstream_port = proxy_factory(acl=AccessControl([(False, '127.0.0.0/8')]))
+        pool = UpstreamPool([Upstream('127.0.0.1', upstream_port)])
+        _, port = proxy_factory(upstreams=pool)
+        with EchoServer() as echo, socket.create_connection(('127.0.0.1', port), timeout=5) as client:
+            client.sendall(encode_handshake() + encode_request(*echo.address))
+            assert recv_exactly(client, 12)[2:4] == b'\x05\x02'
+
+    def test_acl_applies_before_upstream(self, proxy_factory):
+        """Цепочка не обходит ACL: запрещенный адрес и домен, указывающий на запрещенную сеть"""
+        upstream = Upstream('127.0.0.1', proxy_factory()[1])
+        pool = UpstreamPool([upstream])
+        _, port = proxy_factory(upstreams=pool, acl=AccessControl([(False, '127.0.0.0/8'), (False, '::1')]))
+        with EchoServer() as echo:
+            for host in (echo.address[0], 'localhost'):
+                with socket.create_connection(('127.0.0.1', port), timeout=5) as client:
+                    client.sendall(encode_handshake() + encode_request(host, echo.address[1]))
+                    assert recv_exactly(client, 12)[2:4] == b'\x05\x02'
+        assert upstream.requests == 0
+
+    def test_checked_domain_sent_as_address(self, proxy_factory):
+        """Домен без своего правила разрешается на прокси, upstream получает проверенный адрес"""
+        _, upstream_port = proxy_factory(acl=AccessControl([(False, 'localhost')]))
+        pool = UpstreamPool([Upstream('127.0.0.1', upstream_port)])
+        # ::1 запрещен, чтобы из адресов localhost остался адрес echo-сервера
+        _, port = proxy_factory(upstreams=pool, acl=AccessControl([(False, '10.0.0.0/8'), (False, '::1')]))
+        with EchoServer() as echo, socket.create_connection(('127.0.0.1', port), timeout=5) as client:
+            client.sendall(encode_handshake() + encode_request('localhost', echo.address[1]) + b'hello')
+            data = recv_exactly(client, 2 + 10 + 5)
+            assert data[:4] == b'\x05\x00\x05\x00'
+            assert data[12:] == b'hello'
@@ -0,0 +1,77 @@
+import pytest
+import random
+import socket
+import time
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from acl import AccessControl
+
+LOOKUPS = 50000
+
+
+def build_rules(count, rng):
+    """Смесь IPv4/IPv6 CIDR и доменов, как в типичных списках блокировки"""
+    rules = []
+    for i in range(count):
+        kind = i % 3
+        if kind == 0:
+            address = socket.inet_ntoa(rng.getrandbits(32).to_bytes(4, 'big'))
+            rules.append((False, f'{address}/{rng.choice((16, 20, 24, 28, 32))}'))
+        elif kind == 1:
+            address = socket.inet_ntop(socket.AF_INET6, rng.getrandbits(128).to_bytes(16, 'big'))
+            rules.append((False, f'{address}/{rng.choice((32, 48, 64, 128))}'))
+        else:
+            rules.append((False, f'host{i}.tracker{i % 997}.example'))
+    return rules
+
+
+def build_hosts(rng):
+    hosts = []
+    for i in range(1000):
+        hosts.append(socket.inet_ntoa(rng.getrandbits(32).to_bytes(4, 'big')))
+        hosts.append(socket.inet_ntop(socket.AF_INET6, rng.getrandbits(128).to_bytes(16, 'big')))
+        hosts.append(f'www.host{i * 3 + 2}.tracker{(i * 3 + 2) % 997}.example')
+    return hosts
+
+
+def lookups_per_second(acl, hosts):
+    allows = acl.allows
+    started = time.perf_counter()
+    for i in range(LOOKUPS):
+        allows(hosts[i % len(hosts)])
+    return LOOKUPS / (time.perf_counter() - started)
+
+
+class TestAclLookup:
+    """Скорость проверки назначения в зависимости от числа правил"""
+
+    def test_lookup_rate_independent_of_rule_count(self):
+        rng = random.Random(1)
+        hosts = build_hosts(rng)
+
+        small = AccessControl(build_rules(100, rng))
+        started = time.perf_counter()
+        large = AccessControl(build_rules(100000, rng))
+        compile_time = time.perf_counter() - started
+
+        small_rate = max(lookups_per_second(small, hosts) for _ in range(3))
+        large_rate = max(lookups_per_second(large, hosts) for _ in range(3))
+        print(f"\n100 rules: {small_rate:,.0f} lookups/s, 100k rules: {large_rate:,.0f} lookups/s, "
+              f"compile {compile_time:.2f}s")
+
+        # Деревья: путь поиска ограничен длиной адреса, а не числом правил
+        assert large_rate > small_rate * 0.5
+        assert large_rate > 50000
+
+    def test_matches_rules(self):
+        rng = random.Random(2)
+        rules = build_rules(3000, rng)
+        acl = AccessControl(rules)
+        for allow, pattern in rules[2::3]:
+            assert not acl.allows('www.' + pattern)
+        for allow, pattern in rules[:3000:3]:
+            assert not acl.allows(pattern.split('/')[0])
@@ -0,0 +1,56 @@
+import pytest
+import time
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from socks5_native import Socks5Handshake, Socks5Request, ext_backend, native_backend, python_backend
+
+# Сообщения разного размера: от минимального запроса до максимального домена
+MESSAGES = [
+    ('handshake 3B', 'handshake', b'\x05\x01\x00'),
+    ('handshake 257B', 'handshake', b'\x05\xff' + bytes(range(255))),
+    ('request ipv4 10B', 'request', b'\x05\x01\x00\x01\x7f\x00\x00\x01\x04\x38'),
+    ('request domain 18B', 'request', b'\x05\x01\x00\x03\x0bexample.com\x00\x50'),
+    ('request ipv6 22B', 'request', b'\x05\x01\x00\x04' + bytes(16) + b'\x01\xbb'),
+    ('request domain 261B', 'request', b'\x05\x01\x00\x03' + bytes([254]) + b'a' * 254 + b'\x00\x50'),
+]
+
+
+def time_per_message(backend, kind, data, iterations=5000):
+    if kind == 'handshake':
+        parse, result = backend.parse_handshake, Socks5Handshake()
+    else:
+        parse, result = backend.parse_request, Socks5Request()
+
+    start_time = time.perf_counter()
+    for _ in range(iterations):
+        assert parse(data, result) == 0
+    return (time.perf_counter() - start_time) / iterations
+
+
+class TestBackendPerformance:
+    """Сравнение расширения, C через ctypes и pure-Python парсеров по размерам сообщений"""
+
+    def test_backends_by_message_size(self):
+        """Печатает таблицу: какой backend быстрее для каждого размера"""
+        try:
+            native = native_backend()
+        except OSError:
+            pytest.skip("C library not compiled. Run 'make' first.")
+        backends = {'native': native, 'python': python_backend()}
+        try:
+            backends['ext'] = ext_backend()
+        except OSError:
+            pass
+
+        print(f"\n{'message':<22}" + ''.join(f"{name + ' ns':>12}" for name in backends) + "  winner")
+        for name, kind, data in MESSAGES:
+            times = {backend_name: time_per_message(backend, kind, data) for backend_name, backend in backends.items()}
+            winner = min(times, key=times.get)
+            print(f"{name:<22}" + ''.join(f"{value * 1e9:>12.0f}" for value in times.values()) + f"  {winner}")
+
+            # Все реализации укладываются в исходную границу performance тестов
+            assert all(value < 0.001 for value in times.values())
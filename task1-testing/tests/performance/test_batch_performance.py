@@ -0,0 +1,61 @@
+import time
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from socks5_native import parse_request, parse_handshake, pack_messages, parse_requests_batch, parse_handshakes_batch
+
+
+def measure(func, *args):
+    start_time = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start_time, result
+
+
+class TestBatchPerformance:
+    """Сравнение пакетного парсинга с парсингом по одному сообщению"""
+    
+    iterations = 20000
+    
+    def build_requests(self):
+        ipv4_data = b'\x05\x01\x00\x01\x7f\x00\x00\x01\x04\x38'
+        domain_data = b'\x05\x01\x00\x03\x0bexample.com\x00\x50'
+        return [ipv4_data if i % 2 == 0 else domain_data for i in range(self.iterations)]
+    
+    def test_request_batch_vs_per_message(self):
+        """Пакетный парсинг запросов быстрее поштучного"""
+        messages = self.build_requests()
+        data, offsets = pack_messages(messages)
+        
+        def per_message():
+            return sum(1 for message in messages if parse_request(message)[0])
+        
+        per_message_time, per_message_parsed = measure(per_message)
+        batch_time, batch = measure(parse_requests_batch, data, offsets)
+        
+        print(f"\nper-message: {per_message_time / self.iterations * 1e9:.0f} ns/msg, "
+              f"batch: {batch_time / self.iterations * 1e9:.0f} ns/msg, "
+              f"speedup: {per_message_time / batch_time:.1f}x")
+        
+        assert batch.parsed == per_message_parsed == self.iterations
+        assert batch_time < per_message_time
+    
+    def test_handshake_batch_vs_per_message(self):
+        """Пакетный парсинг handshake быстрее поштучного"""
+        messages = [b'\x05\x01\x00'] * self.iterations
+        data, offsets = pack_messages(messages)
+        
+        def per_message():
+            return sum(1 for message in messages if parse_handshake(message)[0])
+        
+        per_message_time, per_message_parsed = measure(per_message)
+        batch_time, batch = measure(parse_handshakes_batch, data, offsets)
+        
+        print(f"\nper-message: {per_message_time / self.iterations * 1e9:.0f} ns/msg, "
+              f"batch: {batch_time / self.iterations * 1e9:.0f} ns/msg, "
+              f"speedup: {per_message_time / batch_time:.1f}x")
+        
+        assert batch.parsed == per_message_parsed == self.iterations
+        assert batch_time < per_message_time
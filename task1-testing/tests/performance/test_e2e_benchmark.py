@@ -0,0 +1,53 @@
+import pytest
+import json
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from benchmark import BenchmarkSuite, main, flatten
+
+
+class TestEndToEndBenchmark:
+    """Короткий прогон сквозных бенчмарков"""
+
+    def test_suite_reports_all_metrics(self):
+        suite = BenchmarkSuite(concurrency=(1, 4), connections=100,
+                               payload_bytes=8 * 1024 * 1024, idle_tunnels=50)
+        results = suite.run()
+        flat = flatten(results['results'])
+
+        print()
+        for metric, value in flat.items():
+            print(f"{metric}: {value:.3f}")
+
+        for level in ('1', '4'):
+            assert flat[f'connect.{level}.connections_per_sec'] > 0
+            assert flat[f'connect.{level}.latency_p50_ms'] <= flat[f'connect.{level}.latency_p99_ms']
+            assert flat[f'connect.{level}.latency_p99_ms'] <= flat[f'connect.{level}.latency_p999_ms']
+        assert flat['throughput.single_mb_s'] > 0
+        assert flat['throughput.aggregate_mb_s.4'] > 0
+        assert 'rss_per_tunnel_kb' in results['results']['memory']
+
+    def test_baseline_workflow(self, tmp_path):
+        """Сохранение baseline и повторный прогон с проверкой регрессий"""
+        output = str(tmp_path / 'results.json')
+        baseline = str(tmp_path / 'baseline.json')
+        args = ['--output', output, '--baseline', baseline, '--concurrency', '2',
+                '--connections', '50', '--payload-mb', '4', '--idle-tunnels', '20']
+
+        assert main(args + ['--save-baseline']) == 0
+        with open(baseline) as f:
+            assert 'connect' in json.load(f)['results']
+
+        # Порог с запасом: проверяется сам механизм, а не стабильность машины
+        assert main(args + ['--threshold', '20']) == 0
+
+        # Завышенный baseline пропускной способности - регрессия
+        with open(baseline) as f:
+            data = json.load(f)
+        data['results']['throughput']['single_mb_s'] *= 1000
+        with open(baseline, 'w') as f:
+            json.dump(data, f)
+        assert main(args) == 1
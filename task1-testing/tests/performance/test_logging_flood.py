@@ -0,0 +1,72 @@
+import pytest
+import socket
+import time
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+# Общие вспомогательные функции тестов (tests/helpers.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import start_proxy
+from event_log import EventLogger
+
+FLOOD_CONNECTIONS = 1000
+# Задержка записи в stdout (терминал или pipe, который не успевают читать)
+WRITE_DELAY = 0.002
+
+
+class SlowStream:
+    def write(self, data):
+        time.sleep(WRITE_DELAY)
+
+    def flush(self):
+        pass
+
+
+class SyncLogger:
+    """Запись в поток прямо в рабочем потоке - как print до появления event_log"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def log(self, event, level='info', **fields):
+        self.stream.write(f"{event} {fields}\n")
+        self.stream.flush()
+
+    def info(self, event, **fields):
+        self.log(event, 'info', **fields)
+
+    def warning(self, event, **fields):
+        self.log(event, 'warning', **fields)
+
+
+def flood_rate(logger):
+    """Подключений в секунду при потоке невалидных handshake"""
+    port = start_proxy(max_workers=4, backlog=1024, logger=logger).port
+
+    start = time.perf_counter()
+    for _ in range(FLOOD_CONNECTIONS):
+        with socket.create_connection(('127.0.0.1', port), timeout=10) as client:
+            client.sendall(b'\x04\x01\x00')
+            assert client.recv(2) == b'\x05\xff'
+    return FLOOD_CONNECTIONS / (time.perf_counter() - start)
+
+
+class TestLoggingFlood:
+    """Скорость приема соединений не ограничена записью лога"""
+
+    def test_malformed_handshake_flood(self):
+        sync_rate = flood_rate(SyncLogger(SlowStream()))
+        logger = EventLogger(stream=SlowStream())
+        async_rate = flood_rate(logger)
+        stats = logger.stats()
+        logger.close()
+
+        print(f"\nSync logging: {sync_rate:.0f} conn/s, background logging: {async_rate:.0f} conn/s, "
+              f"rate limited: {stats['rate_limited']}, dropped: {stats['dropped']}")
+
+        # Синхронная запись ограничивает прием ~2 записями на подключение
+        assert sync_rate < 1 / (2 * WRITE_DELAY) * 1.1
+        assert async_rate > sync_rate * 2
@@ -0,0 +1,67 @@
+import pytest
+import socket
+import time
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+# Общие вспомогательные функции тестов (tests/helpers.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import start_proxy
+from metrics import ProxyMetrics
+from local_servers import EchoServer
+
+CONNECTIONS = 200
+
+
+def instrumentation_cost():
+    """Время всех обращений к метрикам, которые делает одно подключение"""
+    metrics = ProxyMetrics()
+    iterations = 20000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        metrics.accepted.inc()
+        metrics.handshake_time.observe(0.0002)
+        metrics.request_parse_time.observe(0.00001)
+        metrics.connect_time.observe(0.001)
+        metrics.replies.inc(labels=(0,))
+        metrics.active_tunnels.inc()
+        metrics.bytes_in.inc(4096)
+        metrics.bytes_out.inc(4096)
+        metrics.active_tunnels.dec()
+        metrics.tunnel_lifetime.observe(0.5)
+    return (time.perf_counter() - start) / iterations
+
+
+def connection_cost():
+    """Время одного CONNECT с обменом данными через прокси"""
+    port = start_proxy().port
+
+    with EchoServer() as echo:
+        request = b'\x05\x01\x00\x01' + socket.inet_aton(echo.address[0]) + echo.address[1].to_bytes(2, 'big')
+        start = time.perf_counter()
+        for _ in range(CONNECTIONS):
+            with socket.create_connection(('127.0.0.1', port), timeout=5) as client:
+                client.sendall(b'\x05\x01\x00')
+                client.recv(2)
+                client.sendall(request)
+                client.recv(10)
+                client.sendall(b'ping')
+                client.recv(4)
+        return (time.perf_counter() - start) / CONNECTIONS
+
+
+class TestMetricsOverhead:
+    """Стоимость сбора метрик относительно обработки подключения"""
+
+    def test_instrumentation_is_cheap(self):
+        per_connection = instrumentation_cost()
+        total = connection_cost()
+        share = per_connection / total
+
+        print(f"\nMetrics per connection: {per_connection * 1e6:.1f} us, "
+              f"connection: {total * 1e6:.0f} us, overhead: {share:.2%}")
+
+        assert share < 0.03
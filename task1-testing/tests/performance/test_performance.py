@@ -7,7 +7,7 @@ import os
 # Добавляем путь к src/python для импортов
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
 
-from socks5_native import parse_handshake, parse_request, Socks5Handshake, Socks5Request
+from socks5_native import parse_handshake, parse_request, parse_request_fast, Socks5Handshake, Socks5Request
 from socks5_proxy import Socks5Proxy
 
 class TestPerformance:
@@ -54,6 +54,25 @@ class TestPerformance:
         time_per_operation = total_time / iterations
         assert time_per_operation < 0.001  # 1ms per operation
     
+    def test_request_fast_parsing_performance(self):
+        """Тест производительности парсинга в структуру текущего потока"""
+        ipv4_data = b'\x05\x01\x00\x01\x7f\x00\x00\x01\x04\x38'
+        domain_view = memoryview(bytearray(b'\x05\x01\x00\x03\x0bexample.com\x00\x50'))
+        
+        start_time = time.time()
+        iterations = 10000
+        
+        for i in range(iterations):
+            data = ipv4_data if i % 2 == 0 else domain_view
+            success, request = parse_request_fast(data)
+            assert success == True
+        
+        end_time = time.time()
+        total_time = end_time - start_time
+        
+        time_per_operation = total_time / iterations
+        assert time_per_operation < 0.001  # 1ms per operation
+    
     def test_concurrent_parsing_performance(self):
         """Тест производительности при конкурентном парсинге"""
         test_data = b'\x05\x01\x00\x01\x7f\x00\x00\x01\x04\x38'
@@ -0,0 +1,58 @@
+import pytest
+import socket
+import time
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+# Общие вспомогательные функции тестов (tests/helpers.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import start_proxy
+from local_servers import SinkServer
+from splice_relay import splice_supported
+
+PAYLOAD_SIZE = 64 * 1024 * 1024
+
+
+def measure_throughput(relay_mode):
+    """MB/s при передаче PAYLOAD_SIZE байт через прокси в локальный sink"""
+    port = start_proxy(relay_mode=relay_mode).port
+
+    with SinkServer() as sink:
+        client = socket.create_connection(('127.0.0.1', port), timeout=10)
+        try:
+            client.sendall(b'\x05\x01\x00')
+            assert client.recv(2) == b'\x05\x00'
+            sink_ip, sink_port = sink.address
+            client.sendall(b'\x05\x01\x00\x01' + socket.inet_aton(sink_ip) + sink_port.to_bytes(2, 'big'))
+            assert client.recv(10)[1] == 0x00
+
+            chunk = memoryview(bytes(1 << 20))
+            start_time = time.perf_counter()
+            for _ in range(PAYLOAD_SIZE // len(chunk)):
+                client.sendall(chunk)
+            assert sink.wait_for_bytes(PAYLOAD_SIZE, timeout=60)
+            elapsed = time.perf_counter() - start_time
+        finally:
+            client.close()
+
+    return PAYLOAD_SIZE / elapsed / 1e6
+
+
+class TestRelayThroughput:
+    """Пропускная способность одного туннеля в разных режимах пересылки"""
+
+    def test_splice_vs_copy(self):
+        if not splice_supported():
+            pytest.skip("os.splice is not supported here")
+
+        copy_rate = measure_throughput('thread')
+        splice_rate = measure_throughput('splice')
+
+        print(f"\ncopy: {copy_rate:.0f} MB/s, splice: {splice_rate:.0f} MB/s, "
+              f"gain: {splice_rate / copy_rate:.2f}x")
+
+        assert copy_rate > 0
+        assert splice_rate > 0
@@ -0,0 +1,45 @@
+import time
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from resolver import CachingResolver
+
+
+class SlowStubResolver:
+    """Заглушка DNS с фиксированной задержкой ответа"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self, host):
+        self.calls += 1
+        time.sleep(self.delay)
+        return [(2, ('10.0.0.1', 0))]
+
+
+class TestResolverPerformance:
+    """Экономия времени на повторных запросах популярных имен"""
+
+    def test_cache_hit_rate_and_latency(self):
+        stub = SlowStubResolver(delay=0.005)
+        resolver = CachingResolver(stub)
+        # 10 популярных имен, 500 соединений
+        hosts = [f'host{i % 10}.test' for i in range(500)]
+
+        start_time = time.perf_counter()
+        for host in hosts:
+            resolver.resolve(host, 443)
+        cached_time = time.perf_counter() - start_time
+
+        uncached_time = len(hosts) * stub.delay
+        stats = resolver.stats()
+        print(f"\nhit rate: {stats['hit_rate']:.1%}, cached: {cached_time * 1000:.0f} ms, "
+              f"uncached (estimated): {uncached_time * 1000:.0f} ms")
+
+        assert stub.calls == 10
+        assert stats['hit_rate'] == 0.98
+        assert cached_time < uncached_time / 10
@@ -0,0 +1,55 @@
+import pytest
+import socket
+import threading
+import time
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from local_servers import SinkServer
+from relay import RELAY_THREAD, RELAY_SHARED
+from shaping import BandwidthShaper
+from socks5_proxy import Socks5Proxy
+
+PAYLOAD_SIZE = 128 * 1024 * 1024
+# Лимиты заведомо выше скорости loopback: ведра проверяются, но не ограничивают
+UNREACHABLE_RATE = 100 * 1024 ** 3
+
+
+def measure_throughput(relay_mode, shaper):
+    """MB/s одного туннеля через start_tunnel прокси в локальный sink"""
+    proxy = Socks5Proxy(relay_mode=relay_mode, shaper=shaper)
+    with SinkServer() as sink:
+        client, proxy_client = socket.socketpair()
+        remote = socket.create_connection(sink.address)
+        limit = shaper.open('10.0.0.1', sink.address) if shaper else None
+        threading.Thread(target=proxy.start_tunnel, args=(proxy_client, remote, limit), daemon=True).start()
+
+        chunk = memoryview(bytes(1 << 20))
+        start_time = time.perf_counter()
+        for _ in range(PAYLOAD_SIZE // len(chunk)):
+            client.sendall(chunk)
+        assert sink.wait_for_bytes(PAYLOAD_SIZE, timeout=60)
+        elapsed = time.perf_counter() - start_time
+        client.close()
+    for relay in proxy.relays:
+        relay.stop()
+    return PAYLOAD_SIZE / elapsed / 1e6
+
+
+class TestShapingOverhead:
+    """Стоимость проверки ведер токенов, когда лимит не достигается"""
+
+    @pytest.mark.parametrize('relay_mode', [RELAY_THREAD, RELAY_SHARED])
+    def test_overhead_without_throttling(self, relay_mode):
+        shaper = BandwidthShaper(per_client=UNREACHABLE_RATE, per_destination=UNREACHABLE_RATE,
+                                 total=UNREACHABLE_RATE)
+        plain = max(measure_throughput(relay_mode, None) for _ in range(3))
+        shaped = max(measure_throughput(relay_mode, shaper) for _ in range(3))
+        overhead = 1 - shaped / plain
+        print(f"\n{relay_mode}: plain {plain:.0f} MB/s, shaped {shaped:.0f} MB/s, overhead {overhead:.1%}")
+
+        # Три ведра на чтение: проверка должна теряться на фоне копирования данных
+        assert shaped > plain * 0.7
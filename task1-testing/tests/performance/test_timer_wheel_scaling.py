@@ -0,0 +1,49 @@
+import pytest
+import time
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from timer_wheel import TimerWheel
+
+OPERATIONS = 20000
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def operation_cost(tracked):
+    """Среднее время schedule + cancel + шага колеса при tracked отслеживаемых соединениях"""
+    clock = FakeClock()
+    wheel = TimerWheel(clock=clock)
+    # Таймауты простоя по 300с: колесо полно, но текущие слоты почти пусты
+    for i in range(tracked):
+        wheel.schedule(300 + i % 1000 * 0.01, None, idle=True)
+
+    start = time.perf_counter()
+    for _ in range(OPERATIONS):
+        timer = wheel.schedule(30, None)
+        wheel.cancel(timer)
+    clock.now += 1
+    wheel.advance()
+    elapsed = time.perf_counter() - start
+    assert wheel.stats()['pending'] == tracked
+    return elapsed / OPERATIONS
+
+
+class TestTimerWheelScaling:
+    """Стоимость операций колеса не зависит от числа соединений"""
+
+    def test_constant_cost(self):
+        small = min(operation_cost(1000) for _ in range(3))
+        large = min(operation_cost(100000) for _ in range(3))
+        print(f"\nper-op: 1k timers {small * 1e6:.2f}us, 100k timers {large * 1e6:.2f}us")
+        # O(1): рост в 100 раз числа таймеров не должен заметно влиять на операцию
+        assert large < small * 2
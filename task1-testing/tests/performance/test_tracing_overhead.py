@@ -0,0 +1,88 @@
+import pytest
+import io
+import socket
+import time
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+# Общие вспомогательные функции тестов (tests/helpers.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import start_proxy
+from local_servers import EchoServer
+from socks5_proxy import Socks5Proxy
+from tracing import Tracer
+
+CONNECTIONS = 200
+ROUNDS = 3
+
+
+def disabled_tracing_cost(tracer):
+    """Время проверок трассировки, которые делает одно подключение вне выборки"""
+    proxy = Socks5Proxy(tracer=tracer)
+    client = socket.socket()
+    iterations = 20000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        # start(): решение о выборке
+        if proxy.tracer is not None:
+            proxy.tracer.sample()
+        # handle_client, handle_connect, tunnel_data
+        for _ in range(3):
+            trace = proxy.trace_for(client)
+        # Проверки `trace is not None` в точках трассировки
+        for _ in range(12):
+            if trace is not None:
+                pass
+    elapsed = time.perf_counter() - start
+    client.close()
+    return elapsed / iterations
+
+
+def connection_cost(proxy):
+    """Время одного CONNECT с обменом данными через прокси"""
+    with EchoServer() as echo:
+        request = b'\x05\x01\x00\x01' + socket.inet_aton(echo.address[0]) + echo.address[1].to_bytes(2, 'big')
+        start = time.perf_counter()
+        for _ in range(CONNECTIONS):
+            with socket.create_connection(('127.0.0.1', proxy.port), timeout=5) as client:
+                client.sendall(b'\x05\x01\x00')
+                client.recv(2)
+                client.sendall(request)
+                client.recv(10)
+                client.sendall(b'ping')
+                client.recv(4)
+        return (time.perf_counter() - start) / CONNECTIONS
+
+
+class TestTracingOverhead:
+    """Стоимость трассировки, когда соединение не попало в выборку"""
+
+    def test_disabled_tracing_is_free(self):
+        tracers = {
+            'none': None,
+            'sample 0': Tracer(stream=io.StringIO(), sample_rate=0.0),
+            'sample 1': Tracer(stream=io.StringIO(), sample_rate=1.0),
+        }
+        proxies = {name: start_proxy(tracer=tracer) for name, tracer in tracers.items()}
+        # Замеры чередуются, чтобы фоновые колебания нагрузки делились между вариантами
+        costs = {name: float('inf') for name in proxies}
+        for _ in range(ROUNDS):
+            for name, proxy in proxies.items():
+                costs[name] = min(costs[name], connection_cost(proxy))
+
+        checks = {name: disabled_tracing_cost(tracers[name]) for name in ('none', 'sample 0')}
+        print('\n' + ', '.join(f"{name}: {cost * 1e6:.0f} us/connection" for name, cost in costs.items()))
+        print(', '.join(f"checks with tracer {name}: {cost * 1e6:.2f} us" for name, cost in checks.items()))
+        for tracer in tracers.values():
+            if tracer is not None:
+                tracer.close()
+
+        # Без выборки трассировка - несколько сравнений с None на подключение
+        assert checks['none'] / costs['none'] < 0.005
+        assert checks['sample 0'] / costs['none'] < 0.01
+        # Сквозной замер шумит сильнее, граница - с запасом на колебания
+        assert costs['sample 0'] < costs['none'] * 1.2
+        assert tracers['sample 1'].stats()['written'] > 0
@@ -0,0 +1,61 @@
+import pytest
+import socket
+import threading
+import time
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from local_servers import UdpEchoServer
+from socks5_native import build_udp_header
+from udp_relay import UdpRelay
+
+DURATION = 1.0
+# Датаграмм в полете: клиент не ждет каждый ответ, как DNS/QUIC под нагрузкой
+WINDOW = 32
+
+
+def measure_pps(batch_size, payload_size=64):
+    """Датаграмм в секунду (туда и обратно) через UdpRelay к UDP echo-серверу"""
+    relay = UdpRelay(batch_size=batch_size).start()
+    with UdpEchoServer() as echo:
+        client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        client.bind(('127.0.0.1', 0))
+        client.settimeout(0.2)
+        association = relay.open('127.0.0.1', '127.0.0.1')
+        datagram = build_udp_header(0x01, socket.inet_aton(echo.address[0]), echo.address[1]) + bytes(payload_size)
+
+        received = 0
+        inflight = 0
+        deadline = time.perf_counter() + DURATION
+        start = time.perf_counter()
+        while time.perf_counter() < deadline:
+            while inflight < WINDOW:
+                client.sendto(datagram, association.address)
+                inflight += 1
+            try:
+                client.recvfrom(65535)
+            except socket.timeout:
+                # Потерянные датаграммы не останавливают замер: окно начинается заново
+                inflight = 0
+                continue
+            received += 1
+            inflight -= 1
+        elapsed = time.perf_counter() - start
+        client.close()
+    relay.stop()
+    return received / elapsed
+
+
+class TestUdpThroughput:
+    """Пропускная способность UDP relay в датаграммах в секунду"""
+
+    def test_packets_per_second(self):
+        single = measure_pps(batch_size=1)
+        batched = measure_pps(batch_size=64)
+        print(f"\nUDP relay: {single:.0f} pps without batching, {batched:.0f} pps with batch of 64")
+
+        assert single > 0
+        assert batched > 0
@@ -0,0 +1,192 @@
+import pytest
+import ipaddress
+import os
+import random
+import sys
+import time
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from acl import AccessControl, CidrTrie, DomainTrie, Rule, RuleSet, parse_pattern, parse_rules
+
+
+def reference_match(rules, address):
+    """Самое длинное совпадение полным перебором, при равенстве - запрет"""
+    best = None
+    for allow, pattern in rules:
+        network = ipaddress.ip_network(pattern, strict=False)
+        if address.version != network.version or address not in network:
+            continue
+        key = (network.prefixlen, not allow)
+        if best is None or key > best[0]:
+            best = (key, allow)
+    return None if best is None else best[1]
+
+
+def random_rules(rng, version, count):
+    bits, cls = (32, ipaddress.IPv4Address) if version == 4 else (128, ipaddress.IPv6Address)
+    rules = []
+    for _ in range(count):
+        prefixlen = rng.randint(0, bits) if rng.random() < 0.1 else rng.randint(bits // 4, bits)
+        # Узкое адресное пространство, чтобы правила пересекались
+        address = cls(rng.getrandbits(8) << (bits - 8) | rng.getrandbits(bits - 8) & 0xFFFF)
+        rules.append((rng.random() < 0.5, f'{address}/{prefixlen}'))
+    return rules
+
+
+class TestCidrTrie:
+    """Поиск самого длинного префикса"""
+
+    @pytest.mark.parametrize('version', [4, 6])
+    def test_matches_reference(self, version):
+        rng = random.Random(version)
+        rules = random_rules(rng, version, 300)
+        ruleset = RuleSet(rules, default=None)
+        bits, cls = (32, ipaddress.IPv4Address) if version == 4 else (128, ipaddress.IPv6Address)
+
+        for allow, pattern in rules[:100]:
+            network = ipaddress.ip_network(pattern, strict=False)
+            addresses = [network.network_address, network.broadcast_address]
+            addresses.append(cls(rng.getrandbits(8) << (bits - 8) | rng.getrandbits(16)))
+            for address in addresses:
+                assert ruleset.match(str(address)).allow == reference_match(rules, address), address
+
+    def test_longest_prefix_wins(self):
+        trie = CidrTrie()
+        wide, narrow, host = Rule(False, 'wide'), Rule(True, 'narrow'), Rule(False, 'host')
+        trie.insert(bytes((10, 0, 0, 0)), 8, wide)
+        trie.insert(bytes((10, 1, 0, 0)), 12, narrow)
+        trie.insert(bytes((10, 1, 2, 3)), 32, host)
+
+        assert trie.lookup(bytes((10, 200, 0, 1))) is wide
+        assert trie.lookup(bytes((10, 15, 0, 1))) is narrow
+        assert trie.lookup(bytes((10, 1, 2, 3))) is host
+        assert trie.lookup(bytes((11, 0, 0, 1))) is None
+
+    def test_insert_order_does_not_matter(self):
+        trie = CidrTrie()
+        narrow, wide = Rule(True, 'narrow'), Rule(False, 'wide')
+        trie.insert(bytes((10, 1, 0, 0)), 16, narrow)
+        trie.insert(bytes((10, 0, 0, 0)), 9, wide)
+        assert trie.lookup(bytes((10, 1, 5, 5))) is narrow
+        assert trie.lookup(bytes((10, 2, 5, 5))) is wide
+
+    def test_default_route(self):
+        ruleset = RuleSet([(False, '0.0.0.0/0'), (True, '192.168.0.0/16')])
+        assert not ruleset.match('8.8.8.8').allow
+        assert ruleset.match('192.168.1.1').allow
+        # Маршрут /0 IPv4 не действует на IPv6
+        assert ruleset.match('::1').allow
+
+
+class TestDomainTrie:
+    """Совпадение домена по суффиксу меток"""
+
+    def test_subdomains(self):
+        ruleset = RuleSet([(False, 'example.com'), (True, 'api.example.com')])
+        assert not ruleset.match('example.com').allow
+        assert not ruleset.match('www.Example.COM.').allow
+        assert ruleset.match('v1.api.example.com').allow
+        # Совпадение только по целым меткам
+        assert ruleset.match('badexample.com').allow
+
+    def test_wildcard_and_leading_dot(self):
+        assert parse_pattern('*.example.com') == parse_pattern('.example.com') == 'example.com'
+
+    def test_deny_wins_tie(self):
+        for rules in ([(True, 'example.com'), (False, 'example.com')],
+                      [(False, 'example.com'), (True, 'example.com')]):
+            assert not RuleSet(rules).match('example.com').allow
+        assert not RuleSet([(True, '10.0.0.0/8'), (False, '10.0.0.0/8')]).match('10.1.1.1').allow
+
+    def test_ip_literal_domain_uses_cidr_rules(self):
+        ruleset = RuleSet([(False, '127.0.0.0/8')])
+        assert ruleset.match('127.0.0.1').pattern == '127.0.0.0/8'
+
+    def test_lookup_without_match(self):
+        trie = DomainTrie()
+        trie.insert('example.com', Rule(False, 'example.com'))
+        assert trie.lookup('com') is None
+        assert trie.lookup('example.org') is None
+
+
+class TestRules:
+    """Разбор файла правил"""
+
+    def test_parse(self):
+        lines = ['# block lists', '', 'deny 10.0.0.0/8  # internal', 'allow example.com', 'deny ::1']
+        assert parse_rules(lines) == [(False, '10.0.0.0/8'), (True, 'example.com'), (False, '::1')]
+
+    @pytest.mark.parametrize('line', ['block 10.0.0.0/8', 'deny', 'deny a b', 'deny example..com', 'allow .', 'deny 10.0.0.0/33', 'deny ::1/x'])
+    def test_invalid(self, line):
+        with pytest.raises(ValueError):
+            parse_rules([line])
+
+
+class TestAccessControl:
+    """Проверки и замена правил во время работы"""
+
+    def test_default(self):
+        assert AccessControl().allows('example.com')
+        acl = AccessControl([(True, 'example.com')], default=False)
+        assert acl.allows('www.example.com')
+        assert not acl.allows('example.org')
+        assert acl.match('example.org').pattern is None
+
+    def test_filter(self):
+        acl = AccessControl([(False, '10.0.0.0/8')])
+        addresses = [(2, ('10.0.0.1', 80)), (2, ('8.8.8.8', 80)), (10, ('::1', 80, 0, 0))]
+        assert acl.filter(addresses) == addresses[1:]
+
+    def test_ipv4_mapped_addresses(self):
+        """::ffff:a.b.c.d проверяется правилами IPv4, в том числе после разрешения имени"""
+        acl = AccessControl([(False, '127.0.0.0/8')])
+        assert not acl.allows('::ffff:127.0.0.1')
+        assert not acl.allows('::FFFF:7f00:1')
+        assert acl.allows('::ffff:10.0.0.1')
+        assert acl.allows('::1')
+        addresses = [(10, ('::ffff:127.0.0.1', 80, 0, 0)), (2, ('10.0.0.1', 80))]
+        assert acl.filter(addresses) == addresses[1:]
+
+    def test_scoped_ipv6_address(self):
+        acl = AccessControl([(False, 'fe80::/10')])
+        assert not acl.allows('fe80::1%lo')
+
+    def test_undecodable_name(self):
+        acl = AccessControl([(False, 'example.com')], default=False)
+        assert not acl.allows(b'\xff.example.com'.decode('utf-8', 'surrogateescape'))
+
+    def test_load_replaces_rules(self):
+        acl = AccessControl([(False, 'example.com')])
+        ruleset = acl.ruleset
+        acl.load([(True, 'example.com')])
+        assert acl.allows('example.com')
+        # Старый RuleSet не изменяется - проверка, начатая до замены, закончится на нем
+        assert not ruleset.match('example.com').allow
+
+    def test_file_reload(self, tmp_path):
+        path = tmp_path / 'acl'
+        path.write_text('deny example.com\n')
+        acl = AccessControl(path=str(path)).watch(interval=0.01)
+        try:
+            assert not acl.allows('example.com')
+            path.write_text('allow example.com\ndeny 10.0.0.0/8\n')
+            os.utime(path, (acl.mtime + 10, acl.mtime + 10))
+
+            deadline = time.time() + 3
+            while not acl.allows('example.com') and time.time() < deadline:
+                time.sleep(0.01)
+            assert acl.allows('example.com')
+            assert acl.stats() == {'ipv4_rules': 1, 'ipv6_rules': 0, 'domain_rules': 1, 'reloads': 2}
+        finally:
+            acl.stop()
+
+    def test_invalid_file_keeps_rules(self, tmp_path):
+        path = tmp_path / 'acl'
+        path.write_text('deny example.com\n')
+        acl = AccessControl(path=str(path))
+        path.write_text('deny\n')
+        with pytest.raises(ValueError):
+            acl.reload()
+        assert not acl.allows('example.com')
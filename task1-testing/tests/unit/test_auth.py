@@ -0,0 +1,167 @@
+import pytest
+import os
+import sys
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from auth import (hash_password, check_password, CredentialStore, FileCredentialStore,
+                  SqliteCredentialStore, CredentialCache, main)
+
+
+class FakeClock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class CountingStore(CredentialStore):
+    """Хранилище в памяти, считающее обращения"""
+
+    def __init__(self, users):
+        self.users = {username: hash_password(password, iterations=1000) for username, password in users.items()}
+        self.lookups = 0
+
+    def password_hash(self, username):
+        self.lookups += 1
+        return self.users.get(username)
+
+
+class TestPasswordHash:
+    """Хеширование паролей"""
+
+    def test_roundtrip(self):
+        encoded = hash_password(b'secret', iterations=1000)
+        assert encoded.startswith('pbkdf2_sha256$1000$')
+        assert check_password(b'secret', encoded)
+        assert not check_password(b'Secret', encoded)
+
+    def test_salted(self):
+        assert hash_password(b'secret', iterations=1000) != hash_password(b'secret', iterations=1000)
+
+    @pytest.mark.parametrize('encoded', ['', 'md5$1$00$00', 'pbkdf2_sha256$x$00$00', 'pbkdf2_sha256$1$zz$00'])
+    def test_malformed(self, encoded):
+        assert not check_password(b'secret', encoded)
+
+
+class TestCredentialStore:
+    """Базовый класс хранилища"""
+
+    def test_password_hash_required(self):
+        class Incomplete(CredentialStore):
+            pass
+
+        # Ошибка при создании хранилища, а не при первой проверке пароля
+        with pytest.raises(TypeError):
+            Incomplete()
+
+
+class TestFileCredentialStore:
+    """Файл username:хеш"""
+
+    def write(self, path, lines):
+        path.write_text(''.join(line + '\n' for line in lines))
+
+    def test_verify(self, tmp_path):
+        path = tmp_path / 'users'
+        self.write(path, ['# comment', '', 'alice:' + hash_password(b'secret', iterations=1000)])
+        store = FileCredentialStore(str(path))
+        assert store.verify(b'alice', b'secret')
+        assert not store.verify(b'alice', b'wrong')
+        assert not store.verify(b'bob', b'secret')
+
+    def test_reload_on_change(self, tmp_path):
+        path = tmp_path / 'users'
+        self.write(path, ['alice:' + hash_password(b'secret', iterations=1000)])
+        store = FileCredentialStore(str(path))
+
+        self.write(path, ['bob:' + hash_password(b'hunter2', iterations=1000)])
+        os.utime(path, (store.mtime + 10, store.mtime + 10))
+        assert store.verify(b'bob', b'hunter2')
+        assert not store.verify(b'alice', b'secret')
+
+    def test_missing_file_keeps_users(self, tmp_path):
+        path = tmp_path / 'users'
+        self.write(path, ['alice:' + hash_password(b'secret', iterations=1000)])
+        store = FileCredentialStore(str(path))
+        path.unlink()
+        assert store.verify(b'alice', b'secret')
+
+
+class TestSqliteCredentialStore:
+    """Учетные записи в SQLite"""
+
+    def test_add_and_verify(self, tmp_path):
+        store = SqliteCredentialStore(str(tmp_path / 'users.db'))
+        store.add_user(b'alice', b'secret')
+        assert store.verify(b'alice', b'secret')
+        assert not store.verify(b'alice', b'wrong')
+        assert store.password_hash(b'bob') is None
+        store.close()
+
+    def test_cli_adds_user(self, tmp_path, monkeypatch):
+        path = str(tmp_path / 'users.db')
+        monkeypatch.setattr('getpass.getpass', lambda prompt: 'secret')
+        assert main(['alice', '--db', path]) == 0
+        assert SqliteCredentialStore(path).verify(b'alice', b'secret')
+
+
+class TestCredentialCache:
+    """Кеш успешных проверок"""
+
+    def test_hit_skips_store(self):
+        store = CountingStore({b'alice': b'secret'})
+        cache = CredentialCache(store)
+        assert cache.verify(b'alice', b'secret')
+        assert cache.verify(b'alice', b'secret')
+        assert store.lookups == 1
+        assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 1, 'failures': 0}
+
+    def test_failures_not_cached(self):
+        store = CountingStore({b'alice': b'secret'})
+        cache = CredentialCache(store)
+        assert not cache.verify(b'alice', b'wrong')
+        assert not cache.verify(b'alice', b'wrong')
+        assert store.lookups == 2
+        assert cache.stats()['failures'] == 2
+        assert cache.stats()['entries'] == 0
+
+    def test_ttl(self):
+        """Смена пароля в хранилище действует после истечения записи"""
+        clock = FakeClock()
+        store = CountingStore({b'alice': b'secret'})
+        cache = CredentialCache(store, ttl=10, clock=clock)
+        assert cache.verify(b'alice', b'secret')
+
+        store.users[b'alice'] = hash_password(b'changed', iterations=1000)
+        clock.now += 5
+        assert cache.verify(b'alice', b'secret')
+        clock.now += 6
+        assert not cache.verify(b'alice', b'secret')
+        assert cache.verify(b'alice', b'changed')
+
+    def test_lru_bound(self):
+        store = CountingStore({b'user%d' % i: b'pw' for i in range(3)})
+        cache = CredentialCache(store, max_entries=2)
+        cache.verify(b'user0', b'pw')
+        cache.verify(b'user1', b'pw')
+        cache.verify(b'user0', b'pw')
+        cache.verify(b'user2', b'pw')
+        assert cache.stats()['entries'] == 2
+
+        # Вытеснен user1 - давно не использованный
+        lookups = store.lookups
+        cache.verify(b'user0', b'pw')
+        assert store.lookups == lookups
+        cache.verify(b'user1', b'pw')
+        assert store.lookups == lookups + 1
+
+    def test_key_separates_fields(self):
+        cache = CredentialCache(CountingStore({}))
+        assert cache.key(b'ab', b'c') != cache.key(b'a', b'bc')
+
+    def test_key_salted_per_instance(self):
+        store = CountingStore({})
+        assert CredentialCache(store).key(b'alice', b'secret') != CredentialCache(store).key(b'alice', b'secret')
@@ -0,0 +1,72 @@
+import pytest
+import io
+import threading
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from batch_writer import BatchWriter
+
+
+class CountingStream(io.StringIO):
+    """Поток вывода, который считает вызовы write и ждет разрешения на запись"""
+
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+        self.unblocked = threading.Event()
+
+    def write(self, data):
+        self.unblocked.wait()
+        self.writes += 1
+        return super().write(data)
+
+
+class TestBatchWriter:
+    """Общая фоновая запись для лога событий и трассировки"""
+
+    def test_batches_and_counters(self):
+        stream = CountingStream()
+        writer = BatchWriter(stream, lambda value: f'{value}\n', queue_size=1000)
+        for i in range(100):
+            assert writer.submit((i,))
+        stream.unblocked.set()
+        writer.close()
+
+        assert stream.getvalue().splitlines() == [str(i) for i in range(100)]
+        # Пока запись заблокирована, элементы копятся и уходят несколькими пакетами
+        assert stream.writes < 100
+        assert writer.stats() == {'written': 100, 'dropped': 0, 'queue_depth': 0}
+
+    def test_full_queue_drops(self):
+        stream = CountingStream()
+        writer = BatchWriter(stream, str, queue_size=1)
+        results = [writer.submit(('x',)) for _ in range(10)]
+        stream.unblocked.set()
+        writer.close()
+
+        assert not all(results)
+        assert writer.stats()['dropped'] == results.count(False)
+
+    def test_join_finishes_output(self):
+        stream = io.StringIO()
+
+        def join(lines, end):
+            return ''.join(lines) + ('end\n' if end else '')
+
+        writer = BatchWriter(stream, lambda value: f'{value}\n', join=join)
+        writer.submit(('a',))
+        writer.close()
+
+        assert stream.getvalue().endswith('a\nend\n')
+
+    def test_closed_stream_is_ignored(self):
+        stream = io.StringIO()
+        stream.close()
+        writer = BatchWriter(stream, str)
+        writer.submit(('x',))
+        writer.close()
+
+        assert writer.stats()['written'] == 1
@@ -0,0 +1,85 @@
+import pytest
+import json
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from benchmark import percentile, flatten, compare, lower_is_better, parse_args, BASELINE_PATH, DEFAULT_CONCURRENCY
+
+
+def make_results(cps=1000.0, p99=5.0, mb_s=800.0, rss=30.0):
+    return {'results': {
+        'connect': {'8': {'connections_per_sec': cps, 'latency_p99_ms': p99}},
+        'throughput': {'single_mb_s': mb_s, 'aggregate_mb_s': {}},
+        'memory': {'rss_per_tunnel_kb': rss},
+    }}
+
+
+class TestPercentile:
+    """Перцентили по ближайшему рангу"""
+
+    def test_values(self):
+        samples = list(range(1, 1001))
+        assert percentile(samples, 50) == 500
+        assert percentile(samples, 99) == 990
+        assert percentile(samples, 99.9) == 999
+        assert percentile(samples, 100) == 1000
+
+    def test_small_sample(self):
+        assert percentile([3, 1, 2], 99.9) == 3
+        assert percentile([7], 50) == 7
+        assert percentile([], 50) is None
+
+
+class TestBaselineComparison:
+    """Проверка регрессий относительно сохраненного baseline"""
+
+    def test_flatten(self):
+        flat = flatten(make_results()['results'])
+        assert flat['connect.8.connections_per_sec'] == 1000.0
+        assert flat['throughput.single_mb_s'] == 800.0
+        assert flat['memory.rss_per_tunnel_kb'] == 30.0
+
+    def test_direction(self):
+        assert lower_is_better('connect.8.latency_p99_ms')
+        assert lower_is_better('memory.rss_per_tunnel_kb')
+        assert not lower_is_better('throughput.single_mb_s')
+
+    def test_no_regression_within_threshold(self):
+        assert compare(make_results(cps=900, p99=5.5), make_results(), threshold=0.2) == []
+
+    def test_throughput_regression(self):
+        regressions = compare(make_results(mb_s=500), make_results(), threshold=0.2)
+        assert [r[0] for r in regressions] == ['throughput.single_mb_s']
+
+    def test_latency_and_memory_regression(self):
+        regressions = compare(make_results(p99=10.0, rss=60.0), make_results(), threshold=0.2)
+        assert {r[0] for r in regressions} == {'connect.8.latency_p99_ms', 'memory.rss_per_tunnel_kb'}
+
+    def test_improvement_is_not_regression(self):
+        assert compare(make_results(cps=5000, p99=1.0, mb_s=2000, rss=10), make_results()) == []
+
+    def test_missing_metrics_ignored(self):
+        current = make_results()
+        current['results']['memory']['rss_per_tunnel_kb'] = None
+        assert compare(current, make_results()) == []
+
+
+class TestBaselineArguments:
+    """Сохраненный baseline по умолчанию и проверка аргументов"""
+
+    def test_default_baseline_committed(self):
+        assert parse_args([]).baseline == BASELINE_PATH
+        with open(BASELINE_PATH) as f:
+            flat = flatten(json.load(f)['results'])
+        for level in DEFAULT_CONCURRENCY:
+            assert flat[f'connect.{level}.connections_per_sec'] > 0
+        assert flat['throughput.single_mb_s'] > 0
+
+    def test_save_baseline_requires_path(self, capsys):
+        with pytest.raises(SystemExit) as error:
+            parse_args(['--baseline', '', '--save-baseline'])
+        assert error.value.code == 2
+        assert '--save-baseline requires a --baseline path' in capsys.readouterr().err
@@ -0,0 +1,148 @@
+import pytest
+import os
+import socket
+import threading
+import sys
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from buffer_pool import BufferPool, ChunkSizer
+from relay import RELAY_SHARED
+from socks5_proxy import Socks5Proxy
+
+
+class TestBufferPool:
+    """Тесты пула буферов"""
+
+    def test_size_classes(self):
+        """Размер округляется вверх до степени двойки в пределах пула"""
+        pool = BufferPool(min_size=4096, max_size=65536)
+
+        assert len(pool.acquire(1)) == 4096
+        assert len(pool.acquire(5000)) == 8192
+        assert len(pool.acquire(10 ** 6)) == 65536
+
+    def test_reuse_and_hit_rate(self):
+        """Возвращенный буфер выдается повторно"""
+        pool = BufferPool()
+        buffer = pool.acquire(4096)
+        pool.release(buffer)
+
+        assert pool.acquire(4096) is buffer
+        stats = pool.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == 0.5
+        assert stats['in_use_bytes'] == 4096
+
+    def test_free_list_is_bounded(self):
+        """Лишние буферы не задерживаются в пуле"""
+        pool = BufferPool(max_free_per_class=2)
+        buffers = [pool.acquire(4096) for _ in range(5)]
+        for buffer in buffers:
+            pool.release(buffer)
+
+        stats = pool.stats()
+        assert stats['free_bytes'] == 2 * 4096
+        assert stats['allocated_bytes'] == 2 * 4096
+        assert stats['in_use_bytes'] == 0
+
+
+class TestChunkSizer:
+    """Тесты адаптивного размера чтения"""
+
+    def test_grows_on_bulk_reads(self):
+        sizer = ChunkSizer(min_size=4096, max_size=262144)
+        for _ in range(10):
+            sizer.update(sizer.size)
+        assert sizer.size == 262144
+
+    def test_shrinks_on_short_reads(self):
+        sizer = ChunkSizer(min_size=4096, max_size=262144)
+        sizer.size = 65536
+        for _ in range(ChunkSizer.SHORT_READS_TO_SHRINK):
+            sizer.update(100)
+        assert sizer.size == 32768
+
+    def test_medium_reads_keep_size(self):
+        sizer = ChunkSizer()
+        sizer.size = 16384
+        for _ in range(10):
+            sizer.update(10000)
+        assert sizer.size == 16384
+
+
+class TestTunnelData:
+    """Тесты tunnel_data поверх пула буферов"""
+
+    def run_tunnel(self, proxy):
+        client, proxy_client_side = socket.socketpair()
+        proxy_remote_side, server = socket.socketpair()
+        thread = threading.Thread(target=proxy.tunnel_data, args=(proxy_client_side, proxy_remote_side))
+        thread.daemon = True
+        thread.start()
+        return thread, client, server
+
+    def recv_all(self, sock):
+        chunks = []
+        while True:
+            chunk = sock.recv(1 << 20)
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+
+    def test_bulk_transfer_is_complete(self):
+        """Большой объем доходит целиком, буферы возвращаются в пул"""
+        proxy = Socks5Proxy()
+        thread, client, server = self.run_tunnel(proxy)
+        payload = os.urandom(8 * 1024 * 1024)
+
+        sender = threading.Thread(target=lambda: (client.sendall(payload), client.shutdown(socket.SHUT_WR)))
+        sender.start()
+        assert self.recv_all(server) == payload
+        sender.join()
+
+        server.close()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+
+        stats = proxy.stats()['buffer_pool']
+        assert stats['in_use_bytes'] == 0
+        # Промахи только при первом использовании каждого класса размера
+        assert stats['misses'] <= 8
+
+    def test_eof_ends_tunnel(self):
+        """После EOF с обеих сторон поток туннеля завершается"""
+        proxy = Socks5Proxy()
+        thread, client, server = self.run_tunnel(proxy)
+
+        client.sendall(b'request')
+        client.shutdown(socket.SHUT_WR)
+        assert self.recv_all(server) == b'request'
+        server.sendall(b'response')
+        server.close()
+        assert self.recv_all(client) == b'response'
+
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+
+    def test_shared_relay_stats_without_pool(self):
+        """В режиме shared пул не используется и не попадает в stats()"""
+        assert 'buffer_pool' in Socks5Proxy().stats()
+        assert 'buffer_pool' not in Socks5Proxy(relay_mode=RELAY_SHARED, relay_threads=1).stats()
+
+    def test_small_injected_pool(self):
+        """Пул с буферами меньше MAX_CHUNK: чтения не выходят за размер буфера"""
+        proxy = Socks5Proxy(buffer_pool=BufferPool(max_size=8192))
+        thread, client, server = self.run_tunnel(proxy)
+        payload = os.urandom(1024 * 1024)
+
+        sender = threading.Thread(target=lambda: (client.sendall(payload), client.shutdown(socket.SHUT_WR)))
+        sender.start()
+        assert self.recv_all(server) == payload
+        sender.join()
+
+        server.close()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
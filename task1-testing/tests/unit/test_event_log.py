@@ -0,0 +1,128 @@
+import pytest
+import io
+import json
+import threading
+import sys
+import os
+from unittest.mock import MagicMock
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from event_log import EventLogger
+from socks5_proxy import Socks5Proxy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class BlockingStream(io.StringIO):
+    """Поток вывода, запись в который ждет разрешения (как переполненный pipe stdout)"""
+
+    def __init__(self):
+        super().__init__()
+        self.unblocked = threading.Event()
+
+    def write(self, data):
+        self.unblocked.wait()
+        return super().write(data)
+
+
+def records(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+class TestEventLogger:
+    """Фоновая запись, выборка и ограничение частоты"""
+
+    def test_structured_output(self):
+        stream = io.StringIO()
+        logger = EventLogger(stream=stream)
+        logger.warning('connect_failed', host='example.com', port=443, error='refused')
+        logger.close()
+
+        record, = records(stream)
+        assert record['event'] == 'connect_failed'
+        assert record['level'] == 'warning'
+        assert record['host'] == 'example.com'
+        assert record['port'] == 443
+        assert 'ts' in record
+
+    def test_sampling(self):
+        stream = io.StringIO()
+        logger = EventLogger(stream=stream, sample_rates={'noisy': 0.0, 'kept': 1.0})
+        for _ in range(100):
+            logger.info('noisy')
+        logger.info('kept')
+        logger.close()
+
+        assert [r['event'] for r in records(stream)] == ['kept']
+        assert logger.stats()['sampled_out'] == 100
+
+    def test_rate_limit(self):
+        stream = io.StringIO()
+        clock = FakeClock()
+        logger = EventLogger(stream=stream, rate_limits={'accepted': 10.0}, clock=clock)
+        for _ in range(50):
+            logger.info('accepted')
+        clock.now += 0.5
+        for _ in range(50):
+            logger.info('accepted')
+        logger.close()
+
+        # 10 событий всплеска и 5 за следующие полсекунды
+        assert len(records(stream)) == 15
+        assert logger.stats()['rate_limited'] == 85
+
+    def test_unlimited_event(self):
+        stream = io.StringIO()
+        logger = EventLogger(stream=stream, rate_limits={})
+        for _ in range(500):
+            logger.info('accepted')
+        logger.close()
+        assert logger.stats()['written'] == 500
+
+    def test_full_queue_drops_without_blocking(self):
+        stream = BlockingStream()
+        logger = EventLogger(stream=stream, queue_size=10, rate_limits={})
+        for i in range(100):
+            logger.info('event', i=i)
+
+        # Фоновый поток завис в write, очередь заполнена, остальное отброшено сразу
+        assert logger.stats()['dropped'] > 0
+
+        stream.unblocked.set()
+        logger.close()
+        assert logger.stats()['written'] + logger.stats()['dropped'] == 100
+
+
+class TestProxyLogging:
+    """События прокси идут в переданный логгер"""
+
+    def test_connect_failure_logged(self):
+        logger = MagicMock()
+        proxy = Socks5Proxy(logger=logger)
+        mock_client = MagicMock()
+        mock_client.recv.side_effect = [b'\x05\x01\x00', b'\x05\x01\x00\x01\x7f\x00\x00\x01\x00\x01']
+
+        proxy.handle_client(mock_client)
+
+        event = logger.warning.call_args
+        assert event[0][0] == 'connect_failed'
+        assert event[1]['host'] == '127.0.0.1'
+        assert event[1]['port'] == 1
+
+    def test_handshake_failure_logged(self):
+        logger = MagicMock()
+        proxy = Socks5Proxy(logger=logger)
+        mock_client = MagicMock()
+        mock_client.recv.return_value = b'\x04\x01\x00'
+
+        proxy.handle_client(mock_client)
+
+        logger.info.assert_called_with('handshake_failed', code=-2)
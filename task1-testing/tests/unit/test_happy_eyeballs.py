@@ -0,0 +1,185 @@
+import pytest
+import socket
+import time
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from happy_eyeballs import interleave_families, connect_happy_eyeballs
+from socks5_proxy import Socks5Proxy
+from socks5_native import Socks5Request
+
+V4 = socket.AF_INET
+V6 = socket.AF_INET6
+
+
+def listening_socket(family=V4, backlog=16):
+    host = '::1' if family == V6 else '127.0.0.1'
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.bind((host, 0))
+    sock.listen(backlog)
+    return sock
+
+
+def blackhole():
+    """Адрес, SYN на который остается без ответа: очередь listen(0) заполнена"""
+    sock = listening_socket(backlog=0)
+    fillers = []
+    for _ in range(3):
+        filler = socket.socket()
+        filler.setblocking(False)
+        filler.connect_ex(sock.getsockname())
+        fillers.append(filler)
+    time.sleep(0.05)
+    return sock, fillers
+
+
+def closed_port_address():
+    sock = listening_socket()
+    address = sock.getsockname()
+    sock.close()
+    return (V4, address)
+
+
+class TestInterleave:
+    """Порядок попыток по RFC 8305"""
+
+    def test_alternates_families(self):
+        addresses = [(V6, 'a'), (V6, 'b'), (V4, 'c'), (V4, 'd'), (V4, 'e')]
+        assert interleave_families(addresses) == [(V6, 'a'), (V4, 'c'), (V6, 'b'), (V4, 'd'), (V4, 'e')]
+
+    def test_single_family(self):
+        addresses = [(V4, 'a'), (V4, 'b')]
+        assert interleave_families(addresses) == addresses
+
+    def test_empty(self):
+        assert interleave_families([]) == []
+
+
+class TestConnectHappyEyeballs:
+    """Параллельные попытки подключения"""
+
+    def test_first_address_succeeds(self):
+        server = listening_socket()
+        sock = connect_happy_eyeballs([(V4, server.getsockname())])
+        assert sock.getpeername() == server.getsockname()
+        assert sock.gettimeout() is None
+        sock.close()
+        server.close()
+
+    def test_refused_address_falls_through_immediately(self):
+        """После отказа следующий адрес пробуется без ожидания attempt_delay"""
+        server = listening_socket()
+        start = time.monotonic()
+        sock = connect_happy_eyeballs([closed_port_address(), (V4, server.getsockname())],
+                                      attempt_delay=2.0)
+        assert time.monotonic() - start < 1.0
+        assert sock.getpeername() == server.getsockname()
+        sock.close()
+        server.close()
+
+    def test_dead_address_raced_after_delay(self):
+        """Зависший адрес не задерживает подключение дольше attempt_delay"""
+        dead, fillers = blackhole()
+        server = listening_socket()
+
+        start = time.monotonic()
+        sock = connect_happy_eyeballs([(V4, dead.getsockname()), (V4, server.getsockname())],
+                                      attempt_delay=0.1, attempt_timeout=5)
+        elapsed = time.monotonic() - start
+
+        assert sock.getpeername() == server.getsockname()
+        assert 0.1 <= elapsed < 1.0
+        sock.close()
+        for s in [dead, server] + fillers:
+            s.close()
+
+    def test_dual_stack(self):
+        """IPv6 и IPv4 адреса одного имени"""
+        server6 = listening_socket(V6)
+        sock = connect_happy_eyeballs([(V6, server6.getsockname()), closed_port_address()])
+        assert sock.family == V6
+        sock.close()
+        server6.close()
+
+    def test_all_attempts_fail(self):
+        with pytest.raises(OSError):
+            connect_happy_eyeballs([closed_port_address(), closed_port_address()])
+
+    def test_attempt_timeout(self):
+        dead, fillers = blackhole()
+        start = time.monotonic()
+        with pytest.raises(socket.timeout):
+            connect_happy_eyeballs([(V4, dead.getsockname())], attempt_timeout=0.2)
+        assert time.monotonic() - start < 1.0
+        for s in [dead] + fillers:
+            s.close()
+
+
+class TestProxyDualStack:
+    """IPv6 и Happy Eyeballs в handle_connect"""
+
+    @patch('socket.socket')
+    def test_handle_connect_ipv6(self, mock_socket):
+        """IPv6 адрес подключается через AF_INET6 с корректной записью адреса"""
+        proxy = Socks5Proxy()
+        request = Socks5Request()
+        request.cmd = 0x01
+        request.atyp = 0x04
+        request.dst_addr.ipv6[:] = socket.inet_pton(V6, '2001:db8::1')
+        request.dst_port = 443
+
+        mock_remote = MagicMock()
+        mock_socket.return_value = mock_remote
+
+        with patch.object(proxy, 'start_tunnel'):
+            proxy.handle_connect(MagicMock(), request)
+
+        mock_socket.assert_called_with(V6, socket.SOCK_STREAM)
+        mock_remote.connect.assert_called_with(('2001:db8::1', 443))
+
+    def test_ipv6_connect_end_to_end(self):
+        """CONNECT на IPv6 loopback через прокси"""
+        server6 = listening_socket(V6)
+        proxy = Socks5Proxy()
+        request = Socks5Request()
+        request.cmd = 0x01
+        request.atyp = 0x04
+        request.dst_addr.ipv6[:] = socket.inet_pton(V6, '::1')
+        request.dst_port = server6.getsockname()[1]
+
+        client = MagicMock()
+        with patch.object(proxy, 'start_tunnel') as start_tunnel:
+            proxy.handle_connect(client, request)
+
+        client.send.assert_called_with(b'\x05\x00\x00\x01\x00\x00\x00\x00\x00\x00')
+        remote = start_tunnel.call_args[0][1]
+        assert remote.family == V6
+        remote.close()
+        server6.close()
+
+    def test_domain_with_happy_eyeballs(self):
+        """Домен с несколькими адресами: мертвый адрес не мешает подключению"""
+        server = listening_socket()
+        resolver = MagicMock()
+        resolver.resolve.return_value = [closed_port_address(), (V4, server.getsockname())]
+        proxy = Socks5Proxy(resolver=resolver, happy_eyeballs=True)
+
+        request = Socks5Request()
+        request.cmd = 0x01
+        request.atyp = 0x03
+        request.dst_addr.domain.len = 4
+        request.dst_addr.domain.name[:4] = b'test'
+        request.dst_port = server.getsockname()[1]
+
+        client = MagicMock()
+        with patch.object(proxy, 'start_tunnel') as start_tunnel:
+            proxy.handle_connect(client, request)
+
+        resolver.resolve.assert_called_with('test', server.getsockname()[1])
+        client.send.assert_called_with(b'\x05\x00\x00\x01\x00\x00\x00\x00\x00\x00')
+        start_tunnel.call_args[0][1].close()
+        server.close()
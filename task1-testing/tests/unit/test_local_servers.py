@@ -0,0 +1,27 @@
+import pytest
+import os
+import socket
+import sys
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from local_servers import LocalServer, EchoServer
+
+
+class TestLocalServer:
+    """Тесты базового локального сервера"""
+
+    def test_handle_required(self):
+        """Подкласс без handle не создаётся, а не падает на первом соединении"""
+        class Incomplete(LocalServer):
+            pass
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+    def test_echo_server(self):
+        with EchoServer() as server:
+            with socket.create_connection(server.address, timeout=3) as client:
+                client.sendall(b'ping')
+                assert client.recv(4) == b'ping'
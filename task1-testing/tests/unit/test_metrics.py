@@ -0,0 +1,168 @@
+import pytest
+import socket
+import threading
+import urllib.request
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+# Общие вспомогательные функции тестов (tests/helpers.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import wait_for
+from metrics import MetricsRegistry, ProxyMetrics, MetricsServer, SnapshotWriter
+from socks5_proxy import Socks5Proxy
+from local_servers import EchoServer
+
+
+class TestMetricTypes:
+    """Счетчики, гистограммы и экспорт в формате Prometheus"""
+
+    def test_counter_with_labels(self):
+        registry = MetricsRegistry()
+        counter = registry.counter('errors_total', 'Errors', ('code',))
+        counter.inc(labels=(1,))
+        counter.inc(2, labels=(1,))
+        counter.inc(labels=(7,))
+
+        assert counter.value((1,)) == 3
+        text = registry.render()
+        assert '# TYPE errors_total counter' in text
+        assert 'errors_total{code="1"} 3' in text
+        assert 'errors_total{code="7"} 1' in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            histogram.observe(value)
+
+        text = registry.render()
+        assert 'latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{le="1"} 3' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+        assert 'latency_seconds_count 4' in text
+        assert 'latency_seconds_sum 6.05' in text
+
+    def test_gauge(self):
+        registry = MetricsRegistry()
+        gauge = registry.gauge('active', 'Active')
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        assert 'active 1' in registry.render()
+
+    def test_duplicate_name_rejected(self):
+        registry = MetricsRegistry()
+        registry.counter('a_total', 'A')
+        with pytest.raises(ValueError):
+            registry.counter('a_total', 'A')
+
+    def test_concurrent_increments(self):
+        counter = MetricsRegistry().counter('n_total', 'N')
+
+        def work():
+            for _ in range(10000):
+                counter.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert counter.value() == 40000
+
+
+class TestExport:
+    """HTTP эндпоинт и файл снимка"""
+
+    def test_http_endpoint(self):
+        metrics = ProxyMetrics()
+        metrics.accepted.inc()
+        server = MetricsServer(metrics.registry, port=0).start()
+        try:
+            url = f'http://127.0.0.1:{server.address[1]}/metrics'
+            with urllib.request.urlopen(url, timeout=5) as response:
+                assert response.headers['Content-Type'].startswith('text/plain')
+                body = response.read().decode()
+            assert 'socks5_accepted_connections_total 1' in body
+        finally:
+            server.stop()
+
+    def test_snapshot_file(self, tmp_path):
+        metrics = ProxyMetrics()
+        metrics.bytes_in.inc(100)
+        path = str(tmp_path / 'metrics.prom')
+        writer = SnapshotWriter(metrics.registry, path, interval=0.05).start()
+        assert wait_for(lambda: os.path.exists(path))
+        writer.stop()
+        with open(path) as f:
+            assert 'socks5_bytes_in_total 100' in f.read()
+
+
+class TestProxyInstrumentation:
+    """Метрики, которые собирает Socks5Proxy"""
+
+    def test_handshake_parse_failure_counted(self):
+        proxy = Socks5Proxy()
+        mock_client = MagicMock()
+        mock_client.recv.return_value = b'\x04\x01\x00'
+
+        proxy.handle_client(mock_client)
+
+        assert proxy.metrics.parse_failures.value(('handshake', -2)) == 1
+
+    def test_request_failure_reply_counted(self):
+        proxy = Socks5Proxy()
+        mock_client = MagicMock()
+        mock_client.recv.side_effect = [b'\x05\x01\x00', b'\x05\x01\x00\x09']
+
+        proxy.handle_client(mock_client)
+
+        mock_client.send.assert_called_with(b'\x05\x07\x00\x01\x00\x00\x00\x00\x00\x00')
+        assert proxy.metrics.replies.value((0x07,)) == 1
+        assert proxy.metrics.handshake_time.count == 1
+        assert sum(proxy.metrics.parse_failures.values.values()) == 1
+
+    @patch('socket.socket')
+    def test_connect_failure_reply_counted(self, mock_socket):
+        proxy = Socks5Proxy()
+        mock_socket.return_value.connect.side_effect = ConnectionRefusedError
+        mock_client = MagicMock()
+        mock_client.recv.side_effect = [b'\x05\x01\x00', b'\x05\x01\x00\x01\x7f\x00\x00\x01\x00\x50']
+
+        proxy.handle_client(mock_client)
+
+        assert proxy.metrics.replies.value((0x04,)) == 1
+        assert proxy.metrics.request_parse_time.count == 1
+
+    @pytest.mark.parametrize('relay_mode', ['thread', 'shared', 'splice'])
+    def test_tunnel_metrics(self, relay_mode):
+        proxy = Socks5Proxy(relay_mode=relay_mode)
+        metrics = proxy.metrics
+        client, proxy_side = socket.socketpair()
+
+        with EchoServer() as echo:
+            remote = socket.create_connection(echo.address)
+            thread = threading.Thread(target=proxy.start_tunnel, args=(proxy_side, remote))
+            thread.start()
+
+            assert wait_for(lambda: metrics.active_tunnels.value() == 1)
+            client.sendall(b'x' * 1000)
+            received = b''
+            while len(received) < 1000:
+                received += client.recv(4096)
+            client.shutdown(socket.SHUT_WR)
+            assert client.recv(1) == b''
+            client.close()
+            thread.join(timeout=5)
+
+            assert wait_for(lambda: metrics.active_tunnels.value() == 0)
+            assert metrics.bytes_in.value() == 1000
+            assert metrics.bytes_out.value() == 1000
+            assert metrics.tunnel_lifetime.count == 1
+
+        for relay in proxy.relays:
+            relay.stop()
@@ -0,0 +1,454 @@
+import pytest
+import random
+import socket
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+import socks5_native
+from socks5_native import (Socks5Handshake, Socks5Auth, Socks5Request, Socks5UdpHeader, ext_backend, native_backend,
+                           python_backend, set_backend, get_backend, parse_request, parse_request_compact,
+                           pack_messages, UDP_HEADER_MAX)
+
+
+def native_or_skip():
+    try:
+        return native_backend()
+    except OSError:
+        pytest.skip("C library not compiled. Run 'make' first.")
+
+
+def ext_or_skip():
+    try:
+        return ext_backend()
+    except OSError:
+        pytest.skip("C extension not compiled. Run 'make' first.")
+
+
+def load_backend(name):
+    if name == 'ext':
+        return ext_or_skip()
+    return native_or_skip() if name == 'native' else python_backend()
+
+
+@pytest.fixture
+def restore_backend():
+    """Возвращает выбор backend к исходному после теста"""
+    saved_name, saved_backend = socks5_native._backend_name, socks5_native._backend
+    yield
+    socks5_native._backend_name, socks5_native._backend = saved_name, saved_backend
+
+
+# Корректные и некорректные сообщения для сравнения реализаций
+REQUESTS = [
+    b'\x05\x01\x00\x01\x7f\x00\x00\x01\x04\x38',
+    b'\x05\x01\x00\x03\x0bexample.com\x00\x50',
+    b'\x05\x01\x00\x04' + bytes(range(16)) + b'\x01\xbb',
+    b'\x05\x01\x00\x03' + bytes([254]) + b'a' * 254 + b'\x00\x50',
+    b'\x05\x01\x00\x03' + bytes([255]) + b'a' * 255 + b'\x00\x50',
+    b'\x05\x01\x00\x03\x00\x00\x50',
+    b'\x05\x01\x00\x03\x05abc',
+    b'\x05\x01\x00\x03',
+    b'\x05\x01\x00\x01\x7f\x00',
+    b'\x05\x01\x00\x04\x00',
+    b'\x05\x01\x00\x02\x00\x50',
+    b'\x05\x01\x00',
+    b'',
+]
+
+HANDSHAKES = [
+    b'\x05\x01\x00',
+    b'\x05\x03\x00\x01\x02',
+    b'\x05\x00\x00',
+    b'\x04\x01\x00',
+    b'\x05\x05\x00',
+    b'\x05',
+    b'',
+]
+
+
+class TestPythonBackend:
+    """Pure-Python парсер совпадает с C библиотекой"""
+
+    @pytest.mark.parametrize('data', REQUESTS)
+    def test_request_matches_native(self, data):
+        native = native_or_skip()
+        native_request, python_request = Socks5Request(), Socks5Request()
+
+        native_code = native.parse_request(data, native_request)
+        python_code = python_backend().parse_request(data, python_request)
+
+        assert python_code == native_code
+        if native_code == 0:
+            assert bytes(python_request) == bytes(native_request)
+
+    @pytest.mark.parametrize('data', HANDSHAKES)
+    def test_handshake_matches_native(self, data):
+        native = native_or_skip()
+        native_handshake, python_handshake = Socks5Handshake(), Socks5Handshake()
+
+        native_code = native.parse_handshake(data, native_handshake)
+        python_code = python_backend().parse_handshake(data, python_handshake)
+
+        assert python_code == native_code
+        if native_code == 0:
+            assert bytes(python_handshake) == bytes(native_handshake)
+
+    def test_random_requests_match_native(self):
+        """Случайные данные разбираются одинаково"""
+        native = native_or_skip()
+        rng = random.Random(1080)
+
+        for _ in range(2000):
+            data = bytes([5, 1, 0, rng.choice([1, 3, 4, 2])]) + rng.randbytes(rng.randint(0, 30))
+            assert python_backend().parse_request(data, Socks5Request()) == \
+                native.parse_request(data, Socks5Request())
+
+    def test_batch_matches_native(self, restore_backend):
+        """Пакетный парсинг дает одинаковые массивы"""
+        native_or_skip()
+        data, offsets = pack_messages(REQUESTS)
+
+        results = {}
+        for name in ('native', 'python'):
+            set_backend(name)
+            batch = socks5_native.parse_requests_batch(data, offsets)
+            results[name] = (batch.parsed, list(batch.status), list(batch.port), list(batch.addr_offset))
+
+        assert results['python'] == results['native']
+
+    def test_memoryview_input(self):
+        """Pure-Python парсер принимает memoryview"""
+        request = Socks5Request()
+        data = memoryview(b'xx\x05\x01\x00\x01\x7f\x00\x00\x01\x04\x38')[2:]
+
+        assert python_backend().parse_request(data, request) == 0
+        assert request.dst_port == 1080
+
+
+UDP_DATAGRAMS = [
+    b'\x00\x00\x00\x01\x7f\x00\x00\x01\x00\x35payload',
+    b'\x00\x00\x00\x03\x0bexample.com\x00\x35',
+    b'\x00\x00\x00\x04' + bytes(range(16)) + b'\x01\xbbquic',
+    b'\x00\x00\x01\x01\x7f\x00\x00\x01\x00\x35fragment',
+    b'\x00\x00\x00\x03\x00\x00\x35',
+    b'\x00\x00\x00\x02\x00\x35',
+    b'\x00\x00\x00\x01\x7f',
+    b'\x00\x00',
+]
+
+
+class TestUdpHeader:
+    """Разбор и сборка заголовка UDP датаграммы в обеих реализациях"""
+
+    @pytest.fixture(params=['ext', 'native', 'python'])
+    def backend(self, request):
+        return load_backend(request.param)
+
+    @pytest.mark.parametrize('data', UDP_DATAGRAMS)
+    def test_parse_matches_native(self, data):
+        native = native_or_skip()
+        native_header, python_header = Socks5UdpHeader(), Socks5UdpHeader()
+
+        native_code = native.parse_udp_header(data, native_header)
+        python_code = python_backend().parse_udp_header(data, python_header)
+
+        assert python_code == native_code
+        if native_code == 0:
+            assert bytes(python_header) == bytes(native_header)
+
+    def test_parse_fields(self, backend):
+        header = Socks5UdpHeader()
+        data = UDP_DATAGRAMS[0]
+        assert backend.parse_udp_header(data, header) == 0
+        assert (header.frag, header.atyp, header.dst_port) == (0, 1, 53)
+        assert data[header.header_len:] == b'payload'
+
+        assert backend.parse_udp_header(UDP_DATAGRAMS[3], header) == 0
+        assert header.frag == 1
+
+    @pytest.mark.parametrize('atyp, addr', [
+        (0x01, b'\x7f\x00\x00\x01'),
+        (0x03, b'example.com'),
+        (0x04, bytes(range(16))),
+    ])
+    def test_build_roundtrip(self, backend, atyp, addr):
+        out = bytearray(UDP_HEADER_MAX)
+        length = backend.build_udp_header(out, atyp, addr, 5353)
+        assert length > 0
+
+        header = Socks5UdpHeader()
+        assert backend.parse_udp_header(bytes(out[:length]) + b'data', header) == 0
+        assert (header.atyp, header.dst_port, header.header_len) == (atyp, 5353, length)
+
+    @pytest.mark.parametrize('atyp, addr, code', [
+        (0x01, b'\x7f\x00\x00', -4),
+        (0x03, b'', -4),
+        (0x03, b'a' * 255, -4),
+        (0x02, b'\x00', -7),
+    ])
+    def test_build_errors(self, backend, atyp, addr, code):
+        assert backend.build_udp_header(bytearray(UDP_HEADER_MAX), atyp, addr, 53) == code
+
+    def test_build_short_buffer(self, backend):
+        assert backend.build_udp_header(bytearray(5), 0x01, b'\x7f\x00\x00\x01', 53) == -1
+
+
+AUTH_REQUESTS = [
+    b'\x01\x05alice\x06secret',
+    b'\x01\x01a\x01b',
+    b'\x01' + bytes([255]) + b'u' * 255 + bytes([255]) + b'p' * 255,
+    b'\x01\x05alice\x06sec',
+    b'\x01\x05ali',
+    b'\x01\x05alice\x00',
+    b'\x01\x00\x01p',
+    b'\x05\x05alice\x06secret',
+    b'\x01',
+    b'',
+]
+
+
+class TestAuth:
+    """Запрос username/password (RFC 1929) в обеих реализациях"""
+
+    @pytest.fixture(params=['ext', 'native', 'python'])
+    def backend(self, request):
+        return load_backend(request.param)
+
+    @pytest.mark.parametrize('data', AUTH_REQUESTS)
+    def test_parse_matches_native(self, data):
+        native = native_or_skip()
+        native_auth, python_auth = Socks5Auth(), Socks5Auth()
+
+        native_code = native.parse_auth(data, native_auth)
+        python_code = python_backend().parse_auth(data, python_auth)
+
+        assert python_code == native_code
+        assert python_backend().auth_needed(data) == native.auth_needed(data)
+        if native_code == 0:
+            assert bytes(python_auth) == bytes(native_auth)
+
+    @pytest.mark.parametrize('data, code', [
+        (AUTH_REQUESTS[0], 0),
+        (b'\x01', -1),
+        (b'\x05\x05alice\x06secret', -2),
+        (b'\x01\x00\x01p', -3),
+        (b'\x01\x05ali', -4),
+        (b'\x01\x05alice\x00', -5),
+        (b'\x01\x05alice\x06sec', -6),
+    ])
+    def test_error_codes(self, backend, data, code):
+        assert backend.parse_auth(data, Socks5Auth()) == code
+
+    def test_fields(self, backend):
+        auth = Socks5Auth()
+        assert backend.parse_auth(memoryview(AUTH_REQUESTS[0] + b'tail'), auth) == 0
+        assert (auth.username, auth.password) == (b'alice', b'secret')
+
+    @pytest.mark.parametrize('data, expected', [
+        (b'', 2),
+        (b'\x01', 2),
+        (b'\x01\x05', 8),
+        (b'\x01\x05alice', 8),
+        (b'\x01\x05alice\x06', 14),
+        (b'\x02\x05', -2),
+        (b'\x01\x00', -3),
+        (b'\x01\x05alice\x00', -5),
+    ])
+    def test_needed(self, backend, data, expected):
+        assert backend.auth_needed(data) == expected
+
+
+class TestExtBackend:
+    """CPython расширение совпадает с C библиотекой через ctypes"""
+
+    @pytest.mark.parametrize('data', REQUESTS)
+    def test_request_matches_native(self, data):
+        native, ext = native_or_skip(), ext_or_skip()
+        native_request, ext_request = Socks5Request(), Socks5Request()
+
+        assert ext.parse_request(data, ext_request) == native.parse_request(data, native_request)
+        assert ext.request_needed(data) == native.request_needed(data)
+        assert bytes(ext_request) == bytes(native_request)
+
+    @pytest.mark.parametrize('data', HANDSHAKES)
+    def test_handshake_matches_native(self, data):
+        native, ext = native_or_skip(), ext_or_skip()
+        native_handshake, ext_handshake = Socks5Handshake(), Socks5Handshake()
+
+        assert ext.parse_handshake(data, ext_handshake) == native.parse_handshake(data, native_handshake)
+        assert ext.handshake_needed(data) == native.handshake_needed(data)
+        assert bytes(ext_handshake) == bytes(native_handshake)
+
+    @pytest.mark.parametrize('data', UDP_DATAGRAMS)
+    def test_udp_header_matches_native(self, data):
+        native, ext = native_or_skip(), ext_or_skip()
+        native_header, ext_header = Socks5UdpHeader(), Socks5UdpHeader()
+
+        assert ext.parse_udp_header(data, ext_header) == native.parse_udp_header(data, native_header)
+        assert bytes(ext_header) == bytes(native_header)
+
+    def test_batch_matches_native(self, restore_backend):
+        native_or_skip()
+        ext_or_skip()
+        data, offsets = pack_messages(REQUESTS + HANDSHAKES)
+
+        results = {}
+        for name in ('ext', 'native'):
+            set_backend(name)
+            requests = socks5_native.parse_requests_batch(data, offsets)
+            handshakes = socks5_native.parse_handshakes_batch(data, offsets)
+            results[name] = (requests.parsed, list(requests.status), list(requests.cmd), list(requests.atyp),
+                             list(requests.port), list(requests.addr_offset),
+                             handshakes.parsed, list(handshakes.status), list(handshakes.nmethods))
+
+        assert results['ext'] == results['native']
+
+    @pytest.mark.parametrize('data', [
+        bytearray(REQUESTS[0]),
+        memoryview(b'xx' + REQUESTS[0])[2:],
+        memoryview(bytearray(b'xx' + REQUESTS[0]))[2:],
+    ])
+    def test_buffer_inputs(self, data):
+        request = Socks5Request()
+        assert ext_or_skip().parse_request(data, request) == 0
+        assert request.dst_port == 1080
+
+    def test_argument_errors(self):
+        ext = ext_or_skip()
+        with pytest.raises(TypeError):
+            ext.parse_request('text', Socks5Request())
+        with pytest.raises(TypeError):
+            ext.parse_request(REQUESTS[0])
+        with pytest.raises(BufferError):
+            ext.parse_request(REQUESTS[0], b'read-only')
+        with pytest.raises(ValueError):
+            ext.parse_request(REQUESTS[0], Socks5Handshake())
+        with pytest.raises(ValueError):
+            ext.build_udp_header(bytearray(UDP_HEADER_MAX), 0x01, b'\x7f\x00\x00\x01', 70000)
+
+
+class TestCompactRequest:
+    """parse_request_compact одинаков во всех реализациях"""
+
+    @pytest.fixture(params=['ext', 'native', 'python'])
+    def backend(self, request):
+        return load_backend(request.param)
+
+    @pytest.mark.parametrize('data, expected', [
+        (REQUESTS[0], (1, 1, '127.0.0.1', 1080, 10)),
+        (REQUESTS[1] + b'tail', (1, 3, 'example.com', 80, 18)),
+        (REQUESTS[2], (1, 4, '1:203:405:607:809:a0b:c0d:e0f', 443, 22)),
+        (REQUESTS[3], (1, 3, 'a' * 254, 80, 261)),
+        (b'\x05\x01\x00\x04' + bytes(16) + b'\x00\x50', (1, 4, '::', 80, 22)),
+        (b'\x05\x01\x00\x01\xff\x00\x0a\xc8\x00\x00', (1, 1, '255.0.10.200', 0, 10)),
+    ])
+    def test_fields(self, backend, data, expected):
+        parsed = backend.parse_request_compact(data)
+        assert (parsed.cmd, parsed.atyp, parsed.host, parsed.port, parsed.consumed) == expected
+        assert tuple(parsed) == expected
+
+    @pytest.mark.parametrize('data', REQUESTS[4:])
+    def test_error_codes(self, backend, data):
+        assert backend.parse_request_compact(data) == backend.parse_request(data, Socks5Request())
+
+    @pytest.mark.parametrize('addr', [
+        bytes(16),
+        bytes(15) + b'\x01',
+        b'\x01' + bytes(15),
+        bytes(10) + b'\xff\xff\x7f\x00\x00\x01',
+        bytes(12) + b'\x0a\x00\x00\x01',
+        b'\x00\x01' + bytes(4) + b'\x00\x01' + bytes(6) + b'\x00\x01',
+        b'\x20\x01\x0d\xb8\x00\x00' + b'\x00\x01' * 5,
+        bytes(range(0xf0, 0x100)),
+    ])
+    def test_ipv6_text(self, backend, addr):
+        """Запись IPv6 совпадает с socket.inet_ntop, включая сокращение нулей и IPv4 суффикс"""
+        parsed = backend.parse_request_compact(b'\x05\x01\x00\x04' + addr + b'\x00\x50')
+        assert parsed.host == socket.inet_ntop(socket.AF_INET6, addr)
+
+    def test_invalid_utf8_domain(self, backend):
+        """Имя домена не из UTF-8 не приводит к исключению и не теряет байты"""
+        parsed = backend.parse_request_compact(b'\x05\x01\x00\x03\x02\xff\xfe\x00\x50')
+        assert parsed.host.encode('utf-8', 'surrogateescape') == b'\xff\xfe'
+
+    def test_random_requests_match(self):
+        rng = random.Random(1081)
+        backends = [python_backend()]
+        for loader in (native_backend, ext_backend):
+            try:
+                backends.append(loader())
+            except OSError:
+                pass
+
+        for _ in range(2000):
+            data = bytes([5, rng.choice([1, 3]), 0, rng.choice([1, 3, 4])]) + rng.randbytes(rng.randint(0, 30))
+            results = [backend.parse_request_compact(data) for backend in backends]
+            results = [result if isinstance(result, int) else tuple(result) for result in results]
+            assert results.count(results[0]) == len(results)
+
+    def test_ext_result_is_immutable(self):
+        parsed = ext_or_skip().parse_request_compact(REQUESTS[0])
+        with pytest.raises(AttributeError):
+            parsed.port = 80
+
+    def test_module_function(self, restore_backend):
+        set_backend('python')
+        assert parse_request_compact(REQUESTS[0]).host == '127.0.0.1'
+
+
+class TestBackendSelection:
+    """Выбор реализации парсера"""
+
+    def test_unknown_backend(self, restore_backend):
+        with pytest.raises(ValueError):
+            set_backend('rust')
+
+    def test_backend_is_loaded_lazily(self, restore_backend):
+        """set_backend не загружает реализацию до первого вызова"""
+        set_backend('python')
+        assert socks5_native._backend is None
+
+        success, request = parse_request(b'\x05\x01\x00\x01\x7f\x00\x00\x01\x04\x38')
+        assert success
+        assert get_backend().name == 'python'
+
+    def test_auto_prefers_extension(self, restore_backend):
+        ext_or_skip()
+        set_backend('auto')
+        assert get_backend().name == 'ext'
+
+    def test_auto_falls_back_to_native(self, restore_backend, monkeypatch):
+        native_or_skip()
+        monkeypatch.delitem(sys.modules, socks5_native.EXTENSION_NAME, raising=False)
+        monkeypatch.setattr(socks5_native, 'EXTENSION_PATHS', ['/nonexistent/_socks5_ext.so'])
+        set_backend('auto')
+        assert get_backend().name == 'native'
+
+    def test_auto_falls_back_to_python(self, restore_backend, monkeypatch):
+        """Без C библиотеки и расширения auto выбирает pure-Python реализацию"""
+        monkeypatch.delitem(sys.modules, socks5_native.EXTENSION_NAME, raising=False)
+        monkeypatch.setattr(socks5_native, 'EXTENSION_PATHS', ['/nonexistent/_socks5_ext.so'])
+        monkeypatch.setattr(socks5_native, 'LIBRARY_PATHS', ['/nonexistent/libsocks5_parser.so'])
+        set_backend('auto')
+
+        assert get_backend().name == 'python'
+        assert parse_request(b'\x05\x01\x00\x03\x01a\x00\x50')[0]
+
+    def test_native_without_library_fails(self, restore_backend, monkeypatch):
+        """Явно запрошенный native без библиотеки - ошибка"""
+        monkeypatch.setattr(socks5_native, 'LIBRARY_PATHS', ['/nonexistent/libsocks5_parser.so'])
+        set_backend('native')
+
+        with pytest.raises(OSError):
+            get_backend()
+
+    def test_ext_without_extension_fails(self, restore_backend, monkeypatch):
+        monkeypatch.delitem(sys.modules, socks5_native.EXTENSION_NAME, raising=False)
+        monkeypatch.setattr(socks5_native, 'EXTENSION_PATHS', ['/nonexistent/_socks5_ext.so'])
+        set_backend('ext')
+
+        with pytest.raises(OSError):
+            get_backend()
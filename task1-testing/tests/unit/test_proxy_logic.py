@@ -42,7 +42,9 @@ class TestProxyLogic:
         mock_remote = MagicMock()
         mock_socket.return_value = mock_remote
         
-        proxy.handle_connect(mock_client, request)
+        # Туннель с mock сокетами не запускаем
+        with patch.object(proxy, 'start_tunnel'):
+            proxy.handle_connect(mock_client, request)
         
         # Проверяем, что создан сокет и выполнено подключение
         mock_socket.assert_called_with(socket.AF_INET, socket.SOCK_STREAM)
@@ -72,9 +74,13 @@ class TestProxyLogic:
         mock_remote = MagicMock()
         mock_socket.return_value = mock_remote
         
-        proxy.handle_connect(mock_client, request)
+        # Имя разрешается для всех семейств адресов, подключение к первому адресу
+        addresses = [(socket.AF_INET6, ('2001:db8::1', 0, 0, 0)), (socket.AF_INET, ('93.184.216.34', 0))]
+        with patch('socks5_proxy.system_resolve', return_value=addresses), patch.object(proxy, 'start_tunnel'):
+            proxy.handle_connect(mock_client, request)
         
-        mock_remote.connect.assert_called_with(('example.com', 443))
+        mock_socket.assert_called_with(socket.AF_INET6, socket.SOCK_STREAM)
+        mock_remote.connect.assert_called_with(('2001:db8::1', 443, 0, 0))
     
     def test_handle_connect_unsupported_atyp(self):
         """Тест неподдерживаемого типа адреса"""
@@ -115,6 +121,29 @@ class TestProxyLogic:
         mock_client.send.assert_called_with(b'\x05\x04\x00\x01\x00\x00\x00\x00\x00\x00')
         mock_client.close.assert_called_once()
 
+    @patch('socket.socket')
+    def test_initial_data_failure_after_success_reply(self, mock_socket):
+        """Ошибка отправки данных вслед за запросом: второго reply нет, оба сокета закрыты"""
+        proxy = Socks5Proxy()
+        mock_client = MagicMock()
+        request = Socks5Request()
+        request.cmd = 0x01
+        request.atyp = 0x01
+        request.dst_addr.ipv4 = (ctypes.c_uint8 * 4)(127, 0, 0, 1)
+        request.dst_port = 80
+
+        mock_remote = MagicMock()
+        mock_remote.sendall.side_effect = ConnectionResetError
+        mock_socket.return_value = mock_remote
+
+        with patch.object(proxy, 'start_tunnel') as start_tunnel:
+            proxy.handle_connect(mock_client, request, b'GET / HTTP/1.1')
+
+        mock_client.send.assert_called_once_with(b'\x05\x00\x00\x01\x00\x00\x00\x00\x00\x00')
+        mock_client.close.assert_called_once()
+        mock_remote.close.assert_called_once()
+        start_tunnel.assert_not_called()
+
 class TestErrorHandling:
     """Тесты обработки ошибок"""
     
@@ -0,0 +1,139 @@
+import pytest
+import socket
+import threading
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+# Общие вспомогательные функции тестов (tests/helpers.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import recv_exactly, start_proxy, wait_for
+from relay import RelayEngine
+from socks5_proxy import Socks5Proxy
+
+
+class TestRelayEngine:
+    """Тесты общего цикла пересылки"""
+
+    @pytest.fixture
+    def engine(self):
+        engine = RelayEngine()
+        engine.start()
+        yield engine
+        engine.stop()
+
+    def make_tunnel(self, engine):
+        """Пара клиент <-> прокси и прокси <-> сервер, середина отдается в engine"""
+        client, proxy_client_side = socket.socketpair()
+        proxy_remote_side, server = socket.socketpair()
+        engine.add_tunnel(proxy_client_side, proxy_remote_side)
+        client.settimeout(5)
+        server.settimeout(5)
+        return client, server
+
+    def test_data_both_directions(self, engine):
+        """Данные проходят в обе стороны"""
+        client, server = self.make_tunnel(engine)
+
+        client.sendall(b'ping')
+        assert server.recv(16) == b'ping'
+        server.sendall(b'pong')
+        assert client.recv(16) == b'pong'
+
+        assert wait_for(lambda: engine.active_tunnels == 1)
+
+    def test_bulk_transfer_with_backpressure(self, engine):
+        """Большой объем в обе стороны одновременно не теряется"""
+        client, server = self.make_tunnel(engine)
+        payload = os.urandom(4 * 1024 * 1024)
+        received = {}
+
+        def read_all(name, sock):
+            received[name] = recv_exactly(sock, len(payload))
+
+        readers = [
+            threading.Thread(target=read_all, args=('server', server)),
+            threading.Thread(target=read_all, args=('client', client)),
+        ]
+        for reader in readers:
+            reader.start()
+
+        client.sendall(payload)
+        server.sendall(payload)
+
+        for reader in readers:
+            reader.join()
+
+        assert received['server'] == payload
+        assert received['client'] == payload
+
+    def test_half_close(self, engine):
+        """FIN от клиента доходит до сервера, ответ сервера - до клиента"""
+        client, server = self.make_tunnel(engine)
+
+        client.sendall(b'request')
+        client.shutdown(socket.SHUT_WR)
+
+        assert recv_exactly(server, 7) == b'request'
+        assert server.recv(16) == b''
+
+        server.sendall(b'response')
+        server.close()
+
+        assert recv_exactly(client, 8) == b'response'
+        assert client.recv(16) == b''
+        assert wait_for(lambda: engine.active_tunnels == 0)
+
+    def test_many_tunnels_one_thread(self, engine):
+        """Все туннели обслуживаются одним потоком"""
+        threads_before = threading.active_count()
+        tunnels = [self.make_tunnel(engine) for _ in range(100)]
+
+        for i, (client, server) in enumerate(tunnels):
+            client.sendall(str(i).encode())
+            assert server.recv(16) == str(i).encode()
+
+        assert engine.active_tunnels == 100
+        assert threading.active_count() == threads_before
+
+        for client, server in tunnels:
+            client.close()
+            server.close()
+        assert wait_for(lambda: engine.active_tunnels == 0)
+
+
+class TestSharedRelayProxy:
+    """Socks5Proxy в режиме shared"""
+
+    def test_unknown_relay_mode(self):
+        with pytest.raises(ValueError):
+            Socks5Proxy(relay_mode='splice-everything')
+
+    def test_tunnel_through_proxy(self):
+        """После CONNECT туннель обслуживается общим циклом, а не потоком обработчика"""
+        target = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        target.bind(('127.0.0.1', 0))
+        target.listen(1)
+
+        proxy = start_proxy(relay_mode='shared')
+
+        client = socket.create_connection(('127.0.0.1', proxy.port), timeout=5)
+        try:
+            client.sendall(b'\x05\x01\x00')
+            assert client.recv(2) == b'\x05\x00'
+            client.sendall(b'\x05\x01\x00\x01\x7f\x00\x00\x01' + target.getsockname()[1].to_bytes(2, 'big'))
+            assert client.recv(10)[1] == 0x00
+
+            upstream, _ = target.accept()
+            client.sendall(b'hello')
+            assert upstream.recv(16) == b'hello'
+            upstream.sendall(b'world')
+            assert client.recv(16) == b'world'
+
+            assert wait_for(lambda: proxy.stats()['active_tunnels'] == 1)
+            upstream.close()
+        finally:
+            client.close()
+            target.close()
@@ -0,0 +1,113 @@
+import pytest
+import ipaddress
+import socket
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+import socks5_native
+from socks5_native import (RequestView, Socks5Request, pack_reply, parse_request_into, parse_request_view,
+                           set_backend)
+from socks5_proxy import Socks5Proxy
+
+REQUESTS = [
+    (b'\x05\x01\x00\x01\x7f\x00\x00\x01\x04\x38', (1, 1, b'\x7f\x00\x00\x01', '127.0.0.1', 1080)),
+    (b'\x05\x01\x00\x03\x0bexample.com\x01\xbb', (1, 3, b'example.com', 'example.com', 443)),
+    (b'\x05\x03\x00\x04' + bytes(15) + b'\x01\x00\x50', (3, 4, bytes(15) + b'\x01', '::1', 80)),
+]
+
+
+@pytest.fixture(params=['native', 'python'])
+def backend(request):
+    saved_name, saved_backend = socks5_native._backend_name, socks5_native._backend
+    set_backend(request.param)
+    try:
+        socks5_native.get_backend()
+    except OSError:
+        pytest.skip("C library not compiled. Run 'make' first.")
+    yield request.param
+    socks5_native._backend_name, socks5_native._backend = saved_name, saved_backend
+
+
+class TestRequestView:
+    """Компактное представление разобранного запроса"""
+
+    @pytest.mark.parametrize('data, expected', REQUESTS)
+    def test_fields(self, backend, data, expected):
+        view = parse_request_view(data + b'payload')
+        assert (view.cmd, view.atyp, view.addr, view.host, view.port) == expected
+
+    @pytest.mark.parametrize('data, expected', REQUESTS)
+    def test_buffer_inputs(self, backend, data, expected):
+        view = parse_request_view(memoryview(bytearray(data)))
+        assert type(view.addr) is bytes
+        assert view.address == (expected[3], expected[4])
+
+    @pytest.mark.parametrize('data, expected', REQUESTS)
+    def test_from_struct_matches(self, data, expected):
+        request = Socks5Request()
+        assert parse_request_into(data, request) == 0
+        view = RequestView.from_struct(request)
+        assert (view.cmd, view.atyp, view.addr, view.host, view.port) == expected
+
+    @pytest.mark.parametrize('data', [b'\x05\x01\x00', b'\x05\x01\x00\x02\x00\x50', b'\x05\x01\x00\x03\x00\x00\x50'])
+    def test_error_code(self, backend, data):
+        assert parse_request_view(data) == parse_request_into(data, Socks5Request())
+
+    def test_host_is_cached(self):
+        view = RequestView(0x01, 0x01, b'\x0a\x00\x00\x01', 80)
+        assert view._host is None
+        assert view.host is view.host
+        assert view.ip is view.ip
+
+    def test_ip(self):
+        assert RequestView(0x01, 0x01, b'\x0a\x00\x00\x01', 80).ip == ipaddress.IPv4Address('10.0.0.1')
+        assert RequestView(0x01, 0x04, socket.inet_pton(socket.AF_INET6, '2001:db8::1'), 80).ip == \
+            ipaddress.IPv6Address('2001:db8::1')
+        assert RequestView(0x01, 0x03, b'10.0.0.1', 80).ip is None
+
+    def test_invalid_utf8_domain(self):
+        view = RequestView(0x01, 0x03, b'\xff\xfe', 80)
+        assert view.host.encode('utf-8', 'surrogateescape') == b'\xff\xfe'
+
+    def test_smaller_than_struct(self):
+        view = parse_request_view(REQUESTS[1][0])
+        assert not hasattr(view, '__dict__')
+        assert sys.getsizeof(view) + sys.getsizeof(view.addr) < sys.getsizeof(Socks5Request())
+
+
+class TestPackReply:
+    """Сборка ответа сервера"""
+
+    @pytest.mark.parametrize('code', [0x00, 0x04, 0xff])
+    def test_zero_address(self, code):
+        assert pack_reply(code) == bytes((0x05, code, 0x00, 0x01)) + bytes(6)
+        assert pack_reply(code) is pack_reply(code)
+
+    @pytest.mark.parametrize('bind, expected', [
+        (('10.0.0.1', 1080), b'\x05\x00\x00\x01\x0a\x00\x00\x01\x04\x38'),
+        (('::1', 53), b'\x05\x00\x00\x04' + bytes(15) + b'\x01\x00\x35'),
+    ])
+    def test_bind_address(self, bind, expected):
+        assert pack_reply(0x00, bind) == expected
+
+
+class TestProxyWithView:
+    """handle_connect получает адрес из RequestView"""
+
+    @patch('socket.socket')
+    def test_handle_connect(self, mock_socket):
+        proxy = Socks5Proxy()
+        mock_client = MagicMock()
+        mock_remote = MagicMock()
+        mock_socket.return_value = mock_remote
+
+        with patch.object(proxy, 'start_tunnel'):
+            proxy.handle_connect(mock_client, parse_request_view(REQUESTS[0][0]), b'hello')
+
+        mock_remote.connect.assert_called_with(('127.0.0.1', 1080))
+        mock_remote.sendall.assert_called_with(b'hello')
+        mock_client.send.assert_called_with(pack_reply(0x00))
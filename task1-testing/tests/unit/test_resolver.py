@@ -0,0 +1,195 @@
+import pytest
+import socket
+import threading
+import time
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from resolver import CachingResolver
+from socks5_proxy import Socks5Proxy
+from socks5_native import Socks5Request
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class StubResolver:
+    """Локальная заглушка DNS: считает вызовы, может задерживать и падать"""
+
+    def __init__(self, delay=0.0, fail=()):
+        self.calls = []
+        self.delay = delay
+        self.fail = set(fail)
+        self.lock = threading.Lock()
+
+    def __call__(self, host):
+        with self.lock:
+            self.calls.append(host)
+        if self.delay:
+            time.sleep(self.delay)
+        if host in self.fail:
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        return [(socket.AF_INET, ('10.0.0.%d' % len(host), 0))]
+
+
+class TestCachingResolver:
+    """Тесты кеша DNS"""
+
+    def test_positive_cache_and_port(self):
+        """Повторный запрос берется из кеша, порт подставляется"""
+        stub = StubResolver()
+        resolver = CachingResolver(stub, clock=FakeClock())
+
+        assert resolver.resolve('example.com', 80) == [(socket.AF_INET, ('10.0.0.11', 80))]
+        assert resolver.resolve('example.com', 443) == [(socket.AF_INET, ('10.0.0.11', 443))]
+        assert stub.calls == ['example.com']
+        assert resolver.stats()['hits'] == 1
+
+    def test_positive_ttl_expiry(self):
+        clock = FakeClock()
+        stub = StubResolver()
+        resolver = CachingResolver(stub, positive_ttl=10, clock=clock)
+
+        resolver.resolve('example.com', 80)
+        clock.now += 11
+        resolver.resolve('example.com', 80)
+        assert stub.calls == ['example.com', 'example.com']
+
+    def test_negative_cache(self):
+        """Ошибка кешируется на negative_ttl"""
+        clock = FakeClock()
+        stub = StubResolver(fail={'missing.test'})
+        resolver = CachingResolver(stub, negative_ttl=5, clock=clock)
+
+        for _ in range(3):
+            with pytest.raises(socket.gaierror):
+                resolver.resolve('missing.test', 80)
+        assert stub.calls == ['missing.test']
+        assert resolver.stats()['negative_hits'] == 2
+
+        clock.now += 6
+        with pytest.raises(socket.gaierror):
+            resolver.resolve('missing.test', 80)
+        assert len(stub.calls) == 2
+
+    def test_lru_eviction(self):
+        stub = StubResolver()
+        resolver = CachingResolver(stub, max_entries=2, clock=FakeClock())
+
+        resolver.resolve('a.test', 80)
+        resolver.resolve('b.test', 80)
+        resolver.resolve('a.test', 80)   # a становится самым свежим
+        resolver.resolve('c.test', 80)   # вытесняет b
+
+        assert resolver.stats()['evictions'] == 1
+        resolver.resolve('a.test', 80)
+        resolver.resolve('b.test', 80)
+        assert stub.calls == ['a.test', 'b.test', 'c.test', 'b.test']
+
+    def test_concurrent_lookups_are_coalesced(self):
+        """Одновременные запросы одного имени - один вызов DNS"""
+        stub = StubResolver(delay=0.2)
+        resolver = CachingResolver(stub)
+        results = []
+
+        threads = [threading.Thread(target=lambda: results.append(resolver.resolve('example.com', 80)))
+                   for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert stub.calls == ['example.com']
+        assert len(results) == 10
+        assert resolver.stats()['coalesced'] == 9
+
+    def test_coalesced_failure_releases_waiters(self):
+        """Ошибка первого запроса получают и ожидающие потоки"""
+        stub = StubResolver(delay=0.1, fail={'missing.test'})
+        resolver = CachingResolver(stub)
+        errors = []
+
+        def worker():
+            try:
+                resolver.resolve('missing.test', 80)
+            except socket.gaierror as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert len(errors) == 5
+        assert stub.calls == ['missing.test']
+
+    def test_hot_entry_refreshed_in_background(self):
+        """Популярная запись обновляется до истечения TTL"""
+        clock = FakeClock()
+        stub = StubResolver()
+        resolver = CachingResolver(stub, positive_ttl=10, refresh_ahead=0.2,
+                                   refresh_min_hits=3, clock=clock)
+
+        resolver.resolve('hot.test', 80)
+        for _ in range(3):
+            resolver.resolve('hot.test', 80)
+        assert stub.calls == ['hot.test']
+
+        clock.now += 9  # осталось меньше 20% TTL
+        resolver.resolve('hot.test', 80)
+
+        deadline = time.time() + 2
+        while resolver.stats()['refreshes'] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert stub.calls == ['hot.test', 'hot.test']
+
+        # Обновленная запись живет еще полный TTL
+        clock.now += 9
+        resolver.resolve('hot.test', 80)
+        assert len(stub.calls) == 2
+
+
+class TestProxyWithResolver:
+    """handle_connect с кешем DNS"""
+
+    def make_domain_request(self, domain, port):
+        request = Socks5Request()
+        request.cmd = 0x01
+        request.atyp = 0x03
+        request.dst_port = port
+        request.dst_addr.domain.len = len(domain)
+        request.dst_addr.domain.name[:len(domain)] = domain
+        return request
+
+    @patch('socket.socket')
+    def test_domain_connect_uses_resolver(self, mock_socket):
+        stub = StubResolver()
+        proxy = Socks5Proxy(resolver=CachingResolver(stub))
+        mock_remote = MagicMock()
+        mock_socket.return_value = mock_remote
+
+        with patch.object(proxy, 'start_tunnel'):
+            proxy.handle_connect(MagicMock(), self.make_domain_request(b'example.com', 443))
+            proxy.handle_connect(MagicMock(), self.make_domain_request(b'example.com', 443))
+
+        mock_remote.connect.assert_called_with(('10.0.0.11', 443))
+        assert stub.calls == ['example.com']
+
+    def test_resolution_failure_replies_host_unreachable(self):
+        proxy = Socks5Proxy(resolver=CachingResolver(StubResolver(fail={'missing.test'})))
+        mock_client = MagicMock()
+
+        proxy.handle_connect(mock_client, self.make_domain_request(b'missing.test', 80))
+
+        mock_client.send.assert_called_with(b'\x05\x04\x00\x01\x00\x00\x00\x00\x00\x00')
+        mock_client.close.assert_called_once()
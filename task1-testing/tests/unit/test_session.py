@@ -0,0 +1,197 @@
+import pytest
+import socket
+import threading
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+import socks5_native
+from socks5_native import native_backend, python_backend, set_backend
+from socks5_session import (Socks5Session, STATE_HANDSHAKE, STATE_AUTH, STATE_REQUEST, STATE_DONE, STATE_ERROR,
+                            METHOD_NO_AUTH, METHOD_USERNAME_PASSWORD, ERROR_NO_ACCEPTABLE_METHODS)
+from socks5_proxy import Socks5Proxy
+from local_servers import EchoServer
+
+HANDSHAKE = b'\x05\x01\x00'
+REQUEST_IPV4 = b'\x05\x01\x00\x01\x7f\x00\x00\x01\x00\x50'
+REQUEST_DOMAIN = b'\x05\x01\x00\x03\x0bexample.com\x01\xbb'
+
+
+@pytest.fixture(params=['native', 'python'])
+def backend(request):
+    """Тесты выполняются на обеих реализациях парсера"""
+    if request.param == 'native':
+        try:
+            native_backend()
+        except OSError:
+            pytest.skip("C library not compiled. Run 'make' first.")
+    saved_name, saved_backend = socks5_native._backend_name, socks5_native._backend
+    set_backend(request.param)
+    yield request.param
+    socks5_native._backend_name, socks5_native._backend = saved_name, saved_backend
+
+
+class TestBytesNeeded:
+    """Длина сообщения по его началу (socks5_*_needed)"""
+
+    @pytest.mark.parametrize('data, expected', [
+        (b'', 2),
+        (b'\x05', 2),
+        (b'\x05\x02', 4),
+        (b'\x05\x02\x00\x02', 4),
+        (b'\x04\x01', -2),
+        (b'\x05\x00', -3),
+    ])
+    def test_handshake(self, backend, data, expected):
+        assert socks5_native.handshake_needed(data) == expected
+
+    @pytest.mark.parametrize('data, expected', [
+        (b'\x05\x01', 4),
+        (b'\x05\x01\x00\x01', 10),
+        (b'\x05\x01\x00\x03', 7),
+        (b'\x05\x01\x00\x03\x0b', 18),
+        (b'\x05\x01\x00\x03\x00', -4),
+        (b'\x05\x01\x00\x03\xff', -4),
+        (b'\x05\x01\x00\x04', 22),
+        (b'\x05\x01\x00\x09', -7),
+    ])
+    def test_request(self, backend, data, expected):
+        assert socks5_native.request_needed(data) == expected
+
+    def test_buffer_types(self, backend):
+        data = bytearray(REQUEST_DOMAIN + b'payload')
+        assert socks5_native.request_needed(data) == len(REQUEST_DOMAIN)
+        assert socks5_native.request_needed(memoryview(data)[:5]) == len(REQUEST_DOMAIN)
+
+
+class TestSocks5Session:
+    """Разбор произвольно нарезанного потока"""
+
+    def test_separate_messages(self, backend):
+        session = Socks5Session()
+        assert session.feed(HANDSHAKE) == STATE_REQUEST
+        assert session.feed(REQUEST_IPV4) == STATE_DONE
+        assert session.request.port == 80
+        assert session.take_payload() == b''
+
+    def test_byte_by_byte(self, backend):
+        session = Socks5Session()
+        stream = HANDSHAKE + REQUEST_DOMAIN
+        for i, byte in enumerate(stream):
+            state = session.feed(bytes([byte]))
+            if i < len(HANDSHAKE) - 1:
+                assert state == STATE_HANDSHAKE
+                assert session.needed > 0
+        assert state == STATE_DONE
+        assert session.request.addr == b'example.com'
+        assert session.request.address == ('example.com', 443)
+
+    def test_pipelined_with_payload(self, backend):
+        session = Socks5Session()
+        assert session.feed(HANDSHAKE + REQUEST_IPV4 + b'GET / HTTP/1.0\r\n') == STATE_DONE
+        assert session.handshake.nmethods == 1
+        assert session.take_payload() == b'GET / HTTP/1.0\r\n'
+
+    def test_needed_reports_missing_bytes(self, backend):
+        session = Socks5Session()
+        session.feed(HANDSHAKE + REQUEST_DOMAIN[:6])
+        assert session.state == STATE_REQUEST
+        assert session.needed == len(REQUEST_DOMAIN) - 6
+
+    def test_invalid_handshake(self, backend):
+        session = Socks5Session()
+        assert session.feed(b'\x04\x01\x00') == STATE_ERROR
+        assert session.error == -2
+
+    def test_invalid_request(self, backend):
+        session = Socks5Session()
+        assert session.feed(HANDSHAKE + b'\x05\x01\x00\x09') == STATE_ERROR
+        assert session.error == -7
+        assert session.handshake_done is False
+
+
+class TestMethodSelection:
+    """Выбор метода аутентификации и этап username/password"""
+
+    AUTH = b'\x01\x05alice\x06secret'
+
+    def test_server_preference_order(self, backend):
+        session = Socks5Session((METHOD_USERNAME_PASSWORD, METHOD_NO_AUTH))
+        assert session.feed(b'\x05\x02\x00\x02') == STATE_AUTH
+        assert session.method == METHOD_USERNAME_PASSWORD
+        assert session.handshake_done is True
+
+    def test_no_acceptable_methods(self, backend):
+        session = Socks5Session((METHOD_USERNAME_PASSWORD,))
+        assert session.feed(HANDSHAKE) == STATE_ERROR
+        assert session.error == ERROR_NO_ACCEPTABLE_METHODS
+        assert session.failed_state == STATE_HANDSHAKE
+
+    def test_auth_then_request_pipelined(self, backend):
+        session = Socks5Session((METHOD_USERNAME_PASSWORD,))
+        assert session.feed(b'\x05\x01\x02' + self.AUTH + REQUEST_IPV4 + b'data') == STATE_DONE
+        assert (session.auth.username, session.auth.password) == (b'alice', b'secret')
+        assert session.take_payload() == b'data'
+
+    def test_auth_byte_by_byte(self, backend):
+        session = Socks5Session((METHOD_USERNAME_PASSWORD,))
+        session.feed(b'\x05\x01\x02')
+        for byte in self.AUTH[:-1]:
+            assert session.feed(bytes((byte,))) == STATE_AUTH
+        assert session.needed == 1
+        assert session.feed(self.AUTH[-1:]) == STATE_REQUEST
+
+    def test_invalid_auth(self, backend):
+        session = Socks5Session((METHOD_USERNAME_PASSWORD,))
+        assert session.feed(b'\x05\x01\x02\x01\x00') == STATE_ERROR
+        assert session.error == -3
+        assert session.failed_state == STATE_AUTH
+
+
+class TestPipelinedClient:
+    """Клиент отправляет все сразу и не ждет ответов сервера"""
+
+    @pytest.fixture
+    def proxy_client(self):
+        proxy = Socks5Proxy()
+        client, proxy_side = socket.socketpair()
+        thread = threading.Thread(target=proxy.handle_client, args=(proxy_side,), daemon=True)
+        yield client, thread
+        client.close()
+
+    def read_replies(self, client, size):
+        data = b''
+        while len(data) < size:
+            chunk = client.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    def test_pipelined_connect_and_payload(self, proxy_client):
+        client, thread = proxy_client
+        with EchoServer() as echo:
+            request = b'\x05\x01\x00\x01' + socket.inet_aton(echo.address[0]) + echo.address[1].to_bytes(2, 'big')
+            client.sendall(HANDSHAKE + request + b'hello')
+            thread.start()
+
+            data = self.read_replies(client, 2 + 10 + 5)
+            assert data[:2] == b'\x05\x00'
+            assert data[2:4] == b'\x05\x00'
+            assert data[12:] == b'hello'
+
+    def test_split_messages(self, proxy_client):
+        client, thread = proxy_client
+        with EchoServer() as echo:
+            request = b'\x05\x01\x00\x01' + socket.inet_aton(echo.address[0]) + echo.address[1].to_bytes(2, 'big')
+            thread.start()
+            client.sendall(HANDSHAKE[:1])
+            client.sendall(HANDSHAKE[1:])
+            assert self.read_replies(client, 2) == b'\x05\x00'
+            client.sendall(request[:5])
+            client.sendall(request[5:])
+            assert self.read_replies(client, 10)[:2] == b'\x05\x00'
+            client.sendall(b'ping')
+            assert self.read_replies(client, 4) == b'ping'
@@ -0,0 +1,107 @@
+import pytest
+import gc
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from shaping import TokenBucket, TunnelLimit, BandwidthShaper, parse_bandwidth, MIN_READ
+
+
+class FakeClock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+    """Тесты ведра токенов"""
+
+    def test_starts_full(self):
+        bucket = TokenBucket(1000, burst=500, now=0)
+        assert bucket.available(0) == 500
+
+    def test_refill_capped_by_burst(self):
+        """Токены начисляются со скоростью rate, но не больше burst"""
+        bucket = TokenBucket(1000, burst=500, now=0)
+        bucket.consume(500)
+        assert bucket.available(0.2) == pytest.approx(200)
+        assert bucket.available(10) == 500
+
+    def test_delay(self):
+        bucket = TokenBucket(1000, burst=500, now=0)
+        bucket.consume(700)
+        # Долг 200 байт плюс 100 нужных
+        assert bucket.delay(100, 0) == pytest.approx(0.3)
+        assert bucket.delay(100, 1) == 0
+
+    def test_default_burst(self):
+        """Запас по умолчанию не меньше одного минимального чтения"""
+        assert TokenBucket(100).burst == MIN_READ
+        assert TokenBucket(1_000_000).burst == 250_000
+
+    def test_invalid_rate(self):
+        with pytest.raises(ValueError):
+            TokenBucket(0)
+
+
+class TestTunnelLimit:
+    """Ограничения одного туннеля"""
+
+    def test_smallest_bucket_wins(self):
+        clock = FakeClock(0)
+        limit = TunnelLimit([TokenBucket(10**6, 20000, 0), TokenBucket(10**6, 8000, 0)], clock)
+        assert limit.allowance(65536) == 8000
+        limit.consume(8000)
+        assert limit.allowance(65536) == 0
+        # Нужно MIN_READ токенов в меньшем ведре
+        assert limit.delay() == pytest.approx(MIN_READ / 10**6)
+
+    def test_small_request_allowed(self):
+        """Чтение меньше MIN_READ разрешается целиком"""
+        clock = FakeClock(0)
+        limit = TunnelLimit([TokenBucket(10**6, 1000, 0)], clock)
+        assert limit.allowance(100) == 100
+
+
+class TestBandwidthShaper:
+    """Общие ведра по клиенту и назначению"""
+
+    def test_client_bucket_shared(self):
+        shaper = BandwidthShaper(per_client=10000, clock=FakeClock())
+        first = shaper.open('10.0.0.1', ('example.com', 80))
+        second = shaper.open('10.0.0.1', ('example.org', 80))
+        other = shaper.open('10.0.0.2', ('example.com', 80))
+        assert first.buckets[0] is second.buckets[0]
+        assert first.buckets[0] is not other.buckets[0]
+
+    def test_all_limits(self):
+        shaper = BandwidthShaper(per_client=1, per_destination=2, total=3, clock=FakeClock())
+        limit = shaper.open('10.0.0.1', ('example.com', 80))
+        assert [bucket.rate for bucket in limit.buckets] == [1, 2, 3]
+        assert shaper.stats() == {'clients': 1, 'destinations': 1}
+
+    def test_no_limits(self):
+        assert BandwidthShaper().open('10.0.0.1', ('example.com', 80)) is None
+
+    def test_buckets_released(self):
+        """Ведро клиента удаляется после закрытия последнего туннеля"""
+        shaper = BandwidthShaper(per_client=10000, clock=FakeClock())
+        limit = shaper.open('10.0.0.1', ('example.com', 80))
+        assert shaper.stats()['clients'] == 1
+        del limit
+        gc.collect()
+        assert shaper.stats()['clients'] == 0
+
+    def test_burst_seconds(self):
+        shaper = BandwidthShaper(total=100000, burst_seconds=2, clock=FakeClock())
+        assert shaper.total.burst == 200000
+
+
+def test_parse_bandwidth():
+    assert parse_bandwidth('512K') == 512 * 1024
+    assert parse_bandwidth('10m') == 10 * 1024 * 1024
+    assert parse_bandwidth('1500') == 1500
@@ -0,0 +1,51 @@
+import pytest
+import socket
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from socks5_messages import ERROR_CODES, encode_handshake, encode_auth, encode_request, describe_reply
+from socks5_native import parse_handshake, parse_auth, parse_request
+
+
+class TestEncoders:
+    """Кодирование сообщений клиента"""
+
+    def test_handshake(self):
+        assert encode_handshake() == b'\x05\x01\x00'
+        success, handshake = parse_handshake(encode_handshake((0x00, 0x02)))
+        assert success and handshake.nmethods == 2
+
+    def test_auth(self):
+        success, auth = parse_auth(encode_auth(b'alice', b'secret'))
+        assert success
+        assert (auth.username, auth.password) == (b'alice', b'secret')
+
+    def test_ipv4_request(self):
+        assert encode_request('127.0.0.1', 80) == b'\x05\x01\x00\x01\x7f\x00\x00\x01\x00\x50'
+
+    def test_ipv6_request(self):
+        data = encode_request('::1', 443)
+        success, request = parse_request(data)
+        assert success
+        assert request.atyp == 0x04
+        assert socket.inet_ntop(socket.AF_INET6, bytes(request.dst_addr.ipv6)) == '::1'
+        assert request.dst_port == 443
+
+    def test_domain_request(self):
+        data = encode_request('example.com', 8080)
+        success, request = parse_request(data)
+        assert success
+        assert request.atyp == 0x03
+        assert bytes(request.dst_addr.domain.name[:request.dst_addr.domain.len]) == b'example.com'
+        assert request.dst_port == 8080
+
+    def test_domain_too_long(self):
+        with pytest.raises(ValueError):
+            encode_request('a' * 300, 80)
+
+    def test_error_codes(self):
+        assert describe_reply(0x04) == ERROR_CODES[0x04] == 'Host unreachable'
+        assert describe_reply(0x42) == 'Unknown error 66'
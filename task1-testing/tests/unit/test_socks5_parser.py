@@ -4,7 +4,9 @@ import os
 # Добавляем путь к src/python для импортов
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
 
-from socks5_native import parse_handshake, parse_request, Socks5Handshake, Socks5Request
+from socks5_native import (parse_handshake, parse_request, parse_handshake_fast, parse_request_fast,
+                           parse_handshake_into, parse_request_into, Socks5Handshake, Socks5Request,
+                           pack_messages, parse_handshakes_batch, parse_requests_batch)
 
 class TestSocks5Parser:
     """Unit-тесты для C библиотеки парсинга SOCKS5"""
@@ -155,3 +157,118 @@ class TestEdgeCases:
     #    domain_str = bytes(domain_bytes).decode('utf-8')
     #    
     #    assert domain_str == 'a'
+
+class TestBufferTypes:
+    """Тесты передачи буферов в C библиотеку без копирования"""
+    
+    def test_request_from_bytearray(self):
+        """Запрос из bytearray"""
+        data = bytearray(b'\x05\x01\x00\x01\x7f\x00\x00\x01\x04\x38')
+        success, request = parse_request(data)
+        
+        assert success == True
+        assert list(request.dst_addr.ipv4) == [127, 0, 0, 1]
+        assert request.dst_port == 1080
+    
+    def test_request_from_memoryview_slice(self):
+        """Запрос из среза memoryview (в том числе read-only)"""
+        data = b'garbage\x05\x01\x00\x03\x0bexample.com\x00\x50'
+        
+        for buffer in (memoryview(data)[7:], memoryview(bytearray(data))[7:]):
+            success, request = parse_request(buffer)
+            assert success == True
+            assert request.dst_addr.domain.len == 11
+            assert request.dst_port == 80
+    
+    def test_handshake_from_memoryview(self):
+        """Handshake из memoryview"""
+        success, handshake = parse_handshake(memoryview(b'\x05\x02\x00\x02'))
+        
+        assert success == True
+        assert handshake.nmethods == 2
+        assert handshake.methods[1] == 2
+    
+    def test_into_returns_error_code(self):
+        """parse_*_into возвращают код ошибки C библиотеки"""
+        assert parse_handshake_into(b'\x04\x01\x00', Socks5Handshake()) == -2
+        assert parse_request_into(b'\x05\x01\x00\x02\x00\x50', Socks5Request()) == -7
+        assert parse_request_into(b'\x05\x01\x00\x01\x7f\x00\x00\x01\x04\x38', Socks5Request()) == 0
+    
+    def test_fast_reuses_thread_struct(self):
+        """fast-функции возвращают одну и ту же структуру в пределах потока"""
+        _, first = parse_request_fast(b'\x05\x01\x00\x01\x7f\x00\x00\x01\x04\x38')
+        _, second = parse_request_fast(b'\x05\x01\x00\x03\x01a\x00\x50')
+        
+        assert first is second
+        assert second.atyp == 3
+        assert second.dst_port == 80
+        
+        success, request = parse_request_fast(b'\x05\x01\x00')
+        assert success == False
+        assert request is None
+    
+    def test_parse_failure_is_silent(self, capsys):
+        """Ошибка парсинга не печатает отладочный вывод"""
+        success, _ = parse_request(b'\x05\x01\x00')
+        
+        assert success == False
+        assert capsys.readouterr().out == ''
+
+class TestBatchParsing:
+    """Тесты пакетного парсинга"""
+    
+    def test_requests_batch(self):
+        """Пакет из корректных и некорректных запросов"""
+        messages = [
+            b'\x05\x01\x00\x01\x7f\x00\x00\x01\x04\x38',
+            b'\x05\x01\x00',
+            b'\x05\x01\x00\x03\x0bexample.com\x00\x50',
+            b'\x05\x01\x00\x02\x00\x50',
+        ]
+        data, offsets = pack_messages(messages)
+        batch = parse_requests_batch(data, offsets)
+        
+        assert batch.count == 4
+        assert batch.parsed == 2
+        assert list(batch.status) == [0, -1, 0, -7]
+        assert list(batch.cmd) == [1, 0, 1, 0]
+        assert list(batch.atyp) == [1, 0, 3, 0]
+        assert list(batch.port) == [1080, 0, 80, 0]
+        
+        ipv4_offset = batch.addr_offset[0]
+        assert data[ipv4_offset:ipv4_offset + 4] == b'\x7f\x00\x00\x01'
+        domain_offset = batch.addr_offset[2]
+        assert data[domain_offset - 1] == 11
+        assert data[domain_offset:domain_offset + 11] == b'example.com'
+    
+    def test_handshakes_batch(self):
+        """Пакет handshake"""
+        data, offsets = pack_messages([b'\x05\x01\x00', b'\x04\x01\x00', b'\x05\x02\x00\x02'])
+        batch = parse_handshakes_batch(bytearray(data), list(offsets))
+        
+        assert batch.parsed == 2
+        assert list(batch.status) == [0, -2, 0]
+        assert list(batch.nmethods) == [1, 0, 2]
+    
+    def test_offsets_out_of_bounds(self):
+        """Смещения за пределами буфера дают ошибку -1 для сообщения"""
+        data = b'\x05\x01\x00\x01\x7f\x00\x00\x01\x04\x38'
+        batch = parse_requests_batch(data, [0, 10, 20])
+        
+        assert list(batch.status) == [0, -1]
+        assert batch.parsed == 1
+    
+    def test_empty_batch(self):
+        """Пустой пакет"""
+        batch = parse_requests_batch(b'', [0])
+        assert batch.count == 0
+        assert batch.parsed == 0
+    
+    def test_results_are_buffers(self):
+        """Результаты доступны через memoryview без копирования"""
+        data, offsets = pack_messages([b'\x05\x01\x00\x01\x7f\x00\x00\x01\x04\x38'] * 3)
+        batch = parse_requests_batch(data, offsets)
+        
+        ports = memoryview(batch.port)
+        assert ports.format == 'H'
+        assert ports.tolist() == [1080, 1080, 1080]
@@ -0,0 +1,116 @@
+import pytest
+import errno
+import os
+import socket
+import threading
+import sys
+from unittest.mock import patch
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+import splice_relay
+from splice_relay import SpliceTunnel, splice_supported
+
+
+def recv_all(sock):
+    chunks = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return b''.join(chunks)
+        chunks.append(chunk)
+
+
+def run_tunnel():
+    """Клиент и сервер по разные стороны SpliceTunnel"""
+    client, proxy_client_side = socket.socketpair()
+    proxy_remote_side, server = socket.socketpair()
+    tunnel = SpliceTunnel(proxy_client_side, proxy_remote_side)
+    thread = threading.Thread(target=tunnel.run, daemon=True)
+    thread.start()
+    return tunnel, thread, client, server
+
+
+class TestSpliceTunnel:
+    """Тесты пересылки через os.splice"""
+
+    def test_transfer_and_half_close(self):
+        """Данные и FIN проходят в обе стороны"""
+        if not splice_supported():
+            pytest.skip("os.splice is not supported here")
+
+        tunnel, thread, client, server = run_tunnel()
+        payload = os.urandom(3 * 1024 * 1024 + 17)
+
+        sender = threading.Thread(target=lambda: (client.sendall(payload), client.shutdown(socket.SHUT_WR)))
+        sender.start()
+        assert recv_all(server) == payload
+        sender.join()
+
+        server.sendall(b'done')
+        server.shutdown(socket.SHUT_WR)
+        assert recv_all(client) == b'done'
+
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+        assert tunnel.bytes_relayed == len(payload) + 4
+
+    def test_fallback_when_splice_rejected(self):
+        """При EINVAL от ядра направление переходит на копирование в user space"""
+        def reject(*args, **kwargs):
+            raise OSError(errno.EINVAL, "Invalid argument")
+
+        with patch.object(splice_relay.os, 'splice', side_effect=reject):
+            tunnel, thread, client, server = run_tunnel()
+            client.sendall(b'hello')
+            client.shutdown(socket.SHUT_WR)
+            assert recv_all(server) == b'hello'
+            server.close()
+            thread.join(timeout=5)
+
+        assert tunnel.bytes_relayed == 5
+
+    def test_fallback_mid_stream_keeps_pipe_data(self):
+        """Отказ splice из pipe посреди потока: данные, уже попавшие в pipe, не теряются"""
+        if not splice_supported():
+            pytest.skip("os.splice is not supported here")
+
+        real_splice = os.splice
+        sockets = set()
+        pipe_writes = []
+
+        def flaky(src, dst, count, *args, **kwargs):
+            if src not in sockets:
+                # Первая порция уходит из pipe целиком, на второй ядро отказывает
+                pipe_writes.append(count)
+                if len(pipe_writes) > 1:
+                    raise OSError(errno.EINVAL, "Invalid argument")
+            return real_splice(src, dst, min(count, 4096), *args, **kwargs)
+
+        client, client_side = socket.socketpair()
+        remote_side, server = socket.socketpair()
+        sockets.update((client_side.fileno(), remote_side.fileno()))
+        tunnel = SpliceTunnel(client_side, remote_side)
+        payload = os.urandom(64 * 1024)
+        with patch.object(splice_relay.os, 'splice', side_effect=flaky):
+            thread = threading.Thread(target=tunnel.run, daemon=True)
+            thread.start()
+            client.sendall(payload[:4096])
+            assert server.recv(65536) == payload[:4096]
+            sender = threading.Thread(target=lambda: (client.sendall(payload[4096:]),
+                                                      client.shutdown(socket.SHUT_WR)))
+            sender.start()
+            received = payload[:4096] + recv_all(server)
+            sender.join()
+            server.close()
+            thread.join(timeout=5)
+
+        assert received == payload
+        assert tunnel.bytes_relayed == len(payload)
+
+    def test_support_detection_is_cached(self):
+        """Проверка поддержки выполняется один раз"""
+        first = splice_supported()
+        with patch.object(splice_relay.os, 'pipe', side_effect=AssertionError):
+            assert splice_supported() == first
@@ -0,0 +1,193 @@
+import pytest
+import socket
+import threading
+import time
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+# Общие вспомогательные функции тестов (tests/helpers.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from helpers import wait_for
+from timer_wheel import TimerWheel, Timer
+from relay import RELAY_THREAD, RELAY_SHARED, RELAY_SPLICE
+from socks5_proxy import Socks5Proxy
+from local_servers import EchoServer
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestTimerWheel:
+    """Тесты колеса таймеров на искусственных часах"""
+
+    @pytest.fixture
+    def clock(self):
+        return FakeClock()
+
+    @pytest.fixture
+    def wheel(self, clock):
+        return TimerWheel(tick=0.1, slots=16, clock=clock)
+
+    def test_fires_after_delay(self, wheel, clock):
+        """Таймер срабатывает после срока, но не раньше"""
+        fired = []
+        wheel.schedule(1.0, fired.append, 'a')
+
+        clock.now += 0.9
+        assert wheel.advance() == 0
+        clock.now += 0.2
+        assert wheel.advance() == 1
+        assert fired == ['a']
+        assert wheel.stats()['pending'] == 0
+
+    def test_cancel(self, wheel, clock):
+        """Отмененный таймер не срабатывает"""
+        fired = []
+        timer = wheel.schedule(0.5, fired.append, 'a')
+        assert wheel.cancel(timer)
+
+        clock.now += 1
+        wheel.advance()
+        assert fired == []
+        assert wheel.stats()['cancelled'] == 1
+        # Повторная отмена безопасна
+        assert wheel.cancel(timer)
+
+    def test_cancel_after_fire(self, wheel, clock):
+        """cancel сообщает, что таймер уже сработал"""
+        timer = wheel.schedule(0.1, lambda: None)
+        clock.now += 0.5
+        wheel.advance()
+        assert timer.state == Timer.FIRED
+        assert not wheel.cancel(timer)
+
+    def test_delay_longer_than_wheel(self, wheel, clock):
+        """Срок больше одного оборота колеса учитывается через счетчик оборотов"""
+        fired = []
+        # 16 слотов по 0.1с = оборот 1.6с
+        wheel.schedule(5.0, fired.append, 'long')
+
+        for _ in range(49):
+            clock.now += 0.1
+            wheel.advance()
+        assert fired == []
+
+        clock.now += 0.2
+        wheel.advance()
+        assert fired == ['long']
+
+    def test_idle_timer_rescheduled_on_activity(self, wheel, clock):
+        """Таймер простоя переносится от последней активности"""
+        fired = []
+        timer = wheel.schedule(1.0, fired.append, 'idle', idle=True)
+
+        clock.now += 0.8
+        wheel.touch(timer)
+        clock.now += 0.5
+        wheel.advance()
+        assert fired == []
+
+        clock.now += 0.6
+        wheel.advance()
+        assert fired == ['idle']
+
+    def test_callback_error_does_not_stop_wheel(self, wheel, clock):
+        """Исключение в колбэке не мешает остальным таймерам"""
+        fired = []
+
+        def fail():
+            raise RuntimeError("boom")
+
+        wheel.schedule(0.2, fail)
+        wheel.schedule(0.2, fired.append, 'ok')
+        clock.now += 0.5
+        assert wheel.advance() == 2
+        assert fired == ['ok']
+
+    def test_background_thread(self):
+        """Поток колеса вызывает колбэки по реальным часам"""
+        wheel = TimerWheel(tick=0.01).start()
+        try:
+            event = threading.Event()
+            wheel.schedule(0.05, event.set)
+            assert event.wait(2)
+        finally:
+            wheel.stop()
+
+
+class TestProxyTimeouts:
+    """Таймауты handshake и простоя в прокси"""
+
+    @pytest.fixture
+    def wheel(self):
+        wheel = TimerWheel(tick=0.02).start()
+        yield wheel
+        wheel.stop()
+
+    def test_handshake_timeout(self, wheel):
+        """Клиент без handshake отключается по таймауту"""
+        proxy = Socks5Proxy(handshake_timeout=0.1, timer_wheel=wheel)
+        client, proxy_side = socket.socketpair()
+        client.settimeout(3)
+        handler = threading.Thread(target=proxy.handle_client, args=(proxy_side,))
+        handler.start()
+
+        # Неполный handshake: прокси ждет остаток
+        client.sendall(b'\x05')
+        assert client.recv(16) == b''
+        handler.join(3)
+        assert not handler.is_alive()
+        assert proxy.stats()['reclaimed']['handshake'] == 1
+        assert proxy.metrics.reclaimed.value(('handshake',)) == 1
+        client.close()
+
+    def test_handshake_timer_cancelled(self, wheel):
+        """После разбора request таймер handshake снимается"""
+        proxy = Socks5Proxy(handshake_timeout=5, timer_wheel=wheel)
+        client, proxy_side = socket.socketpair()
+        client.settimeout(3)
+        handler = threading.Thread(target=proxy.handle_client, args=(proxy_side,))
+        handler.start()
+
+        # Неподдерживаемая команда BIND - ответ без подключения к серверу
+        client.sendall(b'\x05\x01\x00' + b'\x05\x02\x00\x01\x7f\x00\x00\x01\x00\x50')
+        assert client.recv(2) == b'\x05\x00'
+        assert client.recv(10)[1] == 0x07
+        handler.join(3)
+        assert wheel.stats()['pending'] == 0
+        assert proxy.reclaimed['handshake'] == 0
+        client.close()
+
+    @pytest.mark.parametrize('relay_mode', [RELAY_THREAD, RELAY_SHARED, RELAY_SPLICE])
+    def test_idle_tunnel_reclaimed(self, wheel, relay_mode):
+        """Туннель без данных закрывается, активный - остается открытым"""
+        proxy = Socks5Proxy(relay_mode=relay_mode, idle_timeout=0.3, timer_wheel=wheel)
+        with EchoServer() as echo:
+            client, proxy_client = socket.socketpair()
+            remote = socket.create_connection(echo.address)
+            client.settimeout(3)
+            tunnel = threading.Thread(target=proxy.start_tunnel, args=(proxy_client, remote))
+            tunnel.start()
+
+            # Активность продлевает туннель дольше таймаута
+            for _ in range(4):
+                client.sendall(b'x')
+                assert client.recv(1) == b'x'
+                time.sleep(0.1)
+            assert proxy.reclaimed['idle'] == 0
+
+            assert client.recv(16) == b''
+            assert wait_for(lambda: proxy.reclaimed['idle'] == 1)
+            tunnel.join(3)
+            assert wait_for(lambda: wheel.stats()['pending'] == 0)
+            client.close()
+        for relay in proxy.relays:
+            relay.stop()
@@ -0,0 +1,130 @@
+import pytest
+import io
+import json
+import threading
+import time
+import sys
+import os
+from unittest.mock import MagicMock
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from socks5_proxy import Socks5Proxy
+from tracing import Tracer
+
+
+class BlockingStream(io.StringIO):
+    """Файл трассировки, запись в который ждет разрешения (как медленный диск)"""
+
+    def __init__(self):
+        super().__init__()
+        self.unblocked = threading.Event()
+
+    def write(self, data):
+        self.unblocked.wait()
+        return super().write(data)
+
+
+def close_and_load(tracer, stream):
+    tracer.close()
+    return json.loads(stream.getvalue())
+
+
+class TestTracer:
+    """Выборка и формат Chrome trace event"""
+
+    def test_spans_in_microseconds(self):
+        stream = io.StringIO()
+        tracer = Tracer(stream=stream)
+        trace = tracer.sample()
+        trace.name('127.0.0.1:5000')
+        trace.span('connect', 1.5, 1.5025, host='example.com', port=443)
+        trace.span('teardown', 2.0, 2.0)
+
+        meta, connect, teardown = close_and_load(tracer, stream)
+        assert meta == {'ph': 'M', 'name': 'thread_name', 'pid': os.getpid(), 'tid': trace.tid,
+                        'args': {'name': '127.0.0.1:5000'}}
+        assert connect == {'ph': 'X', 'name': 'connect', 'cat': 'socks5', 'pid': os.getpid(), 'tid': trace.tid,
+                           'ts': 1500000.0, 'dur': 2500.0, 'args': {'host': 'example.com', 'port': 443}}
+        assert 'args' not in teardown
+
+    def test_connection_per_track(self):
+        stream = io.StringIO()
+        tracer = Tracer(stream=stream)
+        first, second = tracer.sample(), tracer.sample()
+        first.span('accept', first.started)
+        second.span('accept', second.started)
+
+        events = close_and_load(tracer, stream)
+        assert first.tid != second.tid
+        assert sorted(event['tid'] for event in events) == sorted((first.tid, second.tid))
+
+    def test_sampling(self):
+        values = iter([0.05, 0.5, 0.09, 0.99])
+        tracer = Tracer(stream=io.StringIO(), sample_rate=0.1, rng=lambda: next(values))
+        assert [tracer.sample() is not None for _ in range(4)] == [True, False, True, False]
+        assert tracer.stats()['sampled'] == 2
+        tracer.close()
+
+    def test_sampling_off(self):
+        stream = io.StringIO()
+        tracer = Tracer(stream=stream, sample_rate=0.0)
+        assert all(tracer.sample() is None for _ in range(100))
+        assert close_and_load(tracer, stream) == []
+
+    @pytest.mark.parametrize('rate', [-0.1, 1.5])
+    def test_invalid_rate(self, rate):
+        with pytest.raises(ValueError):
+            Tracer(stream=io.StringIO(), sample_rate=rate)
+
+    def test_unfinished_file_is_readable(self):
+        """Без close() нет закрывающей скобки - просмотрщики читают такой файл, json - с ней"""
+        stream = io.StringIO()
+        tracer = Tracer(stream=stream)
+        tracer.sample().span('accept', 0.0, 0.001)
+        deadline = time.time() + 3
+        while tracer.stats()['written'] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(json.loads(stream.getvalue() + ']')) == 1
+        tracer.close()
+
+    def test_full_queue_drops(self):
+        """Медленная запись не задерживает рабочие потоки: лишние спаны отбрасываются"""
+        stream = BlockingStream()
+        tracer = Tracer(stream=stream, queue_size=2)
+        trace = tracer.sample()
+        for _ in range(20):
+            trace.span('accept', 0.0, 0.001)
+        assert tracer.stats()['dropped'] > 0
+
+        stream.unblocked.set()
+        events = close_and_load(tracer, stream)
+        assert len(events) + tracer.stats()['dropped'] == 20
+
+    def test_file_output(self, tmp_path):
+        path = tmp_path / 'trace.json'
+        tracer = Tracer(str(path))
+        tracer.sample().span('accept', 0.0, 0.001)
+        tracer.close()
+        assert [event['name'] for event in json.loads(path.read_text())] == ['accept']
+
+
+class TestProxyTracing:
+    """Точки трассировки в Socks5Proxy"""
+
+    def test_off_by_default(self):
+        proxy = Socks5Proxy()
+        assert proxy.tracer is None
+        assert proxy.trace_for(MagicMock()) is None
+        assert 'trace' not in proxy.stats()
+
+    def test_rejected_connection_releases_trace(self):
+        stream = io.StringIO()
+        proxy = Socks5Proxy(tracer=Tracer(stream=stream))
+        client = MagicMock()
+        proxy.traces[client] = proxy.tracer.sample()
+        proxy.reject(client)
+        assert proxy.traces == {}
+        assert proxy.stats()['trace']['sampled'] == 1
+        proxy.tracer.close()
@@ -0,0 +1,153 @@
+import pytest
+import socket
+import sys
+import os
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from upstream import (Upstream, UpstreamPool, UpstreamSocket, POLICY_EWMA, POLICY_LEAST_CONNECTIONS,
+                      parse_upstream)
+
+
+class FakeClock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_pool(count=3, **kwargs):
+    upstreams = [Upstream('127.0.0.1', 10000 + i) for i in range(count)]
+    return UpstreamPool(upstreams, clock=kwargs.pop('clock', FakeClock()), **kwargs), upstreams
+
+
+class TestParseUpstream:
+    """Адрес upstream из командной строки"""
+
+    @pytest.mark.parametrize('value, expected', [
+        ('proxy.local:1080', ('proxy.local', 1080, None)),
+        ('alice:secret@10.0.0.1:1081', ('10.0.0.1', 1081, (b'alice', b'secret'))),
+        ('[::1]:1080', ('::1', 1080, None)),
+    ])
+    def test_parse(self, value, expected):
+        upstream = parse_upstream(value)
+        assert (upstream.host, upstream.port, upstream.credentials) == expected
+
+    @pytest.mark.parametrize('value', ['proxy.local', ':1080', 'host:port'])
+    def test_invalid(self, value):
+        with pytest.raises(ValueError):
+            parse_upstream(value)
+
+
+class TestEwma:
+    """Peak EWMA задержки"""
+
+    def test_increase_is_immediate(self):
+        upstream = Upstream('127.0.0.1', 1)
+        upstream.observe(0.001, 0)
+        upstream.observe(0.2, 0.1)
+        assert upstream.ewma == 0.2
+
+    def test_decrease_decays_with_time(self):
+        upstream = Upstream('127.0.0.1', 1)
+        upstream.observe(0.2, 0)
+        upstream.observe(0.0, 0.1, decay=10)
+        assert 0.19 < upstream.ewma < 0.2
+        upstream.observe(0.0, 30.1, decay=10)
+        assert upstream.ewma < 0.01
+
+
+class TestSelection:
+    """Выбор upstream"""
+
+    def test_least_connections(self):
+        pool, upstreams = make_pool()
+        picked = [pool.acquire() for _ in range(3)]
+        # Равная стоимость - по кругу
+        assert sorted(upstream.port for upstream in picked) == [10000, 10001, 10002]
+
+        pool.release(upstreams[1])
+        assert pool.acquire() is upstreams[1]
+
+    def test_ewma_prefers_fast(self):
+        pool, upstreams = make_pool(policy=POLICY_EWMA)
+        for upstream, latency in zip(upstreams, (0.010, 0.001, 0.050)):
+            pool.record_success(upstream, latency)
+        assert pool.acquire() is upstreams[1]
+        # Стоимость растет с числом активных соединений: 0.001 * 20 > 0.010
+        upstreams[1].active = 20
+        assert pool.acquire() is upstreams[0]
+
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError):
+            make_pool(policy='random')
+
+    def test_unhealthy_skipped(self):
+        pool, upstreams = make_pool()
+        upstreams[0].healthy = upstreams[1].healthy = False
+        assert all(pool.acquire() is upstreams[2] for _ in range(3))
+
+    def test_all_unavailable_falls_back(self):
+        pool, upstreams = make_pool(2)
+        for upstream in upstreams:
+            upstream.healthy = False
+        assert pool.acquire() in upstreams
+        assert pool.acquire(exclude=upstreams) is None
+
+
+class TestEjection:
+    """Исключение upstream по ошибкам и по задержке"""
+
+    def test_consecutive_failures(self):
+        clock = FakeClock()
+        pool, upstreams = make_pool(eject_failures=3, eject_time=30, clock=clock)
+        for _ in range(2):
+            pool.record_failure(upstreams[0])
+        pool.record_success(upstreams[0], 0.001)
+        pool.record_failure(upstreams[0])
+        assert upstreams[0].ejected_until <= clock.now
+
+        pool.record_failure(upstreams[0])
+        pool.record_failure(upstreams[0])
+        assert upstreams[0].ejected_until == clock.now + 30
+        assert all(pool.acquire() is not upstreams[0] for _ in range(4))
+
+        clock.now += 31
+        assert upstreams[0] in pool.available(clock.now)
+
+    def test_max_ejected_fraction(self):
+        pool, upstreams = make_pool(4, eject_failures=1)
+        for upstream in upstreams:
+            pool.record_failure(upstream)
+        assert sum(1 for upstream in upstreams if upstream.ejections) == 2
+
+    def test_latency_outlier(self):
+        pool, upstreams = make_pool()
+        for upstream, latency in zip(upstreams, (0.001, 0.002, 0.300)):
+            pool.record_success(upstream, latency)
+        pool.eject_outliers()
+        assert [upstream.ejections for upstream in upstreams] == [0, 0, 1]
+
+    def test_small_latency_difference_ignored(self):
+        """На loopback разница 0.1 мс против 1 мс - шум, а не медленный upstream"""
+        pool, upstreams = make_pool()
+        for upstream, latency in zip(upstreams, (0.0001, 0.0001, 0.001)):
+            pool.record_success(upstream, latency)
+        pool.eject_outliers()
+        assert not any(upstream.ejections for upstream in upstreams)
+
+
+class TestUpstreamSocket:
+    """Закрытие соединения освобождает upstream"""
+
+    def test_close_releases_once(self):
+        pool, upstreams = make_pool(1)
+        upstream = pool.acquire()
+        sock = UpstreamSocket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.pool, sock.upstream = pool, upstream
+        assert upstream.active == 1
+        sock.close()
+        sock.close()
+        assert upstream.active == 0
@@ -0,0 +1,123 @@
+import pytest
+import threading
+import time
+import sys
+import os
+from unittest.mock import MagicMock
+
+# Добавляем путь к src/python для импортов
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'python'))
+
+from worker_pool import WorkerPool, OVERLOAD_REJECT, OVERLOAD_QUEUE
+from socks5_proxy import Socks5Proxy
+
+
+class TestWorkerPool:
+    """Unit-тесты пула потоков"""
+
+    def test_tasks_are_processed(self):
+        """Все поставленные задачи обрабатываются"""
+        processed = []
+        pool = WorkerPool(processed.append, max_workers=2, queue_size=10)
+
+        for i in range(10):
+            assert pool.try_acquire()
+            pool.submit(i)
+
+        pool.shutdown()
+        assert sorted(processed) == list(range(10))
+        assert pool.stats()['completed'] == 10
+
+    def test_capacity_is_bounded(self):
+        """Емкость пула равна max_workers + queue_size"""
+        release = threading.Event()
+        pool = WorkerPool(lambda item: release.wait(), max_workers=2, queue_size=1)
+
+        for i in range(3):
+            assert pool.try_acquire(blocking=False)
+            pool.submit(i)
+
+        assert not pool.try_acquire(blocking=False)
+
+        # Дожидаемся, пока потоки заберут задачи из очереди
+        time.sleep(0.1)
+        assert pool.stats()['busy_workers'] == 2
+        assert pool.queue_depth == 1
+
+        release.set()
+        pool.shutdown()
+        assert pool.try_acquire(blocking=False)
+
+    def test_handler_error_does_not_kill_worker(self):
+        """Исключение в обработчике не останавливает поток и освобождает место"""
+        processed = []
+
+        def handler(item):
+            if item == 'bad':
+                raise RuntimeError("boom")
+            processed.append(item)
+
+        pool = WorkerPool(handler, max_workers=1, queue_size=0)
+        assert pool.try_acquire()
+        pool.submit('bad')
+        assert pool.try_acquire(timeout=1)
+        pool.submit('good')
+        pool.shutdown()
+
+        assert processed == ['good']
+
+    def test_invalid_parameters(self):
+        """Неверные параметры пула"""
+        with pytest.raises(ValueError):
+            WorkerPool(print, max_workers=0)
+        with pytest.raises(ValueError):
+            WorkerPool(print, max_workers=1, queue_size=-1)
+
+
+class TestAdmissionControl:
+    """Тесты политик перегрузки Socks5Proxy"""
+
+    def test_unknown_policy(self):
+        """Неизвестная политика перегрузки"""
+        with pytest.raises(ValueError):
+            Socks5Proxy(overload_policy='drop')
+
+    def test_reject_when_pool_is_full(self):
+        """При политике reject лишнее соединение получает отказ в выборе метода"""
+        release = threading.Event()
+        proxy = Socks5Proxy(max_workers=1, queue_size=0, overload_policy=OVERLOAD_REJECT)
+        proxy.handle_client = lambda sock: release.wait()
+        proxy.pool.handler = proxy.handle_client
+
+        busy_client = MagicMock()
+        rejected_client = MagicMock()
+
+        proxy.dispatch(busy_client)
+        proxy.dispatch(rejected_client)
+
+        rejected_client.send.assert_called_with(b'\x05\xff')
+        rejected_client.close.assert_called_once()
+        assert proxy.stats()['rejected'] == 1
+
+        release.set()
+        proxy.pool.shutdown()
+
+    def test_queue_policy_waits_for_slot(self):
+        """При политике queue соединение дожидается освобождения места"""
+        handled = []
+        release = threading.Event()
+
+        def handler(sock):
+            release.wait()
+            handled.append(sock)
+
+        proxy = Socks5Proxy(max_workers=1, queue_size=0, overload_policy=OVERLOAD_QUEUE)
+        proxy.pool.handler = handler
+
+        proxy.dispatch('first')
+        threading.Timer(0.1, release.set).start()
+        proxy.dispatch('second')
+        proxy.pool.shutdown()
+
+        assert handled == ['first', 'second']
+        assert proxy.stats()['rejected'] == 0